@@ -1,6 +1,9 @@
 import streamlit as st
+from contextlib import nullcontext
 from pathlib import Path
-from snowflake.snowpark.context import get_active_session
+from iitj_search.backend import backend_name
+from iitj_search.profiling import RunProfiler, is_admin, recent_profiles
+from iitj_search.warmup import start_warmup
 
 # IITJ Logo
 logo_path = Path(__file__).parent / "resources" / "iitj.jpg"
@@ -22,7 +25,9 @@ st.set_page_config(
 def get_snowflake_session():
     """Get active Snowflake session or create new one if expired"""
     try:
-        # Try to get active session (works in Streamlit in Snowflake)
+        # Try to get active session (works in Streamlit in Snowflake).
+        # Snowpark is imported here, not at the top, to keep it off the cold start.
+        from snowflake.snowpark.context import get_active_session
         session = get_active_session()
         return session
     except Exception:
@@ -42,13 +47,10 @@ def get_snowflake_session():
         st.session_state.snowflake_session = new_session
         return new_session
 
-# Establish connection at app launch
-if "snowflake_session" not in st.session_state:
-    with st.spinner("🔌 Connecting to Snowflake..."):
-        st.session_state.snowflake_session = get_snowflake_session()
-        st.session_state.get_snowflake_session = get_snowflake_session
-    st.balloons()
-    st.toast("Connected to ☁️", icon="✅")
+# Pages connect on first use through this getter instead of blocking first
+# paint here (the local backend needs no connection).
+if backend_name(st.secrets) != "local" and "get_snowflake_session" not in st.session_state:
+    st.session_state.get_snowflake_session = get_snowflake_session
 
 
 # Pages
@@ -60,4 +62,53 @@ pg = st.navigation({
     "Menu": [curate, ai_search]
 })
 
-pg.run()
+@st.fragment
+def profiling_panel():
+    """This process's recent rerun profiles; browsing them reruns only this panel."""
+    profiles = recent_profiles()
+    with st.expander("⏱️ Rerun profiles", expanded=True):
+        if not profiles:
+            st.caption("Profiles of the following reruns appear here.")
+            return
+        titles = [profile.title() for profile in profiles]
+        profile = profiles[titles.index(st.selectbox("Profile", titles, key="profile_choice"))]
+        st.caption(
+            f"{profile.user or 'unknown'} · {profile.samples} stack samples · "
+            f"peak traced memory {profile.peak_kib:,.0f} KiB"
+        )
+        st.markdown("**Top functions** (own time, script thread)")
+        st.dataframe(profile.functions, hide_index=True, column_config={
+            "own_ms": st.column_config.NumberColumn("own ms", format="%.1f"),
+            "total_ms": st.column_config.NumberColumn("total ms", format="%.1f"),
+        })
+        st.markdown("**Allocation sites**")
+        st.dataframe(profile.allocations, hide_index=True, column_config={
+            "kib": st.column_config.NumberColumn("KiB", format="%.1f"),
+        })
+        st.download_button(
+            "Flamegraph stacks (.folded)",
+            profile.folded,
+            file_name=f"iitj_profile_{int(profile.started)}.folded",
+            mime="text/plain",
+            icon=":material/download:",
+            on_click="ignore",
+        )
+
+# Admins can profile each rerun of either page; for everyone else this is one check.
+profiler = nullcontext()
+if is_admin(st.session_state):
+    with st.sidebar:
+        if st.toggle("Profile reruns", key="profile_reruns",
+                     help="cProfile, stack samples and tracemalloc around every rerun of the page"):
+            profiling_panel()
+            profiler = RunProfiler(pg.title, st.session_state.user_email)
+
+try:
+    with profiler:
+        pg.run()
+finally:
+    # Resume the warehouse and warm the search service once the page has painted
+    # (also when the page ended early with st.stop()).
+    if "backend" in st.session_state and not st.session_state.get("warmup_started"):
+        st.session_state.warmup_started = True
+        start_warmup(st.session_state.backend)
@@ -0,0 +1 @@
+"""Shared helpers and command-line tools for the IITJ AI Search app."""
@@ -0,0 +1,503 @@
+"""Process-wide admission control for search, completion and embedding calls.
+
+Every ``SEARCH_PREVIEW``, ``AI_COMPLETE`` and embedding-procedure call the
+app issues goes through a gate for its kind, which lets at most ``limit``
+calls run at once. Callers over the limit wait in a queue that is fair per
+user: each user has their own FIFO and slots are handed out round-robin
+across users, so one session fanning out many sub-queries cannot starve the
+others. Nobody jumps the queue while anyone is waiting.
+
+A turn's routed completion holds one complete slot for the primary and its
+hedge or fallback together (``RagEngine.admitted_routed``), so a queued
+hedge can never outlive its turn. While a hedge runs, the gate therefore
+counts one call where two are running: ``in_flight`` can undercount
+concurrent completions by up to the number of hedging turns.
+
+A caller that has waited ``max_wait`` seconds gives up with
+``AdmissionTimeout``. While queued, the caller's ``Requester`` (a context
+variable the page sets per session) shows its position, which the page
+displays in the turn's status line. A turn that is abandoned while queued
+leaves the queue at once (``jobs.turn_abandoned``).
+
+Background work (follow-up prefetch) runs inside ``low_priority()``: its
+calls never queue. They take a slot only while nobody is waiting and fewer
+than ``BACKGROUND_SHARE`` of the slots are in use, and otherwise fail at
+once with ``AdmissionBusy``, so they can never delay a user's call.
+
+Limits and waits come from ``IITJ_ADMIT_<KIND>`` and
+``IITJ_ADMIT_<KIND>_WAIT`` (e.g. ``IITJ_ADMIT_COMPLETE=4``). Queue depth,
+calls in flight and wait-time histograms are kept per kind; with
+``IITJ_METRICS_TEXTFILE`` set they are written there in the Prometheus text
+format every ``EXPORT_INTERVAL`` seconds, for node_exporter's textfile
+collector.
+
+Simulate a burst of users against the local backend:
+    python -m iitj_search.admission --users 30 --questions 2
+    python -m iitj_search.admission --users 30 --complete-limit 2 --prometheus
+"""
+
+import argparse
+import contextvars
+import os
+import statistics
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+from iitj_search.jobs import QueryCancelled, turn_abandoned
+
+KINDS = ("search", "complete", "embed")
+DEFAULT_LIMITS = {"search": 8, "complete": 4, "embed": 2}
+DEFAULT_MAX_WAIT = {"search": 20.0, "complete": 60.0, "embed": 300.0}  # seconds
+# Upper bounds (seconds) of the wait-time histogram buckets; the last is open-ended.
+WAIT_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300]
+RECENT_WAITS = 500
+WAIT_SLICE = 0.25  # seconds between position updates and abandonment checks
+EXPORT_INTERVAL = 15.0
+BACKGROUND_SHARE = 0.5  # background calls only run while fewer slots than this share are busy
+METRICS_TEXTFILE = os.environ.get("IITJ_METRICS_TEXTFILE")
+
+current_requester: contextvars.ContextVar = contextvars.ContextVar("iitj_requester", default=None)
+# Set by ``low_priority``; copied into worker threads like the requester.
+_background: contextvars.ContextVar = contextvars.ContextVar("iitj_background", default=None)
+
+
+class AdmissionTimeout(TimeoutError):
+    """The call waited longer than its gate's ``max_wait`` for a slot."""
+
+
+class AdmissionBusy(AdmissionTimeout):
+    """A background call found no spare slot; it does not wait for one."""
+
+
+@dataclass
+class BackgroundWork:
+    """Calls made inside one ``low_priority`` block; ``busy`` counts the ones turned away."""
+
+    calls: int = 0
+    busy: int = 0
+
+
+@dataclass
+class Requester:
+    """Who is asking; ``waiting`` maps a kind to the queue position while queued."""
+
+    user: str
+    waiting: dict[str, int] = field(default_factory=dict)
+
+    def queue_note(self) -> str:
+        """Status-line suffix while queued, e.g. " - waiting for a complete slot (position 3)"."""
+        waiting = dict(self.waiting)  # updated from worker threads
+        if not waiting:
+            return ""
+        kind, position = min(waiting.items(), key=lambda item: item[1])
+        return f" - waiting for a {kind} slot (position {position})"
+
+
+def _env_number(name: str, default, cast):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+
+class _Ticket:
+    __slots__ = ("user", "granted")
+
+    def __init__(self, user: str):
+        self.user = user
+        self.granted = False
+
+
+class Gate:
+    """Concurrency limit for one kind of call, with a per-user round-robin queue."""
+
+    def __init__(self, kind: str, limit: int, max_wait: float):
+        self.kind = kind
+        self.limit = max(1, limit)
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        # user -> their waiting tickets; the first user is served next.
+        self._queues: OrderedDict[str, deque[_Ticket]] = OrderedDict()
+        self.admitted = 0
+        self.timeouts = 0
+        self.abandoned = 0
+        self.background = 0
+        self.background_busy = 0
+        self.max_depth = 0
+        self._buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self._wait_sum = 0.0
+        self._recent = deque(maxlen=RECENT_WAITS)
+
+    # -- queue --------------------------------------------------------------
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _position(self, ticket: _Ticket) -> int:
+        """1-based place of ``ticket`` in the round-robin order of the waiting tickets."""
+        position = 0
+        queues = list(self._queues.values())
+        for rank in range(max(len(q) for q in queues)):
+            for q in queues:
+                if rank < len(q):
+                    position += 1
+                    if q[rank] is ticket:
+                        return position
+        return position
+
+    def _grant(self):
+        while self.in_flight < self.limit and self._queues:
+            user, tickets = next(iter(self._queues.items()))
+            tickets.popleft().granted = True
+            self.in_flight += 1
+            if tickets:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+        self._cond.notify_all()
+
+    def _withdraw(self, ticket: _Ticket):
+        tickets = self._queues.get(ticket.user)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[ticket.user]
+
+    def _record_wait(self, seconds: float):
+        self.admitted += 1
+        self._buckets[bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self._wait_sum += seconds
+        self._recent.append(seconds)
+
+    # -- callers ------------------------------------------------------------
+
+    def acquire(self, user: str, max_wait: float | None = None, on_wait=None) -> float:
+        """Wait for a slot; returns the seconds spent queued.
+
+        ``on_wait(position)`` is called (outside the gate's lock) whenever the
+        position may have changed. Raises ``AdmissionTimeout`` after
+        ``max_wait`` and ``QueryCancelled`` when the caller's turn was
+        abandoned meanwhile.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.monotonic()
+        with self._cond:
+            if self.in_flight < self.limit and not self._queues:
+                self.in_flight += 1
+                self._record_wait(0.0)
+                return 0.0
+            ticket = _Ticket(user)
+            self._queues.setdefault(user, deque()).append(ticket)
+            self.max_depth = max(self.max_depth, self.depth())
+        try:
+            while True:
+                with self._cond:
+                    if ticket.granted:
+                        waited = time.monotonic() - start
+                        self._record_wait(waited)
+                        return waited
+                    remaining = max_wait - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._withdraw(ticket)
+                        self.timeouts += 1
+                        raise AdmissionTimeout(
+                            f"no {self.kind} slot freed up within {max_wait:g}s "
+                            f"with {self.in_flight} running and {self.depth()} waiting"
+                        )
+                    if turn_abandoned():
+                        self._withdraw(ticket)
+                        self.abandoned += 1
+                        raise QueryCancelled(f"{self.kind} request left the queue with its turn")
+                    position = self._position(ticket)
+                if on_wait is not None:
+                    on_wait(position)
+                with self._cond:
+                    if not ticket.granted:
+                        self._cond.wait(min(remaining, WAIT_SLICE))
+        except BaseException:
+            with self._cond:
+                if ticket.granted:
+                    # Granted just as the caller gave up: hand the slot on.
+                    self.in_flight -= 1
+                    self._grant()
+                else:
+                    self._withdraw(ticket)
+            raise
+
+    def try_acquire_spare(self) -> bool:
+        """Take a slot for background work only if nobody waits and the gate is mostly idle."""
+        with self._cond:
+            if self._queues or self.in_flight >= int(self.limit * BACKGROUND_SHARE):
+                self.background_busy += 1
+                return False
+            self.in_flight += 1
+            self.background += 1
+            self._record_wait(0.0)
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._grant()
+
+    # -- metrics ------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            recent = sorted(self._recent)
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queue_depth": self.depth(),
+                "queued_users": len(self._queues),
+                "max_depth": self.max_depth,
+                "admitted": self.admitted,
+                "timeouts": self.timeouts,
+                "abandoned": self.abandoned,
+                "background": self.background,
+                "background_busy": self.background_busy,
+                "wait_p50_s": round(statistics.median(recent), 3) if recent else None,
+                "wait_p95_s": round(recent[min(len(recent) - 1, round(0.95 * (len(recent) - 1)))], 3) if recent else None,
+                "wait_sum_s": round(self._wait_sum, 3),
+                "wait_histogram": dict(zip([f"<={b}s" for b in WAIT_BUCKETS] + [f">{WAIT_BUCKETS[-1]}s"],
+                                           self._buckets)),
+            }
+
+    def prometheus_lines(self) -> list[str]:
+        with self._cond:
+            labels = f'kind="{self.kind}"'
+            lines = [
+                f"iitj_admission_limit{{{labels}}} {self.limit}",
+                f"iitj_admission_in_flight{{{labels}}} {self.in_flight}",
+                f"iitj_admission_queue_depth{{{labels}}} {self.depth()}",
+                f"iitj_admission_admitted_total{{{labels}}} {self.admitted}",
+                f"iitj_admission_timeouts_total{{{labels}}} {self.timeouts}",
+                f"iitj_admission_abandoned_total{{{labels}}} {self.abandoned}",
+            ]
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS + ["+Inf"], self._buckets):
+                cumulative += count
+                lines.append(f'iitj_admission_wait_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"iitj_admission_wait_seconds_sum{{{labels}}} {self._wait_sum:.6f}")
+            lines.append(f"iitj_admission_wait_seconds_count{{{labels}}} {cumulative}")
+        return lines
+
+
+PROMETHEUS_HEADER = """\
+# HELP iitj_admission_limit Concurrent calls allowed per kind.
+# TYPE iitj_admission_limit gauge
+# HELP iitj_admission_in_flight Calls currently running per kind.
+# TYPE iitj_admission_in_flight gauge
+# HELP iitj_admission_queue_depth Calls currently waiting for a slot per kind.
+# TYPE iitj_admission_queue_depth gauge
+# HELP iitj_admission_admitted_total Calls admitted per kind.
+# TYPE iitj_admission_admitted_total counter
+# HELP iitj_admission_timeouts_total Calls that gave up after the maximum queue wait.
+# TYPE iitj_admission_timeouts_total counter
+# HELP iitj_admission_abandoned_total Calls that left the queue with an abandoned turn.
+# TYPE iitj_admission_abandoned_total counter
+# HELP iitj_admission_wait_seconds Time spent queued before admission.
+# TYPE iitj_admission_wait_seconds histogram
+"""
+
+
+class AdmissionController:
+    """One gate per kind of call."""
+
+    def __init__(self, limits: dict[str, int] | None = None, max_wait: dict[str, float] | None = None):
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        self.gates = {kind: Gate(kind, limits[kind], max_wait[kind]) for kind in KINDS}
+        self._exporter = None
+        self._exporter_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            {kind: _env_number(f"IITJ_ADMIT_{kind.upper()}", DEFAULT_LIMITS[kind], int) for kind in KINDS},
+            {kind: _env_number(f"IITJ_ADMIT_{kind.upper()}_WAIT", DEFAULT_MAX_WAIT[kind], float) for kind in KINDS},
+        )
+
+    @contextmanager
+    def admit(self, kind: str, user: str | None = None, max_wait: float | None = None):
+        """Hold a ``kind`` slot for the block, queueing for it first if needed.
+
+        Inside ``low_priority`` the call never queues: it raises
+        ``AdmissionBusy`` when there is no spare slot.
+        """
+        gate = self.gates[kind]
+        work = _background.get()
+        if work is not None:
+            work.calls += 1
+            if not gate.try_acquire_spare():
+                work.busy += 1
+                raise AdmissionBusy(f"no spare {kind} slot for background work")
+            try:
+                yield
+            finally:
+                gate.release()
+            return
+        requester = current_requester.get()
+        user = user or (requester.user if requester else "anonymous")
+        # The queue position is shown in the requester's status line.
+        on_wait = partial(requester.waiting.__setitem__, kind) if requester is not None else None
+        try:
+            gate.acquire(user, max_wait, on_wait)
+        finally:
+            if requester is not None:
+                requester.waiting.pop(kind, None)
+        try:
+            yield
+        finally:
+            gate.release()
+
+    def snapshot(self) -> dict[str, dict]:
+        return {kind: gate.snapshot() for kind, gate in self.gates.items()}
+
+    def prometheus_text(self) -> str:
+        return PROMETHEUS_HEADER + "".join(
+            line + "\n" for gate in self.gates.values() for line in gate.prometheus_lines()
+        )
+
+    def write_textfile(self, path: Path):
+        """Write the metrics atomically (node_exporter may read at any time)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def start_exporter(self, path: Path, interval: float = EXPORT_INTERVAL):
+        """Rewrite ``path`` every ``interval`` seconds on a daemon thread (once per controller)."""
+        with self._exporter_lock:
+            if self._exporter is not None:
+                return
+
+            def export():
+                while True:
+                    try:
+                        self.write_textfile(path)
+                    except OSError:
+                        pass  # try again next interval
+                    time.sleep(interval)
+
+            self._exporter = threading.Thread(target=export, name="iitj-admission-metrics", daemon=True)
+            self._exporter.start()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def shared_controller() -> AdmissionController:
+    """Process-wide controller configured from the environment."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController.from_env()
+            if METRICS_TEXTFILE:
+                _controller.start_exporter(Path(METRICS_TEXTFILE))
+        return _controller
+
+
+def admit(kind: str, user: str | None = None, max_wait: float | None = None):
+    """``shared_controller().admit(...)``."""
+    return shared_controller().admit(kind, user, max_wait)
+
+
+@contextmanager
+def low_priority():
+    """Run the block's admitted calls as background work; yields its ``BackgroundWork``."""
+    work = BackgroundWork()
+    token = _background.set(work)
+    try:
+        yield work
+    finally:
+        _background.reset(token)
+
+
+def simulate(users: int, questions: int, controller: AdmissionController, latency) -> dict:
+    """A burst of ``users`` each asking ``questions`` questions (two sub-queries, one completion) at once."""
+    from iitj_search import config
+    from iitj_search.backend import LocalBackend
+    from iitj_search.local_corpus import build_corpus
+
+    backend = LocalBackend(latency=latency)
+    backend.load_corpus(build_corpus(50))
+    service = config.qualified(config.SEARCH_SERVICE)
+    turn_seconds, errors = [], []
+    lock = threading.Lock()
+
+    def user_flow(idx: int):
+        current_requester.set(Requester(f"user-{idx}"))
+        for _ in range(questions):
+            start = time.monotonic()
+            try:
+                for query in ("faculty in computer science", "scholarship notices"):
+                    with controller.admit("search"):
+                        backend.search(service, {"query": query, "columns": ["CHUNK"], "filter": {}, "limit": 5})
+                with controller.admit("complete"):
+                    backend.complete("claude-4-sonnet", query)
+            except AdmissionTimeout as exc:
+                with lock:
+                    errors.append(str(exc))
+                continue
+            with lock:
+                turn_seconds.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=user_flow, args=(i,)) for i in range(users)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "wall_s": time.monotonic() - start,
+        "turn_seconds": turn_seconds,
+        "timeouts": len(errors),
+        "gates": controller.snapshot(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=30, help="Users arriving at once")
+    parser.add_argument("--questions", type=int, default=2, help="Questions per user")
+    parser.add_argument("--search-limit", type=int, default=DEFAULT_LIMITS["search"])
+    parser.add_argument("--complete-limit", type=int, default=DEFAULT_LIMITS["complete"])
+    parser.add_argument("--complete-wait", type=float, default=DEFAULT_MAX_WAIT["complete"],
+                        help="Maximum seconds a completion waits for a slot")
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    parser.add_argument("--complete-latency", type=float, default=1.0)
+    parser.add_argument("--prometheus", action="store_true", help="Print the metrics in the Prometheus text format")
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import LocalLatency
+
+    controller = AdmissionController(
+        {"search": args.search_limit, "complete": args.complete_limit},
+        {"complete": args.complete_wait},
+    )
+    report = simulate(args.users, args.questions, controller,
+                      LocalLatency(search=args.search_latency, complete=args.complete_latency))
+    times = sorted(report["turn_seconds"])
+    print(f"{args.users} users x {args.questions} questions in {report['wall_s']:.1f}s; "
+          f"{len(times)} answered, {report['timeouts']} gave up waiting")
+    if times:
+        print(f"turn time p50 {statistics.median(times):.2f}s, max {times[-1]:.2f}s")
+    for kind, gate in report["gates"].items():
+        if gate["admitted"] or gate["timeouts"]:
+            print(f"{kind:<9} limit {gate['limit']:<3} max depth {gate['max_depth']:<4} "
+                  f"wait p50 {gate['wait_p50_s']}s p95 {gate['wait_p95_s']}s, {gate['timeouts']} timeouts")
+    if args.prometheus:
+        print()
+        print(controller.prometheus_text(), end="")
+
+
+if __name__ == "__main__":
+    main()
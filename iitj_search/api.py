@@ -0,0 +1,508 @@
+"""HTTP/JSON query API over the RAG engine, outside the Streamlit rerun loop.
+
+Endpoints:
+    POST /v1/answer   {"question": ..., "history": [{"role": ..., "content": ...}],
+                       "settings": {...}, "stream": false}
+    POST /v1/search   {"question": ..., "settings": {...}}
+    GET  /v1/suggest?q=<typed text>&limit=8
+    GET  /healthz
+
+``settings`` takes the engine's DEFAULT_SETTINGS keys, each with its
+default's type, plus ``filters`` ({"file_types", "uploaded_by",
+"uploaded_after", "uploaded_before", "source_domain"}); anything else is a 400. With ``"stream": true`` the answer comes back as
+newline-delimited JSON events while the turn runs: status, sources (as soon
+as retrieval is done), answer and done; with two or more
+``compare_models``, each model's run is also a compared event as it
+finishes. AI_COMPLETE returns the whole answer at once, so the text arrives
+in one event.
+
+Requests borrow an engine from a pool of warehouse sessions (``--pool-size``
+Snowpark sessions; the local backend is shared). At most ``--max-in-flight``
+turns run at once; others wait up to ``--queue-timeout`` seconds and then
+get 503. Warehouse calls go through the same admission gates as the app,
+queued fairly per client (``X-Client-Id`` header, else the remote address),
+and a client that disconnects mid-stream has its statements cancelled. Set
+IITJ_API_KEY to require ``Authorization: Bearer <key>``.
+
+Usage:
+    python -m iitj_search.api --port 8502 --pool-size 4 --max-in-flight 16
+    curl -s localhost:8502/v1/answer -d '{"question": "List faculty in the Physics department"}'
+    python -m iitj_search.api --bench --requests 40 --concurrency 8
+"""
+
+import argparse
+import hmac
+import json
+import os
+import queue
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from iitj_search.admission import AdmissionTimeout, Requester, current_requester, shared_controller
+from iitj_search.autocomplete import shared_index
+from iitj_search.breaker import breaker_states
+from iitj_search.compare import MAX_MODELS
+from iitj_search.engine import DEFAULT_SETTINGS, RagEngine
+from iitj_search.filters import SearchFilters
+from iitj_search.jobs import TurnJobs
+from iitj_search.router import AUTO, MODELS
+
+DEFAULT_PORT = 8502
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_QUEUE_TIMEOUT = 30.0
+MAX_BODY_BYTES = 64 * 1024
+MAX_SUGGESTIONS = 20
+MAX_HISTORY = 20
+FILTER_FIELDS = {"file_types", "uploaded_by", "uploaded_after", "uploaded_before", "source_domain"}
+# The values the app's sidebar offers for the string settings.
+SETTING_CHOICES = {
+    "planner_mode": ["Rules", "Cheap model"],
+    "depth_mode": ["Fixed", "Adaptive", "Rerank"],
+    "model": [AUTO, *MODELS],
+}
+
+
+class BadRequest(ValueError):
+    """The request body cannot be answered as sent."""
+
+
+class EnginePool:
+    """Engines over pooled warehouse sessions, created on first use up to ``size``."""
+
+    def __init__(self, backend_factory, size: int = DEFAULT_POOL_SIZE):
+        self._factory = backend_factory
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self):
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    engine = RagEngine(self._factory())
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                engine = self._idle.get()
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def status(self) -> dict:
+        return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+
+def parse_settings(raw) -> dict:
+    """Engine settings from a request's ``settings`` object."""
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        raise BadRequest("settings must be an object")
+    unknown = set(raw) - set(DEFAULT_SETTINGS) - {"filters"}
+    if unknown:
+        raise BadRequest(f"unknown settings: {', '.join(sorted(unknown))}")
+    settings = {key: _setting(key, value) for key, value in raw.items() if key != "filters"}
+    filters = raw.get("filters") or {}
+    if not isinstance(filters, dict) or set(filters) - FILTER_FIELDS:
+        raise BadRequest(f"filters must be an object with keys from {sorted(FILTER_FIELDS)}")
+    try:
+        settings["filters"] = SearchFilters(
+            file_types=[str(t).lower() for t in filters.get("file_types") or []],
+            uploaded_by=(filters.get("uploaded_by") or "").strip().lower() or None,
+            uploaded_after=date.fromisoformat(filters["uploaded_after"]) if filters.get("uploaded_after") else None,
+            uploaded_before=date.fromisoformat(filters["uploaded_before"]) if filters.get("uploaded_before") else None,
+            source_domain=(filters.get("source_domain") or "").strip().lower().removeprefix("www.") or None,
+        )
+    except (TypeError, ValueError) as exc:
+        raise BadRequest(f"bad filter value: {exc}") from exc
+    return settings
+
+
+def _setting(key: str, value):
+    """``value`` checked against the type of the setting's default (a bool is not a number)."""
+    default = DEFAULT_SETTINGS[key]
+    if isinstance(default, tuple):
+        if not isinstance(value, list) or not all(model in MODELS for model in value) or len(value) > MAX_MODELS:
+            raise BadRequest(f"{key} must be a list of at most {MAX_MODELS} models from {sorted(MODELS)}")
+        return tuple(value)
+    if type(value) is not type(default):
+        raise BadRequest(f"{key} must be a {type(default).__name__}, not {json.dumps(value)}")
+    if isinstance(value, int) and not isinstance(value, bool) and value < 1:
+        raise BadRequest(f"{key} must be at least 1")
+    if key in SETTING_CHOICES and value not in SETTING_CHOICES[key]:
+        raise BadRequest(f"{key} must be one of {SETTING_CHOICES[key]}")
+    return value
+
+
+def _history(raw) -> list[dict]:
+    if raw is None:
+        return []
+    if not isinstance(raw, list) or not all(
+        isinstance(h, dict) and h.get("role") in {"user", "assistant"} and isinstance(h.get("content"), str)
+        for h in raw
+    ):
+        raise BadRequest("history must be a list of {role: user|assistant, content} objects")
+    return raw[-MAX_HISTORY:]
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, pool: EnginePool, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT, api_key: str | None = None):
+        super().__init__(address, ApiHandler)
+        self.pool = pool
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.api_key = api_key
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.counts = {"in_flight": 0, "answered": 0, "rejected": 0, "failed": 0, "disconnected": 0}
+
+    def count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.counts[key] += delta
+
+    def status(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        breakers = breaker_states()
+        return {
+            # Still serving while a breaker is open, but answers are degraded.
+            "ok": True,
+            "degraded": any(state["state"] != "closed" for state in breakers.values()),
+            "requests": counts,
+            "max_in_flight": self.max_in_flight,
+            "pool": self.pool.status(),
+            "admission": shared_controller().snapshot(),
+            "breakers": breakers,
+        }
+
+    @contextmanager
+    def slot(self):
+        """One of the ``max_in_flight`` turns; raises ``AdmissionTimeout`` when none frees up in time."""
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            self.count("rejected")
+            raise AdmissionTimeout(f"no request slot freed up within {self.queue_timeout:g}s")
+        self.count("in_flight")
+        try:
+            yield
+        finally:
+            self.count("in_flight", -1)
+            self.slots.release()
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server: ApiServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # one line per request is too noisy under load
+
+    # -- plumbing -------------------------------------------------------------
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body, default=_json_default, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(f"body larger than {MAX_BODY_BYTES} bytes")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as exc:
+            raise BadRequest(f"invalid JSON: {exc}") from exc
+        if not isinstance(body, dict):
+            raise BadRequest("body must be a JSON object")
+        question = body.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise BadRequest("question is required")
+        return body
+
+    def _authorized(self) -> bool:
+        if not self.server.api_key:
+            return True
+        given = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(given, self.server.api_key)
+
+    def _client(self) -> str:
+        return self.headers.get("X-Client-Id") or self.client_address[0]
+
+    # -- endpoints ------------------------------------------------------------
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/healthz":
+            self._send_json(200, self.server.status())
+        elif url.path == "/v1/suggest":
+            self._suggest(parse_qs(url.query))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _suggest(self, query: dict):
+        if not self._authorized():
+            self._send_json(401, {"error": "missing or wrong API key"})
+            return
+        try:
+            limit = min(MAX_SUGGESTIONS, max(1, int(query.get("limit", ["8"])[0])))
+        except ValueError:
+            self._send_json(400, {"error": "limit must be an integer"})
+            return
+        # The index lives in memory; the engine is only borrowed for its backend.
+        with self.server.pool.lease() as engine:
+            index = shared_index(engine.backend)
+        self._send_json(200, {"suggestions": index.complete(query.get("q", [""])[0], limit)})
+
+    def do_POST(self):
+        if self.path not in {"/v1/answer", "/v1/search"}:
+            self._send_json(404, {"error": "not found"})
+            return
+        if not self._authorized():
+            self._send_json(401, {"error": "missing or wrong API key"})
+            return
+        try:
+            body = self._read_json()
+            settings = parse_settings(body.get("settings"))
+            history = _history(body.get("history"))
+        except BadRequest as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        # Admission queues are fair per client, as they are per session in the app.
+        current_requester.set(Requester(f"api-{self._client()}"))
+        jobs = TurnJobs()
+        reason = "finished"
+        try:
+            with self.server.slot(), self.server.pool.lease() as engine, jobs.active():
+                if self.path == "/v1/search":
+                    self._search(engine, body["question"], settings)
+                elif body.get("stream"):
+                    self._stream(engine, body["question"], history, settings)
+                else:
+                    turn = engine.answer(body["question"], history, settings)
+                    self.server.count("answered")
+                    self._send_json(200, turn.summary())
+        except AdmissionTimeout as exc:
+            self._send_json(503, {"error": f"busy: {exc}"}, {"Retry-After": "5"})
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count("disconnected")
+            self.close_connection = True
+            reason = "interrupted"
+        except Exception as exc:
+            self.server.count("failed")
+            self._send_json(502, {"error": f"{type(exc).__name__}: {exc}"})
+        finally:
+            # A hedge's loser, or everything when the client went away.
+            jobs.cancel_all(reason)
+
+    def _search(self, engine: RagEngine, question: str, settings: dict):
+        trace = {}
+        start = time.perf_counter()
+        results = engine.run_search(question, {**DEFAULT_SETTINGS, **settings}, trace)
+        self.server.count("answered")
+        self._send_json(200, {
+            "question": question,
+            "results": results,
+            "sources": engine.source_documents(question, results),
+            "shards": (trace.get("last_search_shards") or {}).get("shards"),
+            "plan": trace.get("last_search_plan"),
+            "seconds": round(time.perf_counter() - start, 3),
+        })
+
+    def _stream(self, engine: RagEngine, question: str, history: list[dict], settings: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(name, data):
+            line = json.dumps({"event": name, **data}, default=_json_default, ensure_ascii=False) + "\n"
+            payload = line.encode("utf-8")
+            self.wfile.write(f"{len(payload):X}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            turn = engine.answer(question, history, settings, on_event=send)
+            self.server.count("answered")
+            summary = turn.summary()
+            send("done", {key: summary[key] for key in ("answered_from", "model", "hedged", "degraded", "chunks", "timings")})
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as exc:
+            self.server.count("failed")
+            send("error", {"error": f"{type(exc).__name__}: {exc}"})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(pool: EnginePool, host: str = "127.0.0.1", port: int = DEFAULT_PORT, **limits) -> ApiServer:
+    """Start the API on a daemon thread; returns the server (``server.shutdown()`` stops it)."""
+    server = ApiServer((host, port), pool, **limits)
+    threading.Thread(target=server.serve_forever, name="iitj-api", daemon=True).start()
+    return server
+
+
+# -- benchmark ------------------------------------------------------------------
+
+def _post(url: str, body: dict, timeout: float) -> dict:
+    from urllib.request import Request, urlopen
+
+    request = Request(url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _summarize(path: str, seconds: list[float], wall: float, errors: int) -> dict:
+    ordered = sorted(seconds) or [0.0]
+    return {
+        "path": path,
+        "requests": len(seconds),
+        "errors": errors,
+        "wall_s": round(wall, 2),
+        "per_s": round(len(seconds) / wall, 2) if wall else 0.0,
+        "p50_s": round(statistics.median(ordered), 3),
+        "p95_s": round(ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))], 3),
+    }
+
+
+def _run_clients(questions: list[str], concurrency: int, ask) -> tuple[list[float], float, int]:
+    """Spread the questions over ``concurrency`` client threads, each calling ``ask(worker, question)``."""
+    seconds, errors = [], []
+    lock = threading.Lock()
+
+    def worker(idx):
+        for question in questions[idx::concurrency]:
+            start = time.perf_counter()
+            try:
+                ask(idx, question)
+            except Exception:
+                with lock:
+                    errors.append(question)
+                continue
+            with lock:
+                seconds.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(idx,)) for idx in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return seconds, time.perf_counter() - start, len(errors)
+
+
+def bench(requests: int, concurrency: int, latency, scale: int = 200, timeout: float = 120.0) -> list[dict]:
+    """Golden-set questions through the API and through the search page (AppTest), same backend."""
+    from iitj_search import entities
+    from iitj_search.backend import LocalBackend
+    from iitj_search.evaluate import load_golden_set
+    from iitj_search.loadtest import SEARCH_PAGE
+    from iitj_search.local_corpus import build_corpus
+
+    backend = LocalBackend(latency=latency)
+    backend.load_corpus(build_corpus(scale))
+    entities.rebuild(backend)
+    golden = [item["question"] for item in load_golden_set()]
+    questions = [golden[idx % len(golden)] for idx in range(requests)]
+
+    server = serve(EnginePool(lambda: backend, size=concurrency), port=0, max_in_flight=concurrency)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/answer"
+    try:
+        api = _summarize("api", *_run_clients(
+            questions, concurrency, lambda idx, q: _post(url, {"question": q}, timeout),
+        ))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    from streamlit.testing.v1 import AppTest
+
+    apps = {}
+
+    def ask_page(idx, question):
+        at = apps.get(idx)
+        if at is None:
+            at = apps[idx] = AppTest.from_file(str(SEARCH_PAGE), default_timeout=timeout)
+            at.session_state["backend"] = backend
+            at.run()
+        at.chat_input[0].set_value(question).run()
+        if len(at.exception):
+            raise RuntimeError(at.exception[0].value)
+
+    page = _summarize("streamlit", *_run_clients(questions, concurrency, ask_page))
+    return [api, page]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="Warehouse sessions to pool")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument("--queue-timeout", type=float, default=DEFAULT_QUEUE_TIMEOUT)
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    parser.add_argument("--bench", action="store_true", help="Compare API and Streamlit-page throughput locally")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scale", type=int, default=200, help="Filler documents in the benchmark corpus")
+    parser.add_argument("--latency", default="search=0.3,complete=1.5", help="Simulated latency for the benchmark")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        from iitj_search.backend import LocalLatency
+
+        rows = bench(args.requests, args.concurrency, LocalLatency.parse(args.latency), args.scale)
+        print(f"{'path':<10} {'requests':>8} {'errors':>6} {'wall s':>7} {'req/s':>6} {'p50 s':>6} {'p95 s':>6}")
+        for row in rows:
+            print(f"{row['path']:<10} {row['requests']:>8} {row['errors']:>6} {row['wall_s']:>7.2f} "
+                  f"{row['per_s']:>6.2f} {row['p50_s']:>6.2f} {row['p95_s']:>6.2f}")
+        return
+
+    from iitj_search.backend import command_line_backend
+
+    pool = EnginePool(lambda: command_line_backend(args.backend), size=args.pool_size)
+    server = ApiServer(
+        (args.host, args.port), pool, max_in_flight=args.max_in_flight, queue_timeout=args.queue_timeout,
+        api_key=os.environ.get("IITJ_API_KEY") or None,
+    )
+    print(f"serving on http://{args.host}:{server.server_address[1]} "
+          f"(pool {args.pool_size}, {args.max_in_flight} in flight)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Type-ahead question suggestions from a compact in-memory prefix index.
+
+Suggestions are whole questions built from four sources:
+
+- documents in UPLOADED_FILES_METADATA: "Tell me about <SHORT_DESCRIPTION or FILE_NAME>"
+- faculty names from the entity tables: "Give information about <name>"
+- departments from the entity tables: "List faculty in the <name> department"
+- past questions: those in well-rated feedback, and those answered in this process
+  from at least ``MIN_SESSIONS`` distinct sessions, which gain weight with each
+  further session that asks them. A question asked in one session is never
+  shown to another before then.
+
+``PrefixIndex`` is one sorted array of normalised keys searched with
+``bisect``. It has no trie nodes. A suggestion can be found from the start of its
+text and from each of its first ``KEY_WORDS`` content words, so "kumar" finds
+"Give information about Binod Kumar". When a prefix matches little, its
+last word is corrected against the indexed names and titles. A misspelt
+"binod kumaar" still offers the right person.
+
+Adding a suggestion is a few ``insort`` calls, so the index is updated in
+place after uploads (``index_file``) and answered questions
+(``note_question``) instead of being rebuilt. The number of suggestions is
+capped at ``max_entries``. Past the cap, the lowest-weighted tenth is dropped
+in one pass.
+
+Build the index and time it:
+    python -m iitj_search.autocomplete --prefix "binod"
+    python -m iitj_search.autocomplete --bench --scale 5000
+"""
+
+import argparse
+import difflib
+import re
+import statistics
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from iitj_search import config
+
+MAX_ENTRIES = 5000
+KEY_WORDS = 6  # content words per suggestion that a prefix can start at
+SCAN_LIMIT = 400  # keys read per lookup before ranking
+SEP = "\x00"  # between a key and its suggestion's ID (sorts before every character)
+FEEDBACK_ROWS = 1000
+MIN_FEEDBACK_RATING = 4
+# Starting weights; every ask of a question adds QUESTION_WEIGHT.
+WEIGHTS = {"question": 1.0, "faculty": 0.6, "department": 0.6, "document": 0.4}
+QUESTION_WEIGHT = 1.0
+MIN_SESSIONS = 3  # distinct sessions that must ask a question before it is suggested
+TEMPLATES = {
+    "faculty": "Give information about {}",
+    "department": "List faculty in the {} department",
+    "document": "Tell me about {}",
+}
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "for", "to", "and", "or", "is", "are", "what", "who", "how",
+    "me", "about", "give", "tell", "list", "show", "all", "information", "with", "their", "iit", "jodhpur",
+}
+USER_LINE = re.compile(r"^\[user\]:\s*(.+)$", re.MULTILINE)
+
+
+def normalize(text: str) -> str:
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in (text or "").lower()).split())
+
+
+@dataclass
+class Suggestion:
+    text: str
+    kind: str
+    weight: float
+    keys: tuple[str, ...]
+    words: tuple[str, ...]  # of the subject, for spelling correction
+
+
+class PrefixIndex:
+    """Weighted suggestions in a sorted key array; safe to share across threads."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: dict[str, Suggestion] = {}
+        self._keys: list[str] = []  # "<key>\0<suggestion id>", sorted
+        self._vocabulary: dict[str, int] = {}  # words of names and titles -> suggestions using them
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _keys_for(normalized: str) -> tuple[str, ...]:
+        words = normalized.split()
+        keys = [normalized]
+        for start, word in enumerate(words):
+            if len(keys) > KEY_WORDS:
+                break
+            if start and word not in STOPWORDS:
+                keys.append(" ".join(words[start:]))
+        return tuple(keys)
+
+    def add(self, text: str, kind: str, weight: float | None = None, subject: str | None = None) -> bool:
+        """Add a suggestion, or raise its weight if present; False when the text is empty.
+
+        ``subject`` (a name or title) feeds the spelling correction.
+        """
+        text = " ".join((text or "").split())
+        sid = normalize(text)
+        if not sid:
+            return False
+        weight = WEIGHTS.get(kind, 0.5) if weight is None else weight
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                entry.weight += weight if kind == "question" else 0.0
+                return True
+            words = tuple(word for word in normalize(subject).split() if len(word) > 2) if subject else ()
+            entry = Suggestion(text, kind, weight, self._keys_for(sid), words)
+            self._entries[sid] = entry
+            for key in entry.keys:
+                insort(self._keys, f"{key}{SEP}{sid}")
+            for word in words:
+                self._vocabulary[word] = self._vocabulary.get(word, 0) + 1
+            if len(self._entries) > self.max_entries:
+                self._evict()
+        return True
+
+    def _evict(self):
+        """Drop the lowest-weighted tenth (one pass, rather than one scan per add)."""
+        ranked = sorted(self._entries.items(), key=lambda item: item[1].weight)
+        dropped = {sid for sid, _ in ranked[: max(1, self.max_entries // 10)]}
+        for sid in dropped:
+            for word in self._entries.pop(sid).words:
+                self._vocabulary[word] -= 1
+                if not self._vocabulary[word]:
+                    del self._vocabulary[word]
+        self._keys = [key for key in self._keys if key.rpartition(SEP)[2] not in dropped]
+
+    def complete(self, prefix: str, limit: int = 8) -> list[str]:
+        """Suggestions for what has been typed so far, best first; the heaviest when empty."""
+        typed = normalize(prefix)
+        with self._lock:
+            if not typed:
+                ranked = sorted(self._entries.values(), key=lambda entry: -entry.weight)
+                return [entry.text for entry in ranked[:limit]]
+            found = self._scan(typed)
+            if len(found) < limit:
+                head, _, last = typed.rpartition(" ")
+                for word in difflib.get_close_matches(last, self._vocabulary, n=3, cutoff=0.75):
+                    for sid, rank in self._scan(f"{head} {word}".strip()).items():
+                        found.setdefault(sid, rank + 1)  # below exact-prefix matches
+            ranked = sorted(found.items(), key=lambda item: (item[1], -self._entries[item[0]].weight,
+                                                            len(self._entries[item[0]].text)))
+            return [self._entries[sid].text for sid, _ in ranked[:limit]]
+
+    def _scan(self, typed: str) -> dict[str, int]:
+        """Suggestion ID -> 0 when its text starts with ``typed``, 1 when a later word does."""
+        found: dict[str, int] = {}
+        position = bisect_left(self._keys, typed)
+        for key in self._keys[position:position + SCAN_LIMIT]:
+            if not key.startswith(typed):
+                break
+            matched, _, sid = key.rpartition(SEP)
+            rank = 0 if matched == sid else 1
+            found[sid] = min(rank, found.get(sid, rank))
+        return found
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the keys, texts and vocabulary."""
+        with self._lock:
+            return (
+                sys.getsizeof(self._keys) + sum(sys.getsizeof(key) for key in self._keys)
+                + sys.getsizeof(self._entries)
+                + sum(sys.getsizeof(sid) + sys.getsizeof(entry.text) + 120 for sid, entry in self._entries.items())
+                + sys.getsizeof(self._vocabulary) + sum(sys.getsizeof(word) for word in self._vocabulary)
+            )
+
+
+# -- sources ----------------------------------------------------------------------
+
+def _rows(backend, query: str, params: list | None = None) -> list:
+    try:
+        return backend.sql(query, params=params)
+    except Exception:
+        return []  # e.g. entity or feedback tables not created yet
+
+
+def add_documents(index: PrefixIndex, rows) -> int:
+    added = 0
+    for row in rows:
+        title = row["SHORT_DESCRIPTION"] or row["FILE_NAME"]
+        added += index.add(TEMPLATES["document"].format(title), "document", subject=title)
+    return added
+
+
+def add_entities(index: PrefixIndex, kind: str, names) -> int:
+    added = 0
+    for name in filter(None, names):
+        text = TEMPLATES[kind].format(name)
+        if kind == "department" and name.lower().startswith("school"):
+            text = text.removesuffix(" department")
+        added += index.add(text, kind, subject=name)
+    return added
+
+
+def feedback_questions(backend, limit: int = FEEDBACK_ROWS) -> list[str]:
+    """User turns from the chat histories of well-rated feedback."""
+    rows = _rows(
+        backend,
+        f"SELECT HISTORY_OF_CHAT FROM {config.qualified(config.FEEDBACK_TABLE)} "
+        f"WHERE RATING >= {MIN_FEEDBACK_RATING} ORDER BY FEEDBACK_GIVEN_ON DESC LIMIT {int(limit)}",
+    )
+    return [match.strip() for row in rows for match in USER_LINE.findall(row["HISTORY_OF_CHAT"] or "")]
+
+
+def build_index(backend, max_entries: int = MAX_ENTRIES) -> PrefixIndex:
+    index = PrefixIndex(max_entries)
+    add_documents(index, _rows(
+        backend,
+        f"SELECT SHORT_DESCRIPTION, FILE_NAME FROM {config.qualified(config.METADATA_TABLE)} "
+        f"ORDER BY UPLOAD_TIMESTAMP DESC LIMIT {int(max_entries)}",
+    ))
+    for kind, table in (("faculty", config.FACULTY_TABLE), ("department", config.DEPARTMENT_TABLE)):
+        add_entities(index, kind, [row["NAME"] for row in _rows(
+            backend, f"SELECT DISTINCT NAME FROM {config.qualified(table)}"
+        )])
+    for question in feedback_questions(backend):
+        index.add(question, "question")
+    return index
+
+
+_indexes: dict = {}
+_indexes_lock = threading.Lock()
+
+
+def _backend_key(backend):
+    # Every Snowpark session sees the same tables; each local backend is its own database.
+    return backend.name if backend.name == "snowflake" else backend
+
+
+def shared_index(backend) -> PrefixIndex:
+    """Process-wide index for the backend's tables, built on first use."""
+    key = _backend_key(backend)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None:
+        built = build_index(backend)
+        with _indexes_lock:
+            index = _indexes.setdefault(key, built)
+    return index
+
+
+def index_file(backend, file_name: str) -> int:
+    """Add a newly ingested file's title and extracted names; a no-op until the index is built."""
+    with _indexes_lock:
+        index = _indexes.get(_backend_key(backend))
+    if index is None:
+        return 0
+    added = add_documents(index, _rows(
+        backend,
+        f"SELECT SHORT_DESCRIPTION, FILE_NAME FROM {config.qualified(config.METADATA_TABLE)} WHERE FILE_NAME = ?",
+        [file_name],
+    ))
+    for kind, table in (("faculty", config.FACULTY_TABLE), ("department", config.DEPARTMENT_TABLE)):
+        added += add_entities(index, kind, [row["NAME"] for row in _rows(
+            backend, f"SELECT DISTINCT NAME FROM {config.qualified(table)} WHERE FILE_NAME = ?", [file_name]
+        )])
+    return added
+
+
+_asked: dict = {}  # backend key -> {normalised question: sessions that asked it}
+
+
+def note_question(backend, question: str, session: str):
+    """Count an answered question from ``session``; suggest it once ``MIN_SESSIONS`` sessions asked it.
+
+    Until then the question stays out of the shared index. Repeats from one session add nothing.
+    """
+    sid = normalize(question)
+    key = _backend_key(backend)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or not sid:
+            return
+        asked = _asked.setdefault(key, {})
+        sessions = asked.setdefault(sid, set())
+        if session in sessions:
+            return
+        sessions.add(session)
+        count = len(sessions)
+        if len(asked) > index.max_entries:
+            # Forget the questions first noted longest ago.
+            for stale in [other for other in asked if other != sid][: max(1, index.max_entries // 10)]:
+                del asked[stale]
+    if count >= MIN_SESSIONS:
+        index.add(question, "question", QUESTION_WEIGHT)
+
+
+# -- benchmark --------------------------------------------------------------------
+
+def bench(scale: int, lookups: int = 2000) -> dict:
+    """Build, add and lookup timings on a local corpus of ``scale`` filler documents."""
+    from iitj_search.backend import LocalBackend
+    from iitj_search.entities import rebuild
+    from iitj_search.local_corpus import build_corpus
+
+    backend = LocalBackend()
+    backend.load_corpus(build_corpus(scale))
+    rebuild(backend)
+    start = time.perf_counter()
+    index = build_index(backend)
+    build_s = time.perf_counter() - start
+
+    texts = list(index._entries.values())
+    prefixes = [normalize(entry.text)[:n] for entry in texts[:lookups // 4] for n in (2, 4, 7, 12)]
+    lookup_ms = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.complete(prefix)
+        lookup_ms.append((time.perf_counter() - start) * 1000)
+    add_ms = []
+    for idx in range(200):
+        start = time.perf_counter()
+        index.add(f"When is the convocation rehearsal for batch {idx}?", "question")
+        add_ms.append((time.perf_counter() - start) * 1000)
+    ordered_lookup, ordered_add = sorted(lookup_ms), sorted(add_ms)
+    return {
+        "suggestions": len(index),
+        "keys": len(index._keys),
+        "memory_kib": round(index.memory_bytes() / 1024),
+        "build_s": round(build_s, 3),
+        "lookup_p50_ms": round(statistics.median(ordered_lookup), 3),
+        "lookup_p99_ms": round(ordered_lookup[int(0.99 * (len(ordered_lookup) - 1))], 3),
+        "add_p50_ms": round(statistics.median(ordered_add), 3),
+        "add_p99_ms": round(ordered_add[int(0.99 * (len(ordered_add) - 1))], 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prefix", action="append", default=[], help="Show suggestions for this text")
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--bench", action="store_true", help="Time build, lookups and adds on a local corpus")
+    parser.add_argument("--scale", type=int, default=2000, help="Filler documents for --bench")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        for key, value in bench(args.scale).items():
+            print(f"{key:<15} {value}")
+        return
+
+    from iitj_search.backend import command_line_backend
+
+    start = time.perf_counter()
+    index = shared_index(command_line_backend(args.backend))
+    print(f"{len(index)} suggestions, ~{index.memory_bytes() / 1024:.0f} KiB, "
+          f"built in {time.perf_counter() - start:.2f}s")
+    for prefix in args.prefix:
+        print(f"\n{prefix!r}:")
+        for text in index.complete(prefix, args.limit):
+            print(f"  {text}")
+
+
+if __name__ == "__main__":
+    main()
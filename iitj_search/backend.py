@@ -0,0 +1,724 @@
+"""Backend interface for everything the app sends to Snowflake.
+
+``SnowparkBackend`` is the production implementation. ``LocalBackend`` keeps
+the same interface in-process on SQLite, with a BM25 stand-in for Cortex
+Search and a deterministic fake LLM whose latency is configurable, so the app
+and the tools can be run, benchmarked and profiled without a network.
+
+Select the backend with ``IITJ_BACKEND=local`` (or ``backend = "local"`` in
+``.streamlit/secrets.toml``); the default is ``snowflake``.
+"""
+
+import bisect
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+
+from iitj_search import config
+from iitj_search.filters import source_domain
+from iitj_search.jobs import QueryCancelled, current_jobs, statement_kind
+
+
+class Backend:
+    """Operations the app needs from the warehouse."""
+
+    name = "base"
+
+    def sql(self, query: str, params: list | None = None) -> list:
+        """Run a statement and return its rows (indexable by position and column name)."""
+        raise NotImplementedError
+
+    def put_stream(self, stream, stage_path: str, overwrite: bool = True):
+        """Upload a file-like object to ``@stage/file``."""
+        raise NotImplementedError
+
+    def search(self, service: str, payload: dict) -> list[dict]:
+        """Run a Cortex Search SEARCH_PREVIEW request and return its results."""
+        raise NotImplementedError
+
+    def complete(self, model: str, prompt: str) -> str:
+        """Run AI_COMPLETE and return the raw response text."""
+        raise NotImplementedError
+
+    def generate_embeddings(self, file_name: str):
+        """Chunk and embed one staged file via the embedding procedure."""
+        raise NotImplementedError
+
+
+class SnowparkBackend(Backend):
+    """Backend over a Snowpark session, reconnecting once when the session has expired."""
+
+    name = "snowflake"
+
+    def __init__(self, session, refresh=None):
+        self.session = session
+        self._refresh = refresh
+
+    def _run(self, action):
+        try:
+            return action(self.session)
+        except QueryCancelled:
+            raise
+        except Exception:
+            if self._refresh is None or self._session_alive():
+                raise
+            self.session = self._refresh()
+            return action(self.session)
+
+    def _session_alive(self) -> bool:
+        try:
+            self.session.sql("SELECT 1").collect()
+            return True
+        except Exception:
+            return False
+
+    def sql(self, query: str, params: list | None = None) -> list:
+        jobs = current_jobs.get()
+        if jobs is None:
+            return self._run(lambda session: session.sql(query, params=params).collect())
+        # Inside a chat turn: submit asynchronously so the turn can cancel it by query ID.
+        kind = statement_kind(query)
+        return self._run(lambda session: jobs.wait_async(session.sql(query, params=params).collect_nowait(), kind))
+
+    def put_stream(self, stream, stage_path: str, overwrite: bool = True):
+        return self._run(lambda session: session.file.put_stream(
+            stream, stage_path, overwrite=overwrite, auto_compress=False
+        ))
+
+    def search(self, service: str, payload: dict) -> list[dict]:
+        response = self.sql(
+            f"""
+            SELECT SNOWFLAKE.CORTEX.SEARCH_PREVIEW(
+                '{service}',
+                ?
+            ) AS RESPONSE
+            """,
+            params=[json.dumps(payload)],
+        )
+        if not response:
+            return []
+        return parse_search_response(response[0]["RESPONSE"])
+
+    def complete(self, model: str, prompt: str) -> str:
+        response = self.sql(
+            "SELECT SNOWFLAKE.CORTEX.AI_COMPLETE(?, ?) as response",
+            params=[model, prompt],
+        )
+        return response[0]["RESPONSE"] if response else None
+
+    def generate_embeddings(self, file_name: str):
+        # Refresh the stage listing so the procedure sees the new file.
+        self.sql(f"LIST @{config.STAGE}")
+        return self.sql(f"CALL {config.EMBEDDING_PROCEDURE}(?)", params=[file_name])
+
+
+def parse_search_response(raw_response) -> list[dict]:
+    """Extract the ``results`` list from a SEARCH_PREVIEW response value."""
+    if isinstance(raw_response, str):
+        parsed_response = json.loads(raw_response)
+    elif hasattr(raw_response, "as_dict"):
+        parsed_response = raw_response.as_dict()
+    else:
+        parsed_response = raw_response
+
+    if isinstance(parsed_response, dict):
+        return parsed_response.get("results", [])
+    return []
+
+
+class Row(tuple):
+    """Tuple row that also supports lookups by column name, like snowpark.Row."""
+
+    def __new__(cls, values: dict):
+        row = super().__new__(cls, values.values())
+        row._fields = list(values.keys())
+        return row
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return tuple.__getitem__(self, self._fields.index(item.upper()))
+        return tuple.__getitem__(self, item)
+
+    def as_dict(self) -> dict:
+        return dict(zip(self._fields, self))
+
+
+@dataclass
+class LocalLatency:
+    """Simulated warehouse latency in seconds."""
+
+    sql: float = 0.0
+    search: float = 0.0
+    search_per_1k_chunks: float = 0.0  # grows with the size of the service's index
+    complete: float = 0.0  # fixed part of every completion
+    complete_per_1k_prompt_tokens: float = 0.0
+    complete_per_output_token: float = 0.0
+    put: float = 0.0
+    embed: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LocalLatency":
+        """Build from ``"search=0.3,complete=1.5"``-style text."""
+        known = {f.name for f in fields(cls)}
+        values = {}
+        for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+            key, _, value = part.partition("=")
+            if key.strip() not in known:
+                raise ValueError(f"Unknown latency setting: {key.strip()}")
+            values[key.strip()] = float(value)
+        return cls(**values)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text or "") // 4)
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+(?:[@._][a-z0-9]+)*", (text or "").lower())
+
+
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+SEARCHABLE_COLUMNS = [
+    "CHUNK", "SOURCE_URL", "FILE_NAME", "SHORT_DESCRIPTION", "UPLOAD_TIMESTAMP", "UPLOADED_BY",
+    "CHUNK_INDEX", "FILE_TYPE", "SOURCE_DOMAIN",
+]
+# Service ATTRIBUTES the local search accepts filters on.
+FILTER_ATTRIBUTES = ["FILE_TYPE", "UPLOADED_BY", "UPLOAD_TIMESTAMP", "SOURCE_DOMAIN"]
+# The local stage's files, kept in the database so another process on the same IITJ_LOCAL_DB sees them.
+STAGE_TABLE = "LOCAL_STAGE"
+NO_INFORMATION_ANSWER = (
+    "I'm sorry, I couldn't find any information on that topic in the provided documents. "
+    "Recheck list of documents(URL) uploaded or connect with Mahantesh(m25ai2134@iitj.ac.in) for more information."
+)
+
+
+def split_chunks(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    text = (text or "").strip()
+    if not text:
+        return []
+    chunks, start = [], 0
+    while start < len(text):
+        chunks.append(text[start:start + size])
+        if start + size >= len(text):
+            break
+        start += size - overlap
+    return chunks
+
+
+def extract_text(file_name: str, data: bytes) -> str:
+    """Best-effort text extraction for the local embedding procedure."""
+    ext = file_name.rsplit(".", 1)[-1].lower()
+    if ext == "pdf" and data.startswith(b"%PDF"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return ""
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if ext in {"jpeg", "jpg", "png", "tiff", "tif", "pptx", "docx"} and not data[:64].isascii():
+        return ""
+    text = data.decode("utf-8", errors="ignore")
+    if ext == "html":
+        text = re.sub(r"<[^>]+>", " ", text)
+    return text
+
+
+class LocalBackend(Backend):
+    """In-process SQLite warehouse (tables and stage) with lexical search and a deterministic fake LLM."""
+
+    name = "local"
+
+    def __init__(self, path: str = ":memory:", latency: LocalLatency | None = None):
+        self.latency = latency or LocalLatency()
+        self.calls = Counter()
+        # Kinds of Cortex call ("search", "complete") failing as in an outage.
+        self.down: set[str] = set()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._indexes: dict = {}  # shard (None for the whole table) -> (chunk version, index)
+        self._chunk_version = 0
+        self._bootstrap()
+
+    # -- warehouse plumbing -------------------------------------------------
+
+    def _bootstrap(self):
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {config.METADATA_TABLE} (
+                DOC_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                FILE_NAME VARCHAR, SHORT_DESCRIPTION VARCHAR, SOURCE_URL VARCHAR,
+                FILE_TYPE VARCHAR, FILE_SIZE NUMERIC, UPLOADED_BY VARCHAR,
+                UPLOAD_TIMESTAMP TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS {config.CHUNK_TABLE} (
+                FILE_NAME VARCHAR, CHUNK_INDEX INTEGER, CHUNK VARCHAR, SOURCE_URL VARCHAR,
+                SHORT_DESCRIPTION VARCHAR, FILE_TYPE VARCHAR, UPLOADED_BY VARCHAR,
+                UPLOAD_TIMESTAMP TIMESTAMP, SOURCE_DOMAIN VARCHAR,
+                -- milliseconds, so two embeddings of a file within a second are separate generations
+                CREATED_AT TIMESTAMP DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%f', 'now'))
+            );
+            CREATE TABLE IF NOT EXISTS {config.AUTH_TABLE} (UER_EMAIL VARCHAR, PASSWORD VARCHAR);
+            CREATE TABLE IF NOT EXISTS {STAGE_TABLE} (
+                NAME VARCHAR PRIMARY KEY, DATA BLOB, SIZE INTEGER, MD5 VARCHAR, LAST_MODIFIED VARCHAR
+            );
+            CREATE TABLE IF NOT EXISTS {config.REQUESTOR_TABLE} (
+                UER_EMAIL VARCHAR, PASSWORD VARCHAR, MOBILE_NUMBER VARCHAR
+            );
+            """
+        )
+        chunk_columns = {row[1].upper() for row in self._conn.execute(f"PRAGMA table_info({config.CHUNK_TABLE})")}
+        if "SOURCE_DOMAIN" not in chunk_columns:
+            # Databases created before the column existed.
+            self._conn.execute(f"ALTER TABLE {config.CHUNK_TABLE} ADD COLUMN SOURCE_DOMAIN VARCHAR")
+        if not self._conn.execute(f"SELECT COUNT(*) FROM {config.AUTH_TABLE}").fetchone()[0]:
+            self._conn.execute(
+                f"INSERT INTO {config.AUTH_TABLE} VALUES (?, ?)", ["local@iitj.ac.in", "local"]
+            )
+        self._conn.commit()
+
+    def _stage_file(self, name: str, data: bytes, last_modified: str):
+        """Write one file to the stage (lock held; the caller commits)."""
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {STAGE_TABLE} (NAME, DATA, SIZE, MD5, LAST_MODIFIED) VALUES (?, ?, ?, ?, ?)",
+            [name, data, len(data), hashlib.md5(data).hexdigest(), last_modified],
+        )
+
+    def _sleep(self, seconds: float, kind: str = "sql"):
+        if seconds > 0:
+            jobs = current_jobs.get()
+            if jobs is None:
+                time.sleep(seconds)
+            else:
+                # Cancellable like a Snowflake statement inside a chat turn.
+                jobs.sleep(kind, seconds)
+
+    def sql(self, query: str, params: list | None = None) -> list:
+        params = list(params or [])
+        text = " ".join(query.split())
+        upper = text.upper()
+
+        if "CORTEX.SEARCH_PREVIEW" in upper:
+            service = re.search(r"SEARCH_PREVIEW\(\s*'([^']+)'", text, re.IGNORECASE).group(1)
+            results = self.search(service, json.loads(params[0]))
+            return [Row({"RESPONSE": json.dumps({"results": results})})]
+        if "CORTEX.AI_COMPLETE" in upper:
+            return [Row({"RESPONSE": self.complete(params[0], params[1])})]
+        if upper.startswith("CALL ") and "GENERATE_EMBEDDINGS_FOR_NEW_FILE" in upper:
+            self.generate_embeddings(params[0])
+            return [Row({"GENERATE_EMBEDDINGS_FOR_NEW_FILE": "OK"})]
+
+        self._sleep(self.latency.sql)
+        self.calls["sql"] += 1
+        if upper == "SELECT CURRENT_VERSION()":
+            return [Row({"CURRENT_VERSION()": "local"})]
+        if upper == "SELECT CURRENT_WAREHOUSE()":
+            return [Row({"CURRENT_WAREHOUSE()": "LOCAL_WH"})]
+        if upper.startswith("LIST @"):
+            return self._list_stage_rows()
+        if "FROM DIRECTORY(@" in upper:
+            return [
+                Row({"RELATIVE_PATH": row["NAME"].rsplit("/", 1)[-1], "SIZE": row["SIZE"],
+                     "LAST_MODIFIED": row["LAST_MODIFIED"], "MD5": row["MD5"]})
+                for row in self._list_stage_rows()
+            ]
+        if upper.startswith("DESCRIBE CORTEX SEARCH SERVICE"):
+            return [Row({"NAME": "columns", "VALUE": ",".join(SEARCHABLE_COLUMNS)})]
+        if re.match(r"(CREATE (OR REPLACE )?STAGE|ALTER (STAGE|WAREHOUSE)|USE )", upper):
+            return []
+        added = re.match(r"ALTER TABLE (\S+) ADD COLUMN IF NOT EXISTS (\w+) (.+)", translate_sql(text), re.IGNORECASE)
+        if added:
+            # SQLite has no ADD COLUMN IF NOT EXISTS.
+            table, column, kind = added.groups()
+            with self._lock:
+                existing = {row[1].upper() for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if column.upper() not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+                    self._conn.commit()
+            return []
+
+        with self._lock:
+            cursor = self._conn.execute(translate_sql(text), params)
+            rows = cursor.fetchall()
+            columns = [d[0].upper() for d in cursor.description or []]
+            self._conn.commit()
+            if upper.startswith(("INSERT", "DELETE", "UPDATE")) and config.CHUNK_TABLE in upper:
+                self._chunk_version += 1
+        return [Row(dict(zip(columns, row))) for row in rows]
+
+    def _list_stage_rows(self) -> list[Row]:
+        with self._lock:
+            return [
+                Row({"NAME": f"iitj_info_stage/{name}", "SIZE": size, "MD5": md5, "LAST_MODIFIED": last_modified})
+                for name, size, md5, last_modified in self._conn.execute(
+                    f"SELECT NAME, SIZE, MD5, LAST_MODIFIED FROM {STAGE_TABLE} ORDER BY NAME"
+                )
+            ]
+
+    def put_stream(self, stream, stage_path: str, overwrite: bool = True):
+        data = stream.read()
+        self._sleep(self.latency.put)
+        name = stage_path.rsplit("/", 1)[-1]
+        with self._lock:
+            exists = self._conn.execute(f"SELECT 1 FROM {STAGE_TABLE} WHERE NAME = ?", [name]).fetchone()
+            if exists and not overwrite:
+                raise FileExistsError(f"{name} already exists on the stage")
+            self._stage_file(name, data, datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
+            self._conn.commit()
+            self.calls["put"] += 1
+
+    def generate_embeddings(self, file_name: str):
+        """Chunk a staged file into the chunk table, like the Snowflake procedure.
+
+        As with the procedure, chunks are appended; re-embedding a file does
+        not remove chunks from earlier versions.
+        """
+        self._sleep(self.latency.embed)
+        with self._lock:
+            entry = self._conn.execute(f"SELECT DATA FROM {STAGE_TABLE} WHERE NAME = ?", [file_name]).fetchone()
+            if entry is None:
+                raise FileNotFoundError(f"{file_name} is not on the stage")
+            meta = self._conn.execute(
+                f"""
+                SELECT SOURCE_URL, SHORT_DESCRIPTION, FILE_TYPE, UPLOADED_BY, UPLOAD_TIMESTAMP
+                FROM {config.METADATA_TABLE} WHERE FILE_NAME = ?
+                ORDER BY UPLOAD_TIMESTAMP DESC, DOC_ID DESC LIMIT 1
+                """,
+                [file_name],
+            ).fetchone() or (None, file_name, file_name.rsplit(".", 1)[-1], None, None)
+            chunks = split_chunks(extract_text(file_name, entry[0]))
+            self._conn.executemany(
+                f"""
+                INSERT INTO {config.CHUNK_TABLE}
+                (FILE_NAME, CHUNK_INDEX, CHUNK, SOURCE_URL, SHORT_DESCRIPTION, FILE_TYPE, UPLOADED_BY,
+                 UPLOAD_TIMESTAMP, SOURCE_DOMAIN)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(file_name, idx, chunk, *meta, source_domain(meta[0])) for idx, chunk in enumerate(chunks)],
+            )
+            self._conn.commit()
+            self._chunk_version += 1
+            self.calls["embed"] += 1
+        return len(chunks)
+
+    def load_corpus(self, documents: list[dict]):
+        """Stage, register and embed documents shaped like ``local_corpus`` entries."""
+        with self._lock:
+            for doc in documents:
+                self._stage_file(doc["FILE_NAME"], doc["TEXT"].encode("utf-8"), doc["UPLOAD_TIMESTAMP"])
+            self._conn.executemany(
+                f"""
+                INSERT INTO {config.METADATA_TABLE}
+                (FILE_NAME, SHORT_DESCRIPTION, SOURCE_URL, FILE_TYPE, FILE_SIZE, UPLOADED_BY, UPLOAD_TIMESTAMP)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (d["FILE_NAME"], d["SHORT_DESCRIPTION"], d["SOURCE_URL"], d["FILE_TYPE"],
+                     len(d["TEXT"]), d["UPLOADED_BY"], d["UPLOAD_TIMESTAMP"])
+                    for d in documents
+                ],
+            )
+            self._conn.executemany(
+                f"""
+                INSERT INTO {config.CHUNK_TABLE}
+                (FILE_NAME, CHUNK_INDEX, CHUNK, SOURCE_URL, SHORT_DESCRIPTION, FILE_TYPE, UPLOADED_BY,
+                 UPLOAD_TIMESTAMP, SOURCE_DOMAIN)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (d["FILE_NAME"], idx, chunk, d["SOURCE_URL"], d["SHORT_DESCRIPTION"], d["FILE_TYPE"],
+                     d["UPLOADED_BY"], d["UPLOAD_TIMESTAMP"], source_domain(d["SOURCE_URL"]))
+                    for d in documents
+                    for idx, chunk in enumerate(split_chunks(d["TEXT"]))
+                ],
+            )
+            self._conn.commit()
+            self._chunk_version += 1
+
+    # -- Cortex stand-ins ---------------------------------------------------
+
+    def _service_shard(self, service: str) -> tuple[str, bool] | None:
+        """(shard, is default) for a service in the shard routing table, None for an unsharded service."""
+        name = service.rsplit(".", 1)[-1].upper()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    f"SELECT SHARD, IS_DEFAULT FROM {config.SHARD_TABLE} WHERE UPPER(SERVICE) = ?", [name]
+                ).fetchone()
+            except sqlite3.OperationalError:
+                return None  # no routing table: the one service covers every chunk
+        return (row[0], bool(row[1])) if row else None
+
+    def _search_index(self, shard: tuple[str, bool] | None = None) -> dict:
+        """BM25 postings over the chunk table plus attribute indexes, rebuilt when chunks change.
+
+        With a ``shard``, only its chunks are indexed, like a service defined
+        over ``WHERE SHARD = ...`` (the default shard also holds unassigned chunks).
+        """
+        with self._lock:
+            cached = self._indexes.get(shard)
+            if cached is not None and cached[0] == self._chunk_version:
+                return cached[1]
+            if shard is None:
+                cursor = self._conn.execute(f"SELECT * FROM {config.CHUNK_TABLE}")
+            else:
+                name, is_default = shard
+                cursor = self._conn.execute(
+                    f"SELECT * FROM {config.CHUNK_TABLE} WHERE SHARD = ?"
+                    + (" OR SHARD IS NULL" if is_default else ""),
+                    [name],
+                )
+            columns = [d[0].upper() for d in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            postings: dict[str, list[tuple[int, int]]] = {}
+            doc_terms = []
+            lengths = []
+            attributes: dict[str, dict] = {col: {} for col in FILTER_ATTRIBUTES if col != "UPLOAD_TIMESTAMP"}
+            for doc_id, row in enumerate(rows):
+                terms = Counter(tokenize(f"{row['SHORT_DESCRIPTION'] or ''} {row['FILE_NAME']} {row['CHUNK']}"))
+                doc_terms.append(terms)
+                lengths.append(sum(terms.values()))
+                for term, tf in terms.items():
+                    postings.setdefault(term, []).append((doc_id, tf))
+                for col, values in attributes.items():
+                    values.setdefault(row.get(col), set()).add(doc_id)
+            by_time = sorted((str(row.get("UPLOAD_TIMESTAMP") or ""), doc_id) for doc_id, row in enumerate(rows))
+            index = {
+                "rows": rows,
+                "postings": postings,
+                "doc_terms": doc_terms,
+                "lengths": lengths,
+                "avg_length": (sum(lengths) / len(lengths)) if lengths else 0.0,
+                "attributes": attributes,
+                "timestamp_keys": [stamp for stamp, _ in by_time],
+                "timestamp_ids": [doc_id for _, doc_id in by_time],
+            }
+            self._indexes[shard] = (self._chunk_version, index)
+            return index
+
+    def _fail_if_down(self, kind: str, seconds: float):
+        if kind in self.down:
+            self._sleep(seconds, kind)
+            raise RuntimeError(f"simulated {kind} outage")
+
+    def search(self, service: str, payload: dict) -> list[dict]:
+        index = self._search_index(self._service_shard(service))
+        self._fail_if_down("search", self.latency.search)
+        self._sleep(self.latency.search + self.latency.search_per_1k_chunks * len(index["rows"]) / 1000, "search")
+        self.calls["search"] += 1
+        rows, postings, lengths = index["rows"], index["postings"], index["lengths"]
+        total = len(rows)
+        # Like the service, narrow to the filtered candidates before ranking.
+        allowed = filter_doc_ids(payload.get("filter") or {}, index)
+        idf = {
+            term: math.log(1 + (total - len(postings[term]) + 0.5) / (len(postings[term]) + 0.5))
+            for term in set(tokenize(payload.get("query", ""))) if term in postings
+        }
+        k1, b = 1.2, 0.75
+        avg_length = index["avg_length"] or 1
+
+        def bm25(doc_id, term, tf):
+            norm = k1 * (1 - b + b * lengths[doc_id] / avg_length)
+            return idf[term] * tf * (k1 + 1) / (tf + norm)
+
+        scores: dict[int, float] = {}
+        if allowed is not None and len(allowed) * len(idf) < sum(len(postings[t]) for t in idf):
+            # Selective filter: scoring the few allowed chunks beats walking the postings.
+            for doc_id in allowed:
+                doc_terms = index["doc_terms"][doc_id]
+                score = sum(bm25(doc_id, term, doc_terms[term]) for term in idf if term in doc_terms)
+                if score:
+                    scores[doc_id] = score
+        else:
+            for term in idf:
+                for doc_id, tf in postings[term]:
+                    if allowed is None or doc_id in allowed:
+                        scores[doc_id] = scores.get(doc_id, 0.0) + bm25(doc_id, term, tf)
+
+        limit = int(payload.get("limit", 10))
+        columns = payload.get("columns") or SEARCHABLE_COLUMNS
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        results = []
+        for doc_id, score in ranked:
+            row = rows[doc_id]
+            result = {col: row.get(col) for col in columns if col in row}
+            result["@scores"] = {"text_match": round(score, 4)}
+            results.append(result)
+        return results
+
+    def complete(self, model: str, prompt: str) -> str:
+        """Deterministic answer built from the prompt's search results."""
+        self._fail_if_down("complete", self.latency.complete)
+        question = _tag_body(prompt, "question") or ""
+        context = _tag_body(prompt, "search_results") or ""
+        terms = {t for t in tokenize(question) if len(t) > 3}
+        lines = []
+        for line in context.splitlines():
+            clean = line.strip()
+            if clean and not clean.startswith("[Document") and terms & set(tokenize(clean)):
+                if clean not in lines:
+                    lines.append(clean)
+        if lines:
+            answer = "\n".join(f"- {line[:300]}" for line in lines[:8])
+        else:
+            answer = NO_INFORMATION_ANSWER
+
+        delay = (
+            self.latency.complete
+            + self.latency.complete_per_1k_prompt_tokens * estimate_tokens(prompt) / 1000
+            + self.latency.complete_per_output_token * estimate_tokens(answer)
+        )
+        self._sleep(delay, "complete")
+        self.calls["complete"] += 1
+        return json.dumps(answer, ensure_ascii=False)
+
+
+def filter_doc_ids(expression: dict, index: dict) -> set[int] | None:
+    """Chunk ids matching a Cortex Search filter expression (None when there is no filter).
+
+    Supports @eq, @gte, @lte, @and, @or and @not on the FILTER_ATTRIBUTES
+    columns. Timestamps compare on the length of the given value, so a date
+    bound covers the whole day.
+    """
+    if not expression:
+        return None
+    if len(expression) != 1:
+        raise ValueError(f"Filter expression must have exactly one operator: {expression}")
+    (operator, operand), = expression.items()
+    everything = set(range(len(index["rows"])))
+
+    if operator == "@and":
+        result = everything
+        for clause in operand:
+            result = result & filter_doc_ids(clause, index)
+        return result
+    if operator == "@or":
+        return set().union(*(filter_doc_ids(clause, index) for clause in operand))
+    if operator == "@not":
+        return everything - filter_doc_ids(operand, index)
+    if operator not in ("@eq", "@gte", "@lte") or len(operand) != 1:
+        raise ValueError(f"Unsupported filter: {expression}")
+
+    (column, value), = operand.items()
+    column = column.upper()
+    if column not in FILTER_ATTRIBUTES:
+        raise ValueError(f"{column} is not an attribute of the search service")
+    if column != "UPLOAD_TIMESTAMP":
+        if operator != "@eq":
+            raise ValueError(f"{operator} is not supported on {column}")
+        return set(index["attributes"][column].get(value, ()))
+
+    # A stamp starts with the value when it sorts between value and value + max char.
+    value = str(value).replace("T", " ")
+    keys, doc_ids = index["timestamp_keys"], index["timestamp_ids"]
+    lo = bisect.bisect_left(keys, value) if operator in ("@eq", "@gte") else 0
+    hi = bisect.bisect_right(keys, value + "\uffff") if operator in ("@eq", "@lte") else len(keys)
+    return set(doc_ids[lo:hi])
+
+
+def _tag_body(prompt: str, tag: str) -> str | None:
+    match = re.search(rf"<{tag}>\n?(.*?)\n?</{tag}>", prompt or "", re.DOTALL)
+    return match.group(1) if match else None
+
+
+def translate_sql(query: str) -> str:
+    """Rewrite the Snowflake SQL the app issues into SQLite."""
+    text = re.sub(rf"\b{config.DATABASE}\.{config.SCHEMA}\.", "", query, flags=re.IGNORECASE)
+    replacements = [
+        # SQLite's CURRENT_TIMESTAMP is UTC, so the "session time zone" is UTC too.
+        (r"\bTO_TIMESTAMP_LTZ\(([^()]*)\)::TIMESTAMP_NTZ\b", r"datetime(\1)"),
+        (r"\bNUMBER AUTOINCREMENT\b", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+        (r"\bTIMESTAMP_NTZ\b", "TIMESTAMP"),
+        (r"\bCURRENT_TIMESTAMP\(\)", "CURRENT_TIMESTAMP"),
+        (r"\bNUMBER\b", "NUMERIC"),
+        (r"\bILIKE\b", "LIKE"),
+    ]
+    for pattern, replacement in replacements:
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    return text
+
+
+_shared_local_backend = None
+_shared_lock = threading.Lock()
+
+
+def backend_name(secrets=None) -> str:
+    """``local`` or ``snowflake``, from IITJ_BACKEND or the ``backend`` secret."""
+    name = os.environ.get("IITJ_BACKEND")
+    if not name and secrets is not None:
+        try:
+            name = secrets.get("backend")
+        except Exception:
+            name = None
+    return (name or "snowflake").strip().lower()
+
+
+def shared_local_backend() -> LocalBackend:
+    """Process-wide local backend, seeded from IITJ_LOCAL_* environment variables.
+
+    IITJ_LOCAL_DB: SQLite path (default in-memory)
+    IITJ_LOCAL_SCALE: number of generated filler documents (default 200)
+    IITJ_LOCAL_LATENCY: e.g. "search=0.3,complete=1.5,complete_per_1k_prompt_tokens=0.4"
+    IITJ_LOCAL_DOWN: Cortex calls that fail, e.g. "complete" or "search,complete"
+    """
+    global _shared_local_backend
+    with _shared_lock:
+        if _shared_local_backend is None:
+            from iitj_search.local_corpus import build_corpus
+
+            backend = LocalBackend(
+                os.environ.get("IITJ_LOCAL_DB", ":memory:"),
+                LocalLatency.parse(os.environ.get("IITJ_LOCAL_LATENCY", "")),
+            )
+            if not backend.sql(f"SELECT COUNT(*) AS N FROM {config.CHUNK_TABLE}")[0]["N"]:
+                backend.load_corpus(build_corpus(int(os.environ.get("IITJ_LOCAL_SCALE", "200"))))
+                # The ingest-time entity extraction, for the corpus loaded above.
+                from iitj_search.entities import rebuild
+
+                rebuild(backend)
+            backend.down = {kind.strip() for kind in os.environ.get("IITJ_LOCAL_DOWN", "").split(",") if kind.strip()}
+            _shared_local_backend = backend
+        return _shared_local_backend
+
+
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".streamlit", "secrets.toml")
+
+
+def command_line_backend(name: str | None = None) -> Backend:
+    """Backend for the command-line tools.
+
+    ``local`` uses the shared local backend; ``snowflake`` opens a Snowpark
+    session from the same ``[connections]`` entry the app uses in
+    ``.streamlit/secrets.toml``. Defaults to IITJ_BACKEND / the ``backend`` secret.
+    """
+    secrets = {}
+    if os.path.exists(SECRETS_PATH):
+        import tomllib
+
+        with open(SECRETS_PATH, "rb") as handle:
+            secrets = tomllib.load(handle)
+    name = (name or backend_name(secrets)).strip().lower()
+    if name == "local":
+        return shared_local_backend()
+
+    from snowflake.snowpark import Session
+
+    connections = secrets.get("connections", {})
+    cfg = connections.get("my_example_connection") or connections.get("snowflake")
+    if not cfg:
+        raise RuntimeError(f"No Snowflake connection configured in {SECRETS_PATH}")
+
+    def connect():
+        return Session.builder.configs(cfg).create()
+
+    return SnowparkBackend(connect(), refresh=connect)
@@ -0,0 +1,341 @@
+"""Resumable, parallel re-embedding backfill for the whole stage.
+
+Lists the stage, diffs it against the metadata and chunk tables, and re-runs
+the embedding procedure for the selected files in bounded-concurrency
+batches. Each file's progress is checkpointed in the backfill control table,
+so an interrupted run continues where it stopped with ``--resume``. The
+procedure only appends, so a file's older chunks (by ``CREATED_AT``) are
+deleted once its new ones are in; a failed run leaves the old chunks
+searchable. ``--max-files-per-minute`` / ``--max-files`` keep warehouse use
+within budget.
+
+Usage:
+    python -m iitj_search.backfill --dry-run
+    python -m iitj_search.backfill --select missing stale --concurrency 4
+    python -m iitj_search.backfill --select all --max-files-per-minute 30
+    python -m iitj_search.backfill --resume latest
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from iitj_search import config
+from iitj_search.backend import command_line_backend
+from iitj_search.entities import extract_file
+from iitj_search.shards import assign_file
+
+SELECTIONS = ["missing", "stale", "unregistered", "all"]
+PENDING, DONE, FAILED = "pending", "done", "failed"
+INSERT_BATCH = 200
+
+
+def parse_timestamp(value) -> datetime | None:
+    """Timestamps from LIST (RFC 1123 on Snowflake) or the tables (datetime or ISO text)."""
+    if value is None or isinstance(value, datetime):
+        return value.replace(tzinfo=None) if value else None
+    text = str(value).strip()
+    for fmt in ("%a, %d %b %Y %H:%M:%S %Z", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def list_stage(backend) -> dict[str, dict]:
+    """Staged files by name, with SIZE, MD5 and LAST_MODIFIED."""
+    files = {}
+    for row in backend.sql(f"LIST @{config.STAGE}"):
+        name = str(row["NAME"]).rsplit("/", 1)[-1]
+        files[name] = {
+            "size": row["SIZE"],
+            "md5": row["MD5"],
+            "last_modified": parse_timestamp(row["LAST_MODIFIED"]),
+        }
+    return files
+
+
+def list_metadata(backend) -> dict[str, datetime | None]:
+    """Registered files and their latest upload time."""
+    rows = backend.sql(
+        f"""
+        SELECT FILE_NAME, MAX(UPLOAD_TIMESTAMP) AS UPLOADED_AT
+        FROM {config.qualified(config.METADATA_TABLE)}
+        GROUP BY FILE_NAME
+        """
+    )
+    return {row["FILE_NAME"]: parse_timestamp(row["UPLOADED_AT"]) for row in rows}
+
+
+def list_chunk_files(backend) -> dict[str, dict]:
+    """Files with chunks, their chunk count and when they were last embedded."""
+    rows = backend.sql(
+        f"""
+        SELECT FILE_NAME, COUNT(*) AS CHUNKS, MAX(CREATED_AT) AS EMBEDDED_AT
+        FROM {config.qualified(config.CHUNK_TABLE)}
+        GROUP BY FILE_NAME
+        """
+    )
+    return {
+        row["FILE_NAME"]: {"chunks": row["CHUNKS"], "embedded_at": parse_timestamp(row["EMBEDDED_AT"])}
+        for row in rows
+    }
+
+
+def diff_stage(backend) -> dict[str, list[str]]:
+    """Group staged and registered files by what the backfill would need to do.
+
+    missing: staged and registered, but no chunks
+    stale: chunks older than the staged file
+    unregistered: staged, but no metadata row
+    unstaged: metadata row, but not on the stage (nothing to embed)
+    current: chunks newer than the staged file
+    """
+    staged, registered, chunked = list_stage(backend), list_metadata(backend), list_chunk_files(backend)
+    groups = {key: [] for key in ("missing", "stale", "unregistered", "unstaged", "current")}
+    for name, entry in sorted(staged.items()):
+        if name not in registered:
+            groups["unregistered"].append(name)
+        elif name not in chunked:
+            groups["missing"].append(name)
+        elif (
+            entry["last_modified"] and chunked[name]["embedded_at"]
+            and chunked[name]["embedded_at"] < entry["last_modified"]
+        ):
+            groups["stale"].append(name)
+        else:
+            groups["current"].append(name)
+    groups["unstaged"] = sorted(set(registered) - set(staged))
+    return groups
+
+
+def select_files(groups: dict[str, list[str]], selections: list[str]) -> list[str]:
+    if "all" in selections:
+        return sorted(set(groups["missing"] + groups["stale"] + groups["current"]))
+    return sorted({name for selection in selections for name in groups[selection]})
+
+
+# -- control table ----------------------------------------------------------
+
+def ensure_control_table(backend):
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {config.qualified(config.BACKFILL_TABLE)} (
+            RUN_ID VARCHAR,
+            FILE_NAME VARCHAR,
+            STATUS VARCHAR,
+            ATTEMPTS NUMBER DEFAULT 0,
+            CHUNKS NUMBER,
+            ERROR VARCHAR,
+            UPDATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """
+    )
+
+
+def create_run(backend, run_id: str, files: list[str]):
+    for start in range(0, len(files), INSERT_BATCH):
+        batch = files[start:start + INSERT_BATCH]
+        backend.sql(
+            f"INSERT INTO {config.qualified(config.BACKFILL_TABLE)} (RUN_ID, FILE_NAME, STATUS, ATTEMPTS) VALUES "
+            + ", ".join("(?, ?, ?, 0)" for _ in batch),
+            params=[value for name in batch for value in (run_id, name, PENDING)],
+        )
+
+
+def latest_run(backend) -> str | None:
+    rows = backend.sql(
+        f"""
+        SELECT RUN_ID FROM {config.qualified(config.BACKFILL_TABLE)}
+        GROUP BY RUN_ID ORDER BY MAX(UPDATED_AT) DESC, RUN_ID DESC LIMIT 1
+        """
+    )
+    return rows[0]["RUN_ID"] if rows else None
+
+
+def remaining_files(backend, run_id: str, max_attempts: int) -> list[str]:
+    rows = backend.sql(
+        f"""
+        SELECT FILE_NAME FROM {config.qualified(config.BACKFILL_TABLE)}
+        WHERE RUN_ID = ? AND STATUS <> ? AND ATTEMPTS < ?
+        ORDER BY FILE_NAME
+        """,
+        params=[run_id, DONE, max_attempts],
+    )
+    return [row["FILE_NAME"] for row in rows]
+
+
+def run_counts(backend, run_id: str) -> dict[str, int]:
+    rows = backend.sql(
+        f"SELECT STATUS, COUNT(*) AS N FROM {config.qualified(config.BACKFILL_TABLE)} WHERE RUN_ID = ? GROUP BY STATUS",
+        params=[run_id],
+    )
+    return {row["STATUS"]: row["N"] for row in rows}
+
+
+def checkpoint(backend, run_id: str, file_name: str, status: str, chunks: int | None = None, error: str | None = None):
+    attempts = "ATTEMPTS + 1" if status != PENDING else "ATTEMPTS"
+    backend.sql(
+        f"""
+        UPDATE {config.qualified(config.BACKFILL_TABLE)}
+        SET STATUS = ?, CHUNKS = ?, ERROR = ?, ATTEMPTS = {attempts}, UPDATED_AT = CURRENT_TIMESTAMP()
+        WHERE RUN_ID = ? AND FILE_NAME = ?
+        """,
+        params=[status, chunks, (error or "")[:1000] or None, run_id, file_name],
+    )
+
+
+# -- re-embedding -------------------------------------------------------------
+
+class Throttle:
+    """Spaces file starts so no more than ``per_minute`` begin in any minute."""
+
+    def __init__(self, per_minute: float | None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _latest_chunk(backend, chunk_table: str, file_name: str):
+    rows = backend.sql(f"SELECT MAX(CREATED_AT) AS LATEST FROM {chunk_table} WHERE FILE_NAME = ?", params=[file_name])
+    return rows[0]["LATEST"] if rows else None
+
+
+def reembed(backend, file_name: str) -> int:
+    """Replace a file's chunks (and the entities extracted from them) in its shard; returns the new chunk count.
+
+    The old chunks stay until the procedure has added the new generation.
+    """
+    chunk_table = config.qualified(config.CHUNK_TABLE)
+    previous = _latest_chunk(backend, chunk_table, file_name)
+    backend.generate_embeddings(file_name)
+    if previous is not None and _latest_chunk(backend, chunk_table, file_name) != previous:
+        backend.sql(
+            f"DELETE FROM {chunk_table} WHERE FILE_NAME = ? AND CREATED_AT <= ?", params=[file_name, previous]
+        )
+    extract_file(backend, file_name)
+    assign_file(backend, file_name)
+    rows = backend.sql(f"SELECT COUNT(*) AS N FROM {chunk_table} WHERE FILE_NAME = ?", params=[file_name])
+    return rows[0]["N"] if rows else 0
+
+
+def run_backfill(
+    backend,
+    run_id: str,
+    files: list[str],
+    concurrency: int = 4,
+    batch_size: int = 20,
+    throttle: Throttle | None = None,
+    report=print,
+) -> dict:
+    """Re-embed ``files`` in batches, checkpointing each one; returns a summary."""
+    throttle = throttle or Throttle(None)
+    done, failed = [], []
+    lock = threading.Lock()
+
+    def process(name):
+        throttle.wait()
+        try:
+            chunks = reembed(backend, name)
+        except Exception as exc:
+            checkpoint(backend, run_id, name, FAILED, error=str(exc))
+            with lock:
+                failed.append(name)
+            return
+        checkpoint(backend, run_id, name, DONE, chunks=chunks)
+        with lock:
+            done.append(name)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="iitj-backfill") as pool:
+        for offset in range(0, len(files), batch_size):
+            list(pool.map(process, files[offset:offset + batch_size]))
+            elapsed = time.perf_counter() - start
+            finished = len(done) + len(failed)
+            rate = finished / elapsed * 60 if elapsed else 0.0
+            eta = (len(files) - finished) / rate if rate else 0.0
+            report(
+                f"[{run_id}] {finished}/{len(files)} files ({len(failed)} failed), "
+                f"{rate:.1f} files/min, ETA {eta:.1f} min"
+            )
+
+    elapsed = time.perf_counter() - start
+    return {
+        "run_id": run_id,
+        "files": len(files),
+        "done": len(done),
+        "failed": sorted(failed),
+        "seconds": round(elapsed, 2),
+        "files_per_minute": round(len(files) / elapsed * 60, 1) if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--select", nargs="+", default=["missing", "stale"], choices=SELECTIONS,
+                        help="Which files to re-embed (see diff_stage)")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a run ('latest' for the most recent)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Files embedded at once")
+    parser.add_argument("--batch-size", type=int, default=20, help="Files per progress checkpoint")
+    parser.add_argument("--max-files-per-minute", type=float, help="Throttle to stay within warehouse budget")
+    parser.add_argument("--max-files", type=int, help="Stop after this many files; resume later")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Skip files that failed this often")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the stage diff")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    backend = command_line_backend(args.backend)
+    ensure_control_table(backend)
+
+    if args.resume:
+        run_id = latest_run(backend) if args.resume == "latest" else args.resume
+        if not run_id:
+            parser.error("No backfill run to resume")
+        files = remaining_files(backend, run_id, args.max_attempts)
+        print(f"Resuming {run_id}: {len(files)} files left ({run_counts(backend, run_id)})")
+    else:
+        groups = diff_stage(backend)
+        print(", ".join(f"{key}: {len(names)}" for key, names in groups.items()))
+        if groups["unstaged"]:
+            print(f"Registered but not on the stage (skipped): {', '.join(groups['unstaged'][:10])}"
+                  + (" ..." if len(groups["unstaged"]) > 10 else ""))
+        files = select_files(groups, args.select)
+        if args.dry_run:
+            print(f"Would re-embed {len(files)} files")
+            return
+        run_id = datetime.now().strftime("bf_%Y%m%d_%H%M%S")
+        create_run(backend, run_id, files)
+        print(f"Started {run_id}: {len(files)} files")
+
+    if args.max_files is not None:
+        files = files[:args.max_files]
+    summary = run_backfill(
+        backend, run_id, files, args.concurrency, args.batch_size, Throttle(args.max_files_per_minute)
+    )
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        print(
+            f"{summary['done']}/{summary['files']} re-embedded in {summary['seconds']}s "
+            f"({summary['files_per_minute']} files/min), {len(summary['failed'])} failed"
+        )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,292 @@
+"""Offline batch question answering, e.g. regenerating a department's FAQ answers.
+
+Reads questions from a CSV (``question`` column, optional ``id``) or JSONL
+file (``{"id": ..., "question": ...}``) and answers each one through the same
+engine as the search page, ``--concurrency`` questions at a time. Each
+answer, its sources and timings are appended to a JSONL file as soon as it
+is done and, with ``--table``, inserted into IITJ_BATCH_ANSWERS under the
+run ID.
+
+Re-running the same command resumes: questions already answered in the
+output file (or in the table for that run ID) are skipped, failed ones are
+retried. Questions without an ``id`` are keyed by their normalised text.
+
+Within a run, identical search calls (the same sub-query, filters and
+depth, common across FAQ variants) are made once and shared. Warehouse
+calls go through the admission gates, which default to fewer slots than the
+app (``--search-slots``, ``--complete-slots``) and a longer wait, so a batch
+does not crowd out interactive users on the same warehouse.
+
+Usage:
+    python -m iitj_search.batch faq.csv --out faq_answers.jsonl --concurrency 8
+    python -m iitj_search.batch faq.jsonl --out faq_answers.jsonl --table --run-id cse-faq-2025
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from iitj_search import config
+from iitj_search.admission import Requester, current_requester
+from iitj_search.engine import DEFAULT_SETTINGS, RagEngine
+from iitj_search.jobs import TurnJobs
+
+DEFAULT_CONCURRENCY = 8
+# Admission slots for a batch process; the app defaults to 8 and 4.
+BATCH_SEARCH_SLOTS = 4
+BATCH_COMPLETE_SLOTS = 2
+BATCH_MAX_WAIT = 600  # seconds; nobody is watching a spinner
+PROGRESS_EVERY = 10
+
+
+def question_id(question: str) -> str:
+    return hashlib.sha1(" ".join(question.lower().split()).encode("utf-8")).hexdigest()[:16]
+
+
+def load_questions(path: Path) -> list[dict]:
+    """``[{"id", "question"}]`` from a CSV or JSONL file, without blanks or duplicate IDs."""
+    with open(path, encoding="utf-8", newline="") as handle:
+        if path.suffix.lower() in {".jsonl", ".json"}:
+            rows = [json.loads(line) for line in handle if line.strip()]
+        else:
+            rows = list(csv.DictReader(handle))
+    questions, seen = [], set()
+    for row in rows:
+        question = (row.get("question") or "").strip()
+        if not question:
+            continue
+        qid = str(row.get("id") or "").strip() or question_id(question)
+        if qid in seen:
+            continue
+        seen.add(qid)
+        questions.append({"id": qid, "question": question})
+    return questions
+
+
+class CachedEngine(RagEngine):
+    """An engine that makes each distinct search call once per run."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache: dict[str, Future] = {}
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+
+    def admitted_search(self, service: str, payload: dict) -> list[dict]:
+        key = json.dumps([service, payload], sort_keys=True, default=str)
+        with self._cache_lock:
+            future = self._cache.get(key)
+            owner = future is None
+            if owner:
+                future = self._cache[key] = Future()
+            else:
+                self.cache_hits += 1
+        if not owner:
+            return list(future.result())
+        try:
+            results = super().admitted_search(service, payload)
+        except BaseException as exc:
+            with self._cache_lock:
+                self._cache.pop(key, None)  # let a later question try again
+            future.set_exception(exc)
+            raise
+        future.set_result(results)
+        return list(results)
+
+
+# -- output ---------------------------------------------------------------------
+
+def ensure_batch_table(backend):
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {config.qualified(config.BATCH_TABLE)} (
+            RUN_ID VARCHAR, QUESTION_ID VARCHAR, QUESTION VARCHAR, ANSWER VARCHAR, SOURCES VARCHAR,
+            ANSWERED_FROM VARCHAR, MODEL VARCHAR, RETRIEVAL_S FLOAT, GENERATE_S FLOAT, TOTAL_S FLOAT,
+            ERROR VARCHAR, ANSWERED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """
+    )
+
+
+def answered_ids(out: Path | None, backend=None, run_id: str | None = None) -> set[str]:
+    """IDs with a successful answer in the output file (and the table for ``run_id``)."""
+    done = set()
+    if out is not None and out.exists():
+        with open(out, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short when the last run was killed
+                if not record.get("error"):
+                    done.add(record["id"])
+    if backend is not None and run_id:
+        ensure_batch_table(backend)
+        rows = backend.sql(
+            f"SELECT DISTINCT QUESTION_ID FROM {config.qualified(config.BATCH_TABLE)} "
+            "WHERE RUN_ID = ? AND ERROR IS NULL",
+            params=[run_id],
+        )
+        done |= {row["QUESTION_ID"] for row in rows}
+    return done
+
+
+class ResultWriter:
+    """Appends each record to the JSONL file (flushed) and, optionally, the table."""
+
+    def __init__(self, out: Path | None, backend=None, run_id: str | None = None):
+        self.out = out
+        self.backend = backend
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._handle = open(out, "a", encoding="utf-8") if out is not None else None
+
+    def write(self, record: dict):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._handle.flush()
+            if self.backend is not None:
+                timings = record.get("timings") or {}
+                self.backend.sql(
+                    f"""
+                    INSERT INTO {config.qualified(config.BATCH_TABLE)}
+                    (RUN_ID, QUESTION_ID, QUESTION, ANSWER, SOURCES, ANSWERED_FROM, MODEL,
+                     RETRIEVAL_S, GENERATE_S, TOTAL_S, ERROR)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    params=[
+                        self.run_id, record["id"], record["question"], record.get("answer"),
+                        json.dumps(record.get("sources") or [], ensure_ascii=False), record.get("answered_from"),
+                        record.get("model"), timings.get("retrieval_s"), timings.get("generate_s"),
+                        timings.get("total_s"), record.get("error"),
+                    ],
+                )
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+
+
+# -- run ------------------------------------------------------------------------
+
+def answer_one(engine: RagEngine, item: dict, settings: dict) -> dict:
+    record = {"id": item["id"], "question": item["question"]}
+    jobs = TurnJobs()
+    try:
+        with jobs.active():
+            turn = engine.answer(item["question"], settings=settings)
+        summary = turn.summary()
+        record.update({key: summary[key] for key in (
+            "answer", "sources", "answered_from", "model", "hedged", "chunks", "search_error", "degraded",
+            "timings",
+        )})
+        # A degraded answer (Cortex down or failing) is retried on the next run.
+        record["error"] = f"degraded: {turn.degraded}" if turn.degraded else None
+    except Exception as exc:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    finally:
+        jobs.cancel_all("finished")  # a hedge's loser
+    record["answered_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    return record
+
+
+def run_batch(engine: RagEngine, questions: list[dict], writer: ResultWriter, settings: dict | None = None,
+              concurrency: int = DEFAULT_CONCURRENCY, skip: set[str] | None = None, progress=print) -> dict:
+    """Answer the questions not in ``skip``; returns counts and timing percentiles."""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    pending = [item for item in questions if item["id"] not in (skip or set())]
+    counts = {"questions": len(questions), "skipped": len(questions) - len(pending), "answered": 0, "failed": 0}
+    totals = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def work(item):
+        # All of the batch's calls queue as one requester behind the app's sessions.
+        current_requester.set(Requester("batch"))
+        record = answer_one(engine, item, settings)
+        writer.write(record)
+        with lock:
+            counts["failed" if record["error"] else "answered"] += 1
+            if not record["error"]:
+                totals.append(record["timings"].get("total_s", 0.0))
+            done = counts["answered"] + counts["failed"]
+        if progress and (done % PROGRESS_EVERY == 0 or done == len(pending)):
+            progress(f"{done}/{len(pending)} done, {counts['failed']} failed, "
+                     f"{time.perf_counter() - start:.1f}s elapsed")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="iitj-batch") as pool:
+        list(pool.map(work, pending))
+
+    ordered = sorted(totals) or [0.0]
+    return {
+        **counts,
+        "search_cache_hits": getattr(engine, "cache_hits", 0),
+        "wall_s": round(time.perf_counter() - start, 2),
+        "p50_s": round(statistics.median(ordered), 3),
+        "p95_s": round(ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))], 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", type=Path, help="CSV with a 'question' column, or JSONL")
+    parser.add_argument("--out", type=Path, help="JSONL output (appended; resumes from it)")
+    parser.add_argument("--table", action="store_true", help=f"Also insert into {config.BATCH_TABLE}")
+    parser.add_argument("--run-id", help="Table run ID to resume (default: the questions file name)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--search-slots", type=int, default=BATCH_SEARCH_SLOTS)
+    parser.add_argument("--complete-slots", type=int, default=BATCH_COMPLETE_SLOTS)
+    parser.add_argument("--model", default=DEFAULT_SETTINGS["model"])
+    parser.add_argument("--depth", choices=["Fixed", "Adaptive", "Rerank"], default=DEFAULT_SETTINGS["depth_mode"])
+    parser.add_argument("--limit", type=int, default=DEFAULT_SETTINGS["search_limit"])
+    parser.add_argument("--no-entities", action="store_true", help="Always search, even for list questions")
+    parser.add_argument("--no-cache", action="store_true", help="Do not share identical search calls")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+    if not args.out and not args.table:
+        parser.error("give --out and/or --table")
+
+    # Before the first warehouse call creates the process-wide gates.
+    os.environ.setdefault("IITJ_ADMIT_SEARCH", str(args.search_slots))
+    os.environ.setdefault("IITJ_ADMIT_COMPLETE", str(args.complete_slots))
+    for kind in ("SEARCH", "COMPLETE"):
+        os.environ.setdefault(f"IITJ_ADMIT_{kind}_WAIT", str(BATCH_MAX_WAIT))
+
+    from iitj_search.backend import command_line_backend
+
+    backend = command_line_backend(args.backend)
+    run_id = args.run_id or (args.questions.stem if args.table else None)
+    if args.table:
+        ensure_batch_table(backend)
+    questions = load_questions(args.questions)
+    skip = answered_ids(args.out, backend if args.table else None, run_id)
+    engine = (RagEngine if args.no_cache else CachedEngine)(backend)
+    writer = ResultWriter(args.out, backend if args.table else None, run_id or f"batch-{uuid.uuid4().hex[:8]}")
+    try:
+        report = run_batch(
+            engine, questions, writer,
+            settings={"model": args.model, "depth_mode": args.depth, "search_limit": args.limit,
+                      "entity_answers": not args.no_entities},
+            concurrency=args.concurrency, skip=skip,
+        )
+    finally:
+        writer.close()
+    print(f"{report['answered']} answered, {report['failed']} failed, {report['skipped']} already done "
+          f"of {report['questions']} in {report['wall_s']:.1f}s; p50 {report['p50_s']:.2f}s, "
+          f"p95 {report['p95_s']:.2f}s; {report['search_cache_hits']} search calls reused")
+    if report["failed"]:
+        print("re-run the same command to retry the failed questions")
+
+
+if __name__ == "__main__":
+    main()
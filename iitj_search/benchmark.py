@@ -0,0 +1,339 @@
+"""Retrieval quality vs. latency benchmark over a grid of configurations.
+
+Each golden question goes through the page's pipeline,
+``is_searchable_question`` -> search (planner fan-out, fixed / adaptive /
+rerank depth) -> ``build_search_context`` + ``build_prompt`` -> completion
+(a pinned model, or "Auto" through the router). Every stage is timed. For
+each configuration (retrieval mode x results limit x model x prompt chunks)
+the benchmark reports recall@k of the expected documents among the chunks
+sent to the model (k = that count), MRR, the share of answers containing the
+expected facts, prompt and answer tokens, and per-stage latency.
+
+Backends:
+    local      synthetic corpus with simulated latency (the default)
+    snowflake  the live search service and AI_COMPLETE
+    replay     responses recorded from an earlier run (``--record``), played
+               back with their recorded latency (``--replay-speed``)
+
+Record the live service once, then compare configurations offline:
+    python -m iitj_search.benchmark --backend snowflake --record runs/live.jsonl
+    python -m iitj_search.benchmark --replay runs/live.jsonl --modes fixed rerank --limits 10 15
+
+A replay answers only requests that were recorded, so record with the grid
+you want to replay. ``--save`` writes the summaries; ``--compare`` checks a
+run against saved ones and exits with 1 when a configuration lost more than
+``--tolerance`` recall or answer accuracy:
+    python -m iitj_search.benchmark --save runs/baseline.json
+    python -m iitj_search.benchmark --compare runs/baseline.json
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from iitj_search.backend import Backend, LocalLatency, estimate_tokens
+from iitj_search.evaluate import GOLDEN_SET, MODES, file_names, load_golden_set, recall, reciprocal_rank, retrieve
+from iitj_search.rag import build_prompt, build_search_context, clean_text, is_searchable_question
+from iitj_search.rerank import DEFAULT_PROMPT_CHUNKS
+from iitj_search.router import AUTO, choose, complete_routed
+
+STAGES = ["classify", "search", "context", "generate"]
+DEFAULT_MODEL = "claude-sonnet-4-6"
+
+
+class ReplayMiss(KeyError):
+    """The replay file has no response for this request."""
+
+
+def _request_key(kind: str, *parts) -> str:
+    return hashlib.sha256(json.dumps([kind, *parts], sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RecordingBackend(Backend):
+    """Passes search and completion calls through, keeping each response and its latency."""
+
+    name = "recording"
+
+    def __init__(self, inner: Backend):
+        self.inner = inner
+        self.records: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, kind: str, key: str, call):
+        start = time.perf_counter()
+        response = call()
+        with self._lock:
+            self.records[key] = {"kind": kind, "key": key, "seconds": time.perf_counter() - start,
+                                 "response": response}
+        return response
+
+    def sql(self, query: str, params: list | None = None) -> list:
+        return self.inner.sql(query, params)
+
+    def search(self, service: str, payload: dict) -> list[dict]:
+        return self._record("search", _request_key("search", service, payload),
+                            lambda: self.inner.search(service, payload))
+
+    def complete(self, model: str, prompt: str) -> str:
+        return self._record("complete", _request_key("complete", model, prompt),
+                            lambda: self.inner.complete(model, prompt))
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            for record in self.records.values():
+                handle.write(json.dumps(record, default=str) + "\n")
+
+
+class ReplayBackend(Backend):
+    """Serves recorded responses, sleeping ``speed`` times their recorded latency."""
+
+    name = "replay"
+
+    def __init__(self, path: Path, speed: float = 1.0):
+        with open(path, encoding="utf-8") as handle:
+            self.records = {r["key"]: r for r in (json.loads(line) for line in handle if line.strip())}
+        self.speed = speed
+
+    def _replay(self, key: str, what: str):
+        record = self.records.get(key)
+        if record is None:
+            raise ReplayMiss(f"{what} was not recorded")
+        if self.speed > 0:
+            time.sleep(record["seconds"] * self.speed)
+        return json.loads(json.dumps(record["response"]))  # a fresh copy per call
+
+    def search(self, service: str, payload: dict) -> list[dict]:
+        return self._replay(_request_key("search", service, payload), f"search {payload.get('query')!r}")
+
+    def complete(self, model: str, prompt: str) -> str:
+        return self._replay(_request_key("complete", model, prompt), f"{model} completion")
+
+
+@dataclass(frozen=True)
+class BenchConfig:
+    mode: str
+    limit: int
+    model: str
+    prompt_chunks: int
+    split: bool = True
+
+    def label(self) -> str:
+        chunks = f"/p{self.prompt_chunks}" if self.mode == "rerank" else ""
+        return f"{self.mode}/k{self.limit}{chunks}/{self.model}" + ("" if self.split else "/nosplit")
+
+
+def config_grid(modes, limits, models, prompt_chunks, split: bool) -> list[BenchConfig]:
+    configs = []
+    for mode, limit, model, chunks in itertools.product(modes, limits, models, prompt_chunks):
+        config = BenchConfig(mode, limit, model, chunks if mode == "rerank" else DEFAULT_PROMPT_CHUNKS, split)
+        if config not in configs:  # prompt chunks only vary the rerank mode
+            configs.append(config)
+    return configs
+
+
+def _generate(backend, question: str, prompt: str, model: str) -> tuple[str, str]:
+    if model == AUTO:
+        answer = complete_routed(backend.complete, prompt, choose(question, prompt))
+        return answer.text, answer.model
+    return backend.complete(model, prompt), model
+
+
+def run_question(backend, item: dict, config: BenchConfig) -> dict:
+    question = item["question"]
+    timings = {}
+    row = {"id": item["id"], "error": None}
+
+    start = time.perf_counter()
+    searchable = is_searchable_question(question)
+    timings["classify"] = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        results = retrieve(backend, question, config.mode, config.limit, config.prompt_chunks, config.split) \
+            if searchable else []
+        timings["search"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prompt = build_prompt(question, build_search_context(results) if results else "No relevant documents found.")
+        timings["context"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        raw, model = _generate(backend, question, prompt, config.model)
+        timings["generate"] = time.perf_counter() - start
+    except Exception as exc:
+        return {**row, "error": f"{type(exc).__name__}: {exc}"}
+
+    answer = clean_text(raw) or ""
+    retrieved = file_names(results)
+    return {
+        **row,
+        "model": model,
+        "chunks": len(results),
+        "recall": recall(item["expected_files"], retrieved),
+        "rr": reciprocal_rank(item["expected_files"], retrieved),
+        "answer_ok": all(fact.lower() in answer.lower() for fact in item.get("answer_contains", [])),
+        "prompt_tokens": estimate_tokens(prompt),
+        "answer_tokens": estimate_tokens(answer),
+        "seconds": {stage: timings[stage] for stage in STAGES},
+    }
+
+
+def _p95(values: list[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))] if ordered else 0.0
+
+
+def summarize(config: BenchConfig, rows: list[dict]) -> dict:
+    ok = [r for r in rows if not r["error"]]
+    totals = [sum(r["seconds"].values()) for r in ok]
+    summary = {
+        "label": config.label(),
+        "config": asdict(config),
+        "questions": len(rows),
+        "errors": len(rows) - len(ok),
+        "first_error": next((r["error"] for r in rows if r["error"]), None),
+    }
+    if not ok:
+        return summary
+    return {
+        **summary,
+        "chunks": statistics.mean(r["chunks"] for r in ok),
+        "recall": statistics.mean(r["recall"] for r in ok),
+        "mrr": statistics.mean(r["rr"] for r in ok),
+        "answer_ok": statistics.mean(1.0 if r["answer_ok"] else 0.0 for r in ok),
+        "prompt_tokens": statistics.mean(r["prompt_tokens"] for r in ok),
+        "answer_tokens": statistics.mean(r["answer_tokens"] for r in ok),
+        "stage_s": {stage: statistics.mean(r["seconds"][stage] for r in ok) for stage in STAGES},
+        "total_p50_s": statistics.median(totals),
+        "total_p95_s": _p95(totals),
+    }
+
+
+def run_benchmark(backend, golden: list[dict], configs: list[BenchConfig], report=print) -> list[dict]:
+    summaries = []
+    for config in configs:
+        rows = [run_question(backend, item, config) for item in golden]
+        summaries.append(summarize(config, rows))
+        report(f"  {config.label()}: done")
+    return summaries
+
+
+def print_table(summaries: list[dict], baseline: dict[str, dict] | None = None):
+    """One row per configuration; deltas are against ``baseline`` (saved run) or the first row."""
+    reference = summaries[0] if summaries else None
+    print(f"{'configuration':<42} {'recall@k':>8} {'MRR':>5} {'answer':>6} {'prompt':>6} {'answer':>6} "
+          f"{'search s':>8} {'gen s':>6} {'p50 s':>6} {'p95 s':>6}  vs {'baseline' if baseline else 'first row'}")
+    print(f"{'':<42} {'':>8} {'':>5} {'':>6} {'tok':>6} {'tok':>6}")
+    for s in summaries:
+        if "recall" not in s:
+            print(f"{s['label']:<42} all {s['errors']} questions failed: {s['first_error']}")
+            continue
+        ref = (baseline or {}).get(s["label"]) if baseline is not None else reference
+        note = ""
+        if ref and "recall" in ref and ref is not s:
+            faster = s["total_p50_s"] < ref["total_p50_s"]
+            d_recall, d_answer = s["recall"] - ref["recall"], s["answer_ok"] - ref["answer_ok"]
+            note = (f"{s['total_p50_s'] - ref['total_p50_s']:+.2f}s, recall {d_recall:+.2f}, "
+                    f"answer {d_answer:+.2f}")
+            if faster and (d_recall < 0 or d_answer < 0):
+                note += "  << faster but worse"
+        if s["errors"]:
+            note += f"  ({s['errors']} errors)"
+        print(
+            f"{s['label']:<42} {s['recall']:>8.2f} {s['mrr']:>5.2f} {s['answer_ok']:>6.2f} "
+            f"{s['prompt_tokens']:>6.0f} {s['answer_tokens']:>6.0f} {s['stage_s']['search']:>8.3f} "
+            f"{s['stage_s']['generate']:>6.3f} {s['total_p50_s']:>6.2f} {s['total_p95_s']:>6.2f}  {note}"
+        )
+
+
+def regressions(summaries: list[dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Configurations whose recall or answer accuracy fell more than ``tolerance`` below the baseline."""
+    found = []
+    for s in summaries:
+        ref = baseline.get(s["label"])
+        if not ref or "recall" not in ref:
+            continue
+        if "recall" not in s:
+            found.append(f"{s['label']}: every question failed")
+            continue
+        for metric in ("recall", "answer_ok"):
+            if s[metric] < ref[metric] - tolerance:
+                found.append(f"{s['label']}: {metric} {ref[metric]:.2f} -> {s[metric]:.2f}")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", type=Path, default=GOLDEN_SET, help="Versioned golden set (JSONL)")
+    parser.add_argument("--modes", nargs="+", default=["fixed", "rerank"], choices=MODES)
+    parser.add_argument("--limits", nargs="+", type=int, default=[10], help="Results slider values")
+    parser.add_argument("--models", nargs="+", default=[DEFAULT_MODEL], help=f"Model names or {AUTO!r}")
+    parser.add_argument("--prompt-chunks", nargs="+", type=int, default=[DEFAULT_PROMPT_CHUNKS],
+                        help="Reranked chunks in the prompt (rerank mode)")
+    parser.add_argument("--no-split", action="store_true", help="Disable compound-question fan-out")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--backend", choices=["local", "snowflake"], default="local")
+    source.add_argument("--replay", type=Path, help="Play back responses recorded with --record")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Recorded latency multiplier (0: none)")
+    parser.add_argument("--record", type=Path, help="Record search and completion responses to this file")
+    parser.add_argument("--scale", type=int, default=1000, help="Local corpus filler documents")
+    parser.add_argument("--latency", default="search=0.1,complete=0.3,complete_per_1k_prompt_tokens=0.6",
+                        help="Local backend latency, e.g. 'search=0.2,complete=0.5'")
+    parser.add_argument("--save", type=Path, help="Write the summaries as JSON")
+    parser.add_argument("--compare", type=Path, help="Summaries saved by an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed recall / answer accuracy drop")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        backend = ReplayBackend(args.replay, args.replay_speed)
+        source = f"replay of {args.replay}"
+    elif args.backend == "snowflake":
+        from iitj_search.backend import command_line_backend
+
+        backend = command_line_backend("snowflake")
+        source = "live service"
+    else:
+        from iitj_search.backend import LocalBackend
+        from iitj_search.local_corpus import build_corpus
+
+        backend = LocalBackend(latency=LocalLatency.parse(args.latency))
+        backend.load_corpus(build_corpus(args.scale))
+        source = f"local corpus (scale {args.scale})"
+    if args.record:
+        backend = RecordingBackend(backend)
+
+    golden = load_golden_set(args.golden)
+    configs = config_grid(args.modes, args.limits, args.models, args.prompt_chunks, not args.no_split)
+    print(f"{len(golden)} questions from {args.golden.name} x {len(configs)} configurations on the {source}")
+    summaries = run_benchmark(backend, golden, configs)
+
+    if args.record:
+        backend.save(args.record)
+        print(f"recorded {len(backend.records)} responses to {args.record}")
+    baseline = None
+    if args.compare:
+        saved = json.loads(args.compare.read_text(encoding="utf-8"))
+        baseline = {s["label"]: s for s in saved["summaries"]}
+    print()
+    print_table(summaries, baseline)
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps({"golden": args.golden.name, "source": source, "summaries": summaries},
+                                        indent=2), encoding="utf-8")
+    if baseline is not None:
+        found = regressions(summaries, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
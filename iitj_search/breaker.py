@@ -0,0 +1,354 @@
+"""Circuit breakers around the Cortex calls, and the degraded answers served while one is open.
+
+Each kind of Cortex call the search turn makes (``SEARCH_PREVIEW`` and
+``AI_COMPLETE``) passes through a process-wide breaker. After
+``failures`` consecutive failures (errors, or calls slower than ``slow``
+seconds) the breaker opens, and calls fail at once with ``CircuitOpen``
+instead of every user waiting out the same timeout. Once ``reset`` seconds
+have passed it lets a single probe call through (half-open). The probe's
+outcome closes the breaker or opens it again for everyone else.
+Cancelled turns and admission timeouts are not Cortex's fault and count
+for nothing.
+
+While answers cannot be generated, the turn is answered by
+``degraded_answer``, clearly labeled: the last good answer to the same
+question after the same conversation (``RecentAnswers``) when there is one,
+else the top-ranked passages with their sources and no generation.
+
+Thresholds come from ``IITJ_BREAKER_<KIND>_FAILURES``, ``_RESET`` and
+``_SLOW`` (e.g. ``IITJ_BREAKER_COMPLETE_RESET=60``).
+
+Simulate an outage and its recovery against the local backend:
+    python -m iitj_search.breaker --simulate
+    python -m iitj_search.breaker --simulate --mode slow --reset 2
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from iitj_search.admission import AdmissionTimeout, _env_number
+from iitj_search.jobs import QueryCancelled
+from iitj_search.rag import clean_text, extract_result_text, history_to_text, normalize_row
+
+KINDS = ("search", "complete")
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+DEFAULT_FAILURES = {"search": 5, "complete": 3}
+DEFAULT_RESET = {"search": 30.0, "complete": 30.0}  # seconds open before a probe
+DEFAULT_SLOW = {"search": 10.0, "complete": 30.0}  # slower calls count as failures
+# Exceptions that say nothing about Cortex's health.
+NEUTRAL_ERRORS = (QueryCancelled, AdmissionTimeout)
+RECENT_ANSWERS = 500
+RECENT_ANSWER_AGE = 24 * 3600.0  # seconds
+DEGRADED_PASSAGES = 3
+PASSAGE_CHARS = 500
+
+
+class CircuitOpen(RuntimeError):
+    """The breaker for ``kind`` is open; the call was not made."""
+
+    def __init__(self, kind: str, retry_in: float, last_error: str | None = None):
+        self.kind = kind
+        self.retry_in = retry_in
+        self.last_error = last_error
+        super().__init__(f"{kind} circuit open after repeated failures; next probe in {retry_in:.0f}s")
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one kind of call, safe to share across threads."""
+
+    def __init__(self, kind: str, failures: int = 5, reset: float = 30.0, slow: float | None = None):
+        self.kind = kind
+        self.failure_threshold = max(1, failures)
+        self.reset = reset
+        self.slow = slow
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _enter(self) -> bool:
+        """Allow the call or raise ``CircuitOpen``; True when the call is the probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            retry_in = self.opened_at + self.reset - time.monotonic()
+            if not self._probing and (self.state == HALF_OPEN or retry_in <= 0):
+                self.state = HALF_OPEN
+                self._probing = True
+                return True
+            self.rejected += 1
+            raise CircuitOpen(self.kind, max(0.0, retry_in), self.last_error)
+
+    def _record(self, probe: bool, error: str | None):
+        with self._lock:
+            if probe:
+                self._probing = False
+            if error is None:
+                if self.state != OPEN or probe:
+                    self.state = CLOSED
+                    self.failures = 0
+                return
+            self.failures += 1
+            self.last_error = error
+            if probe or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def _release_probe(self):
+        """A probe that ended without a verdict (cancelled): the next call probes instead."""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """Run the block as one call through the breaker."""
+        probe = self._enter()
+        start = time.monotonic()
+        try:
+            yield
+        except NEUTRAL_ERRORS:
+            if probe:
+                self._release_probe()
+            raise
+        except Exception as exc:
+            self._record(probe, f"{type(exc).__name__}: {exc}")
+            raise
+        except BaseException:
+            if probe:
+                self._release_probe()
+            raise
+        elapsed = time.monotonic() - start
+        if self.slow is not None and elapsed > self.slow:
+            self._record(probe, f"slow: {elapsed:.1f}s")
+        else:
+            self._record(probe, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = self.opened_at + self.reset - time.monotonic() if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": round(max(0.0, retry_in), 1),
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+_breakers = None
+_breakers_lock = threading.Lock()
+
+
+def shared_breakers() -> dict[str, CircuitBreaker]:
+    """Process-wide breakers, one per kind, configured from the environment."""
+    global _breakers
+    with _breakers_lock:
+        if _breakers is None:
+            _breakers = {
+                kind: CircuitBreaker(
+                    kind,
+                    _env_number(f"IITJ_BREAKER_{kind.upper()}_FAILURES", DEFAULT_FAILURES[kind], int),
+                    _env_number(f"IITJ_BREAKER_{kind.upper()}_RESET", DEFAULT_RESET[kind], float),
+                    _env_number(f"IITJ_BREAKER_{kind.upper()}_SLOW", DEFAULT_SLOW[kind], float),
+                )
+                for kind in KINDS
+            }
+        return _breakers
+
+
+def guard(kind: str):
+    """``shared_breakers()[kind].guard()``."""
+    return shared_breakers()[kind].guard()
+
+
+def breaker_states() -> dict[str, dict]:
+    return {kind: breaker.snapshot() for kind, breaker in shared_breakers().items()}
+
+
+# -- degraded answers -------------------------------------------------------------
+
+def _question_key(question: str, history: list[dict] | None = None) -> str:
+    key = " ".join(question.lower().split())
+    if history:
+        # An answer built on earlier turns only fits the same conversation.
+        key += "#" + hashlib.sha1(history_to_text(history).encode("utf-8")).hexdigest()
+    return key
+
+
+class RecentAnswers:
+    """Last good answer per question and history (most recent ``size``), for serving while Cortex is down."""
+
+    def __init__(self, size: int = RECENT_ANSWERS, max_age: float = RECENT_ANSWER_AGE):
+        self.size = size
+        self.max_age = max_age
+        self._answers: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, question: str, response: str, history: list[dict] | None = None):
+        key = _question_key(question, history)
+        with self._lock:
+            self._answers[key] = (time.time(), response)
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.size:
+                self._answers.popitem(last=False)
+
+    def recall(self, question: str, history: list[dict] | None = None) -> tuple[float, str] | None:
+        """``(answered_at, response)``, or None when missing or too old."""
+        with self._lock:
+            entry = self._answers.get(_question_key(question, history))
+        if entry is None or time.time() - entry[0] > self.max_age:
+            return None
+        return entry
+
+
+_recent = RecentAnswers()
+
+
+def recent_answers() -> RecentAnswers:
+    return _recent
+
+
+def _reason(exc: Exception) -> str:
+    if isinstance(exc, CircuitOpen):
+        if exc.kind == "search":
+            return "Document search is temporarily unavailable"
+        return "AI answers are temporarily unavailable"
+    if isinstance(exc, AdmissionTimeout):
+        return "Too many questions are being answered right now"
+    return "The AI model did not answer"
+
+
+def _ago(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    return f"{minutes // 60} h ago"
+
+
+def degraded_answer(question: str, results: list[dict], exc: Exception,
+                    history: list[dict] | None = None) -> tuple[str, str]:
+    """A labeled answer without generation; returns the text and how it was made.
+
+    The kind is "cached" (a recent good answer to ``question`` after the
+    same ``history``, sources included),
+    "passages" (the top results, sources still to be appended) or
+    "unavailable".
+    """
+    reason = _reason(exc)
+    cached = recent_answers().recall(question, history)
+    if cached is not None:
+        answered_at, response = cached
+        note = f"> ⚠️ **{reason}.** This is a saved answer to the same question from {_ago(time.time() - answered_at)}."
+        return f"{note}\n\n{response}", "cached"
+
+    passages = []
+    for row in results[:DEGRADED_PASSAGES]:
+        row_dict = normalize_row(row)
+        text = extract_result_text(row_dict) or ""
+        if not text:
+            continue
+        if len(text) > PASSAGE_CHARS:
+            text = text[:PASSAGE_CHARS].rsplit(" ", 1)[0] + " …"
+        title = clean_text(row_dict.get("SHORT_DESCRIPTION") or row_dict.get("FILE_NAME") or "Document")
+        passages.append(f"**{len(passages) + 1}. {title}**\n\n{text}")
+    if passages:
+        note = (
+            f"> ⚠️ **{reason}.** Below are the most relevant passages found for your question, "
+            "without a generated summary."
+        )
+        return note + "\n\n" + "\n\n".join(passages), "passages"
+
+    return (
+        f"> ⚠️ **{reason}.** There is no saved answer or matching passage for this question yet. "
+        "Please try again in a few minutes."
+    ), "unavailable"
+
+
+# -- simulation -------------------------------------------------------------------
+
+def simulate(mode: str, reset: float, questions: list[str], latency: float) -> list[dict]:
+    """Healthy turns, an outage of ``AI_COMPLETE`` and its recovery, against the local backend."""
+    from iitj_search.backend import LocalBackend, LocalLatency
+    # The engine's breakers (not this file's copy when run with ``-m``).
+    from iitj_search.breaker import shared_breakers
+    from iitj_search.engine import RagEngine
+    from iitj_search.local_corpus import build_corpus
+
+    backend = LocalBackend(latency=LocalLatency(search=0.05, complete=latency))
+    backend.load_corpus(build_corpus(50))
+    engine = RagEngine(backend)
+    breaker = shared_breakers()["complete"]
+    settings = {"entity_answers": False}
+    rows = []
+
+    def turn(phase: str, question: str):
+        start = time.perf_counter()
+        result = engine.answer(question, settings=settings)
+        rows.append({
+            "phase": phase,
+            "question": question[:40],
+            "seconds": round(time.perf_counter() - start, 2),
+            "degraded": result.degraded or "-",
+            "breaker": breaker.snapshot()["state"],
+        })
+
+    for question in questions:
+        turn("healthy", question)
+    if mode == "slow":
+        backend.latency.complete = breaker.slow + 0.5
+    else:
+        backend.down.add("complete")
+    for idx in range(breaker.failure_threshold + 3):
+        turn("outage", questions[idx % len(questions)] if idx % 2 else f"{questions[0]} (new wording {idx})")
+    backend.down.discard("complete")
+    backend.latency.complete = latency
+    time.sleep(reset + 0.1)
+    for question in questions[:2]:
+        turn("recovered", question)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--simulate", action="store_true", help="Run an outage against the local backend")
+    parser.add_argument("--mode", choices=["error", "slow"], default="error", help="How AI_COMPLETE fails")
+    parser.add_argument("--reset", type=float, default=1.0, help="Seconds open before a probe (simulation)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Healthy completion seconds (simulation)")
+    args = parser.parse_args(argv)
+    if not args.simulate:
+        for kind, breaker in shared_breakers().items():
+            print(f"{kind:<9} opens after {breaker.failure_threshold} failures or calls over {breaker.slow:.0f}s; "
+                  f"probes after {breaker.reset:.0f}s")
+        return
+
+    os.environ.setdefault("IITJ_BREAKER_COMPLETE_RESET", str(args.reset))
+    os.environ.setdefault("IITJ_BREAKER_COMPLETE_SLOW", "1.0")
+    questions = [
+        "What are the hostel fees?",
+        "Who can apply for the merit scholarship?",
+        "When does the semester start?",
+    ]
+    rows = simulate(args.mode, float(os.environ["IITJ_BREAKER_COMPLETE_RESET"]), questions, args.latency)
+    print(f"{'phase':<10} {'question':<42} {'seconds':>7}  {'degraded':<11} breaker")
+    for row in rows:
+        print(f"{row['phase']:<10} {row['question']:<42} {row['seconds']:>7.2f}  {row['degraded']:<11} {row['breaker']}")
+    from iitj_search.breaker import breaker_states as engine_breaker_states
+
+    print(engine_breaker_states()["complete"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Side-by-side answers from several models to one prompt.
+
+Compare mode on the search page reuses the turn's single search result and
+built prompt, and sends the completion to every selected model at once.
+Each model's answer is handed to ``on_done`` as soon as it arrives, so the
+page can fill that model's column while slower models are still running.
+Every run records its latency and prompt/output token counts. The counts
+are estimates (about four characters per token), because AI_COMPLETE only
+returns text. Each completion passes the usual admission gate and breaker,
+and feeds the router's latency statistics. The model the user preferred is
+stored with the turn's feedback.
+
+Compare models on one question:
+    python -m iitj_search.compare "Compare the CSE and EE departments" --models llama3.1-70b claude-4-sonnet
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+
+from iitj_search.backend import estimate_tokens
+from iitj_search.jobs import QueryCancelled, submit_in_context
+from iitj_search.rag import build_search_context, clean_text
+from iitj_search.router import DEADLINE, MODELS, latency_stats
+
+MAX_MODELS = 3
+POOL_SIZE = 12
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class ModelRun:
+    model: str
+    text: str | None = None
+    seconds: float | None = None
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def caption(self) -> str:
+        if self.error:
+            return f"failed after {self.seconds:.1f}s" if self.seconds is not None else "failed"
+        return f"{self.seconds:.1f}s · ~{self.prompt_tokens} prompt / ~{self.output_tokens} output tokens"
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="iitj-compare")
+        return _pool
+
+
+def _run(complete, model: str, prompt: str) -> ModelRun:
+    run = ModelRun(model, prompt_tokens=estimate_tokens(prompt))
+    start = time.perf_counter()
+    try:
+        raw = complete(model, prompt)
+    except QueryCancelled:
+        raise
+    except Exception as exc:
+        run.seconds = time.perf_counter() - start
+        run.error = f"{type(exc).__name__}: {exc}"
+        latency_stats.record(model, run.seconds, ok=False)
+        return run
+    run.seconds = time.perf_counter() - start
+    run.text = clean_text(raw) if raw else None
+    latency_stats.record(model, run.seconds, ok=bool(run.text))
+    if not run.text:
+        run.error = "ValueError: empty response"
+    else:
+        run.output_tokens = estimate_tokens(run.text)
+    return run
+
+
+def compare_models(complete, prompt: str, models: list[str], on_done=None,
+                   deadline: float = DEADLINE) -> list[ModelRun]:
+    """``complete(model, prompt)`` for every model at once, in ``models`` order.
+
+    ``on_done(run)`` is called from this thread as each model finishes; a
+    model still running at the deadline gets a timeout error.
+    """
+    pool = _get_pool()
+    start = time.monotonic()
+    futures = {submit_in_context(pool, _run, complete, model, prompt): model for model in models}
+    runs: dict[str, ModelRun] = {}
+    pending = set(futures)
+    while pending:
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            run = future.result()  # QueryCancelled propagates
+            runs[run.model] = run
+            if on_done is not None:
+                on_done(run)
+    for future in pending:
+        run = ModelRun(futures[future], seconds=deadline, prompt_tokens=estimate_tokens(prompt),
+                       error=f"TimeoutError: no answer within {deadline:.0f}s")
+        runs[run.model] = run
+        if on_done is not None:
+            on_done(run)
+    return [runs[model] for model in models]
+
+
+def winner_options(runs: list[dict]) -> list[str]:
+    """Models that answered, for the feedback form's "which was better" choice."""
+    return [run["model"] for run in runs if not run.get("error")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("question")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS)[:MAX_MODELS])
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import command_line_backend
+    from iitj_search.engine import DEFAULT_SETTINGS, RagEngine
+
+    engine = RagEngine(command_line_backend(args.backend))
+    start = time.perf_counter()
+    results = engine.run_search(args.question, dict(DEFAULT_SETTINGS), {})
+    prompt = engine.prompt(args.question, build_search_context(results) if results else "No relevant documents found.")
+    print(f"retrieval: {len(results)} chunks in {time.perf_counter() - start:.2f}s (shared by all models)")
+    runs = compare_models(
+        engine.admitted_complete, prompt, args.models,
+        on_done=lambda run: print(f"  {run.model} finished after {time.perf_counter() - start:.2f}s"),
+    )
+    for run in runs:
+        print("=" * 72)
+        print(f"{run.model}: {run.caption()}")
+        print(run.error or run.text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Snowflake object names shared by the pages and the command-line tools."""
+
+DATABASE = "IITJ"
+SCHEMA = "MH"
+
+METADATA_TABLE = "UPLOADED_FILES_METADATA"
+AUTH_TABLE = "IITJ_DOCUMENT_CURATOR_INFO"
+REQUESTOR_TABLE = "IITJ_DOCUMENT_CURATOR_REQUESTOR"
+FEEDBACK_TABLE = "IITJ_RAG_FEEDBACK"
+# Chunk table the Cortex Search service is built on (filled by the embedding procedure).
+CHUNK_TABLE = "IITJ_DOCUMENT_CHUNKS"
+# Faculty and departments extracted from the chunks at ingest (see entities.py).
+FACULTY_TABLE = "IITJ_FACULTY"
+DEPARTMENT_TABLE = "IITJ_DEPARTMENTS"
+# Routing table of the search shards, one Cortex Search service each (see shards.py).
+SHARD_TABLE = "IITJ_SEARCH_SHARDS"
+# Per-file checkpoints of re-embedding backfill runs.
+BACKFILL_TABLE = "IITJ_EMBEDDING_BACKFILL"
+# Answers written by offline batch runs, keyed by run and question ID (see batch.py).
+BATCH_TABLE = "IITJ_BATCH_ANSWERS"
+
+STAGE = f"{DATABASE}.{SCHEMA}.IITJ_INFO_STAGE"
+SEARCH_SERVICE = "IITJ_AI_SEARCH"
+EMBEDDING_PROCEDURE = f"{DATABASE}.{SCHEMA}.GENERATE_EMBEDDINGS_FOR_NEW_FILE"
+
+# File types the Curate page accepts (also the FILE_TYPE values search can filter on).
+ALLOWED_EXTENSIONS = ['pdf', 'pptx', 'docx', 'jpeg', 'jpg', 'png', 'tiff', 'tif', 'html', 'txt']
+
+
+def qualified(name: str) -> str:
+    """Return DATABASE.SCHEMA.name for a table, service or procedure name."""
+    return f"{DATABASE}.{SCHEMA}.{name}"
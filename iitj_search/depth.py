@@ -0,0 +1,94 @@
+"""Adaptive retrieval depth from Cortex Search relevance scores.
+
+Instead of prompting with every result the Results slider allows, keep the
+head of the ranking up to the first large score gap or until the kept results
+carry most of the total score. A flat score distribution (no clear winner)
+keeps more results, and so does a weak top score when the service reports a
+calibrated score, so depth only widens when the top results are weak.
+"""
+
+from dataclasses import dataclass
+
+from iitj_search.backend import estimate_tokens
+from iitj_search.rag import build_search_context, normalize_row
+
+MIN_DEPTH = 2
+GAP_RATIO = 0.6  # cut where a score falls below 60% of the one before it
+CUMULATIVE_SHARE = 0.7  # ... or once the kept results hold 70% of the total score
+# Score kinds in order of preference, with the top score below which results
+# count as weak and the full depth is kept. BM25-style text_match scores are
+# not calibrated, so they rely on the relative cutoffs only.
+SCORE_KINDS = {
+    "reranker_score": None,
+    "cosine_similarity": 0.35,
+    "text_match": None,
+}
+
+
+@dataclass
+class DepthChoice:
+    depth: int
+    fetched: int
+    reason: str
+    score_kind: str | None = None
+    tokens_saved: int = 0
+
+
+def result_score(row) -> tuple[str | None, float | None]:
+    """(kind, value) of the best available relevance score on a search hit."""
+    scores = normalize_row(row).get("@scores") or {}
+    for kind in SCORE_KINDS:
+        if isinstance(scores.get(kind), (int, float)):
+            return kind, float(scores[kind])
+    return None, None
+
+
+def choose_depth(
+    results: list[dict],
+    min_depth: int = MIN_DEPTH,
+    gap_ratio: float = GAP_RATIO,
+    cumulative_share: float = CUMULATIVE_SHARE,
+) -> DepthChoice:
+    """How many of the (score-ordered) results to keep."""
+    fetched = len(results)
+    if fetched <= min_depth:
+        return DepthChoice(fetched, fetched, "few results")
+
+    kinds_and_scores = [result_score(row) for row in results]
+    kind = kinds_and_scores[0][0]
+    scores = [score for k, score in kinds_and_scores if k == kind and score is not None]
+    if kind is None or len(scores) != fetched or scores[0] <= 0:
+        return DepthChoice(fetched, fetched, "no scores in response")
+
+    weak_below = SCORE_KINDS[kind]
+    if weak_below is not None and scores[0] < weak_below:
+        return DepthChoice(fetched, fetched, f"weak top score {scores[0]:.2f}", kind)
+
+    total = sum(max(score, 0.0) for score in scores)
+    running = sum(scores[:min_depth])
+    for idx in range(min_depth, fetched):
+        if scores[idx] < gap_ratio * scores[idx - 1]:
+            return DepthChoice(idx, fetched, f"score gap after #{idx}", kind)
+        if running >= cumulative_share * total:
+            return DepthChoice(idx, fetched, f"{cumulative_share:.0%} of total score", kind)
+        running += scores[idx]
+    return DepthChoice(fetched, fetched, "flat scores", kind)
+
+
+def sort_by_score(results: list[dict]) -> list[dict]:
+    """Order hits by relevance score (merged sub-query results arrive interleaved)."""
+    if any(result_score(row)[1] is None for row in results):
+        return results
+    return sorted(results, key=lambda row: -result_score(row)[1])
+
+
+def adaptive_results(results: list[dict], **cutoffs) -> tuple[list[dict], DepthChoice]:
+    """Score-ordered head of ``results`` plus the depth decision and prompt tokens saved."""
+    ordered = sort_by_score(results)
+    choice = choose_depth(ordered, **cutoffs)
+    kept = ordered[:choice.depth]
+    if choice.depth < len(ordered):
+        choice.tokens_saved = (
+            estimate_tokens(build_search_context(ordered)) - estimate_tokens(build_search_context(kept))
+        )
+    return kept, choice
@@ -0,0 +1,466 @@
+"""The AI Search turn without Streamlit: retrieval, prompt, routed answer and sources.
+
+``RagEngine`` holds what the search page used to keep at page level: the
+entity-table shortcut for list questions, filtered and sharded search with
+the query planner and retrieval depth, the prompt with recent history, the
+routed completion (or, in compare mode, every selected model's) and the
+source list appended to the answer. The page runs ``answer`` on the turn
+pool and shows its events from the script thread; api.py serves it over
+HTTP. Every warehouse call goes through the process-wide
+admission gates, and statements are tracked by whatever ``TurnJobs`` is
+current. Cortex calls also pass the circuit breakers (breaker.py); when an
+answer cannot be generated, the turn gets a labeled degraded answer.
+
+Usage:
+    python -m iitj_search.engine "List faculty in the Mathematics department" --show-prompt
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+
+from iitj_search.admission import admit
+from iitj_search.breaker import CircuitOpen, degraded_answer, guard, recent_answers
+from iitj_search.compare import compare_models, winner_options
+from iitj_search.depth import adaptive_results
+from iitj_search.entities import FORMAT_MAX_ROWS, lookup_entities
+from iitj_search.filters import SearchFilters, combine, parse_filters, to_cortex_filter
+from iitj_search.jobs import QueryCancelled
+from iitj_search.planner import fan_out_search, plan_queries, plan_queries_with_model
+from iitj_search.rag import (
+    build_prompt,
+    build_search_context,
+    clean_text,
+    history_to_text,
+    is_result_relevant_to_question,
+    is_searchable_question,
+    normalize_row,
+)
+from iitj_search.rerank import DEFAULT_PROMPT_CHUNKS, candidate_count, rerank_top
+from iitj_search.router import AUTO, choose, complete_routed
+from iitj_search.shards import load_routes, search_shards
+
+HISTORY_LENGTH = 5
+# Small, cheap model used only to split compound questions into sub-queries.
+PLANNER_MODEL = "llama3.1-8b"
+# Formats entity-table answers unless a model is pinned.
+ENTITY_FORMAT_MODEL = "llama3.1-70b"
+ESSENTIAL_COLUMNS = ["CHUNK", "SOURCE_URL", "FILE_NAME", "SHORT_DESCRIPTION"]
+# The page's sidebar defaults.
+DEFAULT_SETTINGS = {
+    "search_limit": 10,
+    "split_compound_questions": True,
+    "planner_mode": "Rules",
+    "depth_mode": "Fixed",
+    "prompt_chunks": DEFAULT_PROMPT_CHUNKS,
+    "parse_question_filters": True,
+    "entity_answers": True,
+    "model": AUTO,
+    "compare_models": (),  # two or more models answer side by side instead of the routed one
+}
+# The settings ``run_search`` reads; the rest only shape the answer.
+SEARCH_SETTINGS = ("search_limit", "split_compound_questions", "planner_mode", "depth_mode", "prompt_chunks",
+                   "parse_question_filters", "filters")
+NO_INFO_INDICATORS = [
+    "couldn't find any information",
+    "no relevant information",
+    "don't have information",
+    "no information available",
+    "couldn't locate any information",
+]
+CLARIFICATION_INDICATORS = [
+    "please ask a specific question",
+    "could you please ask",
+    "to assist you better, please ask",
+    "provide a clear question",
+    "ask a specific question",
+]
+
+
+def indexed_columns(backend, service: str) -> list[str]:
+    """Searchable columns from ``DESCRIBE CORTEX SEARCH SERVICE`` (empty when unavailable)."""
+    try:
+        rows = backend.sql(f"DESCRIBE CORTEX SEARCH SERVICE {service}")
+    except Exception:
+        return []
+
+    for row in rows:
+        row_dict = normalize_row(row)
+        # Check various possible column name variations
+        name_key = next((key for key in ["name", "NAME", "Name"] if key in row_dict), None)
+        if not name_key:
+            continue
+
+        name = (row_dict.get(name_key) or "").lower()
+        if name in {"columns", "search_columns", "indexed_columns", "search columns"}:
+            # Try different value key variations
+            value = None
+            for key in ["value", "VALUE", "Value"]:
+                value = row_dict.get(key)
+                if value:
+                    break
+
+            if value:
+                cols = [c.strip() for c in str(value).split(",") if c.strip()]
+                # Ensure CHUNK is included as it's the search column
+                if "CHUNK" not in cols:
+                    cols.insert(0, "CHUNK")
+                return cols
+
+    # Fallback to hardcoded columns if parsing fails
+    return ["CHUNK", "SOURCE_URL", "FILE_NAME", "SHORT_DESCRIPTION", "UPLOAD_TIMESTAMP", "UPLOADED_BY", "CHUNK_INDEX"]
+
+
+def search_columns(columns: list[str] | None) -> list[str]:
+    """Columns to request: the essential ones when indexed, else everything indexed."""
+    if not columns:
+        return list(ESSENTIAL_COLUMNS)
+    selected = [col for col in ESSENTIAL_COLUMNS if col in columns]
+    return selected if len(selected) == len(ESSENTIAL_COLUMNS) else list(columns)
+
+
+def with_sources(response: str, source_documents: list[dict], searched: bool = True) -> str:
+    """Append the source list, unless the answer says nothing was found or asks for a clearer question."""
+    response_lower = response.lower()
+    has_no_information = any(indicator in response_lower for indicator in NO_INFO_INDICATORS)
+    asks_for_clarification = any(indicator in response_lower for indicator in CLARIFICATION_INDICATORS)
+    if not searched or has_no_information or asks_for_clarification or not source_documents:
+        return response
+
+    response += "\n\n---\n\n"
+    if len(source_documents) == 1:
+        response += "### 📚 Source\n\n"
+    else:
+        response += f"### 📚 Sources ({len(source_documents)} documents)\n\n"
+    for idx, doc in enumerate(source_documents, 1):
+        response += f"{idx}. **{doc['title']}**  \n"
+        response += f"   🔗 [{doc['url']}]({doc['url']})\n\n"
+    return response
+
+
+@dataclass
+class TurnResult:
+    question: str
+    response: str = ""  # answer text with the source list appended
+    text: str = ""  # the model's (or entity table's) answer alone
+    sources: list[dict] = field(default_factory=list)
+    results: list[dict] = field(default_factory=list)
+    search_context: str = ""
+    prompt: str = ""
+    entity_answer: object = None
+    route: dict | None = None  # {"decision": ..., "answer": ...} or {"decision": ..., "error": ...}
+    trace: dict = field(default_factory=dict)
+    search_error: str | None = None
+    degraded: str | None = None  # "cached", "passages" or "unavailable" when not generated
+    compared: list[dict] | None = None  # compare mode: every model's run, in ``compare_models`` order
+    timings: dict = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        """JSON-friendly view for the API and command line."""
+        route = self.route or {}
+        answer = route.get("answer")
+        return {
+            "question": self.question,
+            "answer": self.response,
+            "sources": self.sources,
+            "answered_from": "entity_tables" if self.entity_answer is not None else "search",
+            "model": answer.model if answer else None,
+            "hedged": bool(answer and answer.hedged),
+            "route_reason": route["decision"].reason if route else None,
+            "chunks": len(self.results),
+            "search_error": self.search_error,
+            "model_error": route.get("error"),
+            "degraded": self.degraded,
+            "timings": {key: round(value, 3) for key, value in self.timings.items()},
+        }
+
+
+class RagEngine:
+    """One backend's search services and models, usable from any thread."""
+
+    def __init__(self, backend, routes=None, columns: list[str] | None = None):
+        self.backend = backend
+        self.routes = routes or load_routes(backend)
+        # Indexed columns: filters on other attributes are dropped rather than sent.
+        self.indexed_columns = (
+            columns if columns is not None else indexed_columns(backend, self.routes.default.qualified_service())
+        )
+        self.columns = search_columns(self.indexed_columns)
+
+    # -- admitted warehouse calls ---------------------------------------------
+
+    def admitted_search(self, service: str, payload: dict) -> list[dict]:
+        with admit("search"), guard("search"):
+            return self.backend.search(service, payload)
+
+    def admitted_complete(self, model: str, prompt: str) -> str:
+        with admit("complete"), guard("complete"):
+            return self.backend.complete(model, prompt)
+
+    def admitted_routed(self, prompt: str, decision):
+        """The turn's routed completion, holding one completion slot.
+
+        A hedge runs under the same slot, so a queued hedge can never outlive
+        its turn; the gate counts the pair as one call while both run.
+        """
+        with admit("complete"), guard("complete"):
+            return complete_routed(self.backend.complete, prompt, decision)
+
+    # -- retrieval ------------------------------------------------------------
+
+    def search_service(self, query: str, k: int, search_filter: dict | None = None, shards=None,
+                       shard_stats=None) -> list[dict]:
+        """Search the given shards (the default service when none), merging their hits by score."""
+        payload = {
+            "query": query,
+            "columns": self.columns,
+            "filter": search_filter or {},
+            "limit": k,
+        }
+        results, stats = search_shards(self.admitted_search, shards or [self.routes.default], payload)
+        if shard_stats is not None:
+            shard_stats.extend(stats)
+        return results
+
+    def run_search(self, question: str, settings: dict, trace: dict) -> list[dict]:
+        """Search for the question, fanning compound questions out into concurrent sub-queries.
+
+        Reads only ``settings`` (DEFAULT_SETTINGS keys plus ``filters``) and
+        leaves debug details in ``trace``, so it can run off the caller's thread.
+        When the filters parsed from the question leave nothing, the whole
+        question is searched again without them.
+        """
+        trace["last_search_filters_dropped"] = None
+        results = self._search(question, settings, trace)
+        if not results and settings["parse_question_filters"]:
+            parsed_filters, _ = parse_filters(question)
+            if not parsed_filters.is_empty():
+                # The phrase read as a filter was more likely part of the question.
+                trace["last_search_filters_dropped"] = parsed_filters
+                results = self._search(question, {**settings, "parse_question_filters": False}, trace)
+        return results
+
+    def _search(self, question: str, settings: dict, trace: dict) -> list[dict]:
+        # Filters are pushed down to the service; the filter phrases themselves
+        # are dropped from the search text.
+        parsed_filters, search_question = (
+            parse_filters(question) if settings["parse_question_filters"] else (SearchFilters(), question)
+        )
+        search_question = search_question or question
+        active_filters = combine(settings.get("filters") or SearchFilters(), parsed_filters)
+        search_filter = to_cortex_filter(active_filters, self.indexed_columns or None)
+        trace["last_search_filters"] = (active_filters, search_filter)
+        # Only the shards the question (or its file-type filter) points at are queried.
+        shards, shard_reason = self.routes.select(search_question, active_filters.file_types)
+        shard_stats = []
+        trace["last_search_shards"] = {
+            "shards": [route.shard for route in shards], "reason": shard_reason, "calls": shard_stats,
+        }
+
+        def filtered_search(query, k):
+            return self.search_service(query, k, search_filter, shards, shard_stats)
+
+        limit, depth_mode = settings["search_limit"], settings["depth_mode"]
+        if not settings["split_compound_questions"]:
+            queries = [search_question]
+        elif settings["planner_mode"] == "Cheap model":
+            queries = plan_queries_with_model(search_question, self.admitted_complete, PLANNER_MODEL)
+        else:
+            queries = plan_queries(search_question)
+
+        trace["last_search_candidates"] = None
+        trace["last_search_depth"] = None
+        if depth_mode != "Rerank":
+            results, plan_stats = fan_out_search(filtered_search, queries, limit)
+            trace["last_search_plan"] = plan_stats
+            if depth_mode == "Adaptive":
+                results, trace["last_search_depth"] = adaptive_results(results)
+            return results
+
+        # Two-stage retrieval: over-fetch, rerank on CPU, prompt with the top few.
+        candidates, plan_stats = fan_out_search(filtered_search, queries, candidate_count(limit))
+        trace["last_search_plan"] = plan_stats
+        trace["last_search_candidates"] = len(candidates)
+        return rerank_top(search_question, candidates, settings["prompt_chunks"])
+
+    @staticmethod
+    def source_documents(question: str, results: list[dict]) -> list[dict]:
+        """Distinct source links of the results that are lexically relevant to the question."""
+        source_documents = []
+        seen_urls = set()
+        for row in results:
+            row_dict = normalize_row(row)
+
+            # Keep only rows that are lexically relevant to user's query.
+            if not is_result_relevant_to_question(question, row_dict):
+                continue
+
+            url = row_dict.get("SOURCE_URL") or row_dict.get("source_url")
+            if not url or url in seen_urls:
+                continue
+            seen_urls.add(url)
+
+            title = (
+                row_dict.get("SHORT_DESCRIPTION")
+                or row_dict.get("short_description")
+                or row_dict.get("FILE_NAME")
+                or row_dict.get("file_name")
+                or "Document"
+            )
+            source_documents.append({
+                "title": clean_text(title) if title else "Document",
+                "url": str(url),
+            })
+        return source_documents
+
+    @staticmethod
+    def prompt(question: str, search_context: str, history: list[dict] | None = None) -> str:
+        recent_history = list(history or [])[-HISTORY_LENGTH:]
+        return build_prompt(question, search_context, history_to_text(recent_history) if recent_history else None)
+
+    # -- the whole turn -------------------------------------------------------
+
+    def answer(self, question: str, history: list[dict] | None = None, settings: dict | None = None,
+               on_event=None, search=None) -> TurnResult:
+        """Run one turn in the calling thread.
+
+        ``on_event(name, data)`` is called as the turn progresses ("status",
+        "sources", "compared", "answer"), for streaming. ``search(question,
+        settings, trace)`` replaces ``run_search``, e.g. ``Prefetcher.search``
+        bound to this engine. Search failures are answered from no context.
+        When the model fails, or search is unavailable altogether, the answer
+        is degraded (``result.degraded``) and ``result.route`` records the
+        error.
+        """
+        settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        emit = on_event or (lambda name, data: None)
+        search = search or self.run_search
+        turn = TurnResult(question)
+        start = time.perf_counter()
+
+        should_search = is_searchable_question(question)
+        search_exc = None
+        if should_search and settings["entity_answers"]:
+            turn.entity_answer = lookup_entities(self.backend, question)
+        if should_search and turn.entity_answer is None:
+            emit("status", {"stage": "searching"})
+            try:
+                turn.results = list(search(question, settings, turn.trace) or [])
+            except Exception as exc:
+                search_exc = exc
+                turn.search_error = str(exc)
+        turn.timings["retrieval_s"] = time.perf_counter() - start
+
+        if turn.search_error:
+            turn.search_context = f"Error searching documents: {turn.search_error}"
+        else:
+            turn.search_context = build_search_context(turn.results) if turn.results else "No relevant documents found."
+        turn.sources = (
+            turn.entity_answer.sources if turn.entity_answer is not None
+            else self.source_documents(question, turn.results)
+        )
+        emit("sources", {"sources": turn.sources, "chunks": len(turn.results)})
+
+        emit("status", {"stage": "answering"})
+        generate_start = time.perf_counter()
+        if turn.entity_answer is not None:
+            turn.text, turn.route = self.entity_text(turn.entity_answer, question, settings["model"])
+        elif isinstance(search_exc, CircuitOpen):
+            # Answering from no context would only say nothing was found.
+            turn.text, turn.degraded = degraded_answer(question, [], search_exc, history)
+        elif len(settings["compare_models"]) > 1:
+            turn.prompt = self.prompt(question, turn.search_context, history)
+            self.compare(turn, list(settings["compare_models"]), history, emit)
+        else:
+            turn.prompt = self.prompt(question, turn.search_context, history)
+            decision = choose(question, turn.prompt, override=settings["model"])
+            try:
+                routed = self.admitted_routed(turn.prompt, decision)
+            except QueryCancelled:
+                raise
+            except Exception as exc:
+                turn.route = {"decision": decision, "error": str(exc)}
+                turn.text, turn.degraded = degraded_answer(question, turn.results, exc, history)
+            else:
+                turn.route = {"decision": decision, "answer": routed}
+                # Clean escape sequences and convert to proper formatting
+                turn.text = clean_text(routed.text)
+        turn.timings["generate_s"] = time.perf_counter() - generate_start
+        turn.timings["total_s"] = time.perf_counter() - start
+
+        # A saved answer already lists its sources.
+        turn.response = with_sources(turn.text, turn.sources, should_search and turn.degraded != "cached")
+        if turn.degraded is None and turn.results and not turn.compared:
+            recent_answers().remember(question, turn.response, history)
+        emit("answer", {"text": turn.response})
+        return turn
+
+    def compare(self, turn: TurnResult, models: list[str], history: list[dict] | None, emit):
+        """Every model's answer to ``turn.prompt``, each emitted ("compared") as it finishes.
+
+        The turn's text is the answers under one heading per model, or a
+        degraded answer when none of them answered.
+        """
+        emit("status", {"stage": "comparing", "models": models})
+        runs = compare_models(
+            self.admitted_complete, turn.prompt, models, lambda run: emit("compared", {"run": run.as_dict()}),
+        )
+        turn.compared = [run.as_dict() for run in runs]
+        if not winner_options(turn.compared):
+            exc = RuntimeError("; ".join(f"{run['model']}: {run['error']}" for run in turn.compared))
+            turn.text, turn.degraded = degraded_answer(turn.question, turn.results, exc, history)
+            return
+        turn.text = "\n\n".join(
+            f"#### {run['model']}\n\n{run['text'] if not run['error'] else '_' + run['error'] + '_'}"
+            for run in turn.compared
+        )
+
+    def entity_text(self, entity_answer, question: str, model: str) -> tuple[str, dict | None]:
+        """A short formatting pass over looked-up rows; returns the text and the route taken.
+
+        The rows are already the complete answer, so the plain table is used
+        when the list is long, the model fails or its answer drops a row.
+        """
+        if len(entity_answer.rows) > FORMAT_MAX_ROWS:
+            return entity_answer.markdown(), None
+        prompt = entity_answer.format_prompt(question)
+        decision = choose(question, prompt, override=ENTITY_FORMAT_MODEL if model == AUTO else model)
+        try:
+            routed = self.admitted_routed(prompt, decision)
+        except Exception as exc:
+            return entity_answer.markdown(), {"decision": decision, "error": str(exc)}
+        text = clean_text(routed.text)
+        route = {"decision": decision, "answer": routed}
+        return (text if entity_answer.covered_by(text) else entity_answer.markdown()), route
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("question")
+    parser.add_argument("--model", default=AUTO)
+    parser.add_argument("--depth", choices=["Fixed", "Adaptive", "Rerank"], default="Fixed")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--no-entities", action="store_true", help="Always search, even for list questions")
+    parser.add_argument("--show-prompt", action="store_true")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import command_line_backend
+
+    engine = RagEngine(command_line_backend(args.backend))
+    turn = engine.answer(args.question, settings={
+        "model": args.model, "depth_mode": args.depth, "search_limit": args.limit,
+        "entity_answers": not args.no_entities,
+    })
+    if args.show_prompt and turn.prompt:
+        print(turn.prompt)
+        print("=" * 72)
+    print(turn.response)
+    print("=" * 72)
+    summary = turn.summary()
+    print(f"{summary['answered_from']}, {summary['chunks']} chunks, model {summary['model']}, "
+          f"timings {summary['timings']}")
+
+
+if __name__ == "__main__":
+    main()
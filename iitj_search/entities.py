@@ -0,0 +1,462 @@
+"""Faculty and department tables extracted at ingest, for "list all" questions.
+
+A top-k search cannot answer "List all faculty" or "Which professors work
+in AI? Give their emails" completely: the answer is spread over more chunks
+than fit in a prompt, so it comes back slow and truncated. Instead, each
+ingested file's text (its chunks, overlaps merged) is scanned for faculty
+entries (name, designation, department, research areas, email) and
+department names, which are stored per source file in the entity tables.
+Re-ingesting a file replaces its rows.
+
+``match_enumeration`` recognises enumeration questions (list/show/which
+faculty or departments, optionally "in/working on <topic>"); a question
+that asks anything more, such as who heads a department, is left to
+search. ``lookup_entities`` answers them with one query against the
+entity tables, and the page then only needs a short formatting pass over
+the rows, or none.
+
+Rebuild the tables from the chunk table, or try a question:
+    python -m iitj_search.entities --rebuild
+    python -m iitj_search.entities --ask "List all professors who work in AI/DATA SCIENCE with their email"
+"""
+
+import argparse
+import json
+import re
+import time
+from dataclasses import dataclass, field
+
+from iitj_search import config
+
+FACULTY_COLUMNS = ["NAME", "DESIGNATION", "DEPARTMENT", "RESEARCH_AREAS", "EMAIL",
+                   "FILE_NAME", "SOURCE_URL", "SHORT_DESCRIPTION"]
+DEPARTMENT_COLUMNS = ["NAME", "FILE_NAME", "SOURCE_URL", "SHORT_DESCRIPTION"]
+INSERT_BATCH = 200
+FORMAT_MAX_ROWS = 40  # longer lists skip the model and are shown as a table
+
+NAME = r"[A-Z][a-zA-Z.'-]+(?:\s+[A-Z][a-zA-Z.'-]+){0,3}"
+DESIGNATION = r"(?:(?:Assistant|Associate|Adjunct|Visiting|Distinguished)\s+)?Professor(?:\s+and\s+Head)?"
+EMAIL = r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+# "Dr. Binod Kumar, Assistant Professor, Computer Science and Engineering. Research areas: a, b. Email: x@y"
+FACULTY_ENTRY = re.compile(
+    rf"(?:Dr\.|Prof\.)\s*(?P<name>{NAME}),\s*(?P<designation>{DESIGNATION}),\s*(?P<department>[^.\n]+?)\."
+    rf"(?:\s*Research (?:areas|interests?):\s*(?P<areas>[^.\n]+)\.)?(?:\s*E-?mail:\s*(?P<email>{EMAIL}))?",
+)
+# "Dr. Binod Kumar is an Assistant Professor in the Computer Science and Engineering at IIT Jodhpur. ..."
+FACULTY_PROFILE = re.compile(
+    rf"(?:Dr\.|Prof\.)\s*(?P<name>{NAME}) is an? (?P<designation>{DESIGNATION}) (?:in|at|with) "
+    rf"(?:the )?(?:Department of )?(?P<department>[^.\n]+?)(?: at IIT Jodhpur)?\."
+)
+PROFILE_AREAS = re.compile(r"(?:works on|research (?:areas|interests) (?:are|include)|specializes in)\s+([^.\n]+?)"
+                           r"(?: and leads\b|\.|$)", re.IGNORECASE)
+DEPARTMENT_ITEM = re.compile(r"^\s*[-*•]\s*(?:Department of\s+)?(?P<name>(?:School of\s+)?[A-Z][A-Za-z ,&]+?)\s*$",
+                             re.MULTILINE)
+DEPARTMENTS_HEADING = re.compile(r"\bdepartments?\b(?: and schools)?", re.IGNORECASE)
+EMAIL_PATTERN = re.compile(EMAIL)
+
+# "List all faculty", "Which professors", "What are the departments": an enumeration verb, then the kind.
+ENUMERATION = re.compile(
+    r"^\s*(?:(?:please|kindly|can you|could you)\s+)?"
+    r"(?:list|show(?: me)?|name|enumerate|give(?: me)?|tell me|(?:which|what|who)(?: are)?)\s+"
+    r"(?:(?:a |the )?(?:list|names?) of\s+)?(?:all\s+(?:of\s+)?|every\s+)?(?:the\s+)?"
+    r"(?P<kind>faculty(?: members)?|faculties|professors|profs|teachers|researchers|departments(?: and schools)?|schools)"
+    r"\b(?P<rest>.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+# Plural only: "information about Binod Kumar professor" is about one person.
+FACULTY_WORDS = re.compile(r"\b(?:faculty|faculties|professors|profs|teachers|researchers)\b", re.IGNORECASE)
+INSTITUTE = re.compile(r"\b(?:at|in|of)\s+(?:iit jodhpur|iitj|the institute)\b", re.IGNORECASE)
+# Anything else asked about the people or departments is a question for search.
+PREDICATE_WORDS = re.compile(
+    r"\b(?:who|whom|whose|which|that|heads?|hod|dean|director|chair|leave|teach(?:es|ing)?|taught|courses?|"
+    r"offer(?:s|ed|ing)?|admissions?|fees?|ph\.?d|programs?|programmes?|joined|retired|visiting|how)\b",
+    re.IGNORECASE,
+)
+# A follow-on sentence may only ask for more columns: "Also give their email".
+ATTRIBUTE_WORDS = {
+    "also", "and", "please", "give", "show", "list", "include", "add", "provide", "mention", "me", "their",
+    "the", "its", "with", "along", "email", "emails", "e-mail", "e-mails", "mail", "id", "ids", "address",
+    "addresses", "contact", "contacts", "details", "research", "area", "areas", "interest", "interests",
+    "designation", "designations", "department", "departments", "name", "names",
+}
+TOPIC = re.compile(
+    r"\b(?:who (?:work|works|are working|research)(?: on| in)?|working (?:on|in)|work(?:s|ing)? (?:on|in)|"
+    r"(?:with )?expertise in|expert(?:s)? in|speciali[sz](?:e|es|ing|ed) in|research(?:ing)? (?:on|in)|in|from|of)\s+"
+    r"(?P<topic>[^.?!]+)",
+    re.IGNORECASE,
+)
+TOPIC_NOISE = re.compile(
+    r"\b(?:iit jodhpur|iitj|the institute|along with.*|with their.*|and their.*|also.*|give.*|areas?|department|dept|school)\b",
+    re.IGNORECASE,
+)
+TOPIC_SYNONYMS = {
+    "ai": ["ai", "artificial intelligence", "machine learning", "deep learning", "reinforcement learning",
+           "computer vision", "natural language processing"],
+    "ml": ["machine learning", "deep learning", "reinforcement learning"],
+    "data science": ["data science", "data", "recommender systems"],
+    "cs": ["computer science"],
+}
+
+
+# -- tables -------------------------------------------------------------------
+
+def ensure_entity_tables(backend):
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {config.qualified(config.FACULTY_TABLE)} (
+            NAME VARCHAR, DESIGNATION VARCHAR, DEPARTMENT VARCHAR, RESEARCH_AREAS VARCHAR, EMAIL VARCHAR,
+            FILE_NAME VARCHAR, SOURCE_URL VARCHAR, SHORT_DESCRIPTION VARCHAR,
+            EXTRACTED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """
+    )
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {config.qualified(config.DEPARTMENT_TABLE)} (
+            NAME VARCHAR, FILE_NAME VARCHAR, SOURCE_URL VARCHAR, SHORT_DESCRIPTION VARCHAR,
+            EXTRACTED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """
+    )
+
+
+def _insert(backend, table: str, columns: list[str], rows: list[dict]):
+    for start in range(0, len(rows), INSERT_BATCH):
+        batch = rows[start:start + INSERT_BATCH]
+        backend.sql(
+            f"""
+            INSERT INTO {config.qualified(table)} ({", ".join(columns)})
+            VALUES {", ".join("(" + ", ".join("?" for _ in columns) + ")" for _ in batch)}
+            """,
+            params=[row.get(column) for row in batch for column in columns],
+        )
+
+
+# -- extraction -----------------------------------------------------------------
+
+def merge_chunks(chunks: list[str], max_overlap: int = 400) -> str:
+    """Reassemble a file's text from consecutive, overlapping chunks."""
+    text = ""
+    for chunk in chunks:
+        overlap = 0
+        for size in range(min(len(text), len(chunk), max_overlap), 0, -1):
+            if text.endswith(chunk[:size]):
+                overlap = size
+                break
+        text += chunk[overlap:]
+    return text
+
+
+def _clean(value: str | None) -> str | None:
+    value = " ".join((value or "").split()).strip(" ,;:")
+    return value or None
+
+
+def _department(value: str | None) -> str | None:
+    value = _clean(re.sub(r"^(?:the\s+)?Department of\s+", "", value or "", flags=re.IGNORECASE))
+    return value
+
+
+def _areas(value: str | None) -> str | None:
+    parts = re.split(r",|;|\band\b", value or "")
+    return ", ".join(p for p in (_clean(part) for part in parts) if p) or None
+
+
+def extract_entities(text: str) -> tuple[list[dict], list[dict]]:
+    """(faculty, departments) found in one document's text."""
+    faculty: dict[str, dict] = {}
+
+    def add(name, **fields):
+        entry = faculty.setdefault(name.lower(), {"NAME": name})
+        for key, value in fields.items():
+            if value and not entry.get(key):
+                entry[key] = value
+
+    for match in FACULTY_ENTRY.finditer(text):
+        add(_clean(match["name"]), DESIGNATION=_clean(match["designation"]),
+            DEPARTMENT=_department(match["department"]), RESEARCH_AREAS=_areas(match["areas"]),
+            EMAIL=match["email"])
+    for match in FACULTY_PROFILE.finditer(text):
+        following = text[match.end():match.end() + 600]
+        areas = PROFILE_AREAS.search(following)
+        email = EMAIL_PATTERN.search(following)
+        add(_clean(match["name"]), DESIGNATION=_clean(match["designation"]),
+            DEPARTMENT=_department(match["department"]), RESEARCH_AREAS=_areas(areas.group(1) if areas else None),
+            EMAIL=email.group(0) if email else None)
+
+    departments = []
+    heading = DEPARTMENTS_HEADING.search(text[:300])
+    if heading:
+        # A bulleted list under a "departments" heading.
+        departments = [_department(m["name"]) for m in DEPARTMENT_ITEM.finditer(text)]
+    departments += [entry["DEPARTMENT"] for entry in faculty.values() if entry.get("DEPARTMENT")]
+    return list(faculty.values()), [{"NAME": name} for name in dict.fromkeys(d for d in departments if d)]
+
+
+def extract_with_model(backend, text: str, model: str) -> tuple[list[dict], list[dict]]:
+    """Ask ``model`` for the same entities as JSON, for pages the patterns do not fit."""
+    prompt = (
+        "Extract every faculty member and every department or school mentioned in the document below. "
+        'Reply with JSON only: {"faculty": [{"name": "", "designation": "", "department": "", '
+        '"research_areas": [""], "email": ""}], "departments": [""]}\n\n<document>\n'
+        + text[:20000] + "\n</document>"
+    )
+    try:
+        data = json.loads(re.search(r"\{.*\}", json.loads(backend.complete(model, prompt)), re.DOTALL).group(0))
+    except Exception:
+        return [], []
+    faculty = [
+        {
+            "NAME": _clean(item.get("name")),
+            "DESIGNATION": _clean(item.get("designation")),
+            "DEPARTMENT": _department(item.get("department")),
+            "RESEARCH_AREAS": _areas(", ".join(item.get("research_areas") or [])),
+            "EMAIL": _clean(item.get("email")),
+        }
+        for item in data.get("faculty", []) if isinstance(item, dict) and _clean(item.get("name"))
+    ]
+    departments = [{"NAME": _department(name)} for name in data.get("departments", []) if _department(name)]
+    return faculty, departments
+
+
+def _file_chunks(backend, file_name: str | None = None) -> dict[str, dict]:
+    """file name -> {"text", "SOURCE_URL", "SHORT_DESCRIPTION"} from the chunk table (latest chunk per index)."""
+    where = "WHERE FILE_NAME = ?" if file_name else ""
+    rows = backend.sql(
+        f"""
+        SELECT FILE_NAME, CHUNK_INDEX, CHUNK, SOURCE_URL, SHORT_DESCRIPTION
+        FROM {config.qualified(config.CHUNK_TABLE)} {where}
+        ORDER BY FILE_NAME, CREATED_AT, CHUNK_INDEX
+        """,
+        params=[file_name] if file_name else None,
+    )
+    files: dict[str, dict] = {}
+    for row in rows:
+        entry = files.setdefault(row["FILE_NAME"], {"chunks": {}})
+        entry["chunks"][row["CHUNK_INDEX"]] = row["CHUNK"] or ""
+        entry["SOURCE_URL"] = row["SOURCE_URL"]
+        entry["SHORT_DESCRIPTION"] = row["SHORT_DESCRIPTION"]
+    for entry in files.values():
+        chunks = entry.pop("chunks")
+        entry["text"] = merge_chunks([chunks[idx] for idx in sorted(chunks)])
+    return files
+
+
+def _store(backend, files: dict[str, dict], model: str | None) -> dict:
+    faculty_rows, department_rows = [], []
+    for name, entry in files.items():
+        faculty, departments = extract_entities(entry["text"])
+        if model and not faculty and FACULTY_WORDS.search(entry["text"][:2000]):
+            faculty, departments = extract_with_model(backend, entry["text"], model)
+        source = {"FILE_NAME": name, "SOURCE_URL": entry["SOURCE_URL"], "SHORT_DESCRIPTION": entry["SHORT_DESCRIPTION"]}
+        faculty_rows += [{**row, **source} for row in faculty]
+        department_rows += [{**row, **source} for row in departments]
+    _insert(backend, config.FACULTY_TABLE, FACULTY_COLUMNS, faculty_rows)
+    _insert(backend, config.DEPARTMENT_TABLE, DEPARTMENT_COLUMNS, department_rows)
+    return {"files": len(files), "faculty": len(faculty_rows), "departments": len(department_rows)}
+
+
+def extract_file(backend, file_name: str, model: str | None = None) -> dict:
+    """Replace one file's entity rows after it was (re-)embedded."""
+    ensure_entity_tables(backend)
+    for table in (config.FACULTY_TABLE, config.DEPARTMENT_TABLE):
+        backend.sql(f"DELETE FROM {config.qualified(table)} WHERE FILE_NAME = ?", params=[file_name])
+    return _store(backend, _file_chunks(backend, file_name), model)
+
+
+def rebuild(backend, model: str | None = None) -> dict:
+    """Re-extract the entity tables from the whole chunk table."""
+    ensure_entity_tables(backend)
+    for table in (config.FACULTY_TABLE, config.DEPARTMENT_TABLE):
+        backend.sql(f"DELETE FROM {config.qualified(table)}")
+    return _store(backend, _file_chunks(backend), model)
+
+
+# -- questions ------------------------------------------------------------------
+
+@dataclass
+class EntityQuery:
+    kind: str  # "faculty" or "departments"
+    topic: str | None = None
+    terms: list[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        return self.kind + (f" in {self.topic}" if self.topic else "")
+
+
+def _topic_terms(topic: str) -> list[str]:
+    terms = []
+    for part in re.split(r"/|,|&|\band\b|\bor\b", topic.lower()):
+        part = part.strip()
+        if part:
+            terms += TOPIC_SYNONYMS.get(part, [part])
+    return list(dict.fromkeys(terms))
+
+
+def match_enumeration(question: str) -> EntityQuery | None:
+    """The entity query an enumeration question asks for, or None for anything else.
+
+    Only "list/show/which <faculty or departments>", optionally "in/working
+    on <topic>" and a request for their emails and the like, qualifies. A
+    question that asks more than the tables hold ("Who is the head of...",
+    "Which departments offer...", "...teach the ML course") goes to search.
+    """
+    match = ENUMERATION.match(question)
+    if not match:
+        return None
+    main, *tail = re.split(r"[.?!;]+\s*", INSTITUTE.sub(" ", match["rest"]))
+    if any(set(re.findall(r"[\w-]+", sentence.lower())) - ATTRIBUTE_WORDS for sentence in tail):
+        return None
+    kind = "departments" if match["kind"].lower().startswith(("department", "school")) else "faculty"
+    if not _clean(TOPIC_NOISE.sub(" ", main)):
+        return EntityQuery(kind)
+    topic_match = TOPIC.match(main.strip())
+    if kind == "departments" or not topic_match:
+        return None
+    topic = _clean(re.sub(r"^the\s+", "", TOPIC_NOISE.sub(" ", topic_match["topic"]).strip(), flags=re.IGNORECASE))
+    if not topic:
+        return EntityQuery("faculty")
+    if PREDICATE_WORDS.search(topic):
+        return None
+    return EntityQuery("faculty", topic, _topic_terms(topic))
+
+
+def _matches(terms: list[str], *values) -> bool:
+    text = " ".join(v for v in values if v).lower()
+    return any(re.search(rf"\b{re.escape(term)}\b", text) for term in terms)
+
+
+@dataclass
+class EntityAnswer:
+    query: EntityQuery
+    rows: list[dict]
+    seconds: float
+
+    @property
+    def sources(self) -> list[dict]:
+        seen = {}
+        for row in self.rows:
+            # The first source of each row: the listing page the row was found on, where there is one.
+            for url, title in list(zip(row["SOURCE_URLS"], row["TITLES"]))[:1]:
+                seen.setdefault(url, {"title": title or "Document", "url": url})
+        return list(seen.values())
+
+    def lines(self) -> list[str]:
+        if self.query.kind == "departments":
+            return [row["NAME"] for row in self.rows]
+        return [
+            f"Dr. {row['NAME']}, {row.get('DESIGNATION') or 'Faculty'}, {row.get('DEPARTMENT') or 'IIT Jodhpur'}. "
+            f"Research areas: {row.get('RESEARCH_AREAS') or 'not listed'}. Email: {row.get('EMAIL') or 'not listed'}"
+            for row in self.rows
+        ]
+
+    def markdown(self) -> str:
+        """The whole list, without a model."""
+        if self.query.kind == "departments":
+            return f"IIT Jodhpur has {len(self.rows)} departments and schools:\n\n" + "\n".join(
+                f"- {name}" for name in self.lines()
+            )
+        header = f"{len(self.rows)} faculty members" + (f" in {self.query.topic}" if self.query.topic else "")
+        table = ["| Name | Designation | Department | Research areas | Email |", "|---|---|---|---|---|"]
+        table += [
+            f"| Dr. {row['NAME']} | {row.get('DESIGNATION') or ''} | {row.get('DEPARTMENT') or ''} | "
+            f"{row.get('RESEARCH_AREAS') or ''} | {row.get('EMAIL') or ''} |"
+            for row in self.rows
+        ]
+        return f"{header}:\n\n" + "\n".join(table)
+
+    def format_prompt(self, question: str) -> str:
+        """Prompt for a short formatting pass; the rows are complete, so nothing needs finding."""
+        return (
+            "<instructions>\nThe records below are the complete answer to the question. Present all of them, "
+            "in order, as a concise markdown list or table showing the details the question asks for. "
+            "Do not add, drop or change any record and do not add commentary.\n</instructions>\n\n"
+            "<search_results>\n" + "\n".join(self.lines()) + "\n</search_results>\n\n"
+            f"<question>\n{question}\n</question>"
+        )
+
+    def covered_by(self, text: str) -> bool:
+        """Whether a formatted answer still names every row."""
+        lower = text.lower()
+        return all(row["NAME"].lower() in lower for row in self.rows)
+
+
+def _merge_faculty(rows: list) -> list[dict]:
+    """One entry per person; a listing and a profile page fill in each other's gaps."""
+    people: dict[str, dict] = {}
+    for row in rows:
+        entry = people.setdefault(row["NAME"].lower(), {"NAME": row["NAME"], "SOURCE_URLS": [], "TITLES": []})
+        for column in ("DESIGNATION", "DEPARTMENT", "RESEARCH_AREAS", "EMAIL"):
+            if row[column] and not entry.get(column):
+                entry[column] = row[column]
+        if row["SOURCE_URL"] and row["SOURCE_URL"] not in entry["SOURCE_URLS"]:
+            entry["SOURCE_URLS"].append(row["SOURCE_URL"])
+            entry["TITLES"].append(row["SHORT_DESCRIPTION"])
+    return sorted(people.values(), key=lambda p: ((p.get("DEPARTMENT") or "~"), p["NAME"]))
+
+
+def lookup_entities(backend, question: str) -> EntityAnswer | None:
+    """Answer an enumeration question from the entity tables; None when it is not one or nothing matched."""
+    query = match_enumeration(question)
+    if query is None:
+        return None
+    start = time.perf_counter()
+    try:
+        if query.kind == "departments":
+            rows = backend.sql(
+                f"""
+                SELECT NAME, SOURCE_URL, SHORT_DESCRIPTION
+                FROM {config.qualified(config.DEPARTMENT_TABLE)} ORDER BY NAME
+                """
+            )
+            merged: dict[str, dict] = {}
+            for row in rows:
+                entry = merged.setdefault(row["NAME"].lower(), {"NAME": row["NAME"], "SOURCE_URLS": [], "TITLES": []})
+                if row["SOURCE_URL"] and not entry["SOURCE_URLS"]:
+                    entry["SOURCE_URLS"].append(row["SOURCE_URL"])
+                    entry["TITLES"].append(row["SHORT_DESCRIPTION"])
+            result = list(merged.values())
+        else:
+            rows = backend.sql(
+                f"""
+                SELECT {", ".join(FACULTY_COLUMNS)}
+                FROM {config.qualified(config.FACULTY_TABLE)} ORDER BY FILE_NAME, NAME
+                """
+            )
+            result = _merge_faculty(rows)
+            if query.terms:
+                result = [p for p in result if _matches(query.terms, p.get("RESEARCH_AREAS"), p.get("DEPARTMENT"))]
+    except Exception:
+        return None  # entity tables not built yet: answer with search instead
+    if not result:
+        return None
+    return EntityAnswer(query, result, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="Re-extract the entity tables from the chunk table")
+    parser.add_argument("--model", help="Also ask this model about files the patterns find no faculty in")
+    parser.add_argument("--ask", help="Show how a question would be answered")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import command_line_backend
+
+    backend = command_line_backend(args.backend)
+    if args.rebuild:
+        start = time.perf_counter()
+        counts = rebuild(backend, args.model)
+        print(f"{counts['faculty']} faculty and {counts['departments']} department rows from "
+              f"{counts['files']} files in {time.perf_counter() - start:.1f}s")
+    if args.ask:
+        answer = lookup_entities(backend, args.ask)
+        if answer is None:
+            print(f"not an enumeration question, or no rows match: {match_enumeration(args.ask)}")
+        else:
+            print(f"{answer.query.describe()}: {len(answer.rows)} rows in {answer.seconds * 1000:.1f} ms")
+            print(answer.markdown())
+
+
+if __name__ == "__main__":
+    main()
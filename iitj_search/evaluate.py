@@ -0,0 +1,146 @@
+"""Offline retrieval evaluation on the labelled golden question set.
+
+Runs every golden question through each retrieval mode (fixed limit,
+adaptive score cutoff, over-fetch and rerank) against the local backend
+(synthetic corpus, simulated latency) and compares recall of the expected
+documents in the prompt, MRR, prompt size, latency and whether the answer
+contains the expected facts.
+
+Usage:
+    python -m iitj_search.evaluate --modes fixed adaptive rerank --scale 1000 \\
+        --latency "search=0.2,complete=0.4,complete_per_1k_prompt_tokens=0.8"
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from iitj_search import config
+from iitj_search.backend import LocalBackend, LocalLatency, estimate_tokens
+from iitj_search.depth import adaptive_results
+from iitj_search.local_corpus import build_corpus
+from iitj_search.planner import fan_out_search, plan_queries
+from iitj_search.rag import build_prompt, build_search_context, clean_text, normalize_row
+from iitj_search.rerank import DEFAULT_PROMPT_CHUNKS, candidate_count, rerank_top
+
+GOLDEN_SET = Path(__file__).parent / "data" / "golden_v1.jsonl"
+SEARCH_COLUMNS = ["CHUNK", "SOURCE_URL", "FILE_NAME", "SHORT_DESCRIPTION", "CHUNK_INDEX"]
+MODES = ["fixed", "adaptive", "rerank"]
+
+
+def load_golden_set(path: Path = GOLDEN_SET) -> list[dict]:
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def file_names(results: list[dict]) -> list[str]:
+    return [normalize_row(row).get("FILE_NAME") for row in results]
+
+
+def recall(expected: list[str], retrieved: list[str]) -> float:
+    return len(set(expected) & set(retrieved)) / len(expected) if expected else 1.0
+
+
+def reciprocal_rank(expected: list[str], retrieved: list[str]) -> float:
+    for rank, name in enumerate(retrieved, start=1):
+        if name in expected:
+            return 1.0 / rank
+    return 0.0
+
+
+def retrieve(backend, question: str, mode: str, limit: int, prompt_chunks: int, split: bool) -> list[dict]:
+    """Results that would be sent to build_search_context in the given mode."""
+    def search(query, k):
+        payload = {"query": query, "columns": SEARCH_COLUMNS, "filter": {}, "limit": k}
+        return backend.search(config.qualified(config.SEARCH_SERVICE), payload)
+
+    queries = plan_queries(question) if split else [question]
+    if mode == "fixed":
+        results, _ = fan_out_search(search, queries, limit)
+        return results
+    if mode == "adaptive":
+        results, _ = fan_out_search(search, queries, limit)
+        return adaptive_results(results)[0]
+    if mode == "rerank":
+        candidates, _ = fan_out_search(search, queries, candidate_count(limit))
+        return rerank_top(question, candidates, prompt_chunks)
+    raise ValueError(f"Unknown mode: {mode}")
+
+
+def run_question(backend, item: dict, mode: str, model: str, limit: int, prompt_chunks: int, split: bool) -> dict:
+    start = time.perf_counter()
+    results = retrieve(backend, item["question"], mode, limit, prompt_chunks, split)
+    retrieval_s = time.perf_counter() - start
+
+    prompt = build_prompt(item["question"], build_search_context(results))
+    start = time.perf_counter()
+    answer = clean_text(backend.complete(model, prompt)) or ""
+    generation_s = time.perf_counter() - start
+
+    retrieved = file_names(results)
+    return {
+        "id": item["id"],
+        "chunks": len(results),
+        "recall": recall(item["expected_files"], retrieved),
+        "rr": reciprocal_rank(item["expected_files"], retrieved),
+        "answer_ok": all(fact.lower() in answer.lower() for fact in item.get("answer_contains", [])),
+        "prompt_tokens": estimate_tokens(prompt),
+        "retrieval_s": retrieval_s,
+        "generation_s": generation_s,
+    }
+
+
+def summarize(mode: str, rows: list[dict]) -> dict:
+    return {
+        "mode": mode,
+        "chunks": statistics.mean(r["chunks"] for r in rows),
+        "recall": statistics.mean(r["recall"] for r in rows),
+        "mrr": statistics.mean(r["rr"] for r in rows),
+        "answer_ok": statistics.mean(1.0 if r["answer_ok"] else 0.0 for r in rows),
+        "prompt_tokens": statistics.mean(r["prompt_tokens"] for r in rows),
+        "retrieval_s": statistics.mean(r["retrieval_s"] for r in rows),
+        "generation_s": statistics.mean(r["generation_s"] for r in rows),
+    }
+
+
+def print_table(summaries: list[dict]):
+    print(f"{'mode':<10} {'chunks':>6} {'recall':>7} {'MRR':>6} {'answer':>7} {'prompt tok':>10} {'search s':>9} {'generate s':>10}")
+    for s in summaries:
+        print(
+            f"{s['mode']:<10} {s['chunks']:>6.1f} {s['recall']:>7.2f} {s['mrr']:>6.2f} {s['answer_ok']:>7.2f} "
+            f"{s['prompt_tokens']:>10.0f} {s['retrieval_s']:>9.3f} {s['generation_s']:>10.3f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--golden", type=Path, default=GOLDEN_SET)
+    parser.add_argument("--scale", type=int, default=1000, help="Generated filler documents in the local corpus")
+    parser.add_argument("--latency", default="search=0.1,complete=0.3,complete_per_1k_prompt_tokens=0.6",
+                        help="LocalLatency settings, e.g. 'search=0.2,complete=0.5'")
+    parser.add_argument("--limit", type=int, default=10, help="Results slider value")
+    parser.add_argument("--prompt-chunks", type=int, default=DEFAULT_PROMPT_CHUNKS)
+    parser.add_argument("--model", default="claude-sonnet-4-6")
+    parser.add_argument("--no-split", action="store_true", help="Disable compound-question fan-out")
+    args = parser.parse_args(argv)
+
+    backend = LocalBackend(latency=LocalLatency.parse(args.latency))
+    backend.load_corpus(build_corpus(args.scale))
+    golden = load_golden_set(args.golden)
+
+    summaries = []
+    for mode in args.modes:
+        rows = [
+            run_question(backend, item, mode, args.model, args.limit, args.prompt_chunks, not args.no_split)
+            for item in golden
+        ]
+        summaries.append(summarize(mode, rows))
+    print(f"{len(golden)} questions, corpus scale {args.scale}")
+    print_table(summaries)
+
+
+if __name__ == "__main__":
+    main()
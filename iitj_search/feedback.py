@@ -0,0 +1,315 @@
+"""Asynchronous, batched feedback writes with a local disk spool.
+
+Submitting feedback only enqueues a record; a background writer thread
+inserts queued records in multi-row batches once ``batch_size`` records are
+waiting or ``flush_interval`` seconds have passed. The queue is bounded: when
+it is full, records go straight to the spool instead of blocking the page.
+
+Delivery is at least once. A record leaves memory only after its INSERT
+succeeded or after it was appended (and fsynced) to the spool; when the
+warehouse is unreachable the batch is spooled and replayed every
+``retry_interval`` seconds, and a spool file is deleted only after all of
+its records were inserted. A replay interrupted mid-file inserts some
+records twice, so each row carries a FEEDBACK_UUID to deduplicate on. On
+interpreter exit whatever is still queued is spooled; only a hard kill loses
+the (at most one flush interval of) records still in memory.
+
+Show the spool, or replay it by hand after the app was down during an outage:
+    python -m iitj_search.feedback
+    python -m iitj_search.feedback --replay
+"""
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from iitj_search import config
+
+SPOOL_DIR = Path(os.environ.get("IITJ_FEEDBACK_SPOOL", Path.home() / ".cache" / "iitj_search" / "feedback_spool"))
+MAX_QUEUE = 1000
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 2.0  # seconds
+RETRY_INTERVAL = 30.0  # seconds between spool replays while the warehouse is failing
+COLUMNS = ["FEEDBACK_UUID", "HISTORY_OF_CHAT", "MORE_INFORMATION", "RATING", "FEEDBACK_GIVEN_ON",
+           "PREFERRED_MODEL", "COMPARED_MODELS"]
+
+
+def ensure_feedback_table(backend):
+    """Create the feedback table, adding the columns older tables lack."""
+    table = config.qualified(config.FEEDBACK_TABLE)
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            FEEDBACK_ID NUMBER AUTOINCREMENT,
+            FEEDBACK_UUID VARCHAR,
+            HISTORY_OF_CHAT VARCHAR,
+            MORE_INFORMATION VARCHAR,
+            RATING NUMBER,
+            FEEDBACK_GIVEN_ON TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """
+    )
+    backend.sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS FEEDBACK_UUID VARCHAR")
+    backend.sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS RATING NUMBER")
+    # Compare-mode turns: the model the user preferred and every model's latency and tokens.
+    backend.sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS PREFERRED_MODEL VARCHAR")
+    backend.sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS COMPARED_MODELS VARCHAR")
+
+
+def feedback_record(history: str | None, details: str | None, rating: int | None,
+                    preferred_model: str | None = None, compared: list[dict] | None = None) -> dict:
+    """One feedback row; ``rating`` is 1-5 stars or None.
+
+    For a compare-mode turn, ``preferred_model`` is the winning model and
+    ``compared`` the per-model runs (model, seconds, tokens, error).
+    """
+    return {
+        "feedback_uuid": str(uuid.uuid4()),
+        "history": history,
+        "details": details,
+        "rating": rating,
+        # Stamped at submit time, since the row is inserted later; UTC with its offset,
+        # converted to the session's time zone on insert (see insert_feedback).
+        "given_on": datetime.now(timezone.utc).isoformat(sep=" ", timespec="seconds"),
+        "preferred_model": preferred_model,
+        "compared": compared,
+    }
+
+
+def _utc_stamp(given_on: str) -> str:
+    # Records spooled before the offset was stamped hold naive UTC.
+    return given_on if given_on.endswith("+00:00") else f"{given_on}+00:00"
+
+
+def insert_feedback(backend, records: list[dict], batch_size: int = BATCH_SIZE):
+    """Insert feedback records in multi-row batches.
+
+    FEEDBACK_GIVEN_ON is a TIMESTAMP_NTZ whose default, CURRENT_TIMESTAMP(),
+    is the session's local time, so the UTC stamp is converted to the session
+    time zone the same way before it loses its offset.
+    """
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        backend.sql(
+            f"""
+            INSERT INTO {config.qualified(config.FEEDBACK_TABLE)}
+            ({", ".join(COLUMNS)})
+            VALUES {", ".join("(?, ?, ?, ?, TO_TIMESTAMP_LTZ(?)::TIMESTAMP_NTZ, ?, ?)" for _ in batch)}
+            """,
+            params=[
+                value
+                for r in batch
+                for value in (
+                    r["feedback_uuid"], r["history"], r["details"], r["rating"], _utc_stamp(r["given_on"]),
+                    # Records spooled before compare mode lack these.
+                    r.get("preferred_model"), json.dumps(r["compared"]) if r.get("compared") else None,
+                )
+            ],
+        )
+
+
+class FeedbackWriter:
+    """Bounded in-process queue drained by one background thread."""
+
+    def __init__(self, spool_dir: Path = SPOOL_DIR, max_queue: int = MAX_QUEUE, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, retry_interval: float = RETRY_INTERVAL):
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.counts = Counter()
+        self.last_error = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spool_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._backend = None
+        self._next_replay = 0.0
+
+    # -- producer side ------------------------------------------------------
+
+    def submit(self, backend, record: dict):
+        """Queue a record without touching the warehouse."""
+        # The most recent backend writes every batch; all sessions share one warehouse.
+        self._backend = backend
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+            self.counts["queued"] += 1
+        except queue.Full:
+            self._spool([record])
+            self.counts["spooled_queue_full"] += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="iitj-feedback-writer", daemon=True)
+                self._thread.start()
+
+    # -- writer thread ------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            if time.monotonic() >= self._next_replay and self.spool_files():
+                self.replay_spool()
+
+    def _take_batch(self) -> list[dict]:
+        """Wait for a record, then collect until the batch is full or the interval is up."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[dict]):
+        try:
+            insert_feedback(self._backend, batch, self.batch_size)
+            self.counts["written"] += len(batch)
+            self.last_error = None
+        except Exception as exc:
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            self._spool(batch)
+            self.counts["spooled_on_error"] += len(batch)
+            self._next_replay = time.monotonic() + self.retry_interval
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    # -- spool --------------------------------------------------------------
+
+    def _spool(self, records: list[dict]):
+        with self._spool_lock:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.spool_dir / "pending.jsonl", "a", encoding="utf-8") as handle:
+                for record in records:
+                    handle.write(json.dumps(record) + "\n")
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def spool_files(self) -> list[Path]:
+        if not self.spool_dir.exists():
+            return []
+        return sorted(self.spool_dir.glob("*.jsonl"))
+
+    def replay_spool(self, backend=None) -> int:
+        """Insert spooled records; returns how many were written.
+
+        ``pending.jsonl`` is renamed first so records spooled meanwhile go to
+        a fresh file. A file is deleted only once all its records are in.
+        """
+        backend = backend or self._backend
+        with self._spool_lock:
+            pending = self.spool_dir / "pending.jsonl"
+            if pending.exists():
+                pending.rename(self.spool_dir / f"replay-{time.time_ns()}.jsonl")
+        written = 0
+        for path in self.spool_files():
+            if path.name == "pending.jsonl":
+                continue
+            records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+            try:
+                insert_feedback(backend, records, self.batch_size)
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                self._next_replay = time.monotonic() + self.retry_interval
+                break
+            path.unlink()
+            written += len(records)
+            self.counts["replayed"] += len(records)
+        return written
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued record was written or spooled."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def close(self, timeout: float = 5.0):
+        """Stop the thread and spool whatever is still queued."""
+        self.flush(timeout)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + timeout)
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        if leftover:
+            self._spool(leftover)
+            self.counts["spooled_on_exit"] += len(leftover)
+
+    def status(self) -> dict:
+        return {
+            **self.counts,
+            "in_queue": self._queue.qsize(),
+            "spool_files": len(self.spool_files()),
+            "last_error": self.last_error,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def shared_writer() -> FeedbackWriter:
+    """Process-wide writer, spooled to disk on interpreter exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = FeedbackWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replay", action="store_true", help="Insert spooled feedback into the feedback table")
+    parser.add_argument("--spool-dir", type=Path, default=SPOOL_DIR)
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    writer = FeedbackWriter(spool_dir=args.spool_dir)
+    files = writer.spool_files()
+    pending = sum(len(path.read_text(encoding="utf-8").splitlines()) for path in files)
+    print(f"{len(files)} spool file(s), {pending} record(s) in {writer.spool_dir}")
+    if args.replay and files:
+        from iitj_search.backend import command_line_backend
+
+        backend = command_line_backend(args.backend)
+        ensure_feedback_table(backend)
+        written = writer.replay_spool(backend)
+        print(f"replayed {written} record(s)" + (f"; stopped: {writer.last_error}" if writer.last_error else ""))
+        return 1 if writer.last_error else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
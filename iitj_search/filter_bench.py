@@ -0,0 +1,97 @@
+"""Benchmark filtered against unfiltered search at growing corpus sizes.
+
+Loads the synthetic corpus into the local backend at each scale and runs the
+same queries with no filter and with each filter, reporting search latency,
+hits and how many chunks the filter leaves as candidates.
+
+Usage:
+    python -m iitj_search.filter_bench --scales 1000 10000 50000
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date
+
+from iitj_search import config
+from iitj_search.backend import LocalBackend, filter_doc_ids
+from iitj_search.evaluate import SEARCH_COLUMNS
+from iitj_search.filters import SearchFilters, to_cortex_filter
+from iitj_search.loadtest import percentile
+from iitj_search.local_corpus import build_corpus
+
+QUERIES = [
+    "workshop on deep learning",
+    "scholarship notice",
+    "faculty working on computer vision",
+    "examination schedule for mechanical engineering",
+    "guest lecture robotics",
+]
+FILTERS = {
+    "none": SearchFilters(),
+    "type=html": SearchFilters(file_types=["html"]),
+    "uploader": SearchFilters(uploaded_by="registrar@iitj.ac.in"),
+    "last 90 days": SearchFilters(uploaded_after=date(2025, 10, 3)),
+    "domain": SearchFilters(source_domain="old.iitj.ac.in"),
+    "type+range": SearchFilters(
+        file_types=["pdf", "docx"], uploaded_after=date(2024, 6, 1), uploaded_before=date(2024, 12, 31)
+    ),
+}
+
+
+def bench_filter(backend, search_filter: dict, limit: int, repeats: int) -> dict:
+    service = config.qualified(config.SEARCH_SERVICE)
+    timings, hits = [], []
+    for _ in range(repeats):
+        for query in QUERIES:
+            payload = {"query": query, "columns": SEARCH_COLUMNS, "filter": search_filter, "limit": limit}
+            start = time.perf_counter()
+            results = backend.search(service, payload)
+            timings.append(time.perf_counter() - start)
+            hits.append(len(results))
+    return {
+        "p50_ms": 1000 * statistics.median(timings),
+        "p95_ms": 1000 * percentile(timings, 95),
+        "hits": statistics.mean(hits),
+    }
+
+
+def run_scale(scale: int, limit: int, repeats: int) -> list[dict]:
+    backend = LocalBackend()
+    backend.load_corpus(build_corpus(scale))
+    index = backend._search_index()  # built once up front so the first query is not charged for it
+    total = len(index["rows"])
+    rows = []
+    for name, filters in FILTERS.items():
+        search_filter = to_cortex_filter(filters)
+        candidates = filter_doc_ids(search_filter, index)
+        rows.append({
+            "scale": scale,
+            "filter": name,
+            "candidates": total if candidates is None else len(candidates),
+            "chunks": total,
+            **bench_filter(backend, search_filter, limit, repeats),
+        })
+    return rows
+
+
+def print_table(rows: list[dict]):
+    print(f"{'scale':>7} {'filter':<13} {'candidates':>15} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in rows:
+        share = f"{r['candidates']}/{r['chunks']}"
+        print(f"{r['scale']:>7} {r['filter']:<13} {share:>15} {r['hits']:>5.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Generated filler documents per run")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print_table([row for scale in args.scales for row in run_scale(scale, args.limit, args.repeats)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Metadata filters pushed down to Cortex Search.
+
+Filters on FILE_TYPE, UPLOADED_BY, UPLOAD_TIMESTAMP ranges and SOURCE_DOMAIN
+come from sidebar controls or are parsed from the question, and are sent as
+the SEARCH_PREVIEW ``filter`` expression so the service narrows the candidate
+set before ranking. The columns must be ATTRIBUTES of the search service.
+"""
+
+import re
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse
+
+from iitj_search.config import ALLOWED_EXTENSIONS
+
+FILTER_COLUMNS = ["FILE_TYPE", "UPLOADED_BY", "UPLOAD_TIMESTAMP", "SOURCE_DOMAIN"]
+RECENT_DAYS = 90
+
+
+@dataclass
+class SearchFilters:
+    file_types: list[str] = field(default_factory=list)
+    uploaded_by: str | None = None
+    uploaded_after: date | None = None
+    uploaded_before: date | None = None
+    source_domain: str | None = None
+
+    def is_empty(self) -> bool:
+        return not (self.file_types or self.uploaded_by or self.uploaded_after
+                    or self.uploaded_before or self.source_domain)
+
+    def describe(self) -> str:
+        parts = []
+        if self.file_types:
+            parts.append("type " + "/".join(self.file_types))
+        if self.uploaded_by:
+            parts.append(f"uploaded by {self.uploaded_by}")
+        if self.uploaded_after:
+            parts.append(f"after {self.uploaded_after.isoformat()}")
+        if self.uploaded_before:
+            parts.append(f"before {self.uploaded_before.isoformat()}")
+        if self.source_domain:
+            parts.append(f"from {self.source_domain}")
+        return ", ".join(parts)
+
+
+def source_domain(url: str | None) -> str | None:
+    """Host of a source URL without a leading 'www.'."""
+    if not url:
+        return None
+    host = urlparse(url if "//" in url else f"//{url}").netloc.lower()
+    return host[4:] if host.startswith("www.") else host or None
+
+
+def to_cortex_filter(filters: SearchFilters | None, available_columns: list[str] | None = None) -> dict:
+    """SEARCH_PREVIEW filter expression; conditions on columns the service lacks are dropped."""
+    if filters is None or filters.is_empty():
+        return {}
+
+    def usable(column):
+        return available_columns is None or column in available_columns
+
+    clauses = []
+    if filters.file_types and usable("FILE_TYPE"):
+        type_clauses = [{"@eq": {"FILE_TYPE": ext}} for ext in filters.file_types]
+        clauses.append(type_clauses[0] if len(type_clauses) == 1 else {"@or": type_clauses})
+    if filters.uploaded_by and usable("UPLOADED_BY"):
+        clauses.append({"@eq": {"UPLOADED_BY": filters.uploaded_by}})
+    if filters.uploaded_after and usable("UPLOAD_TIMESTAMP"):
+        clauses.append({"@gte": {"UPLOAD_TIMESTAMP": filters.uploaded_after.isoformat()}})
+    if filters.uploaded_before and usable("UPLOAD_TIMESTAMP"):
+        clauses.append({"@lte": {"UPLOAD_TIMESTAMP": filters.uploaded_before.isoformat()}})
+    if filters.source_domain and usable("SOURCE_DOMAIN"):
+        clauses.append({"@eq": {"SOURCE_DOMAIN": filters.source_domain}})
+
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"@and": clauses}
+
+
+TYPE_WORDS = {
+    "pdf": "pdf", "pdfs": "pdf", "word": "docx", "docx": "docx", "powerpoint": "pptx",
+    "pptx": "pptx", "slides": "pptx", "html": "html", "webpage": "html", "webpages": "html",
+    "text": "txt", "txt": "txt", "image": None, "images": None,
+}
+IMAGE_TYPES = ["jpeg", "jpg", "png", "tiff", "tif"]
+TYPE_PATTERN = re.compile(
+    r"\b(?:in|from|only|among|as)?\s*(?:the\s+)?(" + "|".join(TYPE_WORDS) + r")\s+(?:files?|documents?|docs|pages?)\b",
+    re.IGNORECASE,
+)
+UPLOADER_PATTERN = re.compile(r"\buploaded by\s+([\w.+-]+@[\w.-]+\.\w+)", re.IGNORECASE)
+DOMAIN_PATTERN = re.compile(r"\b(?:from|on|at)\s+((?:https?://)?(?:[\w-]+\.)+(?:ac\.in|in|com|org|edu))\b", re.IGNORECASE)
+# Upload-date bounds need "uploaded", so "admissions in 2025" or "papers published in 2023"
+# stay content queries.
+UPLOAD_DATE_PATTERN = re.compile(
+    r"\buploaded\s+(since|after|before|in|during)\s+(\d{4}(?:-\d{2}-\d{2})?)\b",
+    re.IGNORECASE,
+)
+LAST_PATTERN = re.compile(
+    r"\buploaded\s+(?:in\s+|during\s+|within\s+)?(?:the\s+)?(?:last|past)\s+(\d+)\s+(day|week|month|year)s?\b",
+    re.IGNORECASE,
+)
+# Not a bare "latest" or "recent": "the latest notices" asks for notices, whenever uploaded.
+RECENT_PATTERN = re.compile(r"\b(?:recently uploaded|uploaded recently)\b", re.IGNORECASE)
+
+
+def _parse_date(text: str, end: bool = False) -> date:
+    if len(text) == 4:
+        return date(int(text), 12, 31) if end else date(int(text), 1, 1)
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def parse_filters(question: str, today: date | None = None) -> tuple[SearchFilters, str]:
+    """Filters mentioned in the question, and the question with those phrases removed."""
+    today = today or date.today()
+    filters = SearchFilters()
+    text = question
+
+    def strip(match):
+        nonlocal text
+        text = text.replace(match.group(0), " ", 1)
+
+    for match in TYPE_PATTERN.finditer(question):
+        ext = TYPE_WORDS[match.group(1).lower()]
+        for value in ([ext] if ext else IMAGE_TYPES):
+            if value in ALLOWED_EXTENSIONS and value not in filters.file_types:
+                filters.file_types.append(value)
+        strip(match)
+
+    if match := UPLOADER_PATTERN.search(question):
+        filters.uploaded_by = match.group(1).lower()
+        strip(match)
+    if match := DOMAIN_PATTERN.search(question):
+        filters.source_domain = source_domain(match.group(1))
+        strip(match)
+    for match in UPLOAD_DATE_PATTERN.finditer(question):
+        keyword, value = match.group(1).lower(), match.group(2)
+        if keyword in ("since", "after", "in", "during"):
+            filters.uploaded_after = _parse_date(value)
+        if keyword in ("before", "in", "during"):
+            filters.uploaded_before = _parse_date(value, end=True)
+        strip(match)
+    if filters.uploaded_after is None:
+        if match := LAST_PATTERN.search(question):
+            days = {"day": 1, "week": 7, "month": 30, "year": 365}[match.group(2).lower()]
+            filters.uploaded_after = today - timedelta(days=int(match.group(1)) * days)
+            strip(match)
+        elif match := RECENT_PATTERN.search(question):
+            filters.uploaded_after = today - timedelta(days=RECENT_DAYS)
+            strip(match)
+
+    return filters, " ".join(text.split())
+
+
+def combine(sidebar: SearchFilters, parsed: SearchFilters) -> SearchFilters:
+    """Sidebar settings win; parsed values fill whatever the sidebar leaves unset."""
+    return replace(
+        sidebar,
+        file_types=sidebar.file_types or parsed.file_types,
+        uploaded_by=sidebar.uploaded_by or parsed.uploaded_by,
+        uploaded_after=sidebar.uploaded_after or parsed.uploaded_after,
+        uploaded_before=sidebar.uploaded_before or parsed.uploaded_before,
+        source_domain=sidebar.source_domain or parsed.source_domain,
+    )
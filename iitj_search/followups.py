@@ -0,0 +1,276 @@
+"""Follow-up question chips for each answer, with their searches prefetched.
+
+After an answer the next question is often predictable: the email of the
+professor just named, the other faculty of that department, another of the
+documents the search found. ``suggest_followups`` builds a few such
+questions from the turn's retrieved chunks with the entity patterns of
+entities.py (no model call), and the search page shows them as chips under
+the answer.
+
+``Prefetcher`` runs each chip's search (``RagEngine.run_search``, i.e. its
+SEARCH_PREVIEW calls) on a small background pool under
+``admission.low_priority``. A prefetch takes only spare search slots and is
+dropped when there are none, so it never delays a user. When the chip is
+clicked, or the same question is typed with the same search settings, the
+turn uses the prefetched results and skips retrieval. If the prefetch is
+still running, the turn waits for it instead of searching again. Prefetches
+are kept for PREFETCH_TTL seconds. Those never used count as wasted, along
+with the warehouse seconds of their search calls and an estimate of the
+credits (IITJ_WAREHOUSE_CREDITS_PER_HOUR, default 1 for an X-Small
+warehouse).
+
+Suggest follow-ups for a question and compare a prefetched and a fresh search:
+    python -m iitj_search.followups "Who is Binod Kumar?"
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from iitj_search.admission import low_priority
+from iitj_search.autocomplete import TEMPLATES, normalize
+from iitj_search.engine import SEARCH_SETTINGS
+from iitj_search.entities import extract_entities, match_enumeration
+from iitj_search.rag import is_result_relevant_to_question, is_searchable_question, normalize_row
+
+MAX_FOLLOWUPS = 3
+PREFETCH_WORKERS = 2
+PREFETCH_TTL = 300.0  # seconds an unused prefetch is kept
+MAX_PREFETCHES = 200
+CREDITS_PER_HOUR = float(os.environ.get("IITJ_WAREHOUSE_CREDITS_PER_HOUR") or 1)
+RESEARCH_WORDS = re.compile(r"\b(?:research|areas?|works? on|interests?)\b", re.IGNORECASE)
+
+
+# -- suggestions ------------------------------------------------------------------
+
+def _department_question(name: str) -> str:
+    text = TEMPLATES["department"].format(name)
+    return text.removesuffix(" department") if name.lower().startswith("school") else text
+
+
+def suggest_followups(question: str, answer: str, results: list[dict], asked=(),
+                      limit: int = MAX_FOLLOWUPS) -> list[str]:
+    """Likely next questions after ``answer``, built from the turn's search results.
+
+    Skips the question itself and anything in ``asked`` (the session's
+    earlier questions).
+    """
+    rows = [normalize_row(row) for row in results]
+    faculty, departments = extract_entities("\n".join(row.get("CHUNK") or "" for row in rows))
+    context = f"{question}\n{answer}".lower()
+    # The people the question or the answer names come first.
+    faculty.sort(key=lambda person: person["NAME"].lower() not in context)
+
+    candidates = []
+    if faculty:
+        person = faculty[0]
+        if person.get("EMAIL") and person["EMAIL"].lower() not in context:
+            candidates.append(f"What is the email of Dr. {person['NAME']}?")
+        if person.get("RESEARCH_AREAS") and not RESEARCH_WORDS.search(question):
+            candidates.append(f"What are the research areas of Dr. {person['NAME']}?")
+        if person.get("DEPARTMENT"):
+            departments.insert(0, {"NAME": person["DEPARTMENT"]})
+    candidates += [_department_question(department["NAME"]) for department in departments[:1]]
+    # Not the asked-about person's own profile page again.
+    named = [person["NAME"].lower() for person in faculty if person["NAME"].lower() in question.lower()]
+    for row in filter(lambda row: is_result_relevant_to_question(question, row), rows):
+        title = row.get("SHORT_DESCRIPTION") or row.get("FILE_NAME")
+        if title and title.lower() not in context and not any(name in title.lower() for name in named):
+            candidates.append(TEMPLATES["document"].format(title))
+
+    seen = {normalize(text) for text in (question, *asked)}
+    followups = []
+    for text in candidates:
+        if normalize(text) in seen:
+            continue
+        seen.add(normalize(text))
+        followups.append(text)
+        if len(followups) >= limit:
+            break
+    return followups
+
+
+def will_search(question: str, entity_answers: bool = True) -> bool:
+    """Whether the page would search for ``question`` (enumerations come from the entity tables)."""
+    return is_searchable_question(question) and not (entity_answers and match_enumeration(question))
+
+
+# -- prefetch -------------------------------------------------------------------
+
+@dataclass
+class Prefetch:
+    question: str
+    started: float  # time.monotonic()
+    future: Future | None = None
+    trace: dict = field(default_factory=dict)
+    search_s: float = 0.0  # warehouse seconds of its search calls
+
+
+def _search_seconds(trace: dict) -> float:
+    calls = (trace.get("last_search_shards") or {}).get("calls") or []
+    return sum(call["seconds"] or 0.0 for call in calls)
+
+
+def _backend_key(backend):
+    # Every Snowpark session sees the same search services; each local backend is its own.
+    return backend.name if backend.name == "snowflake" else backend
+
+
+class Prefetcher:
+    """Low-priority searches for likely next questions, shared by every session."""
+
+    def __init__(self, workers: int = PREFETCH_WORKERS, ttl: float = PREFETCH_TTL,
+                 max_entries: int = MAX_PREFETCHES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="iitj-prefetch")
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, Prefetch] = OrderedDict()
+        self.counts = Counter()
+        self.seconds = Counter()
+
+    @staticmethod
+    def key(engine, question: str, settings: dict) -> tuple:
+        # Only what the search reads: the model or compare mode may change between turns.
+        return _backend_key(engine.backend), normalize(question), repr([settings.get(name) for name in SEARCH_SETTINGS])
+
+    def _discard(self, entry: Prefetch):
+        """Count an entry leaving the cache unused (lock held)."""
+        if entry.future.done() and entry.future.result() is not None:
+            self.counts["wasted"] += 1
+            self.seconds["wasted_search"] += entry.search_s
+
+    def _sweep(self):
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if now - entry.started > self.ttl or len(self._entries) > self.max_entries:
+                del self._entries[key]
+                self._discard(entry)
+
+    def prefetch(self, engine, question: str, settings: dict) -> bool:
+        """Start searching for ``question`` in the background; False when already cached."""
+        key = self.key(engine, question, settings)
+        with self._lock:
+            self._sweep()
+            if key in self._entries:
+                return False
+            entry = Prefetch(question, time.monotonic())
+            self._entries[key] = entry
+            self.counts["started"] += 1
+            # Not submit_in_context: the prefetch belongs to no turn, so a new turn does not cancel it.
+            entry.future = self._pool.submit(self._run, engine, question, dict(settings), key, entry)
+        return True
+
+    def _run(self, engine, question: str, settings: dict, key: tuple, entry: Prefetch) -> list[dict] | None:
+        """The prefetched results, or None when the search was turned away or failed."""
+        results, outcome = None, "prefetched"
+        with low_priority() as work:
+            try:
+                results = list(engine.run_search(question, settings, entry.trace) or [])
+            except Exception:
+                outcome = "failed"
+        entry.search_s = _search_seconds(entry.trace)
+        if work.busy:
+            # Some calls found no spare slot; partial results would cost the turn recall.
+            results, outcome = None, "busy"
+        with self._lock:
+            self.counts[outcome] += 1
+            self.seconds["search"] += entry.search_s
+            if results is None:
+                self.seconds["wasted_search"] += entry.search_s
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        return results
+
+    def take(self, engine, question: str, settings: dict) -> Prefetch | None:
+        """Remove and return the prefetch for ``question`` with these settings, if any."""
+        with self._lock:
+            self._sweep()
+            return self._entries.pop(self.key(engine, question, settings), None)
+
+    def search(self, engine, question: str, settings: dict, trace: dict) -> list[dict]:
+        """``engine.run_search``, answered from a prefetch when there is one."""
+        trace["last_prefetch"] = None
+        entry = self.take(engine, question, settings)
+        if entry is not None:
+            waiting = not entry.future.done()
+            start = time.perf_counter()
+            results = entry.future.result()
+            if results is not None:
+                with self._lock:
+                    self.counts["hits"] += 1
+                    self.counts["hits_waiting"] += waiting
+                trace.update(entry.trace)
+                trace["last_prefetch"] = {
+                    "waited_s": round(time.perf_counter() - start, 3),
+                    "search_s": round(entry.search_s, 3),
+                }
+                return list(results)
+        return engine.run_search(question, settings, trace)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._sweep()
+            hits, wasted = self.counts["hits"], self.counts["wasted"]
+            return {
+                **{name: self.counts[name] for name in
+                   ("started", "prefetched", "busy", "failed", "hits", "hits_waiting", "wasted")},
+                "pending": len(self._entries),
+                "hit_rate": round(hits / (hits + wasted), 3) if hits + wasted else None,
+                "search_s": round(self.seconds["search"], 2),
+                "wasted_search_s": round(self.seconds["wasted_search"], 2),
+                # An upper bound: the warehouse is billed while running, whoever keeps it busy.
+                "wasted_credits_estimate": round(self.seconds["wasted_search"] * CREDITS_PER_HOUR / 3600, 5),
+            }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def shared_prefetcher() -> Prefetcher:
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("question")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import command_line_backend
+    from iitj_search.engine import DEFAULT_SETTINGS, RagEngine
+
+    engine = RagEngine(command_line_backend(args.backend))
+    settings = dict(DEFAULT_SETTINGS)
+    turn = engine.answer(args.question, settings=settings)
+    followups = suggest_followups(args.question, turn.text, turn.results)
+    print(f"follow-ups for {args.question!r}:")
+    for text in followups:
+        print(f"  - {text}" + ("" if will_search(text) else "  (entity tables, not prefetched)"))
+
+    prefetcher = shared_prefetcher()
+    searched = [text for text in followups if will_search(text)]
+    for text in searched:
+        prefetcher.prefetch(engine, text, settings)
+    for text in searched:
+        start = time.perf_counter()
+        engine.run_search(text, settings, {})
+        fresh = time.perf_counter() - start
+        start = time.perf_counter()
+        prefetcher.search(engine, text, settings, {})
+        print(f"{text}: fresh search {fresh:.3f}s, from prefetch {time.perf_counter() - start:.3f}s")
+    print(prefetcher.snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""Headless bulk ingestion for large document drops.
+
+Uploads a directory tree or the files listed in a manifest CSV with the same
+validation and metadata as the Curate page: parallel stage PUTs, batched
+metadata INSERTs, and embedding (then entity extraction, see entities.py, and
+shard assignment, see shards.py) queued on its own bounded pool so it
+overlaps the next batch's uploads. Re-running the same command resumes:
+files already staged with the same MD5 skip the PUT, registered files skip
+the INSERT and embedded files skip the procedure.
+
+Manifest CSV columns: ``path`` (required), ``source_url`` (required),
+``description`` and ``file_name`` (optional).
+
+Usage:
+    python -m iitj_search.ingest --dir ./cse_pdfs --base-url https://www.iitj.ac.in/cse/docs \\
+        --uploaded-by office_cse@iitj.ac.in --dry-run
+    python -m iitj_search.ingest --manifest drop.csv --uploaded-by registrar@iitj.ac.in \\
+        --put-concurrency 8 --embed-concurrency 2
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from iitj_search import config
+from iitj_search.backend import command_line_backend
+from iitj_search.backfill import list_chunk_files, list_metadata, list_stage, reembed
+from iitj_search.entities import extract_file
+from iitj_search.shards import assign_file
+
+ALLOWED_EXTENSIONS_DISPLAY = ", ".join(ext.upper() for ext in config.ALLOWED_EXTENSIONS)
+INSERT_BATCH = 100
+
+
+def file_extension(name: str) -> str:
+    return Path(name).suffix.lstrip(".").lower()
+
+
+def validate_file(name: str, source_url: str) -> list[str]:
+    """Curate-page checks for one file: supported type and a source URL."""
+    errors = []
+    ext = file_extension(name)
+    if ext not in config.ALLOWED_EXTENSIONS:
+        errors.append(f"Unsupported file type '.{ext}'. Supported types: {ALLOWED_EXTENSIONS_DISPLAY}")
+    if not (source_url or "").strip():
+        errors.append("Source URL is required")
+    return errors
+
+
+def ensure_stage_and_table(backend):
+    backend.sql(
+        f"""
+        CREATE STAGE IF NOT EXISTS {config.STAGE}
+        ENCRYPTION = ( TYPE = 'SNOWFLAKE_SSE' )
+        DIRECTORY = ( ENABLE = true )
+        """
+    )
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {config.qualified(config.METADATA_TABLE)} (
+            DOC_ID NUMBER AUTOINCREMENT,
+            FILE_NAME VARCHAR,
+            SHORT_DESCRIPTION VARCHAR,
+            SOURCE_URL VARCHAR,
+            FILE_TYPE VARCHAR,
+            FILE_SIZE NUMBER,
+            UPLOADED_BY VARCHAR,
+            UPLOAD_TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+        )
+        """
+    )
+
+
+def insert_metadata(backend, rows: list[dict], uploaded_by: str):
+    """Insert metadata rows (name, description, source_url, ext, size) in multi-row batches."""
+    for start in range(0, len(rows), INSERT_BATCH):
+        batch = rows[start:start + INSERT_BATCH]
+        backend.sql(
+            f"""
+            INSERT INTO {config.qualified(config.METADATA_TABLE)}
+            (FILE_NAME, SHORT_DESCRIPTION, SOURCE_URL, FILE_TYPE, FILE_SIZE, UPLOADED_BY)
+            VALUES {", ".join("(?, ?, ?, ?, ?, ?)" for _ in batch)}
+            """,
+            params=[
+                value
+                for row in batch
+                for value in (row["name"], row["description"], row["source_url"], row["ext"], row["size"], uploaded_by)
+            ],
+        )
+
+
+@dataclass
+class IngestItem:
+    path: Path
+    name: str
+    source_url: str
+    description: str
+    size: int = 0
+    md5: str = ""
+    errors: list | None = None
+
+    @property
+    def ext(self) -> str:
+        return file_extension(self.name)
+
+    def metadata(self) -> dict:
+        return {"name": self.name, "description": self.description, "source_url": self.source_url,
+                "ext": self.ext, "size": self.size}
+
+
+def _md5(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def items_from_directory(root: Path, base_url: str | None) -> list[IngestItem]:
+    items = []
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        relative = path.relative_to(root).as_posix()
+        url = f"{base_url.rstrip('/')}/{relative}" if base_url else ""
+        items.append(IngestItem(path, path.name, url, path.name))
+    return items
+
+
+def items_from_manifest(manifest: Path) -> list[IngestItem]:
+    items = []
+    with open(manifest, newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            path = (manifest.parent / row["path"]).resolve()
+            name = (row.get("file_name") or "").strip() or path.name
+            items.append(IngestItem(path, name, (row.get("source_url") or "").strip(),
+                                    (row.get("description") or "").strip() or name))
+    return items
+
+
+def prepare(items: list[IngestItem]) -> list[IngestItem]:
+    """Validate every item and fill in size and MD5; duplicate stage names are errors."""
+    seen = {}
+    for item in items:
+        item.errors = validate_file(item.name, item.source_url)
+        if not item.path.is_file():
+            item.errors.append(f"{item.path} does not exist")
+        else:
+            item.size = item.path.stat().st_size
+            item.md5 = _md5(item.path)
+        if item.name in seen:
+            item.errors.append(f"Same stage name as {seen[item.name]}")
+        seen.setdefault(item.name, item.path)
+    return items
+
+
+@dataclass
+class IngestPlan:
+    put: list[IngestItem]
+    register: list[IngestItem]
+    embed: list[IngestItem]
+    reembed: set[str]
+    skipped: int
+
+
+def plan_ingest(backend, items: list[IngestItem]) -> IngestPlan:
+    """What still has to happen for each valid item, given what the warehouse already has."""
+    staged, registered, chunked = list_stage(backend), list_metadata(backend), list_chunk_files(backend)
+    put, register, embed, replace, skipped = [], [], [], set(), 0
+    for item in items:
+        if item.errors:
+            continue
+        changed = staged.get(item.name, {}).get("md5") != item.md5
+        needs_put = item.name not in staged or changed
+        needs_register = item.name not in registered or changed
+        needs_embed = item.name not in chunked or changed
+        if needs_put:
+            put.append(item)
+        if needs_register:
+            register.append(item)
+        if needs_embed:
+            embed.append(item)
+            if item.name in chunked:
+                replace.add(item.name)
+        if not (needs_put or needs_register or needs_embed):
+            skipped += 1
+    return IngestPlan(put, register, embed, replace, skipped)
+
+
+def run_ingest(
+    backend,
+    plan: IngestPlan,
+    uploaded_by: str,
+    put_concurrency: int = 8,
+    embed_concurrency: int = 2,
+    batch_size: int = 50,
+    report=print,
+) -> dict:
+    """Execute a plan batch by batch; embedding runs behind the uploads on its own pool."""
+    stage_path = f"@{config.STAGE}"
+    to_register = {item.name for item in plan.register}
+    to_embed = {item.name for item in plan.embed}
+    to_put = {item.name for item in plan.put}
+    pending = {item.name: item for item in plan.put + plan.register + plan.embed}
+    ordered = sorted(pending.values(), key=lambda item: item.name)
+
+    failures: dict[str, str] = {}
+    counts = {"put": 0, "registered": 0, "embedded": 0}
+    uploaded_bytes = 0
+    lock = threading.Lock()
+
+    def put(item):
+        with open(item.path, "rb") as handle:
+            backend.put_stream(io.BytesIO(handle.read()), f"{stage_path}/{item.name}", overwrite=True)
+
+    def embed(item):
+        try:
+            if item.name in plan.reembed:
+                reembed(backend, item.name)
+            else:
+                backend.generate_embeddings(item.name)
+                extract_file(backend, item.name)
+                assign_file(backend, item.name)
+            with lock:
+                counts["embedded"] += 1
+        except Exception as exc:
+            with lock:
+                failures[item.name] = f"embedding: {exc}"
+
+    start = time.perf_counter()
+    put_pool = ThreadPoolExecutor(max_workers=put_concurrency, thread_name_prefix="iitj-put")
+    embed_pool = ThreadPoolExecutor(max_workers=embed_concurrency, thread_name_prefix="iitj-embed")
+    embed_futures = []
+    try:
+        for offset in range(0, len(ordered), batch_size):
+            batch = ordered[offset:offset + batch_size]
+            uploads = {item.name: put_pool.submit(put, item) for item in batch if item.name in to_put}
+            ready = []
+            for item in batch:
+                future = uploads.get(item.name)
+                if future is not None:
+                    try:
+                        future.result()
+                        counts["put"] += 1
+                        uploaded_bytes += item.size
+                    except Exception as exc:
+                        failures[item.name] = f"upload: {exc}"
+                        continue
+                ready.append(item)
+
+            register = [item for item in ready if item.name in to_register]
+            try:
+                insert_metadata(backend, [item.metadata() for item in register], uploaded_by)
+                counts["registered"] += len(register)
+            except Exception as exc:
+                for item in register:
+                    failures[item.name] = f"metadata: {exc}"
+                ready = [item for item in ready if item.name not in to_register]
+
+            embed_futures.extend(embed_pool.submit(embed, item) for item in ready if item.name in to_embed)
+            elapsed = time.perf_counter() - start
+            with lock:
+                embedded = counts["embedded"]
+            report(
+                f"{min(offset + batch_size, len(ordered))}/{len(ordered)} uploaded, {embedded} embedded, "
+                f"{len(failures)} failed, {uploaded_bytes / (1 << 20) / elapsed if elapsed else 0:.1f} MB/s"
+            )
+        for future in embed_futures:
+            future.result()
+    finally:
+        put_pool.shutdown(wait=True)
+        embed_pool.shutdown(wait=True)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(ordered),
+        "skipped": plan.skipped,
+        **counts,
+        "failed": failures,
+        "megabytes": round(uploaded_bytes / (1 << 20), 2),
+        "seconds": round(elapsed, 2),
+        "files_per_minute": round(len(ordered) / elapsed * 60, 1) if elapsed else 0.0,
+        "mb_per_second": round(uploaded_bytes / (1 << 20) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", type=Path, help="Directory tree to ingest")
+    source.add_argument("--manifest", type=Path, help="CSV with path, source_url[, description, file_name]")
+    parser.add_argument("--base-url", help="Source URL prefix for --dir (relative paths are appended)")
+    parser.add_argument("--uploaded-by", required=True, help="Email recorded as UPLOADED_BY")
+    parser.add_argument("--put-concurrency", type=int, default=8)
+    parser.add_argument("--embed-concurrency", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50, help="Files per metadata INSERT batch")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Validate and print the plan only; reads the stage and tables, creates nothing"
+    )
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    items = items_from_directory(args.dir, args.base_url) if args.dir else items_from_manifest(args.manifest)
+    items = prepare(items)
+    invalid = [item for item in items if item.errors]
+    for item in invalid[:20]:
+        print(f"skip {item.path}: {'; '.join(item.errors)}")
+    if len(invalid) > 20:
+        print(f"... and {len(invalid) - 20} more invalid files")
+
+    backend = command_line_backend(args.backend)
+    if not args.dry_run:
+        ensure_stage_and_table(backend)
+    plan = plan_ingest(backend, items)
+    print(
+        f"{len(items)} files: {len(invalid)} invalid, {plan.skipped} already ingested, "
+        f"{len(plan.put)} to upload, {len(plan.register)} to register, "
+        f"{len(plan.embed)} to embed ({len(plan.reembed)} replacing old chunks)"
+    )
+    if args.dry_run:
+        return 1 if invalid else 0
+
+    summary = run_ingest(
+        backend, plan, args.uploaded_by, args.put_concurrency, args.embed_concurrency, args.batch_size
+    )
+    summary["invalid"] = len(invalid)
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        print(
+            f"{summary['files']} files in {summary['seconds']}s: {summary['put']} uploaded "
+            f"({summary['megabytes']} MB, {summary['mb_per_second']} MB/s), {summary['registered']} registered, "
+            f"{summary['embedded']} embedded, {len(summary['failed'])} failed; "
+            f"{summary['files_per_minute']} files/min"
+        )
+        for name, error in list(summary["failed"].items())[:20]:
+            print(f"  {name}: {error}")
+    return 1 if summary["failed"] or invalid else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+"""Cancellable warehouse statements for chat turns.
+
+While a turn runs, the session's ``TurnJobs`` is the current tracker (a
+context variable, copied into the search and completion thread pools). The
+Snowpark backend then submits each statement with ``collect_nowait`` and
+registers its query ID; the local backend registers its simulated latency
+the same way. Everything still running is cancelled when
+
+    * the session starts a newer turn (``new_turn``),
+    * the turn finishes and leaves stragglers behind (a hedge's loser),
+    * the script run is interrupted by a follow-up, Restart or the user
+      leaving (``run_in_turn`` polls from the script thread, so Streamlit's
+      stop/rerun exception surfaces there), or
+    * the tracker itself is garbage collected with the session.
+
+Each cancellation is recorded with the time the statement had already run
+and an estimate of the warehouse time it would still have taken (the median
+duration of completed statements of the same kind, minus that), so the
+savings can be reported.
+
+Usage:
+    python -m iitj_search.jobs --turns 20 --interrupt-after 0.5
+"""
+
+import argparse
+import contextvars
+import statistics
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+current_jobs: contextvars.ContextVar = contextvars.ContextVar("iitj_turn_jobs", default=None)
+# Set by ``run_in_turn`` when the script run waiting for the work was interrupted.
+_abandoned: contextvars.ContextVar = contextvars.ContextVar("iitj_turn_abandoned", default=None)
+
+TURN_POOL_SIZE = 32
+POLL_INTERVAL = 0.25  # seconds between interruption checks in the script thread
+RECENT_DURATIONS = 200
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class QueryCancelled(Exception):
+    """The statement was cancelled because its turn is no longer wanted."""
+
+
+def statement_kind(query: str) -> str:
+    upper = query.upper()
+    if "SEARCH_PREVIEW" in upper:
+        return "search"
+    if "AI_COMPLETE" in upper or "CORTEX.COMPLETE" in upper:
+        return "complete"
+    return "sql"
+
+
+def turn_abandoned() -> bool:
+    """Whether the turn this worker runs for was interrupted (work not yet started should not start)."""
+    flag = _abandoned.get()
+    return flag is not None and flag.is_set()
+
+
+class CancelMetrics:
+    """Process-wide durations of completed statements and cancellation savings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: dict[str, deque] = {}
+        self.counts = Counter()
+        self.seconds = Counter()
+
+    def record_done(self, kind: str, seconds: float):
+        with self._lock:
+            self._durations.setdefault(kind, deque(maxlen=RECENT_DURATIONS)).append(seconds)
+            self.counts[f"{kind}_completed"] += 1
+
+    def typical(self, kind: str) -> float | None:
+        with self._lock:
+            durations = list(self._durations.get(kind, ()))
+        return statistics.median(durations) if durations else None
+
+    def record_cancel(self, kind: str, elapsed: float, reason: str) -> float:
+        """Count a cancellation; returns the estimated warehouse seconds saved."""
+        saved = max(0.0, (self.typical(kind) or elapsed) - elapsed)
+        with self._lock:
+            self.counts[f"{kind}_cancelled"] += 1
+            self.counts[f"cancelled_{reason}"] += 1
+            self.seconds["spent_before_cancel"] += elapsed
+            self.seconds["saved_estimate"] += saved
+        return saved
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counts": dict(self.counts),
+                "spent_before_cancel_s": round(self.seconds["spent_before_cancel"], 2),
+                "saved_estimate_s": round(self.seconds["saved_estimate"], 2),
+                "typical_s": {k: round(statistics.median(v), 3) for k, v in self._durations.items() if v},
+            }
+
+
+cancel_metrics = CancelMetrics()
+
+
+@dataclass
+class TrackedJob:
+    kind: str
+    query_id: str | None
+    started: float
+    cancel: object  # callable
+    cancelled: bool = False
+
+
+def _cancel_active(lock, active: dict, savings: Counter, reason: str) -> int:
+    with lock:
+        jobs = list(active.values())
+        active.clear()
+        for job in jobs:
+            job.cancelled = True
+    for job in jobs:
+        elapsed = time.monotonic() - job.started
+        try:
+            job.cancel()
+        except Exception:
+            pass  # already finished, or the connection is gone with it
+        savings["cancelled"] += 1
+        savings["saved_s"] += cancel_metrics.record_cancel(job.kind, elapsed, reason)
+    return len(jobs)
+
+
+class TurnJobs:
+    """Statements in flight for one session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: dict[int, TrackedJob] = {}
+        self._next_token = 0
+        self.turn = 0
+        self.savings = Counter()
+        # Cancel whatever is left when the session (and with it this tracker) is dropped.
+        weakref.finalize(self, _cancel_active, self._lock, self._active, self.savings, "session_closed")
+
+    @contextmanager
+    def active(self):
+        """Make this the tracker for statements issued in the block."""
+        token = current_jobs.set(self)
+        try:
+            yield self
+        finally:
+            current_jobs.reset(token)
+
+    def register(self, kind: str, query_id: str | None, cancel) -> tuple[int, TrackedJob]:
+        job = TrackedJob(kind, query_id, time.monotonic(), cancel)
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._active[token] = job
+        if turn_abandoned():
+            # Issued after its turn was cancelled (e.g. it was queued for admission).
+            _cancel_active(self._lock, {token: self._active.pop(token)}, self.savings, "interrupted")
+        return token, job
+
+    def finish(self, token: int, job: TrackedJob, ok: bool = True):
+        with self._lock:
+            self._active.pop(token, None)
+        if ok and not job.cancelled:
+            cancel_metrics.record_done(job.kind, time.monotonic() - job.started)
+
+    def cancel_all(self, reason: str) -> int:
+        return _cancel_active(self._lock, self._active, self.savings, reason)
+
+    def new_turn(self) -> int:
+        """Cancel the previous turn's leftovers and start counting a new turn."""
+        cancelled = self.cancel_all("superseded")
+        self.turn += 1
+        return cancelled
+
+    # -- backends -----------------------------------------------------------
+
+    def wait_async(self, async_job, kind: str):
+        """Wait for a Snowpark ``AsyncJob``, raising ``QueryCancelled`` if it was cancelled."""
+        token, job = self.register(kind, getattr(async_job, "query_id", None), async_job.cancel)
+        ok = False
+        try:
+            result = async_job.result()
+            ok = True
+        except Exception as exc:
+            if job.cancelled:
+                raise QueryCancelled(f"{kind} query {job.query_id} cancelled") from exc
+            raise
+        finally:
+            self.finish(token, job, ok)
+        if job.cancelled:
+            raise QueryCancelled(f"{kind} query {job.query_id} cancelled")
+        return result
+
+    def sleep(self, kind: str, seconds: float):
+        """Simulated statement latency that a cancellation cuts short."""
+        done = threading.Event()
+        token, job = self.register(kind, None, done.set)
+        try:
+            done.wait(seconds)
+        finally:
+            self.finish(token, job, not job.cancelled)
+        if job.cancelled:
+            raise QueryCancelled(f"{kind} statement cancelled")
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TURN_POOL_SIZE, thread_name_prefix="iitj-turn")
+        return _pool
+
+
+def submit_in_context(pool: ThreadPoolExecutor, fn, *args):
+    """``pool.submit`` that carries the caller's current tracker into the worker."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def run_in_turn(jobs: TurnJobs, fn, *args, tick=None, interval: float = POLL_INTERVAL):
+    """Run ``fn(*args)`` on the turn pool with ``jobs`` as the tracker.
+
+    The calling thread waits in short slices and calls ``tick(elapsed)``
+    between them; if that (or anything else) raises, the turn's statements
+    are cancelled before the exception propagates.
+    """
+    abandoned = threading.Event()
+    with jobs.active():
+        token = _abandoned.set(abandoned)
+        try:
+            future = submit_in_context(_get_pool(), fn, *args)
+        finally:
+            _abandoned.reset(token)
+    start = time.monotonic()
+    try:
+        # Not ``future.result(timeout=...)``: the work itself may raise a TimeoutError.
+        while not wait([future], timeout=interval).done:
+            if tick is not None:
+                tick(time.monotonic() - start)
+        return future.result()
+    except BaseException:
+        if not future.done():
+            abandoned.set()
+            jobs.cancel_all("interrupted")
+        raise
+
+
+def simulate(turns: int, interrupt_after: float, latency) -> dict:
+    """Turns interrupted by a follow-up after ``interrupt_after`` seconds, against the local backend."""
+    from iitj_search import config
+    from iitj_search.backend import LocalBackend
+    from iitj_search.local_corpus import build_corpus
+    # Under ``python -m`` this file is __main__; the backend uses the package module.
+    from iitj_search.jobs import TurnJobs, cancel_metrics, run_in_turn
+
+    backend = LocalBackend(latency=latency)
+    backend.load_corpus(build_corpus(50))
+    jobs = TurnJobs()
+    service = config.qualified(config.SEARCH_SERVICE)
+
+    def turn(question):
+        backend.search(service, {"query": question, "columns": ["CHUNK"], "filter": {}, "limit": 5})
+        return backend.complete("claude-4-sonnet", question)
+
+    # Calibrate: completed turns give the typical statement durations.
+    for _ in range(3):
+        jobs.new_turn()
+        run_in_turn(jobs, turn, "faculty in computer science")
+
+    class FollowUp(Exception):
+        pass
+
+    def interrupt(elapsed):
+        if elapsed >= interrupt_after:
+            raise FollowUp
+
+    interrupted = 0
+    for _ in range(turns):
+        jobs.new_turn()
+        try:
+            run_in_turn(jobs, turn, "scholarship notices", tick=interrupt, interval=0.05)
+        except FollowUp:
+            interrupted += 1
+    return {"turns": turns, "interrupted": interrupted, **cancel_metrics.snapshot()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--interrupt-after", type=float, default=0.5,
+                        help="Seconds into each turn when the follow-up arrives")
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--complete-latency", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import LocalLatency
+
+    report = simulate(args.turns, args.interrupt_after,
+                      LocalLatency(search=args.search_latency, complete=args.complete_latency))
+    print(f"{report['interrupted']}/{report['turns']} turns interrupted after {args.interrupt_after:.2f}s")
+    print(f"warehouse time spent before cancelling: {report['spent_before_cancel_s']:.2f}s")
+    print(f"warehouse time saved by cancelling (estimate): {report['saved_estimate_s']:.2f}s")
+    print(f"typical statement durations: {report['typical_s']}")
+    print(f"counts: {report['counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Concurrent-session load test for both pages, built on Streamlit's AppTest.
+
+Each simulated user gets its own AppTest instance (its own session state) and
+walks through a realistic flow against one shared ``LocalBackend`` with
+simulated warehouse latency, so the numbers reflect one Streamlit process
+serving N users at once.
+
+Usage:
+    python -m iitj_search.loadtest --concurrency 1 5 10 25
+    python -m iitj_search.loadtest --concurrency 10 --search-latency 0.5 --complete-latency 3
+"""
+
+import argparse
+import io
+import statistics
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from iitj_search import config
+from iitj_search.admission import shared_controller
+from iitj_search.backend import LocalBackend, LocalLatency
+from iitj_search.local_corpus import build_corpus
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+SEARCH_PAGE = APP_ROOT / "pages" / "02_AI_Search.py"
+CURATE_PAGE = APP_ROOT / "pages" / "01_Curate_Information.py"
+
+SUGGESTION = ":blue[:material/local_library:] List all faculty"
+FOLLOW_UPS = [
+    "Which of them work in AI/DATA SCIENCE?",
+    "Give the email of Binod Kumar",
+]
+
+
+@dataclass
+class SessionResult:
+    timings: list[tuple[str, float]] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    apps: list = field(default_factory=list)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed(result: SessionResult, step: str, action):
+    start = time.perf_counter()
+    at = action()
+    result.timings.append((step, time.perf_counter() - start))
+    if at is not None and len(at.exception):
+        result.errors.append(f"{step}: {at.exception[0].value}")
+    return at
+
+
+def _new_app(page: Path, backend, timeout: float):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(page), default_timeout=timeout)
+    # The pages use a backend found in session state instead of connecting.
+    at.session_state["backend"] = backend
+    return at
+
+
+def run_search_flow(backend, result: SessionResult, timeout: float):
+    """Suggestion click, follow-ups, feedback submit and the PDF export."""
+    at = _new_app(SEARCH_PAGE, backend, timeout)
+    result.apps.append(at)
+    _timed(result, "search: first render", at.run)
+
+    at.session_state["selected_suggestion"] = SUGGESTION
+    _timed(result, "search: suggestion click", at.run)
+
+    for question in FOLLOW_UPS:
+        _timed(result, "search: follow-up", lambda: at.chat_input[0].set_value(question).run())
+
+    submit = [b for b in at.button if b.label == "Send feedback"]
+    if submit:
+        _timed(result, "search: feedback submit", lambda: submit[-1].click().run())
+    else:
+        result.errors.append("search: feedback form not rendered")
+
+    if not len(at.get("download_button")):
+        result.errors.append("search: PDF export button not rendered")
+
+
+def run_curate_flow(backend, result: SessionResult, timeout: float, upload_files: int):
+    """Metadata filtering plus an authenticated upload.
+
+    AppTest cannot drive ``st.file_uploader``, so the upload step replays the
+    page's warehouse work (stage PUT, metadata INSERT, embedding procedure)
+    against the same backend to model its contention.
+    """
+    at = _new_app(CURATE_PAGE, backend, timeout)
+    at.session_state["authenticated"] = True
+    at.session_state["user_email"] = "loadtest@iitj.ac.in"
+    result.apps.append(at)
+    _timed(result, "curate: first render", at.run)
+
+    def set_filter(label: str, value: str):
+        widget = next(w for w in at.text_input if w.label == label)
+        return widget.input(value).run()
+
+    _timed(result, "curate: filter by name", lambda: set_filter("File name contains", "faculty"))
+    _timed(result, "curate: filter by url", lambda: set_filter("Source URL contains", "iitj.ac.in"))
+
+    def upload():
+        for idx in range(upload_files):
+            name = f"loadtest_{threading.get_ident()}_{idx}.txt"
+            backend.put_stream(io.BytesIO(b"load test notice"), f"@{config.STAGE}/{name}", overwrite=True)
+            backend.sql(
+                f"INSERT INTO {config.qualified(config.METADATA_TABLE)} "
+                "(FILE_NAME, SHORT_DESCRIPTION, SOURCE_URL, FILE_TYPE, FILE_SIZE, UPLOADED_BY) SELECT ?, ?, ?, ?, ?, ?",
+                params=[name, name, "https://www.iitj.ac.in/", "txt", 16, "loadtest@iitj.ac.in"],
+            )
+            backend.generate_embeddings(name)
+
+    if upload_files:
+        _timed(result, "curate: upload (replayed)", upload)
+
+
+def run_level(concurrency: int, backend, curate_share: float, timeout: float, upload_files: int) -> dict:
+    results = [SessionResult() for _ in range(concurrency)]
+    curate_every = round(1 / curate_share) if curate_share > 0 else 0
+
+    def worker(idx: int):
+        try:
+            if curate_every and idx % curate_every == curate_every - 1:
+                run_curate_flow(backend, results[idx], timeout, upload_files)
+            else:
+                run_search_flow(backend, results[idx], timeout)
+        except Exception as exc:
+            results[idx].errors.append(f"{type(exc).__name__}: {exc}")
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    # AppTest instances are still referenced here, so their session state counts.
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    latencies = [seconds for r in results for _, seconds in r.timings]
+    return {
+        "concurrency": concurrency,
+        "steps": len(latencies),
+        "wall_s": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mem_kib_per_session": retained / 1024 / concurrency,
+        "errors": [err for r in results for err in r.errors],
+        "by_step": _by_step(results),
+        # The pages' admission gates are process-wide, so these add up over the levels run so far.
+        "admission": shared_controller().snapshot(),
+    }
+
+
+def _by_step(results: list[SessionResult]) -> dict[str, list[float]]:
+    by_step: dict[str, list[float]] = {}
+    for r in results:
+        for step, seconds in r.timings:
+            by_step.setdefault(step, []).append(seconds)
+    return by_step
+
+
+def print_report(levels: list[dict], verbose: bool):
+    print(f"{'users':>6} {'steps':>6} {'wall s':>8} {'steps/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'KiB/user':>9} {'errors':>7}")
+    for lvl in levels:
+        print(
+            f"{lvl['concurrency']:>6} {lvl['steps']:>6} {lvl['wall_s']:>8.2f} {lvl['throughput']:>8.2f} "
+            f"{lvl['p50']:>7.2f} {lvl['p95']:>7.2f} {lvl['p99']:>7.2f} {lvl['mem_kib_per_session']:>9.0f} "
+            f"{len(lvl['errors']):>7}"
+        )
+    if verbose:
+        for lvl in levels:
+            print(f"\n-- {lvl['concurrency']} concurrent users --")
+            for step, values in sorted(lvl["by_step"].items()):
+                print(f"  {step:<28} n={len(values):<4} p50={statistics.median(values):.2f}s p95={percentile(values, 95):.2f}s")
+            for kind, gate in lvl["admission"].items():
+                if gate["admitted"] or gate["timeouts"]:
+                    print(f"  admission {kind:<18} max depth {gate['max_depth']:<4} "
+                          f"wait p95={gate['wait_p95_s']}s timeouts={gate['timeouts']}")
+            for err in lvl["errors"][:10]:
+                print(f"  ! {err}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25],
+                        help="Simulated concurrent sessions, one run per value")
+    parser.add_argument("--curate-share", type=float, default=0.25,
+                        help="Fraction of sessions that run the Curate flow instead of the search flow")
+    parser.add_argument("--upload-files", type=int, default=1, help="Files uploaded per Curate session")
+    parser.add_argument("--scale", type=int, default=200, help="Generated filler documents in the local corpus")
+    parser.add_argument("--sql-latency", type=float, default=0.02)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--complete-latency", type=float, default=1.5)
+    parser.add_argument("--put-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=120, help="Per-rerun AppTest timeout in seconds")
+    parser.add_argument("--verbose", action="store_true", help="Print per-step latency and errors")
+    args = parser.parse_args(argv)
+
+    latency = LocalLatency(
+        sql=args.sql_latency,
+        search=args.search_latency,
+        complete=args.complete_latency,
+        put=args.put_latency,
+        embed=args.embed_latency,
+    )
+    levels = []
+    for concurrency in args.concurrency:
+        backend = LocalBackend(latency=latency)
+        backend.load_corpus(build_corpus(args.scale))
+        levels.append(run_level(concurrency, backend, args.curate_share, args.timeout, args.upload_files))
+    print_report(levels, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Deterministic synthetic IITJ corpus for the local backend.
+
+The base documents (departments, faculty lists and profiles, a few notices)
+are fixed so labelled questions can point at them; ``scale`` adds generated
+filler notices that act as distractors and grow the index.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+BASE_URL = "https://www.iitj.ac.in"
+# Notices also come from the old site and the intranet, for source-domain filtering.
+NOTICE_URLS = [BASE_URL, BASE_URL, BASE_URL, "https://old.iitj.ac.in", "https://intranet.iitj.ac.in"]
+
+DEPARTMENTS = [
+    ("cse", "Computer Science and Engineering", "computer-science-engineering"),
+    ("ee", "Electrical Engineering", "electrical-engineering"),
+    ("me", "Mechanical Engineering", "mechanical-engineering"),
+    ("cie", "Civil and Infrastructure Engineering", "civil-and-infrastructure-engineering"),
+    ("che", "Chemical Engineering", "chemical-engineering"),
+    ("mme", "Metallurgical and Materials Engineering", "metallurgical-and-materials-engineering"),
+    ("bb", "Bioscience and Bioengineering", "bioscience-bioengineering"),
+    ("chy", "Chemistry", "chemistry"),
+    ("phy", "Physics", "physics"),
+    ("ma", "Mathematics", "mathematics"),
+    ("aids", "School of Artificial Intelligence and Data Science", "school-of-artificial-intelligence-data-science"),
+    ("sla", "School of Liberal Arts", "school-of-liberal-arts"),
+]
+
+# (name, department code, designation, research areas, email)
+FACULTY = [
+    ("Binod Kumar", "cse", "Assistant Professor", ["hardware security", "VLSI testing", "post-silicon validation"], "binod@iitj.ac.in"),
+    ("Anita Sharma", "cse", "Professor", ["machine learning", "computer vision"], "anita.sharma@iitj.ac.in"),
+    ("Rohit Verma", "cse", "Associate Professor", ["distributed systems", "cloud computing"], "rverma@iitj.ac.in"),
+    ("Meera Iyer", "cse", "Assistant Professor", ["natural language processing", "information retrieval"], "meera@iitj.ac.in"),
+    ("Suresh Patel", "ee", "Professor", ["power electronics", "smart grids"], "spatel@iitj.ac.in"),
+    ("Kavita Rao", "ee", "Associate Professor", ["signal processing", "wireless communication"], "kavita@iitj.ac.in"),
+    ("Arjun Mehta", "ee", "Assistant Professor", ["embedded systems", "edge AI"], "arjun.mehta@iitj.ac.in"),
+    ("Vikram Singh", "me", "Professor", ["robotics", "control systems"], "vsingh@iitj.ac.in"),
+    ("Pooja Nair", "me", "Assistant Professor", ["additive manufacturing", "tribology"], "pooja@iitj.ac.in"),
+    ("Harish Gupta", "cie", "Associate Professor", ["structural health monitoring", "earthquake engineering"], "hgupta@iitj.ac.in"),
+    ("Lakshmi Menon", "cie", "Assistant Professor", ["water resources", "remote sensing"], "lmenon@iitj.ac.in"),
+    ("Deepak Joshi", "che", "Professor", ["catalysis", "process intensification"], "djoshi@iitj.ac.in"),
+    ("Nandini Das", "mme", "Associate Professor", ["alloy design", "corrosion"], "ndas@iitj.ac.in"),
+    ("Sanjay Kulkarni", "bb", "Professor", ["computational biology", "genomics"], "skulkarni@iitj.ac.in"),
+    ("Ritu Agarwal", "bb", "Assistant Professor", ["tissue engineering", "biomaterials"], "ritu@iitj.ac.in"),
+    ("Manoj Tiwari", "chy", "Professor", ["organic synthesis", "green chemistry"], "mtiwari@iitj.ac.in"),
+    ("Farah Khan", "phy", "Associate Professor", ["quantum optics", "photonics"], "farah@iitj.ac.in"),
+    ("Gopal Krishnan", "phy", "Assistant Professor", ["condensed matter physics", "superconductivity"], "gopal@iitj.ac.in"),
+    ("Shalini Bose", "ma", "Professor", ["numerical analysis", "optimization"], "sbose@iitj.ac.in"),
+    ("Prakash Reddy", "ma", "Assistant Professor", ["graph theory", "cryptography"], "preddy@iitj.ac.in"),
+    ("Aditi Chatterjee", "aids", "Professor", ["deep learning", "medical image analysis"], "aditi@iitj.ac.in"),
+    ("Rahul Saxena", "aids", "Associate Professor", ["data science", "recommender systems", "big data analytics"], "rsaxena@iitj.ac.in"),
+    ("Neha Kapoor", "aids", "Assistant Professor", ["reinforcement learning", "AI for healthcare"], "nkapoor@iitj.ac.in"),
+    ("Imran Qureshi", "aids", "Assistant Professor", ["explainable AI", "speech processing"], "imran@iitj.ac.in"),
+    ("Sunita Mishra", "sla", "Associate Professor", ["cognitive science", "digital humanities"], "smishra@iitj.ac.in"),
+]
+
+PROGRAMS = {
+    "cse": ["B.Tech in Computer Science and Engineering", "M.Tech in Computer Science", "PhD"],
+    "ee": ["B.Tech in Electrical Engineering", "M.Tech in VLSI and Embedded Systems", "PhD"],
+    "me": ["B.Tech in Mechanical Engineering", "M.Tech in Robotics", "PhD"],
+    "cie": ["B.Tech in Civil and Infrastructure Engineering", "PhD"],
+    "che": ["B.Tech in Chemical Engineering", "PhD"],
+    "mme": ["B.Tech in Materials Engineering", "PhD"],
+    "bb": ["B.Tech in Bioengineering", "M.Sc in Biotechnology", "PhD"],
+    "chy": ["M.Sc in Chemistry", "PhD"],
+    "phy": ["M.Sc in Physics", "PhD"],
+    "ma": ["M.Sc in Mathematics", "PhD"],
+    "aids": ["B.Tech in Artificial Intelligence and Data Science", "M.Tech in Data Science", "PhD"],
+    "sla": ["PhD in Cognitive Science"],
+}
+
+UPLOADERS = ["m25ai2134@iitj.ac.in", "office_cse@iitj.ac.in", "registrar@iitj.ac.in", "office_aids@iitj.ac.in"]
+BASE_TIMESTAMP = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def slugify(name: str) -> str:
+    return "_".join(name.lower().split())
+
+
+def department_name(code: str) -> str:
+    return next(name for dept, name, _ in DEPARTMENTS if dept == code)
+
+
+def _doc(file_name, description, url, text, uploaded_by, timestamp) -> dict:
+    return {
+        "FILE_NAME": file_name,
+        "SHORT_DESCRIPTION": description,
+        "SOURCE_URL": url,
+        "FILE_TYPE": file_name.rsplit(".", 1)[-1],
+        "UPLOADED_BY": uploaded_by,
+        "UPLOAD_TIMESTAMP": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        "TEXT": text,
+    }
+
+
+def base_documents() -> list[dict]:
+    docs = []
+    stamp = BASE_TIMESTAMP
+
+    def next_stamp():
+        nonlocal stamp
+        stamp += timedelta(hours=7)
+        return stamp
+
+    overview = "IIT Jodhpur departments and schools:\n" + "\n".join(
+        f"- Department of {name}" if not name.startswith("School") else f"- {name}"
+        for _, name, _ in DEPARTMENTS
+    )
+    docs.append(_doc("departments_overview.txt", "Departments at IIT Jodhpur",
+                     f"{BASE_URL}/main/en/departments", overview, UPLOADERS[0], next_stamp()))
+
+    for code, name, slug in DEPARTMENTS:
+        members = [f for f in FACULTY if f[1] == code]
+        about = (
+            f"About {name} at IIT Jodhpur.\n"
+            f"Programs offered: {', '.join(PROGRAMS[code])}.\n"
+            f"The department has {len(members)} faculty members working on "
+            + ", ".join(sorted({area for f in members for area in f[3]}))
+            + "."
+        )
+        docs.append(_doc(f"dept_{code}.html", f"About {name}", f"{BASE_URL}/{slug}/en/about",
+                         about, UPLOADERS[0], next_stamp()))
+
+        listing = [f"Faculty Members - {name}"]
+        for fac_name, _, designation, areas, email in members:
+            listing.append(
+                f"Dr. {fac_name}, {designation}, {name}. Research areas: {', '.join(areas)}. Email: {email}"
+            )
+        uploader = "office_aids@iitj.ac.in" if code == "aids" else UPLOADERS[0]
+        docs.append(_doc(f"faculty_{code}.pdf", f"Faculty of {name}", f"{BASE_URL}/{slug}/en/faculty-members",
+                         "\n".join(listing), uploader, next_stamp()))
+
+    for fac_name, code, designation, areas, email in FACULTY:
+        dept = department_name(code)
+        slug = next(s for d, _, s in DEPARTMENTS if d == code)
+        article = "an" if designation[0] in "AEIOU" else "a"
+        profile = (
+            f"Dr. {fac_name} is {article} {designation} in the {dept} at IIT Jodhpur. "
+            f"Dr. {fac_name.split()[-1]} works on {', '.join(areas)} and leads a research group "
+            f"with PhD and M.Tech students. Contact: {email}, Office: {code.upper()} Block, IIT Jodhpur, "
+            f"NH 62, Nagaur Road, Karwar, Jodhpur 342030."
+        )
+        docs.append(_doc(f"profile_{slugify(fac_name)}.html", f"Profile of Dr. {fac_name}",
+                         f"{BASE_URL}/{slug}/en/faculty/{slugify(fac_name)}", profile, UPLOADERS[0], next_stamp()))
+
+    ai_faculty = [f for f in FACULTY if any(
+        term in area for area in f[3] for term in ("learning", "AI", "data", "vision", "language")
+    )]
+    docs.append(_doc(
+        "ai_research_areas.html", "Research areas in AI and Data Science",
+        f"{BASE_URL}/school-of-artificial-intelligence-data-science/en/research",
+        "Research in Artificial Intelligence and Data Science at IIT Jodhpur spans deep learning, "
+        "reinforcement learning, computer vision, natural language processing, recommender systems, "
+        "explainable AI and AI for healthcare. Faculty working in these areas: "
+        + "; ".join(f"Dr. {f[0]} ({department_name(f[1])})" for f in ai_faculty) + ".",
+        "office_aids@iitj.ac.in", next_stamp(),
+    ))
+    docs.append(_doc(
+        "admissions_btech_2025.pdf", "B.Tech admissions 2025",
+        f"{BASE_URL}/admissions/en/btech",
+        "B.Tech admissions at IIT Jodhpur are through JEE Advanced and JoSAA counselling. "
+        "Seat matrix, eligibility criteria and important dates for the 2025 session are listed. "
+        "Contact the admissions office at admissions@iitj.ac.in.",
+        "registrar@iitj.ac.in", next_stamp(),
+    ))
+    docs.append(_doc(
+        "hostel_rules.pdf", "Hostel rules and regulations",
+        f"{BASE_URL}/students/en/hostel",
+        "Hostel rules: visitors are allowed until 8 PM, mess timings are posted at each hostel, "
+        "and room allotment is done by the Council of Wardens. Contact: chief.warden@iitj.ac.in.",
+        "registrar@iitj.ac.in", next_stamp(),
+    ))
+    return docs
+
+
+FILLER_TOPICS = [
+    "seminar", "workshop", "tender", "circular", "scholarship", "examination schedule",
+    "convocation", "sports meet", "library timing", "recruitment", "guest lecture", "holiday list",
+]
+
+
+def filler_documents(count: int, seed: int = 7) -> list[dict]:
+    """Generated notices mentioning departments and research terms as distractors."""
+    rng = random.Random(seed)
+    areas = sorted({area for f in FACULTY for area in f[3]})
+    docs = []
+    for idx in range(count):
+        code, name, slug = rng.choice(DEPARTMENTS)
+        topic = rng.choice(FILLER_TOPICS)
+        ext = rng.choice(["pdf", "pdf", "html", "txt", "docx"])
+        sentences = [
+            f"Notice regarding {topic} organised by the {name}.",
+            f"The event covers {rng.choice(areas)} and {rng.choice(areas)}.",
+            f"Registration closes on {rng.randint(1, 28)}/{rng.randint(1, 12)}/2025.",
+            f"Queries may be sent to office_{code}@iitj.ac.in.",
+        ]
+        rng.shuffle(sentences)
+        stamp = BASE_TIMESTAMP + timedelta(days=rng.randint(0, 700), minutes=idx)
+        docs.append(_doc(
+            f"notice_{idx:06d}.{ext}", f"{topic.title()} notice - {name}",
+            f"{NOTICE_URLS[idx % len(NOTICE_URLS)]}/{slug}/en/notices/{idx}", " ".join(sentences * rng.randint(1, 3)),
+            rng.choice(UPLOADERS), stamp,
+        ))
+    return docs
+
+
+def build_corpus(scale: int = 0, seed: int = 7) -> list[dict]:
+    """Base documents plus ``scale`` filler notices."""
+    return base_documents() + filler_documents(scale, seed)
@@ -0,0 +1,236 @@
+"""Split compound questions into sub-queries and search them concurrently.
+
+A question such as "List all professors in AI/DATA SCIENCE. Also give their
+email" or "Compare CSE and EE faculty" is answered badly by one top-k search:
+the hits for one part crowd out the other. The planner turns it into a few
+focused sub-queries (by local rules, or optionally a cheap model), the
+fan-out runs their SEARCH_PREVIEW calls in a bounded thread pool, and the
+merged, de-duplicated hits feed a single generation call.
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from iitj_search.jobs import submit_in_context
+from iitj_search.rag import get_query_terms, normalize_row
+
+MAX_SUB_QUERIES = 4
+# Shared by every session so a burst of compound questions cannot open
+# unbounded warehouse connections.
+SEARCH_POOL_SIZE = 8
+_search_pool = None
+_pool_lock = threading.Lock()
+
+# Department and school aliases worth searching for separately.
+DEPARTMENT_ALIASES = {
+    "computer science": "Computer Science and Engineering",
+    "cse": "Computer Science and Engineering",
+    "electrical": "Electrical Engineering",
+    "mechanical": "Mechanical Engineering",
+    "civil": "Civil and Infrastructure Engineering",
+    "chemical engineering": "Chemical Engineering",
+    "metallurgical": "Metallurgical and Materials Engineering",
+    "materials": "Metallurgical and Materials Engineering",
+    "bioscience": "Bioscience and Bioengineering",
+    "bioengineering": "Bioscience and Bioengineering",
+    "chemistry": "Chemistry",
+    "physics": "Physics",
+    "mathematics": "Mathematics",
+    "maths": "Mathematics",
+    "data science": "Artificial Intelligence and Data Science",
+    "artificial intelligence": "Artificial Intelligence and Data Science",
+    "liberal arts": "Liberal Arts",
+}
+FOLLOW_ON_MARKERS = re.compile(r"(?:\.\s+|\s*;\s*|,?\s+and\s+)also\s+|\.\s+(?=(?:also|and)\b)", re.IGNORECASE)
+COMPARE_PATTERN = re.compile(
+    r"(?:compare|comparison of|difference between|differences between)\s+(.+?)\s+(?:and|with|vs\.?|versus)\s+(.+)",
+    re.IGNORECASE,
+)
+VERSUS_PATTERN = re.compile(r"(.+?)\s+(?:vs\.?|versus)\s+(.+)", re.IGNORECASE)
+# "AI/DATA SCIENCE": one word before the slash, the rest of the clause after it.
+# Both sides must start with a word of letters, so "2024/25" stays whole.
+SLASH_GROUP = re.compile(r"\b([^\W\d_]+)\s*/\s*([^\W\d_]+\b[^.,;?/]*)")
+# Words that carry no search signal once a question has been split.
+FILLER_TERMS = {
+    "their", "them", "all", "along", "also", "compare", "comparison", "difference",
+    "differences", "between", "versus", "department", "departments",
+}
+
+
+def _clean(query: str) -> str:
+    return " ".join(query.strip(" .?;,").split())
+
+
+def _content_terms(text: str) -> str:
+    """Content words of ``text`` in their original order."""
+    terms = get_query_terms(text) - FILLER_TERMS
+    return " ".join(sorted(terms, key=text.lower().find))
+
+
+def _split_follow_on(question: str) -> list[str]:
+    """'List X. Also give their email' -> ['List X', 'X email']."""
+    parts = [p for p in FOLLOW_ON_MARKERS.split(question) if p and p.strip()]
+    if len(parts) < 2:
+        return []
+    head = _clean(parts[0])
+    queries = [head]
+    for tail in parts[1:]:
+        tail = re.sub(r"^(?:also|and)\s+", "", tail.strip(), flags=re.IGNORECASE)
+        # Give the follow-on clause ("give their email") its subject back.
+        queries.append(_clean(f"{_content_terms(head)} {_content_terms(tail) or tail}"))
+    return queries
+
+
+def _split_alternatives(question: str) -> list[str]:
+    """'professors in AI/DATA SCIENCE' -> one query per alternative."""
+    match = SLASH_GROUP.search(question)
+    if not match:
+        return []
+    before, after = question[:match.start()], question[match.end():]
+    return [
+        _clean(f"{before}{match.group(1)}{after}"),
+        _clean(f"{before}{match.group(2)}{after}"),
+    ]
+
+
+def _split_comparison(question: str) -> list[str]:
+    match = COMPARE_PATTERN.search(question) or VERSUS_PATTERN.search(question)
+    if not match:
+        return []
+    left, right = _clean(match.group(1)), _clean(match.group(2))
+    # "B.Tech and M.Tech admissions": carry the right side's trailing words to the left.
+    left_words, right_words = left.split(), right.split()
+    tail = right_words[len(left_words):] if len(left_words) < len(right_words) else []
+    return [_clean(" ".join(left_words + tail)), right]
+
+
+def _split_departments(question: str) -> list[str]:
+    lowered = question.lower()
+    found = []
+    for alias, department in DEPARTMENT_ALIASES.items():
+        if re.search(rf"\b{re.escape(alias)}\b", lowered) and department not in found:
+            found.append(department)
+    if len(found) < 2:
+        return []
+    alias_pattern = "|".join(re.escape(a) for a in sorted(DEPARTMENT_ALIASES, key=len, reverse=True))
+    remainder = re.sub(rf"\b(?:{alias_pattern}|engineering)\b", " ", lowered)
+    context = _content_terms(remainder)
+    return [_clean(f"{context} {department}") for department in found]
+
+
+def plan_queries(question: str, max_queries: int = MAX_SUB_QUERIES) -> list[str]:
+    """Sub-queries for a question; the original question always comes first."""
+    queries = [_clean(question)]
+    follow_on = _split_follow_on(question)
+    # Most specific splits first: follow-on clauses, then per-department
+    # (or, failing that, per-side comparison) queries, then alternatives.
+    candidates = follow_on[1:] + (_split_departments(question) or _split_comparison(question))
+    for part in follow_on[:1] or [question]:
+        candidates.extend(_split_alternatives(part))
+
+    seen = {queries[0].lower()}
+    for query in candidates:
+        if query and query.lower() not in seen and get_query_terms(query):
+            seen.add(query.lower())
+            queries.append(query)
+    return queries[:max_queries]
+
+
+PLANNER_PROMPT = """Split the question into at most {n} short search queries that together cover every
+part of it (each department, each alternative, each requested attribute such as email).
+Return only a JSON array of strings. Return ["<question>"] if it is a single simple question.
+
+Question: {question}"""
+
+
+def plan_queries_with_model(question: str, complete, model: str, max_queries: int = MAX_SUB_QUERIES) -> list[str]:
+    """Ask a cheap model for sub-queries, falling back to the local rules."""
+    try:
+        raw = complete(model, PLANNER_PROMPT.format(n=max_queries, question=question))
+        text = raw if isinstance(raw, str) else str(raw)
+        match = re.search(r"\[.*\]", text.replace('\\"', '"'), re.DOTALL)
+        suggested = json.loads(match.group(0)) if match else []
+    except Exception:
+        suggested = []
+    queries = [_clean(question)]
+    for query in suggested:
+        if isinstance(query, str) and _clean(query) and _clean(query).lower() not in {q.lower() for q in queries}:
+            queries.append(_clean(query))
+    if len(queries) == 1:
+        return plan_queries(question, max_queries)
+    return queries[:max_queries]
+
+
+def _get_search_pool() -> ThreadPoolExecutor:
+    global _search_pool
+    with _pool_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(max_workers=SEARCH_POOL_SIZE, thread_name_prefix="iitj-search")
+        return _search_pool
+
+
+def result_key(row: dict) -> tuple:
+    """Identity of a search hit for de-duplication across sub-queries."""
+    row_dict = normalize_row(row)
+    doc = row_dict.get("FILE_NAME") or row_dict.get("file_name") or row_dict.get("SOURCE_URL") or row_dict.get("source_url")
+    chunk_index = row_dict.get("CHUNK_INDEX", row_dict.get("chunk_index"))
+    if doc is not None and chunk_index is not None:
+        return (doc, chunk_index)
+    chunk = row_dict.get("CHUNK") or row_dict.get("chunk") or row_dict.get("content") or ""
+    return (doc, hash(str(chunk)[:500]))
+
+
+def merge_results(result_lists: list[list[dict]], limit: int) -> list[dict]:
+    """Interleave ranked lists round-robin (original query first), dropping duplicates."""
+    merged, seen = [], set()
+    depth = max((len(r) for r in result_lists), default=0)
+    for rank in range(depth):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            key = result_key(results[rank])
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(results[rank])
+            if len(merged) >= limit:
+                return merged
+    return merged
+
+
+def fan_out_search(search, queries: list[str], limit: int, merged_limit: int | None = None) -> tuple[list[dict], list[dict]]:
+    """Run ``search(query, limit)`` for every sub-query concurrently and merge the hits.
+
+    Returns the merged results and per-sub-query stats (query, hits, seconds).
+    """
+    if merged_limit is None:
+        merged_limit = limit if len(queries) == 1 else min(len(queries), 2) * limit
+
+    def timed(query):
+        start = time.perf_counter()
+        results = search(query, limit) or []
+        return list(results), time.perf_counter() - start
+
+    if len(queries) == 1:
+        outcomes = [timed(queries[0])]
+    else:
+        pool = _get_search_pool()
+        futures = [submit_in_context(pool, timed, query) for query in queries]
+        outcomes = []
+        for query, future in zip(queries, futures):
+            try:
+                outcomes.append(future.result())
+            except Exception:
+                # A failed sub-query only costs recall; the original query must succeed.
+                if query == queries[0]:
+                    raise
+                outcomes.append(([], 0.0))
+
+    stats = [
+        {"query": query, "hits": len(results), "seconds": round(seconds, 3)}
+        for query, (results, seconds) in zip(queries, outcomes)
+    ]
+    return merge_results([results for results, _ in outcomes], merged_limit), stats
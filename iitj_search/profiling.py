@@ -0,0 +1,227 @@
+"""CPU and memory profiles of page reruns, for admins.
+
+With **Profile reruns** on (a sidebar toggle shown only to admins), Home.py
+runs the page inside ``RunProfiler``, which collects:
+
+* cProfile: the top functions by own time, with call counts and cumulative time;
+* a stack sampler: the script thread's stack every SAMPLE_INTERVAL seconds,
+  exported as folded stacks for flamegraph.pl, speedscope or inferno;
+* tracemalloc: the lines that allocated the most memory during the rerun,
+  and the peak.
+
+cProfile and the sampler see only the script thread. Searches and
+completions run on the turn pools, so the profile shows the time spent
+waiting for them (``run_in_turn``) rather than their own cost. tracemalloc
+counts every thread's allocations. Only one rerun at a time is profiled;
+another admin's rerun meanwhile runs unprofiled. Fragment reruns do not go
+through Home.py, so they are not profiled either.
+
+The last ``IITJ_PROFILES_KEPT`` (default 10) profiles are kept per process.
+Admins are logged-in curators whose email is listed in ``IITJ_ADMINS``
+(comma-separated; ``*`` for every curator). With the toggle off, the rerun
+runs untouched: nothing is imported or started.
+
+Profile one question's turn from the command line and write a flamegraph:
+    python -m iitj_search.profiling "List faculty in the Mathematics department" --folded turn.folded
+    flamegraph.pl turn.folded > turn.svg
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+ADMINS = frozenset(email.strip().lower() for email in os.environ.get("IITJ_ADMINS", "").split(",") if email.strip())
+KEEP_PROFILES = int(os.environ.get("IITJ_PROFILES_KEPT") or 10)
+TOP_ROWS = 15
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+TRACE_FRAMES = 1  # tracemalloc frames per allocation: the allocating line is enough
+
+_active = threading.Lock()  # one profiled rerun at a time (cProfile and tracemalloc are process-wide)
+_profiles: deque = deque(maxlen=KEEP_PROFILES)
+_profiles_lock = threading.Lock()
+
+
+def is_admin(state) -> bool:
+    """Whether the session's logged-in curator may profile reruns."""
+    email = (state.get("user_email") or "").lower()
+    return bool(state.get("authenticated") and email and ("*" in ADMINS or email in ADMINS))
+
+
+def _short(path: str) -> str:
+    """A file path relative to the app or to site-packages, else its last two parts."""
+    if path.startswith(str(APP_ROOT)):
+        return os.path.relpath(path, APP_ROOT)
+    _, sep, tail = path.rpartition("site-packages" + os.sep)
+    return tail if sep else os.path.join(*Path(path).parts[-2:])
+
+
+@dataclass
+class RunProfile:
+    label: str
+    user: str | None
+    started: float  # time.time()
+    seconds: float = 0.0
+    functions: list[dict] = field(default_factory=list)
+    allocations: list[dict] = field(default_factory=list)
+    peak_kib: float = 0.0
+    samples: int = 0
+    folded: str = ""  # "frame;frame;frame count" lines
+
+    def title(self) -> str:
+        return (f"{time.strftime('%H:%M:%S', time.localtime(self.started))} {self.label} "
+                f"({self.seconds * 1000:.0f} ms)")
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread every ``interval`` seconds."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="iitj-profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+        self._names: dict = {}
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            # ";" separates frames in the folded format (the count follows the last space).
+            name = f"{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+            self._names[code] = name
+        return name
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> str:
+        self._stop_event.set()
+        self.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RunProfiler:
+    """Context manager profiling the calling thread; ``result`` is the ``RunProfile`` afterwards."""
+
+    def __init__(self, label: str, user: str | None = None):
+        self.label = label
+        self.user = user
+        self.result: RunProfile | None = None
+        self._owns_lock = False
+
+    def __enter__(self):
+        self._owns_lock = _active.acquire(blocking=False)
+        if not self._owns_lock:
+            return self
+        import cProfile  # only when profiling
+
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        self._before = None if self._started_tracing else tracemalloc.take_snapshot()
+        self._sampler = StackSampler(threading.get_ident())
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._started = time.time()
+        self._start = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._owns_lock:
+            return False
+        try:
+            self._profile.disable()
+            seconds = time.perf_counter() - self._start
+            folded = self._sampler.stop()
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+            self.result = RunProfile(
+                self.label, self.user, self._started, seconds,
+                functions=self._functions(), allocations=self._allocations(snapshot),
+                peak_kib=peak / 1024, samples=sum(self._sampler.stacks.values()), folded=folded,
+            )
+            with _profiles_lock:
+                _profiles.appendleft(self.result)
+        finally:
+            _active.release()
+        return False
+
+    def _functions(self) -> list[dict]:
+        import pstats
+
+        rows = []
+        for (path, line, name), (_, calls, own, cumulative, _) in pstats.Stats(self._profile).stats.items():
+            where = name if path == "~" else f"{name} ({_short(path)}:{line})"
+            rows.append({"function": where, "calls": calls, "own_ms": own * 1000, "total_ms": cumulative * 1000})
+        rows.sort(key=lambda row: row["own_ms"], reverse=True)
+        return rows[:TOP_ROWS]
+
+    def _allocations(self, snapshot) -> list[dict]:
+        if self._before is not None:
+            # Tracing was already on: only what this rerun added.
+            stats = [s for s in snapshot.compare_to(self._before, "lineno") if s.size_diff > 0]
+            stats.sort(key=lambda s: s.size_diff, reverse=True)
+            sizes = [(s.traceback[0], s.size_diff, s.count_diff) for s in stats]
+        else:
+            sizes = [(s.traceback[0], s.size, s.count) for s in snapshot.statistics("lineno")]
+        return [
+            {"site": f"{_short(frame.filename)}:{frame.lineno}", "kib": size / 1024, "blocks": count}
+            for frame, size, count in sizes[:TOP_ROWS]
+        ]
+
+
+def recent_profiles() -> list[RunProfile]:
+    """This process's last profiles, newest first."""
+    with _profiles_lock:
+        return list(_profiles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("question")
+    parser.add_argument("--folded", type=Path, help="Write the sampled stacks here (flamegraph input)")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import command_line_backend
+    from iitj_search.engine import RagEngine
+
+    engine = RagEngine(command_line_backend(args.backend))
+    with RunProfiler(f"turn: {args.question}") as profiler:
+        engine.answer(args.question)
+    profile = profiler.result
+    print(f"{profile.title()}, {profile.samples} stack samples, peak traced memory {profile.peak_kib:.0f} KiB")
+    print(f"\n{'own ms':>9} {'total ms':>9} {'calls':>7}  function")
+    for row in profile.functions:
+        print(f"{row['own_ms']:9.1f} {row['total_ms']:9.1f} {row['calls']:7}  {row['function']}")
+    print(f"\n{'KiB':>9} {'blocks':>7}  allocation site")
+    for row in profile.allocations:
+        print(f"{row['kib']:9.1f} {row['blocks']:7}  {row['site']}")
+    if args.folded:
+        args.folded.write_text(profile.folded, encoding="utf-8")
+        print(f"\nfolded stacks written to {args.folded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Retrieval and prompt helpers shared by the AI Search page and offline tools."""
+
+import textwrap
+
+INSTRUCTIONS = textwrap.dedent("""
+    - You are an expert chat assistance that extracts information from the CONTEXT provided.                         
+    - You are a helpful AI assistant focused on answering questions about IIT Jodhpur.
+    - You will be given search results from IIT Jodhpur documents as context inside <search_results> tags.
+    - Use the context and conversation history to provide accurate, coherent answers.
+    - Use markdown formatting: headers (starting with ##), code blocks, bullet points, and backticks for inline code.
+    - Don't start responses with a markdown header.
+    - Be brief but clear and informative.
+    - Provide specific details from the search results.
+    - If the search results don't contain relevant information, say so clearly.
+    - DO NOT include source links or URLs in your response - they will be added automatically.
+    - Don't say things like "according to the provided context" or "based on the search results".
+    - If no relevant information is found, respond with "I'm sorry, I couldn't find any information on that topic in the provided documents. Recheck list of documents(URL) uploaded or connect with Mahantesh(m25ai2134@iitj.ac.in) for more information."
+
+""")
+
+
+def parse_columns(raw: str) -> list[str]:
+    return [c.strip() for c in raw.split(",") if c.strip()]
+
+
+def normalize_row(row) -> dict:
+    if isinstance(row, dict):
+        return row
+    if hasattr(row, "as_dict"):
+        return row.as_dict()
+    return dict(row)
+
+
+def clean_text(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return str(value)
+    # Handle escaped newlines and special characters from API responses
+    text = (
+        value.replace("\\r\\n", "\n")
+        .replace("\\n", "\n")
+        .replace("\\t", "\t")
+        .replace('\\"', '"')  # Handle escaped quotes
+        .replace("\\'", "'")   # Handle escaped single quotes
+    )
+    # Remove leading/trailing quotes if they wrap the entire response
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1]
+    return text
+
+
+def get_result_attributes(row_dict: dict) -> dict:
+    attrs = row_dict.get("ATTRIBUTES") or row_dict.get("attributes")
+    return attrs if isinstance(attrs, dict) else {}
+
+
+def extract_result_text(value):
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        for key in ("content", "text", "CHUNK", "chunk"):
+            if key in value:
+                return extract_result_text(value.get(key))
+        return clean_text(value)
+    return clean_text(value)
+
+
+def tokenize_text(text: str) -> list[str]:
+    if not text:
+        return []
+    normalized = "".join(ch.lower() if ch.isalnum() or ch.isspace() else " " for ch in text)
+    return [tok for tok in normalized.split() if tok]
+
+
+def is_searchable_question(question: str) -> bool:
+    """Return True only when query looks like an information need we should retrieve for."""
+    if not question or not question.strip():
+        return False
+
+    q = question.strip().lower()
+    q_tokens = tokenize_text(q)
+    if not q_tokens:
+        return False
+
+    # Common conversational messages where retrieval should be skipped.
+    smalltalk_exact = {
+        "hi", "hello", "hey", "test", "testing", "ok", "okay", "thanks", "thank you",
+        "good morning", "good afternoon", "good evening", "yo", "hii", "hlo"
+    }
+    if q in smalltalk_exact:
+        return False
+
+    # If very short and without clear academic intent, avoid retrieval.
+    intent_terms = {
+        "iitj", "iit", "jodhpur", "faculty", "professor", "department", "research",
+        "course", "program", "admission", "email", "contact", "lab", "publication",
+        "show", "list", "who", "what", "when", "where", "which", "how", "give", "tell", "explain"
+    }
+    has_intent = any(tok in intent_terms for tok in q_tokens) or "?" in question
+    if len(q_tokens) <= 2 and not has_intent:
+        return False
+
+    return has_intent or len(q_tokens) >= 3
+
+
+QUERY_STOPWORDS = {
+    "the", "a", "an", "is", "are", "was", "were", "be", "to", "of", "and", "or", "for",
+    "in", "on", "at", "by", "with", "about", "from", "as", "that", "this", "it", "i",
+    "you", "we", "they", "he", "she", "me", "my", "our", "your", "please", "can", "could",
+    "would", "should", "do", "does", "did", "tell", "give", "show", "list", "what", "who",
+    "when", "where", "which", "how"
+}
+
+
+def get_query_terms(question: str) -> set[str]:
+    return {tok for tok in tokenize_text(question) if len(tok) >= 3 and tok not in QUERY_STOPWORDS}
+
+
+def is_result_relevant_to_question(question: str, row_dict: dict) -> bool:
+    """Simple lexical relevance filter to avoid showing unrelated source links."""
+    query_terms = get_query_terms(question)
+    if not query_terms:
+        return False
+
+    title = (
+        row_dict.get("SHORT_DESCRIPTION")
+        or row_dict.get("short_description")
+        or row_dict.get("FILE_NAME")
+        or row_dict.get("file_name")
+        or ""
+    )
+    chunk = extract_result_text(
+        row_dict.get("CHUNK")
+        or row_dict.get("chunk")
+        or row_dict.get("CONTENT")
+        or row_dict.get("content")
+    ) or ""
+
+    searchable_text = f"{title} {chunk[:2000]}".lower()
+    return any(term in searchable_text for term in query_terms)
+
+
+def build_search_context(results: list[dict]) -> str:
+    """Build context string from search results for LLM prompt."""
+    if not results:
+        return "No relevant documents found."
+
+    context_blocks = []
+    for idx, row in enumerate(results, start=1):
+        row_dict = normalize_row(row)
+        attrs = get_result_attributes(row_dict)
+        title = clean_text(
+            attrs.get("TITLE")
+            or attrs.get("title")
+            or row_dict.get("TITLE")
+            or row_dict.get("title")
+            or row_dict.get("FILE_NAME")
+            or f"Document {idx}"
+        )
+        source_url = attrs.get("SOURCE_URL") or attrs.get("source_url") or row_dict.get("SOURCE_URL") or row_dict.get("source_url")
+        uploaded_by = clean_text(row_dict.get("UPLOADED_BY") or row_dict.get("UPLOADER"))
+        chunk_index = row_dict.get("CHUNK_INDEX")
+        snippet = extract_result_text(
+            row_dict.get("CONTENT")
+            or row_dict.get("CHUNK")
+            or row_dict.get("PAGE_CHUNK")
+            or row_dict.get("content")
+        )
+
+        block = f"[Document {idx} - {title}]"
+        if uploaded_by:
+            block += f"\nUploaded by: {uploaded_by}"
+        if chunk_index is not None:
+            block += f"\nChunk index: {chunk_index}"
+        if snippet:
+            block += f"\n{snippet}"
+        # Don't include source_url in context - we append it separately to avoid duplication
+
+        context_blocks.append(block)
+
+    return "\n\n".join(context_blocks)
+
+
+def history_to_text(chat_history):
+    """Converts chat history into a string."""
+    return "\n".join(f"[{h['role']}]: {h['content']}" for h in chat_history)
+
+
+def build_prompt(question: str, search_context: str, recent_history: str = None) -> str:
+    """Build the complete prompt for the LLM."""
+    prompt_parts = [f"<instructions>\n{INSTRUCTIONS}\n</instructions>"]
+    
+    if search_context:
+        prompt_parts.append(f"<search_results>\n{search_context}\n</search_results>")
+    
+    if recent_history:
+        prompt_parts.append(f"<recent_conversation>\n{recent_history}\n</recent_conversation>")
+    
+    prompt_parts.append(f"<question>\n{question}\n</question>")
+    
+    return "\n\n".join(prompt_parts)
@@ -0,0 +1,253 @@
+"""Reconcile the stage, the metadata table and the chunk table behind the search service.
+
+Uploads overwrite the staged file but add a fresh metadata row, and the
+embedding procedure appends chunks, so the three drift apart. This compares
+them using the stage's directory table and reports:
+
+    orphaned_chunks     chunks of files no longer on the stage
+    stale_chunks        chunks from an earlier embedding of a file
+    duplicate_metadata  older metadata rows for the same file
+    unstaged_metadata   metadata rows for files no longer on the stage
+    unembedded_files    staged files with no chunks (fix with backfill)
+    outdated_chunks     chunks older than the staged file (fix with backfill)
+    unregistered_files  staged files with no metadata row
+
+With ``--prune`` the first four are deleted in batches. A wrong or empty
+stage listing would make every chunk look orphaned, so the prune refuses
+to run when the stage lists no files, or when it would delete more than
+``--max-deletes`` rows (default: MAX_PRUNE_SHARE of the index), unless
+``--force`` is given. Exit code 0 means
+nothing is left to fix, 1 that discrepancies remain, 2 that the run failed,
+so it can be scheduled from cron and alert on non-zero.
+
+Usage:
+    python -m iitj_search.reconcile
+    python -m iitj_search.reconcile --prune --batch-size 500 --json
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+from iitj_search import config
+from iitj_search.backend import command_line_backend
+from iitj_search.backfill import parse_timestamp
+
+PRUNABLE = ["orphaned_chunks", "stale_chunks", "duplicate_metadata", "unstaged_metadata"]
+REPORT_ONLY = ["unembedded_files", "outdated_chunks", "unregistered_files"]
+MAX_PRUNE_SHARE = 0.2  # of the chunk and metadata rows, deleted in one run without --force
+
+
+def stage_directory(backend) -> dict[str, dict]:
+    """Staged files from the stage's directory table (refreshed first)."""
+    backend.sql(f"ALTER STAGE {config.STAGE} REFRESH")
+    rows = backend.sql(f"SELECT RELATIVE_PATH, SIZE, LAST_MODIFIED, MD5 FROM DIRECTORY(@{config.STAGE})")
+    return {
+        str(row["RELATIVE_PATH"]).rsplit("/", 1)[-1]: {
+            "size": row["SIZE"],
+            "md5": row["MD5"],
+            "last_modified": parse_timestamp(row["LAST_MODIFIED"]),
+        }
+        for row in rows
+    }
+
+
+def index_size(backend) -> dict:
+    """Row counts and sizes of the chunk and metadata tables."""
+    chunks = backend.sql(
+        f"""
+        SELECT COUNT(*) AS CHUNKS, COUNT(DISTINCT FILE_NAME) AS FILES, SUM(LENGTH(CHUNK)) AS CHARACTERS
+        FROM {config.qualified(config.CHUNK_TABLE)}
+        """
+    )[0]
+    metadata = backend.sql(f"SELECT COUNT(*) AS N FROM {config.qualified(config.METADATA_TABLE)}")[0]
+    return {
+        "chunks": chunks["CHUNKS"],
+        "chunk_files": chunks["FILES"],
+        "chunk_megabytes": round((chunks["CHARACTERS"] or 0) / (1 << 20), 2),
+        "metadata_rows": metadata["N"],
+    }
+
+
+def find_discrepancies(backend, staged: dict[str, dict] | None = None) -> dict:
+    """Everything out of line between stage, metadata and chunks.
+
+    Each prunable entry carries what the prune step needs: file names for
+    orphaned chunks, (file, newest CREATED_AT) for stale chunks and DOC_IDs
+    for metadata rows. ``staged`` is the stage listing, read when not given.
+    """
+    staged = stage_directory(backend) if staged is None else staged
+    metadata_rows = backend.sql(
+        f"SELECT DOC_ID, FILE_NAME, UPLOAD_TIMESTAMP FROM {config.qualified(config.METADATA_TABLE)}"
+    )
+    chunk_rows = backend.sql(
+        f"""
+        SELECT FILE_NAME, CREATED_AT, COUNT(*) AS CHUNKS
+        FROM {config.qualified(config.CHUNK_TABLE)}
+        GROUP BY FILE_NAME, CREATED_AT
+        """
+    )
+
+    generations = defaultdict(list)
+    for row in chunk_rows:
+        generations[row["FILE_NAME"]].append((row["CREATED_AT"], row["CHUNKS"]))
+    by_file = defaultdict(list)
+    for row in metadata_rows:
+        by_file[row["FILE_NAME"]].append(row)
+
+    found = {key: [] for key in PRUNABLE + REPORT_ONLY}
+    for name, batches in sorted(generations.items()):
+        if name not in staged:
+            found["orphaned_chunks"].append({"file": name, "chunks": sum(n for _, n in batches)})
+            continue
+        newest = max(batches, key=lambda batch: parse_timestamp(batch[0]) or datetime.min)
+        older = sum(n for created, n in batches if created != newest[0])
+        if older:
+            found["stale_chunks"].append({"file": name, "chunks": older, "keep_created_at": newest[0]})
+        embedded_at = parse_timestamp(newest[0])
+        if embedded_at and staged[name]["last_modified"] and embedded_at < staged[name]["last_modified"]:
+            found["outdated_chunks"].append({"file": name, "chunks": newest[1]})
+
+    for name, rows in sorted(by_file.items()):
+        rows = sorted(rows, key=lambda r: (str(r["UPLOAD_TIMESTAMP"] or ""), r["DOC_ID"]), reverse=True)
+        if name not in staged:
+            found["unstaged_metadata"].extend({"file": name, "doc_id": r["DOC_ID"]} for r in rows)
+        else:
+            found["duplicate_metadata"].extend({"file": name, "doc_id": r["DOC_ID"]} for r in rows[1:])
+
+    for name in sorted(staged):
+        if name not in generations:
+            found["unembedded_files"].append({"file": name})
+        if name not in by_file:
+            found["unregistered_files"].append({"file": name})
+    return found
+
+
+def check_prune(found: dict, staged: dict, before: dict, max_deletes: int | None = None):
+    """Raise RuntimeError when the prune looks like a bad stage listing rather than drift."""
+    to_delete = sum(counts({key: found[key]})[key] for key in PRUNABLE)
+    if not to_delete:
+        return
+    if not staged:
+        raise RuntimeError(f"the stage lists no files, so {to_delete} rows would be pruned; "
+                           "check the stage or pass --force")
+    if max_deletes is None:
+        max_deletes = int(MAX_PRUNE_SHARE * (before["chunks"] + before["metadata_rows"]))
+    if to_delete > max_deletes:
+        raise RuntimeError(f"{to_delete} rows to prune exceeds --max-deletes {max_deletes}; "
+                           "check the stage or pass --force")
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def prune(backend, found: dict, batch_size: int = 500, report=print) -> dict[str, int]:
+    """Delete the prunable discrepancies in batches; returns rows deleted per kind."""
+    chunk_table = config.qualified(config.CHUNK_TABLE)
+    metadata_table = config.qualified(config.METADATA_TABLE)
+    deleted = {key: 0 for key in PRUNABLE}
+
+    for batch in _batches(found["orphaned_chunks"], batch_size):
+        backend.sql(
+            f"DELETE FROM {chunk_table} WHERE FILE_NAME IN ({', '.join('?' for _ in batch)})",
+            params=[item["file"] for item in batch],
+        )
+        deleted["orphaned_chunks"] += sum(item["chunks"] for item in batch)
+        report(f"orphaned_chunks: {deleted['orphaned_chunks']} deleted")
+
+    for batch in _batches(found["stale_chunks"], batch_size):
+        backend.sql(
+            f"DELETE FROM {chunk_table} WHERE "
+            + " OR ".join("(FILE_NAME = ? AND CREATED_AT <> ?)" for _ in batch),
+            params=[value for item in batch for value in (item["file"], item["keep_created_at"])],
+        )
+        deleted["stale_chunks"] += sum(item["chunks"] for item in batch)
+        report(f"stale_chunks: {deleted['stale_chunks']} deleted")
+
+    for kind in ("duplicate_metadata", "unstaged_metadata"):
+        for batch in _batches(found[kind], batch_size):
+            backend.sql(
+                f"DELETE FROM {metadata_table} WHERE DOC_ID IN ({', '.join('?' for _ in batch)})",
+                params=[item["doc_id"] for item in batch],
+            )
+            deleted[kind] += len(batch)
+            report(f"{kind}: {deleted[kind]} deleted")
+    return deleted
+
+
+def counts(found: dict) -> dict[str, int]:
+    return {
+        key: sum(item.get("chunks", 1) for item in items) if key.endswith("_chunks") else len(items)
+        for key, items in found.items()
+    }
+
+
+def print_report(before: dict, after: dict | None, found: dict, deleted: dict | None):
+    print("Discrepancies:")
+    for key, value in counts(found).items():
+        unit = "chunks" if key.endswith("_chunks") else ("rows" if key.endswith("_metadata") else "files")
+        action = "" if key in PRUNABLE else "  (report only)"
+        examples = ", ".join(item["file"] for item in found[key][:3])
+        print(f"  {key:<20} {value:>7} {unit:<6}{action}{'  e.g. ' + examples if examples else ''}")
+    if deleted is not None:
+        print("Pruned: " + ", ".join(f"{key} {value}" for key, value in deleted.items()))
+    print(f"{'index size':<20} {'before':>10}" + (f" {'after':>10}" if after else ""))
+    for key, value in before.items():
+        print(f"  {key:<18} {value:>10}" + (f" {after[key]:>10}" if after else ""))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prune", action="store_true", help="Delete orphaned/stale chunks and stale metadata rows")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows or files per DELETE")
+    parser.add_argument("--max-deletes", type=int,
+                        help=f"Refuse to prune more than this many rows in one run "
+                             f"(default: {MAX_PRUNE_SHARE:.0%} of the chunk and metadata rows)")
+    parser.add_argument("--force", action="store_true",
+                        help="Prune even with an empty stage listing or above --max-deletes")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    parser.add_argument("--json", action="store_true", help="Machine-readable output for schedulers")
+    args = parser.parse_args(argv)
+
+    try:
+        backend = command_line_backend(args.backend)
+        before = index_size(backend)
+        staged = stage_directory(backend)
+        found = find_discrepancies(backend, staged)
+        deleted = after = None
+        if args.prune:
+            if not args.force:
+                check_prune(found, staged, before, args.max_deletes)
+            deleted = prune(backend, found, args.batch_size, report=(lambda _: None) if args.json else print)
+            after = index_size(backend)
+            remaining = find_discrepancies(backend)
+        else:
+            remaining = found
+    except Exception as exc:
+        if args.json:
+            print(json.dumps({"ok": False, "error": str(exc)}))
+        else:
+            print(f"Reconciliation failed: {exc}", file=sys.stderr)
+        return 2
+
+    drift = any(counts(remaining).values())
+    if args.json:
+        print(json.dumps({
+            "ok": not drift,
+            "discrepancies": counts(found),
+            "remaining": counts(remaining),
+            "deleted": deleted,
+            "before": before,
+            "after": after,
+        }))
+    else:
+        print_report(before, after, found, deleted)
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
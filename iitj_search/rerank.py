@@ -0,0 +1,112 @@
+"""Local CPU reranker for over-fetched search candidates.
+
+Two-stage retrieval: ask Cortex Search for a larger candidate set, rescore
+the candidates here and prompt the LLM with only the best few. The scorer is
+BM25 over the candidate chunks, plus a boost for query terms found in the
+title (SHORT_DESCRIPTION / FILE_NAME), a query-term proximity bonus and a
+small prior from the service's own ranking.
+"""
+
+import math
+from collections import Counter
+
+from iitj_search.rag import QUERY_STOPWORDS, extract_result_text, normalize_row, tokenize_text
+
+OVERFETCH_FACTOR = 3
+MAX_CANDIDATES = 60
+DEFAULT_PROMPT_CHUNKS = 5
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_BOOST = 1.5
+PROXIMITY_BOOST = 1.0
+RANK_PRIOR = 4.0
+
+
+def candidate_count(limit: int) -> int:
+    """How many candidates to over-fetch for a final depth of ``limit``."""
+    return min(MAX_CANDIDATES, limit * OVERFETCH_FACTOR)
+
+
+def rerank_terms(question: str) -> list[str]:
+    # Unlike get_query_terms, keep two-letter terms such as "ai" and "ee".
+    seen = []
+    for tok in tokenize_text(question):
+        if len(tok) >= 2 and tok not in QUERY_STOPWORDS and tok not in seen:
+            seen.append(tok)
+    return seen
+
+
+def _title(row_dict: dict) -> str:
+    return str(
+        row_dict.get("SHORT_DESCRIPTION") or row_dict.get("short_description") or ""
+    ) + " " + str(row_dict.get("FILE_NAME") or row_dict.get("file_name") or "").replace("_", " ")
+
+
+def _chunk(row_dict: dict) -> str:
+    return extract_result_text(
+        row_dict.get("CHUNK") or row_dict.get("chunk") or row_dict.get("CONTENT") or row_dict.get("content")
+    ) or ""
+
+
+def proximity(positions: dict[str, list[int]]) -> float:
+    """Matched terms / length of the smallest window containing all of them (1.0 when adjacent)."""
+    if len(positions) < 2:
+        return 0.0
+    events = sorted((pos, term) for term, plist in positions.items() for pos in plist)
+    need = len(positions)
+    counts: Counter = Counter()
+    best = math.inf
+    left = 0
+    for pos, term in events:
+        counts[term] += 1
+        while len(counts) == need:
+            best = min(best, pos - events[left][0] + 1)
+            left_term = events[left][1]
+            counts[left_term] -= 1
+            if not counts[left_term]:
+                del counts[left_term]
+            left += 1
+    return (need / best) if best != math.inf else 0.0
+
+
+def rerank(question: str, results: list[dict]) -> list[tuple[float, dict]]:
+    """Rescore candidates; returns (score, row) pairs, best first."""
+    terms = rerank_terms(question)
+    if not terms or not results:
+        return [(0.0, row) for row in results]
+
+    docs = []
+    for row in results:
+        row_dict = normalize_row(row)
+        tokens = tokenize_text(_chunk(row_dict))
+        docs.append((row, tokens, set(tokenize_text(_title(row_dict)))))
+
+    avg_len = sum(len(tokens) for _, tokens, _ in docs) / len(docs) or 1.0
+    doc_freq = Counter(term for _, tokens, _ in docs for term in set(tokens) if term in terms)
+    total = len(docs)
+
+    scored = []
+    for rank, (row, tokens, title_terms) in enumerate(docs):
+        tf = Counter(tok for tok in tokens if tok in terms)
+        bm25 = 0.0
+        for term, freq in tf.items():
+            idf = math.log(1 + (total - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_len)
+            bm25 += idf * freq * (BM25_K1 + 1) / (freq + norm)
+
+        title_score = TITLE_BOOST * len(title_terms.intersection(terms)) / len(terms)
+        positions: dict[str, list[int]] = {}
+        for pos, tok in enumerate(tokens):
+            if tok in tf:
+                positions.setdefault(tok, []).append(pos)
+        proximity_score = PROXIMITY_BOOST * proximity(positions)
+        prior = RANK_PRIOR / (1 + rank)
+        scored.append((bm25 + title_score + proximity_score + prior, rank, row))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(round(score, 4), row) for score, _, row in scored]
+
+
+def rerank_top(question: str, results: list[dict], top_n: int = DEFAULT_PROMPT_CHUNKS) -> list[dict]:
+    return [row for _, row in rerank(question, results)[:top_n]]
@@ -0,0 +1,158 @@
+"""Rerun counts and times per page scope, and a benchmark of them.
+
+The search page records every execution of the whole script ("app") and of
+each fragment (settings, transcript, feedback, debug, export) in session
+state, so the Debug Info panel shows how many reruns each interaction cost
+and how long they took. In the browser a widget inside a fragment reruns
+only that fragment; the app count stays put.
+
+AppTest always reruns the whole script, so the benchmark drives one session
+through a few questions, then performs each interaction and reports the
+whole-script rerun it would have cost without fragments next to the time of
+the fragment that now reruns on its own.
+
+Usage:
+    python -m iitj_search.reruns
+    python -m iitj_search.reruns --turns 4 --sql-latency 0.05
+"""
+
+import argparse
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+STATS_KEY = "rerun_stats"
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+SEARCH_PAGE = APP_ROOT / "pages" / "02_AI_Search.py"
+SUGGESTION = ":blue[:material/local_library:] List all faculty"
+QUESTIONS = [
+    "Which of them work in AI/DATA SCIENCE?",
+    "Give the email of Binod Kumar",
+    "Show departments at IIT Jodhpur",
+    "Any recent scholarship notices?",
+]
+
+
+def record_rerun(state, scope: str, seconds: float):
+    stats = state.setdefault(STATS_KEY, {})
+    entry = stats.setdefault(scope, {"runs": 0, "seconds": 0.0, "last_seconds": 0.0})
+    entry["runs"] += 1
+    entry["seconds"] += seconds
+    entry["last_seconds"] = seconds
+
+
+@contextmanager
+def rerun_timer(state, scope: str):
+    """Count one run of ``scope`` and add its wall time."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_rerun(state, scope, time.perf_counter() - start)
+
+
+def rerun_summary(state) -> list[dict]:
+    return [
+        {
+            "scope": scope,
+            "runs": entry["runs"],
+            "mean_ms": 1000 * entry["seconds"] / entry["runs"],
+            "last_ms": 1000 * entry["last_seconds"],
+        }
+        for scope, entry in sorted(state.get(STATS_KEY, {}).items())
+    ]
+
+
+def _interactions(at):
+    """(name, scope that reruns in the browser or None, action) for each interaction."""
+
+    def results_slider():
+        slider = next(s for s in at.sidebar.slider if s.label == "Results")
+        return slider.set_value(15 if slider.value != 15 else 12).run()
+
+    def send_feedback():
+        return [b for b in at.button if b.label == "Send feedback"][-1].click().run()
+
+    def planner_toggle():
+        toggle = next(t for t in at.sidebar.toggle if t.label == "Split compound questions")
+        return toggle.set_value(not toggle.value).run()
+
+    return [
+        ("Results slider", "settings", results_slider),
+        ("Split compound questions", "settings", planner_toggle),
+        ("Send feedback (star + submit)", "feedback", send_feedback),
+        # Opening the popover or the Debug Info expander never reruns; the
+        # debug fragment is timed from the full rerun below.
+        ("Save PDF", None, at.run),
+    ]
+
+
+def bench(turns: int, latency, scale: int, repeats: int) -> list[dict]:
+    from streamlit.testing.v1 import AppTest
+    from iitj_search.backend import LocalBackend
+    from iitj_search.local_corpus import build_corpus
+
+    backend = LocalBackend(latency=latency)
+    backend.load_corpus(build_corpus(scale))
+    at = AppTest.from_file(str(SEARCH_PAGE), default_timeout=120)
+    at.session_state["backend"] = backend
+    at.run()
+    at.session_state["selected_suggestion"] = SUGGESTION
+    at.run()
+    for question in (QUESTIONS * turns)[:max(turns - 1, 0)]:
+        at.chat_input[0].set_value(question).run()
+
+    rows = []
+    for name, scope, action in _interactions(at):
+        app_ms, scope_ms = [], []
+        for _ in range(repeats):
+            at.session_state[STATS_KEY] = {}
+            action()
+            if len(at.exception):
+                raise RuntimeError(f"{name}: {at.exception[0].value}")
+            stats = {row["scope"]: row for row in rerun_summary(at.session_state)}
+            app_ms.append(stats["app"]["last_ms"])
+            scope_ms.append(stats[scope]["last_ms"] if scope else 0.0)
+        rows.append({
+            "interaction": name,
+            "reruns": scope or "none",
+            "full_ms": statistics.median(app_ms),
+            "fragment_ms": statistics.median(scope_ms),
+        })
+    # Fragments that only rerun with the app are listed for reference.
+    for scope in ("transcript", "debug", "export"):
+        rows.append({
+            "interaction": f"({scope} fragment)",
+            "reruns": scope,
+            "full_ms": statistics.median(app_ms),
+            "fragment_ms": stats[scope]["last_ms"],
+        })
+    return rows
+
+
+def print_table(rows: list[dict], turns: int):
+    print(f"{turns} turns in the transcript; full = whole-script rerun, fragment = what reruns now")
+    print(f"{'interaction':<32} {'reruns':<10} {'full ms':>10} {'fragment ms':>12}")
+    for r in rows:
+        print(f"{r['interaction']:<32} {r['reruns']:<10} {r['full_ms']:>10.1f} {r['fragment_ms']:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=3, help="Questions asked before measuring")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=200, help="Generated filler documents in the local corpus")
+    parser.add_argument("--sql-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.0)
+    parser.add_argument("--complete-latency", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    from iitj_search.backend import LocalLatency
+    latency = LocalLatency(sql=args.sql_latency, search=args.search_latency, complete=args.complete_latency)
+    print_table(bench(args.turns, latency, args.scale, args.repeats), args.turns)
+
+
+if __name__ == "__main__":
+    main()
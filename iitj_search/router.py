@@ -0,0 +1,258 @@
+"""Per-turn model routing with a deadline, hedged fallbacks and latency histograms.
+
+Each turn is classified as simple or complex from the question (compound
+questions, comparisons, explanations, long questions) and the prompt size.
+Simple turns go to the fast tier and complex ones to the strong tier; within
+a tier the model with the lowest recent median latency wins, skipping models
+that have been failing or whose context window the prompt does not fit.
+
+The primary model is called on a shared thread pool. If it has not answered
+after ``hedge_after`` seconds (its own recent p95, clamped) the fallback
+model is called as well and whichever answers first is used; an error from
+the primary starts the fallback at once. Past the deadline the turn fails
+with ``RouteTimeout``. Every call, including a hedge's loser, is recorded in
+per-model latency histograms.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from iitj_search.backend import estimate_tokens
+from iitj_search.jobs import QueryCancelled, submit_in_context
+from iitj_search.planner import plan_queries
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    tier: str  # "fast" or "strong"
+    context_tokens: int
+    expected_seconds: float  # assumed latency until the model has been observed
+
+
+MODELS = {
+    "claude-sonnet-4-6": ModelProfile("strong", 200_000, 6.0),
+    "claude-4-sonnet": ModelProfile("strong", 200_000, 6.0),
+    "llama3.1-70b": ModelProfile("fast", 128_000, 3.0),
+}
+AUTO = "Auto"
+DEADLINE = 45.0  # seconds for the whole turn
+HEDGE_MIN, HEDGE_MAX = 2.0, 15.0  # clamp for the hedge delay
+LARGE_PROMPT_TOKENS = 6000
+LONG_QUESTION_WORDS = 25
+COMPLEX_PATTERN = re.compile(
+    r"\b(?:compare|comparison|difference|differences|versus|vs|explain|why|how does|how do|summari[sz]e|"
+    r"pros and cons|step by step|eligibility|procedure)\b",
+    re.IGNORECASE,
+)
+# Upper bounds (seconds) of the latency histogram buckets; the last is open-ended.
+BUCKETS = [0.5, 1, 2, 4, 8, 16, 32, 60]
+RECENT_CALLS = 50
+# Skip a model when at least this share of its last few calls failed.
+FAILURE_WINDOW, FAILURE_SHARE = 10, 0.5
+
+POOL_SIZE = 16
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class RouteTimeout(TimeoutError):
+    """No model answered within the deadline."""
+
+
+class LatencyStats:
+    """Process-wide per-model latency histograms and recent outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: dict[str, dict] = {}
+
+    def _entry(self, model: str) -> dict:
+        return self._models.setdefault(model, {
+            "buckets": [0] * (len(BUCKETS) + 1),
+            "recent": deque(maxlen=RECENT_CALLS),  # (seconds, ok)
+            "calls": 0,
+            "errors": 0,
+        })
+
+    def record(self, model: str, seconds: float, ok: bool = True):
+        with self._lock:
+            entry = self._entry(model)
+            entry["calls"] += 1
+            entry["errors"] += not ok
+            entry["recent"].append((seconds, ok))
+            if ok:
+                entry["buckets"][bisect_left(BUCKETS, seconds)] += 1
+
+    def recent_latency(self, model: str, pct: float) -> float | None:
+        with self._lock:
+            entry = self._models.get(model)
+            times = sorted(s for s, ok in entry["recent"] if ok) if entry else []
+        if len(times) < 3:
+            return None
+        return times[min(len(times) - 1, round(pct / 100 * (len(times) - 1)))]
+
+    def failing(self, model: str) -> bool:
+        with self._lock:
+            entry = self._models.get(model)
+            last = list(entry["recent"])[-FAILURE_WINDOW:] if entry else []
+        return len(last) >= 3 and sum(not ok for _, ok in last) / len(last) >= FAILURE_SHARE
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            models = {name: dict(entry, recent=list(entry["recent"])) for name, entry in self._models.items()}
+        return {
+            name: {
+                "calls": entry["calls"],
+                "errors": entry["errors"],
+                "p50_s": self.recent_latency(name, 50),
+                "p95_s": self.recent_latency(name, 95),
+                "histogram": dict(zip([f"<={b}s" for b in BUCKETS] + [f">{BUCKETS[-1]}s"], entry["buckets"])),
+            }
+            for name, entry in sorted(models.items())
+        }
+
+
+latency_stats = LatencyStats()
+
+
+@dataclass
+class RouteDecision:
+    primary: str
+    fallback: str | None
+    complexity: str
+    reason: str
+    hedge_after: float | None  # None: only fall back on an error (manual choice)
+    deadline: float = DEADLINE
+
+
+@dataclass
+class RoutedAnswer:
+    text: str
+    model: str
+    decision: RouteDecision
+    seconds: float
+    hedged: bool = False
+    attempts: list[dict] = field(default_factory=list)
+
+
+def classify(question: str, prompt_tokens: int) -> tuple[str, str]:
+    """("simple" | "complex", why)."""
+    if prompt_tokens > LARGE_PROMPT_TOKENS:
+        return "complex", f"prompt ~{prompt_tokens} tokens"
+    if len(plan_queries(question)) > 1:
+        return "complex", "compound question"
+    match = COMPLEX_PATTERN.search(question)
+    if match:
+        return "complex", f"asks to {match.group(0).lower()}"
+    if len(question.split()) > LONG_QUESTION_WORDS:
+        return "complex", "long question"
+    return "simple", "short single question"
+
+
+def _expected(model: str) -> float:
+    return latency_stats.recent_latency(model, 50) or MODELS[model].expected_seconds
+
+
+def _hedge_after(model: str, deadline: float) -> float:
+    p95 = latency_stats.recent_latency(model, 95) or MODELS[model].expected_seconds * 1.5
+    return max(HEDGE_MIN, min(p95, HEDGE_MAX, deadline / 2))
+
+
+def choose(question: str, prompt: str, override: str | None = None, deadline: float = DEADLINE) -> RouteDecision:
+    """Pick the primary and fallback model for one turn."""
+    prompt_tokens = estimate_tokens(prompt)
+    complexity, why = classify(question, prompt_tokens)
+    fits = [m for m, p in MODELS.items() if p.context_tokens > prompt_tokens] or list(MODELS)
+    healthy = [m for m in fits if not latency_stats.failing(m)] or fits
+
+    if override and override != AUTO:
+        others = sorted((m for m in healthy if m != override), key=_expected)
+        return RouteDecision(override, others[0] if others else None, complexity, "chosen in the sidebar", None, deadline)
+
+    tier = "strong" if complexity == "complex" else "fast"
+    ranked = sorted(healthy, key=lambda m: (MODELS[m].tier != tier, _expected(m)))
+    primary = ranked[0]
+    # The fallback is the tier's next model, or the other tier's fastest.
+    fallback = ranked[1] if len(ranked) > 1 else None
+    reason = f"{complexity} ({why}); {primary} ~{_expected(primary):.1f}s recently"
+    # With every other model failing there is nothing to hedge with.
+    hedge_after = _hedge_after(primary, deadline) if fallback else None
+    return RouteDecision(primary, fallback, complexity, reason, hedge_after, deadline)
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="iitj-complete")
+        return _pool
+
+
+def _timed_complete(complete, model: str, prompt: str):
+    start = time.perf_counter()
+    try:
+        text = complete(model, prompt)
+    except QueryCancelled:
+        raise  # not the model's fault
+    except Exception:
+        latency_stats.record(model, time.perf_counter() - start, ok=False)
+        raise
+    seconds = time.perf_counter() - start
+    latency_stats.record(model, seconds, ok=bool(text))
+    if not text:
+        raise ValueError("empty response")
+    return text, seconds
+
+
+def complete_routed(complete, prompt: str, decision: RouteDecision) -> RoutedAnswer:
+    """Run ``complete(model, prompt)`` for the decision, hedging and falling back as needed."""
+    pool = _get_pool()
+    start = time.monotonic()
+    futures = {submit_in_context(pool, _timed_complete, complete, decision.primary, prompt): decision.primary}
+    attempts, hedged = [], False
+    hedge_at = decision.hedge_after if decision.fallback else None
+
+    def start_fallback():
+        nonlocal hedged
+        if decision.fallback and decision.fallback not in futures.values():
+            future = submit_in_context(pool, _timed_complete, complete, decision.fallback, prompt)
+            futures[future] = decision.fallback
+            pending.add(future)
+            hedged = True
+
+    # Futures not yet handled: only what ``wait`` returns as done leaves, so a
+    # fallback finishing right after the wait is still read on the next pass.
+    pending = set(futures)
+    while pending:
+        remaining = decision.deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        hedge_in = None
+        if hedge_at is not None and not hedged:
+            hedge_in = max(0.0, hedge_at - (time.monotonic() - start))
+        done, pending = wait(pending, timeout=min(remaining, hedge_in if hedge_in is not None else remaining),
+                             return_when=FIRST_COMPLETED)
+        for future in done:
+            model = futures[future]
+            try:
+                text, seconds = future.result()
+            except QueryCancelled:
+                raise
+            except Exception as exc:
+                attempts.append({"model": model, "error": f"{type(exc).__name__}: {exc}"})
+                start_fallback()
+                continue
+            attempts.append({"model": model, "seconds": round(seconds, 3)})
+            return RoutedAnswer(text, model, decision, time.monotonic() - start, hedged, attempts)
+        if not done and hedge_in is not None and time.monotonic() - start >= hedge_at:
+            start_fallback()
+            hedge_at = None  # past the hedge point, whether or not a hedge started
+
+    if attempts and all("error" in a for a in attempts) and not pending:
+        raise RuntimeError("; ".join(f"{a['model']}: {a['error']}" for a in attempts))
+    raise RouteTimeout(f"no model answered within {decision.deadline:.0f}s ({', '.join(futures.values())})")
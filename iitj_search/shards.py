@@ -0,0 +1,473 @@
+"""Search shards: Cortex Search services partitioned by department or document type.
+
+With one service over every chunk, index refresh lag and query latency grow
+with the whole corpus. The routing table (``IITJ_SEARCH_SHARDS``) splits it:
+each row is a shard with its own service, defined over the chunks whose
+``SHARD`` column names it (``--ddl`` prints the statements), and the rules
+that send files and questions to it:
+
+    URL_PATTERNS  source URL / file name fragments (department slugs) that
+                  assign a file to the shard
+    FILE_TYPES    file types assigned to the shard; a shard that lists types
+                  holds only those, so a file-type filter can skip it
+    KEYWORDS      words (department names) that route a question to it
+    IS_DEFAULT    the shard for files no rule matches (and unassigned chunks)
+
+New files are assigned after embedding (``assign_file``). A question goes to
+the shards it mentions plus the default shard, or to every shard when it
+mentions none; several shards are queried in parallel and the hits merged by
+relevance score. Without routing rows the single IITJ_AI_SEARCH service is
+used as before.
+
+Usage:
+    python -m iitj_search.shards --show
+    python -m iitj_search.shards --split-departments --assign-all   # local corpus layout
+    python -m iitj_search.shards --ddl --warehouse COMPUTE_WH
+    python -m iitj_search.shards --ask "faculty in computer science"
+    python -m iitj_search.shards --bench --sizes 500,2000,8000 \\
+        --latency "search=0.05,search_per_1k_chunks=0.1"
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from iitj_search import config
+from iitj_search.backend import tokenize
+from iitj_search.depth import result_score
+from iitj_search.jobs import submit_in_context
+from iitj_search.planner import result_key
+
+SHARD_POOL_SIZE = 16
+ASSIGN_BATCH = 200
+DEFAULT_SHARD = "general"
+# Score kinds that mean the same thing in every shard's service.
+COMPARABLE_SCORES = {"cosine_similarity"}
+SERVICE_ATTRIBUTES = ["FILE_TYPE", "UPLOADED_BY", "UPLOAD_TIMESTAMP", "SOURCE_DOMAIN"]
+SERVICE_COLUMNS = [
+    "CHUNK", "CHUNK_INDEX", "FILE_NAME", "SHORT_DESCRIPTION", "SOURCE_URL",
+    "FILE_TYPE", "UPLOADED_BY", "UPLOAD_TIMESTAMP", "SOURCE_DOMAIN",
+]
+# Department groups for ``--split-departments`` (codes from local_corpus.DEPARTMENTS).
+DEPARTMENT_GROUPS = {
+    "engineering": ["cse", "ee", "me", "cie", "che", "mme"],
+    "sciences": ["bb", "chy", "phy", "ma"],
+    "schools": ["aids", "sla"],
+}
+_NAME_NOISE = {"department", "of", "school", "engineering"}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _split(value) -> tuple[str, ...]:
+    return tuple(part.strip().lower() for part in str(value or "").split(",") if part.strip())
+
+
+def _phrase(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+@dataclass(frozen=True)
+class ShardRoute:
+    shard: str
+    service: str
+    url_patterns: tuple[str, ...] = ()
+    file_types: tuple[str, ...] = ()
+    keywords: tuple[str, ...] = ()
+    is_default: bool = False
+    priority: int = 100
+
+    def holds_file(self, file_name: str, source_url: str | None, file_type: str | None) -> bool:
+        """Whether this shard's rules (not the default fallback) claim the file."""
+        if not (self.url_patterns or self.file_types):
+            return False
+        haystack = f"{source_url or ''} {file_name or ''}".lower()
+        if self.url_patterns and not any(pattern in haystack for pattern in self.url_patterns):
+            return False
+        return not self.file_types or (file_type or "").lower() in self.file_types
+
+    def mentioned_in(self, question: str) -> bool:
+        text = f" {_phrase(question)} "
+        return any(f" {_phrase(keyword)} " in text for keyword in self.keywords)
+
+    def qualified_service(self) -> str:
+        return self.service if "." in self.service else config.qualified(self.service)
+
+
+class RoutingTable:
+    """The shard routes, in priority order."""
+
+    def __init__(self, routes: list[ShardRoute]):
+        self.routes = sorted(routes, key=lambda route: (route.priority, route.shard))
+        defaults = [route for route in self.routes if route.is_default]
+        self.default = defaults[0] if defaults else self.routes[0]
+
+    @classmethod
+    def single(cls) -> "RoutingTable":
+        """The unsharded layout: one service over every chunk."""
+        return cls([ShardRoute(DEFAULT_SHARD, config.SEARCH_SERVICE, is_default=True)])
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.routes) > 1
+
+    def assign(self, file_name: str, source_url: str | None, file_type: str | None) -> ShardRoute:
+        for route in self.routes:
+            if route.holds_file(file_name, source_url, file_type):
+                return route
+        return self.default
+
+    def select(self, question: str, file_types: list[str] | None = None) -> tuple[list[ShardRoute], str]:
+        """Shards to query for a question (and file-type filter), with the reason."""
+        wanted = {file_type.lower() for file_type in file_types or []}
+        candidates = [
+            route for route in self.routes
+            if route is self.default or not (wanted and route.file_types and not wanted & set(route.file_types))
+        ]
+        skipped = len(self.routes) - len(candidates)
+        mentioned = [route for route in candidates if route.mentioned_in(question)]
+        if mentioned:
+            chosen = mentioned + ([self.default] if self.default not in mentioned else [])
+            reason = "mentions " + ", ".join(route.shard for route in mentioned)
+        else:
+            chosen = candidates
+            reason = "no shard mentioned" if self.sharded else "unsharded"
+        if skipped:
+            reason += f"; {skipped} skipped by file type"
+        return chosen, reason
+
+
+def ensure_shard_table(backend):
+    backend.sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {config.qualified(config.SHARD_TABLE)} (
+            SHARD VARCHAR, SERVICE VARCHAR, URL_PATTERNS VARCHAR, FILE_TYPES VARCHAR, KEYWORDS VARCHAR,
+            IS_DEFAULT BOOLEAN DEFAULT FALSE, PRIORITY INTEGER DEFAULT 100
+        )
+        """
+    )
+    backend.sql(f"ALTER TABLE {config.qualified(config.CHUNK_TABLE)} ADD COLUMN IF NOT EXISTS SHARD VARCHAR")
+
+
+def load_routes(backend) -> RoutingTable:
+    """The routing table, or the single service when there is none (or it is empty)."""
+    try:
+        rows = backend.sql(
+            f"""
+            SELECT SHARD, SERVICE, URL_PATTERNS, FILE_TYPES, KEYWORDS, IS_DEFAULT, PRIORITY
+            FROM {config.qualified(config.SHARD_TABLE)}
+            """
+        )
+    except Exception:
+        return RoutingTable.single()
+    routes = [
+        ShardRoute(
+            shard=row["SHARD"], service=row["SERVICE"],
+            url_patterns=_split(row["URL_PATTERNS"]), file_types=_split(row["FILE_TYPES"]),
+            keywords=_split(row["KEYWORDS"]), is_default=bool(row["IS_DEFAULT"]),
+            priority=int(row["PRIORITY"] if row["PRIORITY"] is not None else 100),
+        )
+        for row in rows if row["SHARD"] and row["SERVICE"]
+    ]
+    return RoutingTable(routes) if routes else RoutingTable.single()
+
+
+def save_routes(backend, routes: list[ShardRoute]):
+    """Replace the routing table (existing chunk assignments are left alone; see ``assign_all``)."""
+    ensure_shard_table(backend)
+    table = config.qualified(config.SHARD_TABLE)
+    backend.sql(f"DELETE FROM {table}")
+    for route in routes:
+        backend.sql(
+            f"""
+            INSERT INTO {table} (SHARD, SERVICE, URL_PATTERNS, FILE_TYPES, KEYWORDS, IS_DEFAULT, PRIORITY)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            params=[route.shard, route.service, ",".join(route.url_patterns), ",".join(route.file_types),
+                    ",".join(route.keywords), route.is_default, route.priority],
+        )
+
+
+def department_routes() -> list[ShardRoute]:
+    """Shards for the DEPARTMENT_GROUPS of the local corpus, plus a default ``general`` shard."""
+    from iitj_search.local_corpus import DEPARTMENTS
+
+    routes = []
+    for priority, (shard, codes) in enumerate(DEPARTMENT_GROUPS.items(), start=1):
+        departments = [d for d in DEPARTMENTS if d[0] in codes]
+        keywords = []
+        for code, name, _ in departments:
+            # "Civil and Infrastructure Engineering" -> "civil", "infrastructure"
+            for part in name.lower().split(" and "):
+                words = [word for word in part.split() if word not in _NAME_NOISE]
+                if words:
+                    keywords.append(" ".join(words))
+            if len(code) > 2:  # "me", "ma" and "ee" are ordinary words
+                keywords.append(code)
+        routes.append(ShardRoute(
+            shard=shard, service=f"{config.SEARCH_SERVICE}_{shard.upper()}",
+            url_patterns=tuple(f"/{slug}/" for _, _, slug in departments),
+            keywords=tuple(keywords), priority=priority,
+        ))
+    routes.append(ShardRoute(DEFAULT_SHARD, f"{config.SEARCH_SERVICE}_{DEFAULT_SHARD.upper()}", is_default=True))
+    return routes
+
+
+def service_ddl(route: ShardRoute, warehouse: str, target_lag: str = "1 hour", sharded: bool = True) -> str:
+    """CREATE statement for a shard's Cortex Search service (the whole chunk table when unsharded)."""
+    where = f"SHARD = '{route.shard}'" + (" OR SHARD IS NULL" if route.is_default else "")
+    return (
+        f"CREATE OR REPLACE CORTEX SEARCH SERVICE {route.qualified_service()}\n"
+        f"  ON CHUNK\n"
+        f"  ATTRIBUTES {', '.join(SERVICE_ATTRIBUTES)}\n"
+        f"  WAREHOUSE = {warehouse}\n"
+        f"  TARGET_LAG = '{target_lag}'\n"
+        f"  AS SELECT {', '.join(SERVICE_COLUMNS)}\n"
+        f"     FROM {config.qualified(config.CHUNK_TABLE)}"
+        + (f"\n     WHERE {where};" if sharded else ";")
+    )
+
+
+# -- assignment -----------------------------------------------------------------
+
+def _assign(backend, shard: str, file_names: list[str]):
+    for start in range(0, len(file_names), ASSIGN_BATCH):
+        batch = file_names[start:start + ASSIGN_BATCH]
+        backend.sql(
+            f"UPDATE {config.qualified(config.CHUNK_TABLE)} SET SHARD = ? "
+            f"WHERE FILE_NAME IN ({', '.join('?' for _ in batch)})",
+            params=[shard, *batch],
+        )
+
+
+def assign_file(backend, file_name: str, routes: RoutingTable | None = None) -> str | None:
+    """Put a newly embedded file's chunks in its shard; returns the shard (None when unsharded)."""
+    routes = routes or load_routes(backend)
+    if not routes.sharded:
+        return None
+    rows = backend.sql(
+        f"""
+        SELECT SOURCE_URL, FILE_TYPE FROM {config.qualified(config.METADATA_TABLE)}
+        WHERE FILE_NAME = ? ORDER BY UPLOAD_TIMESTAMP DESC LIMIT 1
+        """,
+        params=[file_name],
+    )
+    source_url, file_type = (rows[0]["SOURCE_URL"], rows[0]["FILE_TYPE"]) if rows else (None, None)
+    route = routes.assign(file_name, source_url, file_type or file_name.rsplit(".", 1)[-1])
+    _assign(backend, route.shard, [file_name])
+    return route.shard
+
+
+def assign_all(backend, routes: RoutingTable | None = None) -> Counter:
+    """(Re)assign every file in the chunk table; returns files per shard."""
+    routes = routes or load_routes(backend)
+    ensure_shard_table(backend)
+    rows = backend.sql(
+        f"SELECT DISTINCT FILE_NAME, SOURCE_URL, FILE_TYPE FROM {config.qualified(config.CHUNK_TABLE)}"
+    )
+    by_shard: dict[str, list[str]] = {}
+    for row in rows:
+        route = routes.assign(row["FILE_NAME"], row["SOURCE_URL"], row["FILE_TYPE"])
+        by_shard.setdefault(route.shard, []).append(row["FILE_NAME"])
+    for shard, file_names in by_shard.items():
+        _assign(backend, shard, sorted(set(file_names)))
+    return Counter({shard: len(set(names)) for shard, names in by_shard.items()})
+
+
+# -- querying -------------------------------------------------------------------
+
+def _get_pool() -> ThreadPoolExecutor:
+    # Separate from the sub-query pool: shard queries run inside its workers.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=SHARD_POOL_SIZE, thread_name_prefix="iitj-shard")
+        return _pool
+
+
+def merge_by_score(result_lists: list[list[dict]], limit: int) -> list[dict]:
+    """Merge per-shard rankings by relevance score, dropping duplicates.
+
+    Cosine similarities compare across services as they are; text-match
+    scores depend on each shard's term statistics, so they are taken relative
+    to the shard's top hit. Hits without a score follow the scored ones, in
+    rank order (so unscored lists interleave round-robin).
+    """
+    hits = []
+    for results in result_lists:
+        scored = [result_score(row) for row in results]
+        top = max((score for kind, score in scored if score is not None), default=None)
+        for rank, (row, (kind, score)) in enumerate(zip(results, scored)):
+            if score is not None and kind not in COMPARABLE_SCORES:
+                score = score / top if top and top > 0 else 0.0
+            hits.append((score is None, -(score or 0.0), rank, len(hits), row))
+    merged, seen = [], set()
+    for *_, row in sorted(hits, key=lambda hit: hit[:4]):
+        key = result_key(row)
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(row)
+        if len(merged) >= limit:
+            break
+    return merged
+
+
+def search_shards(search, routes: list[ShardRoute], payload: dict) -> tuple[list[dict], list[dict]]:
+    """Run ``search(service, payload)`` on each shard, in parallel when there are several.
+
+    Returns the hits merged by score and per-shard stats (shard, hits,
+    seconds, error). A failed shard only costs recall unless every shard fails.
+    """
+    def timed(route):
+        start = time.perf_counter()
+        results = search(route.qualified_service(), payload) or []
+        return list(results), time.perf_counter() - start
+
+    if len(routes) == 1:
+        outcomes = [timed(routes[0])]
+    else:
+        futures = [submit_in_context(_get_pool(), timed, route) for route in routes]
+        outcomes, errors = [], []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as exc:
+                errors.append(exc)
+                outcomes.append(exc)
+        if len(errors) == len(routes):
+            raise errors[0]
+
+    stats, result_lists = [], []
+    for route, outcome in zip(routes, outcomes):
+        if isinstance(outcome, Exception):
+            stats.append({"shard": route.shard, "hits": 0, "seconds": None, "error": str(outcome)})
+            continue
+        results, seconds = outcome
+        result_lists.append(results)
+        stats.append({"shard": route.shard, "hits": len(results), "seconds": round(seconds, 3), "error": None})
+    return merge_by_score(result_lists, int(payload.get("limit", 10))), stats
+
+
+# -- benchmark ------------------------------------------------------------------
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench(sizes: list[int], latency, limit: int = 10, repeat: int = 1) -> list[dict]:
+    """Golden-set search latency and recall, single service vs department shards, per corpus size."""
+    from iitj_search.backend import LocalBackend
+    from iitj_search.evaluate import SEARCH_COLUMNS, file_names, load_golden_set, recall
+    from iitj_search.local_corpus import build_corpus
+
+    golden = load_golden_set()
+    report = []
+    for size in sizes:
+        backend = LocalBackend(latency=latency)
+        backend.load_corpus(build_corpus(size))
+        chunks = backend.sql(f"SELECT COUNT(*) AS N FROM {config.qualified(config.CHUNK_TABLE)}")[0]["N"]
+        layouts = {"single": RoutingTable.single()}
+        save_routes(backend, department_routes())
+        assign_all(backend)
+        layouts["sharded"] = load_routes(backend)
+
+        row = {"size": size, "chunks": chunks}
+        for name, routes in layouts.items():
+            # Build each service's index up front so the first question is not charged for it.
+            for route in routes.routes:
+                backend.search(route.qualified_service(), {"query": "warm", "limit": 1})
+            seconds, recalls, queried = [], [], []
+            for _ in range(repeat):
+                for item in golden:
+                    chosen, _ = routes.select(item["question"])
+                    payload = {"query": item["question"], "columns": SEARCH_COLUMNS, "filter": {}, "limit": limit}
+                    start = time.perf_counter()
+                    results, _ = search_shards(backend.search, chosen, payload)
+                    seconds.append(time.perf_counter() - start)
+                    recalls.append(recall(item["expected_files"], file_names(results)))
+                    queried.append(len(chosen))
+            row[name] = {
+                "p50_ms": round(statistics.median(seconds) * 1000, 1),
+                "p95_ms": round(_percentile(seconds, 95) * 1000, 1),
+                "recall": round(statistics.mean(recalls), 3),
+                "shards_queried": round(statistics.mean(queried), 2),
+            }
+        row["largest_shard_chunks"] = max(
+            backend.sql(
+                f"SELECT COUNT(*) AS N FROM {config.qualified(config.CHUNK_TABLE)} GROUP BY SHARD"
+            ),
+            key=lambda r: r["N"],
+        )["N"]
+        report.append(row)
+    return report
+
+
+def print_bench(report: list[dict]):
+    print(f"{'corpus':>8} {'chunks':>7} {'largest':>8} | {'single p50':>10} {'p95':>7} {'recall':>6} | "
+          f"{'sharded p50':>11} {'p95':>7} {'recall':>6} {'shards':>6}")
+    for row in report:
+        single, sharded = row["single"], row["sharded"]
+        print(f"{row['size']:>8} {row['chunks']:>7} {row['largest_shard_chunks']:>8} | "
+              f"{single['p50_ms']:>8.1f}ms {single['p95_ms']:>5.1f}ms {single['recall']:>6.3f} | "
+              f"{sharded['p50_ms']:>9.1f}ms {sharded['p95_ms']:>5.1f}ms {sharded['recall']:>6.3f} "
+              f"{sharded['shards_queried']:>6.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--show", action="store_true", help="Print the routing table and files per shard")
+    parser.add_argument("--split-departments", action="store_true",
+                        help="Replace the routing table with the department-group layout")
+    parser.add_argument("--assign-all", action="store_true", help="(Re)assign every embedded file to its shard")
+    parser.add_argument("--ddl", action="store_true", help="Print the CREATE statements of the shard services")
+    parser.add_argument("--warehouse", default="<warehouse>")
+    parser.add_argument("--target-lag", default="1 hour")
+    parser.add_argument("--ask", help="Show which shards a question would be sent to")
+    parser.add_argument("--backend", choices=["local", "snowflake"], help="Default: IITJ_BACKEND / secrets")
+    parser.add_argument("--bench", action="store_true",
+                        help="Compare single-service and sharded search latency on local corpora")
+    parser.add_argument("--sizes", default="500,2000,8000", help="Filler documents per benchmark corpus")
+    parser.add_argument("--latency", default="search=0.05,search_per_1k_chunks=0.1",
+                        help="Simulated latency for the benchmark")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        from iitj_search.backend import LocalLatency
+
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        print_bench(bench(sizes, LocalLatency.parse(args.latency), repeat=args.repeat))
+        return
+
+    from iitj_search.backend import command_line_backend
+
+    backend = command_line_backend(args.backend)
+    if args.split_departments:
+        save_routes(backend, department_routes())
+    if args.assign_all:
+        counts = assign_all(backend)
+        print("files per shard: " + ", ".join(f"{shard}={count}" for shard, count in sorted(counts.items())))
+    routes = load_routes(backend)
+    if args.show:
+        for route in routes.routes:
+            print(f"{route.shard:<12} {route.service:<28} default={route.is_default} "
+                  f"urls={','.join(route.url_patterns) or '-'} types={','.join(route.file_types) or '-'} "
+                  f"keywords={','.join(route.keywords) or '-'}")
+    if args.ddl:
+        for route in routes.routes:
+            print(service_ddl(route, args.warehouse, args.target_lag, routes.sharded))
+            print()
+    if args.ask:
+        chosen, reason = routes.select(args.ask)
+        print(f"{', '.join(route.shard for route in chosen)} ({reason})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Cold-start profile of the app pages, with a regression threshold.
+
+Each page is rendered in a fresh interpreter (``python -X importtime``) with
+Streamlit's AppTest and the local backend injected, so every run pays the
+full cold start: importing Streamlit, the first render (which imports
+whatever the page imports) and a warm second render for comparison. The
+heaviest imports pulled in by the first render are listed from the
+importtime log.
+
+Exits with status 1 when any page's median cold first render exceeds
+``--max-first-render`` seconds, so CI can run it as a cold-start check.
+
+Usage:
+    python -m iitj_search.startup_profile
+    python -m iitj_search.startup_profile --repeat 3 --max-first-render 4
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+PAGES = [APP_ROOT / "Home.py", APP_ROOT / "pages" / "01_Curate_Information.py", APP_ROOT / "pages" / "02_AI_Search.py"]
+DEFAULT_MAX_FIRST_RENDER = 2.0  # seconds; about 1s measured for Home.py on a laptop-class CPU
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import_streamlit = time.perf_counter() - start
+
+from iitj_search.backend import LocalBackend
+from iitj_search.local_corpus import build_corpus
+backend = LocalBackend()
+backend.load_corpus(build_corpus(0))
+
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.session_state["backend"] = backend
+before = set(sys.modules)
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+loaded = sorted(set(sys.modules) - before)
+start = time.perf_counter()
+at.run()
+second = time.perf_counter() - start
+print(json.dumps({
+    "import_streamlit_s": import_streamlit,
+    "first_render_s": first,
+    "second_render_s": second,
+    "modules_loaded": loaded,
+    "exceptions": [str(e.value) for e in at.exception],
+}))
+"""
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def heaviest_imports(importtime_log: str, modules: set[str], top: int = 8) -> list[tuple[str, float]]:
+    """Slowest outermost imports among ``modules`` (cumulative seconds)."""
+    cumulative = {}
+    for line in importtime_log.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and match.group(4) in modules:
+            cumulative[match.group(4)] = int(match.group(2)) / 1e6
+    # Keep a module only when none of its parent packages is listed as well.
+    roots = {
+        name: secs for name, secs in cumulative.items()
+        if not any(".".join(name.split(".")[:depth]) in cumulative for depth in range(1, name.count(".") + 1))
+    }
+    return sorted(roots.items(), key=lambda item: -item[1])[:top]
+
+
+def profile_page(page: Path) -> dict:
+    env = dict(os.environ, IITJ_BACKEND="local", PYTHONPATH=str(APP_ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, str(page)],
+        cwd=APP_ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode or not lines:
+        raise RuntimeError(f"{page.name} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1])
+    result["heaviest"] = heaviest_imports(proc.stderr, set(result.pop("modules_loaded")))
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=Path, nargs="+", default=PAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="Cold runs per page (median is reported)")
+    parser.add_argument("--max-first-render", type=float, default=DEFAULT_MAX_FIRST_RENDER,
+                        help="Fail when a page's median cold first render takes longer (seconds)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report, failed = [], []
+    for page in args.pages:
+        runs = [profile_page(page) for _ in range(args.repeat)]
+        summary = {
+            "page": page.name,
+            "import_streamlit_s": round(statistics.median(r["import_streamlit_s"] for r in runs), 3),
+            "first_render_s": round(statistics.median(r["first_render_s"] for r in runs), 3),
+            "second_render_s": round(statistics.median(r["second_render_s"] for r in runs), 3),
+            "heaviest": [(name, round(secs, 3)) for name, secs in runs[-1]["heaviest"]],
+            "exceptions": runs[-1]["exceptions"],
+        }
+        report.append(summary)
+        if summary["first_render_s"] > args.max_first_render or summary["exceptions"]:
+            failed.append(page.name)
+
+    if args.json:
+        print(json.dumps({"pages": report, "max_first_render_s": args.max_first_render, "failed": failed}))
+    else:
+        print(f"{'page':<28} {'import st':>9} {'1st render':>10} {'2nd render':>10}")
+        for r in report:
+            print(f"{r['page']:<28} {r['import_streamlit_s']:>9.2f} {r['first_render_s']:>10.2f} {r['second_render_s']:>10.2f}")
+            print("    heaviest first-render imports: "
+                  + ", ".join(f"{name} {secs:.2f}s" for name, secs in r["heaviest"]))
+            for exc in r["exceptions"]:
+                print(f"    ! {exc}")
+        if failed:
+            print(f"FAIL: {', '.join(failed)} over {args.max_first_render:.1f}s cold first render (or raised)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+"""Background warm-up of the warehouse and the search service.
+
+Started after the first paint so the user never waits for it: resumes the
+session's warehouse if it is suspended and sends one tiny SEARCH_PREVIEW to
+each search service (one per shard) so it is hot by the time the first real
+question arrives. Runs at most once per WARMUP_INTERVAL per process.
+"""
+
+import threading
+import time
+
+WARMUP_INTERVAL = 300  # seconds
+WARMUP_QUERY = {"query": "IIT Jodhpur", "columns": ["FILE_NAME"], "filter": {}, "limit": 1}
+
+_lock = threading.Lock()
+_last_started = 0.0
+last_warmup: dict = {}
+
+
+def warm_up(backend) -> dict:
+    """Resume the warehouse and touch the search service; returns step timings (or errors)."""
+    timings = {}
+    start = time.perf_counter()
+    try:
+        warehouse = backend.sql("SELECT CURRENT_WAREHOUSE()")[0][0]
+        if warehouse:
+            backend.sql(f"ALTER WAREHOUSE IF EXISTS {warehouse} RESUME IF SUSPENDED")
+        timings["warehouse_s"] = round(time.perf_counter() - start, 3)
+    except Exception as exc:
+        timings["warehouse_error"] = str(exc)
+
+    start = time.perf_counter()
+    try:
+        # Every shard's service, so a question routed to any of them finds it hot.
+        # (Imported here to keep the search stack off the Home page's cold start.)
+        from iitj_search.shards import load_routes
+
+        for route in load_routes(backend).routes:
+            backend.search(route.qualified_service(), dict(WARMUP_QUERY))
+        timings["search_s"] = round(time.perf_counter() - start, 3)
+    except Exception as exc:
+        timings["search_error"] = str(exc)
+    return timings
+
+
+def start_warmup(backend) -> threading.Thread | None:
+    """Run ``warm_up`` on a daemon thread unless one ran recently."""
+    global _last_started
+    with _lock:
+        if time.monotonic() - _last_started < WARMUP_INTERVAL and _last_started:
+            return None
+        _last_started = time.monotonic()
+
+    def run():
+        last_warmup.clear()
+        last_warmup.update(warm_up(backend), finished_at=time.time())
+
+    thread = threading.Thread(target=run, name="iitj-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -3,7 +3,13 @@ import io
 import os
 import time
 from pathlib import Path
-from snowflake.snowpark.context import get_active_session
+from iitj_search import config
+from iitj_search.admission import admit
+from iitj_search.autocomplete import index_file
+from iitj_search.entities import extract_file
+from iitj_search.backend import SnowparkBackend, backend_name, shared_local_backend
+from iitj_search.ingest import ALLOWED_EXTENSIONS_DISPLAY, ensure_stage_and_table, insert_metadata, validate_file
+from iitj_search.shards import assign_file
 
 st.set_page_config(page_title="Curate Information", page_icon="📋", layout="wide")
 
@@ -79,6 +85,8 @@ def get_or_refresh_session():
             del st.session_state.default_session
 
     try:
+        # Snowpark is imported on first connect so the local backend never loads it.
+        from snowflake.snowpark.context import get_active_session
         session = get_active_session()
         session.sql("SELECT 1").collect()
     except Exception:
@@ -93,22 +101,33 @@ def get_or_refresh_session():
     st.session_state.default_session = session
     return session
 
-session = get_or_refresh_session()
+def get_backend():
+    """Backend for this session: injected, local (IITJ_BACKEND=local) or Snowpark."""
+    if "backend" in st.session_state:
+        return st.session_state.backend
+    if backend_name(st.secrets) == "local":
+        backend = shared_local_backend()
+    else:
+        backend = SnowparkBackend(get_or_refresh_session(), refresh=get_or_refresh_session)
+    st.session_state.backend = backend
+    return backend
+
+backend = get_backend()
 
 with st.sidebar:
     try:
-        version = session.sql("SELECT CURRENT_VERSION()").collect()[0][0]
+        version = backend.sql("SELECT CURRENT_VERSION()")[0][0]
         st.success(f"connected to ☁️")
     except Exception as exc:
         st.error(f"Snowflake connection failed: {exc}")
         st.stop()
 
 # Default configuration
-DATABASE = "IITJ"
-SCHEMA = "MH"
-TABLE_NAME = "UPLOADED_FILES_METADATA"
-AUTH_TABLE = "IITJ_DOCUMENT_CURATOR_INFO"
-FULL_STAGE_NAME = f"{DATABASE}.{SCHEMA}.IITJ_INFO_STAGE"
+DATABASE = config.DATABASE
+SCHEMA = config.SCHEMA
+TABLE_NAME = config.METADATA_TABLE
+AUTH_TABLE = config.AUTH_TABLE
+FULL_STAGE_NAME = config.STAGE
 STAGE_NAME = f"@{FULL_STAGE_NAME}"
 
 # Authentication function
@@ -120,45 +139,14 @@ def authenticate_user(email: str, password: str) -> bool:
         FROM {DATABASE}.{SCHEMA}.{AUTH_TABLE}
         WHERE UER_EMAIL = ? AND PASSWORD = ?
         """
-        result = session.sql(auth_query, params=[email, password]).collect()
+        result = backend.sql(auth_query, params=[email, password])
         return result[0]['COUNT'] > 0
     except Exception as exc:
         st.error(f"Authentication error: {exc}")
         return False
 
-def run_sql_with_refresh(sql: str):
-    global session
-    try:
-        return session.sql(sql).collect()
-    except Exception:
-        session = get_or_refresh_session()
-        return session.sql(sql).collect()
-
-def ensure_stage_and_table():
-    run_sql_with_refresh(
-        f"""
-        CREATE STAGE IF NOT EXISTS {FULL_STAGE_NAME}
-        ENCRYPTION = ( TYPE = 'SNOWFLAKE_SSE' )
-        DIRECTORY = ( ENABLE = true )
-        """
-    )
-
-    run_sql_with_refresh(
-        f"""
-        CREATE TABLE IF NOT EXISTS {DATABASE}.{SCHEMA}.{TABLE_NAME} (
-            DOC_ID NUMBER AUTOINCREMENT,
-            FILE_NAME VARCHAR,
-            SHORT_DESCRIPTION VARCHAR,
-            SOURCE_URL VARCHAR,
-            FILE_TYPE VARCHAR,
-            FILE_SIZE NUMBER,
-            UPLOADED_BY VARCHAR,
-            UPLOAD_TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
-        )
-        """
-    )
-
-ensure_stage_and_table()
+# SnowparkBackend reconnects and retries once when the session has expired.
+ensure_stage_and_table(backend)
 
 with st.container(border=True):
     st.subheader(":material/table: Uploaded Files Metadata")
@@ -209,7 +197,7 @@ with st.container(border=True):
     """
 
     try:
-        rows = session.sql(query_sql, params=params).collect()
+        rows = backend.sql(query_sql, params=params)
         data = [r.as_dict() if hasattr(r, "as_dict") else dict(r) for r in rows]
         st.dataframe(data, width="stretch", hide_index=True)
     except Exception as exc:
@@ -227,7 +215,7 @@ def signup_user(email: str, password: str, mobile_number: str) -> bool:
         FROM {DATABASE}.{SCHEMA}.IITJ_DOCUMENT_CURATOR_REQUESTOR
         WHERE UER_EMAIL = ?
         """
-        result = session.sql(check_query, params=[email]).collect()
+        result = backend.sql(check_query, params=[email])
         if result[0]['COUNT'] > 0:
             st.error("User already registered. Please wait for approval.")
             return False
@@ -238,7 +226,7 @@ def signup_user(email: str, password: str, mobile_number: str) -> bool:
         (UER_EMAIL, PASSWORD, MOBILE_NUMBER)
         VALUES (?, ?, ?)
         """
-        session.sql(insert_query, params=[email, password, mobile_number]).collect()
+        backend.sql(insert_query, params=[email, password, mobile_number])
         return True
     except Exception as exc:
         st.error(f"Signup error: {exc}")
@@ -318,8 +306,7 @@ with st.container(border=True):
     uploaded_by = st.text_input("Uploaded by", value=st.session_state.user_email, disabled=True)
 
     # Allowed file types
-    ALLOWED_EXTENSIONS = ['pdf', 'pptx', 'docx', 'jpeg', 'jpg', 'png', 'tiff', 'tif', 'html', 'txt']
-    ALLOWED_EXTENSIONS_DISPLAY = "PDF, PPTX, DOCX, JPEG, JPG, PNG, TIFF, TIF, HTML, TXT"
+    ALLOWED_EXTENSIONS = config.ALLOWED_EXTENSIONS
 
     uploaded_files = st.file_uploader(
         "Choose files (max 5)",
@@ -388,10 +375,8 @@ with st.container(border=True):
         # Validate all files before uploading
         validation_errors = []
         for idx, meta in enumerate(file_metadata, 1):
-            if meta['ext'] not in ALLOWED_EXTENSIONS:
-                validation_errors.append(f"File {idx} ({meta['name']}): Unsupported file type '.{meta['ext']}'")
-            if not meta['source_url']:
-                validation_errors.append(f"File {idx} ({meta['name']}): Source URL is required")
+            for error in validate_file(meta['name'], meta['source_url']):
+                validation_errors.append(f"File {idx} ({meta['name']}): {error}")
 
         if validation_errors:
             st.error("❌ Please fix the following errors:")
@@ -413,48 +398,48 @@ with st.container(border=True):
                 # Upload file to stage
                 with st.spinner(f"Uploading {meta['name']} to ☁️..."):
                     file_stream = io.BytesIO(meta['file'].getvalue())
-                    session.file.put_stream(
+                    backend.put_stream(
                         file_stream,
                         f"{STAGE_NAME}/{meta['name']}",
                         overwrite=True,
-                        auto_compress=False,
                     )
 
                 # Insert metadata
                 with st.spinner(f"Saving metadata for {meta['name']}..."):
-                    insert_sql = f"""
-                    INSERT INTO {DATABASE}.{SCHEMA}.{TABLE_NAME}
-                    (FILE_NAME, SHORT_DESCRIPTION, SOURCE_URL, FILE_TYPE, FILE_SIZE, UPLOADED_BY)
-                    SELECT
-                        ?, ?, ?, ?, ?, ?
-                    """
-                    session.sql(
-                        insert_sql,
-                        params=[
-                            meta['name'],
-                            meta['description'],
-                            meta['source_url'],
-                            meta['ext'],
-                            meta['size'],
-                            st.session_state.user_email,
-                        ],
-                    ).collect()
+                    insert_metadata(backend, [meta], st.session_state.user_email)
 
                 # Generate embeddings
                 with st.spinner(f"Generating embeddings for {meta['name']}..."):
-                    session.sql(f"LIST {STAGE_NAME}").collect()
-                    session.sql(
-                        "CALL IITJ.MH.GENERATE_EMBEDDINGS_FOR_NEW_FILE(?)",
-                        params=[meta['name']],
-                    ).collect()
-
-                uploaded_count += 1
-                st.success(f"✅ {meta['name']} uploaded successfully!")
+                    # Shares the process-wide embedding slots with other curators.
+                    with admit("embed", user=st.session_state.user_email):
+                        backend.generate_embeddings(meta['name'])
 
             except Exception as exc:
                 failed_count += 1
                 st.error(f"❌ Failed to upload {meta['name']}: {exc}")
 
+            else:
+                uploaded_count += 1
+                st.success(f"✅ {meta['name']} uploaded successfully!")
+
+                # The file is searchable now; these steps only add to it, so their failure is not the upload's.
+                try:
+                    # Faculty and departments for "list all" questions
+                    with st.spinner(f"Extracting faculty and departments from {meta['name']}..."):
+                        extract_file(backend, meta['name'])
+
+                    # Search shard for the new chunks (no-op with a single search service)
+                    assign_file(backend, meta['name'])
+
+                    # Title and extracted names join the search page's type-ahead
+                    index_file(backend, meta['name'])
+
+                except Exception as exc:
+                    st.warning(
+                        f"⚠️ {meta['name']} is searchable, but extracting its faculty and departments, "
+                        f"assigning its search shard or adding it to the type-ahead failed: {exc}"
+                    )
+
             progress_bar.progress((idx) / len(file_metadata))
 
         status_text.empty()
@@ -1,20 +1,34 @@
+import queue
+import time
+import uuid
+from functools import partial
 import streamlit as st
-from htbuilder.units import rem
-from htbuilder import div, styles
 from pathlib import Path
-import json
-from snowflake.snowpark.context import get_active_session
-import textwrap
-import requests
 from io import BytesIO
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from datetime import datetime
+from iitj_search import config
+from iitj_search.admission import Requester, current_requester, shared_controller
+from iitj_search.autocomplete import note_question, shared_index
+from iitj_search.backend import SnowparkBackend, backend_name, shared_local_backend
+from iitj_search.breaker import breaker_states
+from iitj_search.compare import MAX_MODELS, winner_options
+from iitj_search.engine import PLANNER_MODEL, RagEngine, indexed_columns as describe_indexed_columns, with_sources
+from iitj_search.feedback import ensure_feedback_table, feedback_record, shared_writer
+from iitj_search.filters import SearchFilters
+from iitj_search.followups import shared_prefetcher, suggest_followups, will_search
+from iitj_search.jobs import TurnJobs, cancel_metrics, run_in_turn
+from iitj_search.rerank import DEFAULT_PROMPT_CHUNKS, candidate_count
+from iitj_search.reruns import record_rerun, rerun_summary, rerun_timer
+from iitj_search.router import AUTO, MODELS, latency_stats
+from iitj_search.shards import load_routes
+from iitj_search.rag import (
+    extract_result_text,
+    history_to_text,
+    normalize_row,
+)
 
 st.set_page_config(page_title="IITJ AI Search", page_icon="🔎", layout="wide")
+app_run_started = time.perf_counter()
 
 # Sidebar logo - responsive to sidebar width
 logo_path = Path(__file__).parent.parent / "resources" / "iitj.jpg"
@@ -67,6 +81,8 @@ def get_or_refresh_session():
             del st.session_state.default_session
 
     try:
+        # Snowpark is imported on first connect so the local backend never loads it.
+        from snowflake.snowpark.context import get_active_session
         session = get_active_session()
         session.sql("SELECT 1").collect()
     except Exception:
@@ -81,211 +97,49 @@ def get_or_refresh_session():
     st.session_state.default_session = session
     return session
 
-session = get_or_refresh_session()
+def get_backend():
+    """Backend for this session: injected, local (IITJ_BACKEND=local) or Snowpark."""
+    if "backend" in st.session_state:
+        return st.session_state.backend
+    if backend_name(st.secrets) == "local":
+        backend = shared_local_backend()
+    else:
+        backend = SnowparkBackend(get_or_refresh_session(), refresh=get_or_refresh_session)
+    st.session_state.backend = backend
+    return backend
+
+backend = get_backend()
 
-# Validate connection
+# Validate connection once per session; the backend reconnects on its own later.
 with st.sidebar:
-    try:
-        version = session.sql("SELECT CURRENT_VERSION()").collect()[0][0]
-        st.success(f"connected to ☁️")
-    except Exception as exc:
-        st.error(f"☁️ connection failed: {exc}")
-        st.stop()
-
-DB = "IITJ"
-SCHEMA = "MH"
-SEARCH_SERVICE = "IITJ_AI_SEARCH"
-HISTORY_LENGTH = 5
-
-FEEDBACK_TABLE = "IITJ_RAG_FEEDBACK"
-LLM_MODELS = [
-    "claude-sonnet-4-6",
-    # "llama3-70b",
-    "claude-4-sonnet"
-]
-
-INSTRUCTIONS = textwrap.dedent("""
-    - You are an expert chat assistance that extracts information from the CONTEXT provided.                         
-    - You are a helpful AI assistant focused on answering questions about IIT Jodhpur.
-    - You will be given search results from IIT Jodhpur documents as context inside <search_results> tags.
-    - Use the context and conversation history to provide accurate, coherent answers.
-    - Use markdown formatting: headers (starting with ##), code blocks, bullet points, and backticks for inline code.
-    - Don't start responses with a markdown header.
-    - Be brief but clear and informative.
-    - Provide specific details from the search results.
-    - If the search results don't contain relevant information, say so clearly.
-    - DO NOT include source links or URLs in your response - they will be added automatically.
-    - Don't say things like "according to the provided context" or "based on the search results".
-    - If no relevant information is found, respond with "I'm sorry, I couldn't find any information on that topic in the provided documents. Recheck list of documents(URL) uploaded or connect with Mahantesh(m25ai2134@iitj.ac.in) for more information."
-
-""")
-
-# Define helper functions early (before they're used in sidebar)
-def parse_columns(raw: str) -> list[str]:
-    return [c.strip() for c in raw.split(",") if c.strip()]
-
-def normalize_row(row) -> dict:
-    if isinstance(row, dict):
-        return row
-    if hasattr(row, "as_dict"):
-        return row.as_dict()
-    return dict(row)
-
-def clean_text(value):
-    if value is None:
-        return None
-    if not isinstance(value, str):
-        return str(value)
-    # Handle escaped newlines and special characters from API responses
-    text = (
-        value.replace("\\r\\n", "\n")
-        .replace("\\n", "\n")
-        .replace("\\t", "\t")
-        .replace('\\"', '"')  # Handle escaped quotes
-        .replace("\\'", "'")   # Handle escaped single quotes
-    )
-    # Remove leading/trailing quotes if they wrap the entire response
-    if text.startswith('"') and text.endswith('"'):
-        text = text[1:-1]
-    return text
-
-def get_result_attributes(row_dict: dict) -> dict:
-    attrs = row_dict.get("ATTRIBUTES") or row_dict.get("attributes")
-    return attrs if isinstance(attrs, dict) else {}
-
-def extract_result_text(value):
-    if value is None:
-        return None
-    if isinstance(value, dict):
-        for key in ("content", "text", "CHUNK", "chunk"):
-            if key in value:
-                return extract_result_text(value.get(key))
-        return clean_text(value)
-    return clean_text(value)
-
-def tokenize_text(text: str) -> list[str]:
-    if not text:
-        return []
-    normalized = "".join(ch.lower() if ch.isalnum() or ch.isspace() else " " for ch in text)
-    return [tok for tok in normalized.split() if tok]
-
-def is_searchable_question(question: str) -> bool:
-    """Return True only when query looks like an information need we should retrieve for."""
-    if not question or not question.strip():
-        return False
-
-    q = question.strip().lower()
-    q_tokens = tokenize_text(q)
-    if not q_tokens:
-        return False
-
-    # Common conversational messages where retrieval should be skipped.
-    smalltalk_exact = {
-        "hi", "hello", "hey", "test", "testing", "ok", "okay", "thanks", "thank you",
-        "good morning", "good afternoon", "good evening", "yo", "hii", "hlo"
-    }
-    if q in smalltalk_exact:
-        return False
-
-    # If very short and without clear academic intent, avoid retrieval.
-    intent_terms = {
-        "iitj", "iit", "jodhpur", "faculty", "professor", "department", "research",
-        "course", "program", "admission", "email", "contact", "lab", "publication",
-        "show", "list", "who", "what", "when", "where", "which", "how", "give", "tell", "explain"
-    }
-    has_intent = any(tok in intent_terms for tok in q_tokens) or "?" in question
-    if len(q_tokens) <= 2 and not has_intent:
-        return False
-
-    return has_intent or len(q_tokens) >= 3
-
-def get_query_terms(question: str) -> set[str]:
-    stopwords = {
-        "the", "a", "an", "is", "are", "was", "were", "be", "to", "of", "and", "or", "for",
-        "in", "on", "at", "by", "with", "about", "from", "as", "that", "this", "it", "i",
-        "you", "we", "they", "he", "she", "me", "my", "our", "your", "please", "can", "could",
-        "would", "should", "do", "does", "did", "tell", "give", "show", "list", "what", "who",
-        "when", "where", "which", "how"
-    }
-    return {tok for tok in tokenize_text(question) if len(tok) >= 3 and tok not in stopwords}
-
-def is_result_relevant_to_question(question: str, row_dict: dict) -> bool:
-    """Simple lexical relevance filter to avoid showing unrelated source links."""
-    query_terms = get_query_terms(question)
-    if not query_terms:
-        return False
-
-    title = (
-        row_dict.get("SHORT_DESCRIPTION")
-        or row_dict.get("short_description")
-        or row_dict.get("FILE_NAME")
-        or row_dict.get("file_name")
-        or ""
-    )
-    chunk = extract_result_text(
-        row_dict.get("CHUNK")
-        or row_dict.get("chunk")
-        or row_dict.get("CONTENT")
-        or row_dict.get("content")
-    ) or ""
+    if "connection_checked" not in st.session_state:
+        try:
+            version = backend.sql("SELECT CURRENT_VERSION()")[0][0]
+        except Exception as exc:
+            st.error(f"☁️ connection failed: {exc}")
+            st.stop()
+        st.session_state.connection_checked = True
+    st.success(f"connected to ☁️")
 
-    searchable_text = f"{title} {chunk[:2000]}".lower()
-    return any(term in searchable_text for term in query_terms)
+# "Auto" routes each turn (iitj_search.router); the others pin one model.
+LLM_MODELS = [AUTO, *MODELS]
 
-def get_indexed_columns() -> list[str]:
-    try:
-        rows = session.sql(
-            f"DESCRIBE CORTEX SEARCH SERVICE {DB}.{SCHEMA}.{SEARCH_SERVICE}"
-        ).collect()
-    except Exception:
-        return []
-
-    for row in rows:
-        row_dict = row.as_dict() if hasattr(row, "as_dict") else dict(row)
-        # Check various possible column name variations
-        name_key = None
-        for key in ["name", "NAME", "Name"]:
-            if key in row_dict:
-                name_key = key
-                break
-        
-        if not name_key:
-            continue
-            
-        name = (row_dict.get(name_key) or "").lower()
-        if name in {"columns", "search_columns", "indexed_columns", "search columns"}:
-            # Try different value key variations
-            value = None
-            for key in ["value", "VALUE", "Value"]:
-                value = row_dict.get(key)
-                if value:
-                    break
-            
-            if value:
-                cols = [c.strip() for c in str(value).split(",") if c.strip()]
-                # Ensure CHUNK is included as it's the search column
-                if "CHUNK" not in cols:
-                    cols.insert(0, "CHUNK")
-                return cols
-    
-    # Fallback to hardcoded columns if parsing fails
-    return ["CHUNK", "SOURCE_URL", "FILE_NAME", "SHORT_DESCRIPTION", "UPLOAD_TIMESTAMP", "UPLOADED_BY", "CHUNK_INDEX"]
-
-indexed_columns = get_indexed_columns()
-
-def ensure_feedback_table():
-    session.sql(
-        f"""
-        CREATE TABLE IF NOT EXISTS {DB}.{SCHEMA}.{FEEDBACK_TABLE} (
-            FEEDBACK_ID NUMBER AUTOINCREMENT,
-            HISTORY_OF_CHAT VARCHAR,
-            MORE_INFORMATION VARCHAR,
-            FEEDBACK_GIVEN_ON TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
-        )
-        """
-    ).collect()
+# Shard services and the rules choosing them (a single service unless configured).
+if "search_routes" not in st.session_state:
+    st.session_state.search_routes = load_routes(backend)
 
-ensure_feedback_table()
+# Every shard's service is defined with the same columns.
+if "indexed_columns" not in st.session_state:
+    st.session_state.indexed_columns = describe_indexed_columns(
+        backend, st.session_state.search_routes.default.qualified_service()
+    )
+indexed_columns = st.session_state.indexed_columns
+# Search, prompt and answer logic; the page only drives it and renders.
+engine = RagEngine(backend, st.session_state.search_routes, indexed_columns)
+
+if "feedback_table_ready" not in st.session_state:
+    ensure_feedback_table(backend)
+    st.session_state.feedback_table_ready = True
 
 SUGGESTIONS = {
     ":blue[:material/local_library:] List all faculty": "List all faculty IIT Jodhpur along with their research areas",
@@ -295,8 +149,6 @@ SUGGESTIONS = {
     ":red[:material/contacts:] Binod Kumar sir information": "Give information about Binod Kumar professor",
 }
 
-# st.html(div(style=styles(font_size=rem(5), line_height=1))[["❉"]])
-
 title_row = st.container(
     horizontal=True,
     vertical_alignment="bottom",
@@ -342,9 +194,6 @@ text-decoration: underline;
 """
 st.markdown(footer, unsafe_allow_html=True)
 
-st.sidebar.title("Select Models")
-selected_model = st.sidebar.selectbox("Model", LLM_MODELS, index=0)
-
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -363,6 +212,31 @@ if "last_search_question" not in st.session_state:
     st.session_state.last_search_question = None
 if "last_search_error" not in st.session_state:
     st.session_state.last_search_error = None
+if "last_search_plan" not in st.session_state:
+    st.session_state.last_search_plan = []
+if "last_search_candidates" not in st.session_state:
+    st.session_state.last_search_candidates = None
+if "last_search_depth" not in st.session_state:
+    st.session_state.last_search_depth = None
+if "last_search_filters" not in st.session_state:
+    st.session_state.last_search_filters = None
+if "last_entity_lookup" not in st.session_state:
+    st.session_state.last_entity_lookup = None
+if "last_search_shards" not in st.session_state:
+    st.session_state.last_search_shards = None
+if "last_degraded" not in st.session_state:
+    st.session_state.last_degraded = None
+if "last_compare" not in st.session_state:
+    st.session_state.last_compare = None
+if "last_prefetch" not in st.session_state:
+    st.session_state.last_prefetch = None
+# Warehouse statements of the running turn, cancelled when they are no longer wanted.
+if "turn_jobs" not in st.session_state:
+    st.session_state.turn_jobs = TurnJobs()
+# Queues for search and completion slots are fair per session.
+if "requester" not in st.session_state:
+    st.session_state.requester = Requester(f"session-{uuid.uuid4().hex[:12]}")
+current_requester.set(st.session_state.requester)
 
 user_just_asked_initial_question = (
     "initial_question" in st.session_state and st.session_state.initial_question
@@ -372,122 +246,133 @@ user_just_clicked_suggestion = (
     "selected_suggestion" in st.session_state and st.session_state.selected_suggestion
 )
 
+user_just_picked_typeahead = bool(st.session_state.get("typeahead_question"))
+
 user_first_interaction = (
-    user_just_asked_initial_question or user_just_clicked_suggestion
+    user_just_asked_initial_question or user_just_clicked_suggestion or user_just_picked_typeahead
 )
 
 has_message_history = len(st.session_state.messages) > 0
 
-with st.sidebar:
-    st.subheader("Search settings")
-    limit = st.slider("Results", min_value=10, max_value=20, value=10, step=1, help="Maximum number of search results to retrieve")
-    
-    # Display columns as static info (not editable)
-    # st.write("**Columns:**")
-    if indexed_columns:
-        essential_cols = ['CHUNK', 'SOURCE_URL', 'FILE_NAME', 'SHORT_DESCRIPTION']
-        selected_columns = [col for col in essential_cols if col in indexed_columns]
-        if len(selected_columns) < len(essential_cols):
-            selected_columns = indexed_columns
-        
-        # Display as static list
-        # st.code(", ".join(selected_columns))
-    else:
-        # Fallback if indexed columns not detected
-        selected_columns = ['CHUNK', 'SOURCE_URL', 'FILE_NAME', 'SHORT_DESCRIPTION', 'UPLOAD_TIMESTAMP']
-        # st.code(", ".join(selected_columns))
-    
-    # Debug section removed from here - moved to bottom of page after chat
-
-def build_search_context(results: list[dict]) -> str:
-    """Build context string from search results for LLM prompt."""
-    if not results:
-        return "No relevant documents found."
-
-    context_blocks = []
-    for idx, row in enumerate(results, start=1):
-        row_dict = normalize_row(row)
-        attrs = get_result_attributes(row_dict)
-        title = clean_text(
-            attrs.get("TITLE")
-            or attrs.get("title")
-            or row_dict.get("TITLE")
-            or row_dict.get("title")
-            or row_dict.get("FILE_NAME")
-            or f"Document {idx}"
+@st.fragment
+def search_settings():
+    """Model and search settings; changing one reruns only this fragment.
+
+    The widgets are keyed, so the rest of the page reads their values from
+    session state when the next question is asked.
+    """
+    with rerun_timer(st.session_state, "settings"):
+        st.title("Select Models")
+        st.selectbox(
+            "Model", LLM_MODELS, index=0, key="selected_model",
+            help="Auto picks a model per question from its complexity, the prompt size and recent latency",
         )
-        source_url = attrs.get("SOURCE_URL") or attrs.get("source_url") or row_dict.get("SOURCE_URL") or row_dict.get("source_url")
-        uploaded_by = clean_text(row_dict.get("UPLOADED_BY") or row_dict.get("UPLOADER"))
-        chunk_index = row_dict.get("CHUNK_INDEX")
-        snippet = extract_result_text(
-            row_dict.get("CONTENT")
-            or row_dict.get("CHUNK")
-            or row_dict.get("PAGE_CHUNK")
-            or row_dict.get("content")
+        compare = st.toggle(
+            "Compare models", value=False, key="compare_mode",
+            help="Answer each question with several models at once, side by side, from one search",
+        )
+        st.multiselect(
+            "Models to compare", list(MODELS), default=list(MODELS)[:2], max_selections=MAX_MODELS,
+            disabled=not compare, key="compare_models",
         )
 
-        block = f"[Document {idx} - {title}]"
-        if uploaded_by:
-            block += f"\nUploaded by: {uploaded_by}"
-        if chunk_index is not None:
-            block += f"\nChunk index: {chunk_index}"
-        if snippet:
-            block += f"\n{snippet}"
-        # Don't include source_url in context - we append it separately to avoid duplication
-
-        context_blocks.append(block)
+        st.subheader("Search settings")
+        limit = st.slider(
+            "Results", min_value=10, max_value=20, value=10, step=1,
+            help="Maximum number of search results to retrieve", key="search_limit",
+        )
+        split_compound_questions = st.toggle(
+            "Split compound questions",
+            value=True,
+            help="Search each part of a multi-part question concurrently and merge the results",
+            key="split_compound_questions",
+        )
+        st.radio(
+            "Query planner",
+            ["Rules", "Cheap model"],
+            horizontal=True,
+            disabled=not split_compound_questions,
+            help=f"Rules run locally; 'Cheap model' asks {PLANNER_MODEL} to split the question",
+            key="planner_mode",
+        )
+        depth_mode = st.radio(
+            "Retrieval depth",
+            ["Fixed", "Adaptive", "Rerank"],
+            horizontal=True,
+            help=(
+                "Fixed: prompt with every result. "
+                "Adaptive: cut at a relevance-score gap or cumulative-score threshold, widening only when the top results are weak. "
+                f"Rerank: over-fetch {candidate_count(limit)} candidates, rerank them on CPU and prompt with only the best few."
+            ),
+            key="depth_mode",
+        )
+        st.slider(
+            "Prompt chunks",
+            min_value=3,
+            max_value=10,
+            value=DEFAULT_PROMPT_CHUNKS,
+            disabled=depth_mode != "Rerank",
+            help="Reranked chunks sent to the model",
+            key="prompt_chunks",
+        )
 
-    return "\n\n".join(context_blocks)
+        st.toggle(
+            "Answer list questions from tables",
+            value=True,
+            help="'List all faculty…', 'Show departments…': look the rows up in the faculty and department "
+                 "tables built at ingest instead of searching",
+            key="entity_answers",
+        )
 
-def history_to_text(chat_history):
-    """Converts chat history into a string."""
-    return "\n".join(f"[{h['role']}]: {h['content']}" for h in chat_history)
+        with st.expander("Filters", expanded=False):
+            st.multiselect("File type", config.ALLOWED_EXTENSIONS, key="filter_types")
+            st.text_input("Uploaded by", placeholder="office_cse@iitj.ac.in", key="filter_uploader")
+            st.date_input("Uploaded between", value=(), help="Leave empty for any date", key="filter_dates")
+            st.text_input("Source domain", placeholder="iitj.ac.in", key="filter_domain")
+            st.toggle(
+                "Read filters from the question",
+                value=True,
+                help="e.g. 'pdf files', 'uploaded by registrar@iitj.ac.in', 'posted after 2025-01-01', 'recent'",
+                key="parse_question_filters",
+            )
 
-def build_prompt(question: str, search_context: str, recent_history: str = None) -> str:
-    """Build the complete prompt for the LLM."""
-    prompt_parts = [f"<instructions>\n{INSTRUCTIONS}\n</instructions>"]
-    
-    if search_context:
-        prompt_parts.append(f"<search_results>\n{search_context}\n</search_results>")
-    
-    if recent_history:
-        prompt_parts.append(f"<recent_conversation>\n{recent_history}\n</recent_conversation>")
-    
-    prompt_parts.append(f"<question>\n{question}\n</question>")
-    
-    return "\n\n".join(prompt_parts)
+def current_filters() -> SearchFilters:
+    """Sidebar filters as last set in the settings fragment."""
+    filter_dates = st.session_state.filter_dates
+    filter_dates = tuple(filter_dates) if isinstance(filter_dates, (list, tuple)) else (filter_dates,)
+    return SearchFilters(
+        file_types=st.session_state.filter_types,
+        uploaded_by=st.session_state.filter_uploader.strip().lower() or None,
+        uploaded_after=filter_dates[0] if filter_dates else None,
+        uploaded_before=filter_dates[1] if len(filter_dates) > 1 else None,
+        source_domain=st.session_state.filter_domain.strip().lower().removeprefix("www.") or None,
+    )
 
-def get_response(prompt: str, model: str):
-    """Get streaming response from LLM using SQL-based Cortex COMPLETE."""
-    try:
-        # Use SQL-based COMPLETE function for better compatibility
-        response = session.sql(
-            "SELECT SNOWFLAKE.CORTEX.AI_COMPLETE(?, ?) as response",
-            params=[model, prompt]
-        ).collect()
-        
-        if response and len(response) > 0:
-            raw_response = response[0]['RESPONSE']
-            # Clean escape sequences and convert to proper formatting
-            cleaned_response = clean_text(raw_response)
-            return cleaned_response
-        else:
-            st.error("No response received from the model.")
-            st.stop()
-            
-    except Exception as exc:
-        error_msg = f"Model request failed: {type(exc).__name__}\n{str(exc)}"
-        st.error(
-            f"{error_msg}\n\n"
-            f"Model: `{model}`\n\n"
-            f"💡 Try selecting a different model from the sidebar.\n"
-            f"Common models: mistral-large, llama3-70b, mixtral-8x7b\n\n"
-            f"Make sure Cortex AI is enabled in your Snowflake account."
-        )
-        st.stop()
+with st.sidebar:
+    search_settings()
+
+def show_compared(runs: list[dict]):
+    """One column per model: latency and tokens, then its answer (or error)."""
+    for column, run in zip(st.columns(len(runs)), runs):
+        with column:
+            st.markdown(f"**{run['model']}**")
+            show_run(run)
+
+def show_run(run: dict):
+    if run.get("error"):
+        st.caption(f"failed after {run['seconds']:.1f}s" if run.get("seconds") is not None else "failed")
+        st.error(run["error"])
+    else:
+        st.caption(f"{run['seconds']:.1f}s · ~{run['prompt_tokens']} prompt / ~{run['output_tokens']} output tokens")
+        st.markdown(run["text"])
 
+@st.fragment
 def show_feedback_controls(message_index):
-    """Shows the 'How did I do?' control."""
+    """Shows the 'How did I do?' control; submitting reruns only this fragment."""
+    with rerun_timer(st.session_state, "feedback"):
+        feedback_form(message_index)
+
+def feedback_form(message_index):
     st.write("")
 
     with st.popover("How did I do?"):
@@ -496,6 +381,14 @@ def show_feedback_controls(message_index):
                 st.markdown(":small[Rating]")
                 rating = st.feedback(options="stars")
 
+            compared = st.session_state.messages[message_index].get("compare")
+            preferred = None
+            if compared:
+                preferred = st.radio(
+                    "Which answer was better?", [*winner_options(compared), "No preference"],
+                    index=None, horizontal=True,
+                )
+
             details = st.text_area("More information (optional)")
 
             if st.checkbox("Include chat history with my feedback", True):
@@ -507,60 +400,129 @@ def show_feedback_controls(message_index):
 
             if st.form_submit_button("Send feedback"):
                 history_text = history_to_text(relevant_history) if relevant_history else None
-                try:
-                    session.sql(
-                        f"""
-                        INSERT INTO {DB}.{SCHEMA}.{FEEDBACK_TABLE}
-                        (HISTORY_OF_CHAT, MORE_INFORMATION)
-                        SELECT ?, ?
-                        """,
-                        params=[history_text, details],
-                    ).collect()
-                    st.success("Thank you for your feedback!")
-                except Exception as exc:
-                    st.error(f"Failed to store feedback: {exc}")
-
-def run_search(question: str) -> list[dict]:
-    columns = selected_columns if indexed_columns and selected_columns else [
-        'CHUNK', 'SOURCE_URL', 'FILE_NAME', 'SHORT_DESCRIPTION'
-    ]
-    payload = json.dumps({
-        "query": question,
-        "columns": columns,
-        "filter": {},
-        "limit": limit,
-    })
-
-    response = session.sql(
-        f"""
-        SELECT SNOWFLAKE.CORTEX.SEARCH_PREVIEW(
-            '{DB}.{SCHEMA}.{SEARCH_SERVICE}',
-            ?
-        ) AS RESPONSE
-        """,
-        params=[payload],
-    ).collect()
-
-    if not response:
-        return []
-
-    raw_response = response[0]["RESPONSE"] if isinstance(response[0], dict) else response[0][0]
-
-    if isinstance(raw_response, str):
-        parsed_response = json.loads(raw_response)
-    elif hasattr(raw_response, "as_dict"):
-        parsed_response = raw_response.as_dict()
-    else:
-        parsed_response = raw_response
-
-    if isinstance(parsed_response, dict):
-        return parsed_response.get("results", [])
+                # Queued for the background writer; the warehouse is not touched here.
+                shared_writer().submit(
+                    backend,
+                    feedback_record(
+                        history_text, details, rating + 1 if rating is not None else None,
+                        preferred_model=preferred if preferred != "No preference" else None,
+                        # Latency and tokens per model; the answers are in the history.
+                        compared=[{k: v for k, v in run.items() if k != "text"} for run in compared or []] or None,
+                    ),
+                )
+                st.success("Thank you for your feedback!")
+
+def turn_settings() -> dict:
+    """Search and answer settings for one turn, read in the script thread."""
+    keys = ["search_limit", "split_compound_questions", "planner_mode", "depth_mode", "prompt_chunks",
+            "parse_question_filters", "entity_answers"]
+    compare = st.session_state.compare_mode and len(st.session_state.compare_models) > 1
+    return {
+        **{key: st.session_state[key] for key in keys},
+        "filters": current_filters(),
+        "model": st.session_state.selected_model,
+        # One search and one prompt, every selected model at once.
+        "compare_models": list(st.session_state.compare_models) if compare else [],
+    }
 
-    return []
+STAGE_LABELS = {"searching": "Searching documents...", "answering": "Thinking...", "comparing": "Thinking..."}
+
+def answer_turn(question: str, settings: dict):
+    """``engine.answer`` on the turn pool while the script thread shows its progress.
+
+    The engine's events are queued and shown between waits: the stage in the
+    status line and, in compare mode, one column per model, filled as that
+    model finishes. Updating the status line is a Streamlit yield point, so a
+    follow-up, Restart or the user leaving interrupts the wait and cancels
+    the turn's warehouse statements instead of leaving them running.
+    """
+    events = queue.SimpleQueue()
+    status = st.empty()
+    label = STAGE_LABELS["searching"]
+    slots, shown = {}, set()
+
+    def show_events():
+        nonlocal label
+        while not events.empty():
+            name, data = events.get()
+            if name == "status":
+                label = STAGE_LABELS[data["stage"]]
+                if data["stage"] == "comparing":
+                    for column, model in zip(st.columns(len(data["models"])), data["models"]):
+                        with column:
+                            st.markdown(f"**{model}**")
+                            slots[model] = st.empty()
+            elif name == "compared":
+                run = data["run"]
+                shown.add(run["model"])
+                with slots[run["model"]].container():
+                    show_run(run)
+
+    def tick(elapsed):
+        show_events()
+        note = f"({elapsed:.0f}s){st.session_state.requester.queue_note()}"
+        status.caption(f"{label} {note}")
+        for model, slot in slots.items():
+            if model not in shown:
+                slot.caption(f"{label} {note}")
+
+    answer = partial(
+        engine.answer,
+        on_event=lambda name, data: events.put((name, data)),
+        # A clicked follow-up was usually searched in the background already.
+        search=partial(shared_prefetcher().search, engine),
+    )
+    try:
+        turn = run_in_turn(
+            st.session_state.turn_jobs, answer, question, list(st.session_state.messages), settings, tick=tick,
+        )
+        show_events()
+    finally:
+        status.empty()
+    if turn.degraded:
+        # No model answered; the degraded answer replaces the columns.
+        for slot in slots.values():
+            slot.empty()
+    return turn
+
+# Suggestions shown for the text typed in the type-ahead box, best first.
+TYPEAHEAD_SUGGESTIONS = 8
+
+def take_typeahead(key: str):
+    """Ask the chosen suggestion once, and empty the box."""
+    st.session_state.typeahead_question = st.session_state[f"{key}_pick"]
+    st.session_state[f"{key}_pick"] = None
+    st.session_state[key] = ""
+
+@st.fragment
+def typeahead(key: str, placeholder: str):
+    """Question box; the typed text is looked up in the prefix index (questions, names, documents).
+
+    Entering text reruns only this fragment. Picking a suggestion reruns the
+    page, which asks it.
+    """
+    with rerun_timer(st.session_state, "typeahead"):
+        typed = st.text_input("Suggested questions", key=key, placeholder=placeholder, label_visibility="collapsed")
+        if typed.strip():
+            suggestions = shared_index(backend).complete(typed, limit=TYPEAHEAD_SUGGESTIONS)
+            if suggestions:
+                st.pills(
+                    "Suggested questions",
+                    suggestions,
+                    key=f"{key}_pick",
+                    label_visibility="collapsed",
+                    on_change=take_typeahead,
+                    args=(key,),
+                )
+            else:
+                st.caption("No suggested questions match; ask it in the chat box instead.")
+    if st.session_state.get("typeahead_question"):
+        st.rerun()
 
 if not user_first_interaction and not has_message_history:
     with st.container():
         st.chat_input("Ask a question...", key="initial_question")
+        typeahead("typeahead_initial", "Or type a faculty name, a department or a document and press Enter...")
 
         selected_suggestion = st.pills(
             label="Examples",
@@ -569,6 +531,7 @@ if not user_first_interaction and not has_message_history:
             key="selected_suggestion",
         )
 
+    record_rerun(st.session_state, "app", time.perf_counter() - app_run_started)
     st.stop()
 
 user_message = st.chat_input("Ask a follow-up...")
@@ -578,6 +541,12 @@ if not user_message:
         user_message = st.session_state.initial_question
     if user_just_clicked_suggestion:
         user_message = SUGGESTIONS[st.session_state.selected_suggestion]
+    if user_just_picked_typeahead:
+        user_message = st.session_state.typeahead_question
+    if st.session_state.get("followup_question"):
+        user_message = st.session_state.followup_question
+st.session_state.typeahead_question = None
+st.session_state.followup_question = None
 
 def clear_conversation():
     st.session_state.messages = []
@@ -588,9 +557,28 @@ def clear_conversation():
     st.session_state.last_search_context = None
     st.session_state.last_search_question = None
     st.session_state.last_search_error = None
+    st.session_state.last_search_plan = []
+    st.session_state.last_search_candidates = None
+    st.session_state.last_search_depth = None
+    st.session_state.last_search_filters = None
+    st.session_state.last_entity_lookup = None
+    st.session_state.last_search_shards = None
+    st.session_state.last_degraded = None
+    st.session_state.last_compare = None
+    st.session_state.last_prefetch = None
+    st.session_state.pop("chat_pdf", None)
+    st.session_state.pop("last_route", None)
+    st.session_state.turn_jobs.cancel_all("restart")
 
 def generate_chat_pdf() -> BytesIO:
     """Generate PDF from chat history."""
+    # reportlab is only needed for export; importing it here keeps it off the cold start.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.enums import TA_CENTER
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4,
                             rightMargin=72, leftMargin=72,
@@ -663,20 +651,45 @@ def generate_chat_pdf() -> BytesIO:
     buffer.seek(0)
     return buffer
 
-for i, message in enumerate(st.session_state.messages):
-    with st.chat_message(message["role"]):
-        if message["role"] == "assistant":
-            st.container()  # Fix ghost message bug
-        
-        st.markdown(message["content"])
-        
-        if message["role"] == "assistant":
-            show_feedback_controls(i)
+def chat_pdf() -> bytes:
+    """PDF export of the chat, rebuilt only when a message has been added."""
+    signature = len(st.session_state.messages)
+    cached = st.session_state.get("chat_pdf")
+    if not cached or cached[0] != signature:
+        cached = (signature, generate_chat_pdf().getvalue())
+        st.session_state.chat_pdf = cached
+    return cached[1]
+
+@st.fragment
+def chat_transcript():
+    """Replays the conversation so far; each answer has its own feedback fragment."""
+    with rerun_timer(st.session_state, "transcript"):
+        for i, message in enumerate(st.session_state.messages):
+            with st.chat_message(message["role"]):
+                if message["role"] == "assistant":
+                    st.container()  # Fix ghost message bug
+                
+                if message.get("compare"):
+                    show_compared(message["compare"])
+                    st.markdown(message.get("sources", ""))
+                else:
+                    st.markdown(message["content"])
+                
+                if message["role"] == "assistant":
+                    show_feedback_controls(i)
+
+chat_transcript()
 
 if user_message:
     # Escape LaTeX characters
     user_message = user_message.replace("$", r"\$")
 
+    # Anything the previous turn left running is no longer wanted.
+    st.session_state.turn_jobs.new_turn()
+    st.session_state.last_degraded = None
+    st.session_state.last_compare = None
+    st.session_state.last_prefetch = None
+
     # Store debug info for current question (don't delete, just update)
     st.session_state.last_search_question = user_message
     # Don't clear results here - they'll be updated after search completes
@@ -685,233 +698,313 @@ if user_message:
         st.text(user_message)
 
     with st.chat_message("assistant"):
-        should_search = is_searchable_question(user_message)
-
-        # Search for relevant context only when query is likely an info request.
-        with st.spinner("Searching documents..."):
-            try:
-                if should_search:
-                    search_result = run_search(user_message)
-                    # Convert to list if needed and store IMMEDIATELY
-                    if search_result:
-                        results = list(search_result) if not isinstance(search_result, list) else search_result
-                    else:
-                        results = []
-                else:
-                    results = []
-
-                # Store results for debug panel (must happen before any processing)
-                st.session_state.last_search_results = results
-                st.session_state.last_search_error = None
-
-                search_context = build_search_context(results) if results else "No relevant documents found."
-                st.session_state.last_search_context = search_context  # Store context for debug
-
-                # Extract unique sources with additional relevance filter.
-                source_documents = []
-                seen_urls = set()
-
-                for row in results:
-                    row_dict = normalize_row(row)
-
-                    # Keep only rows that are lexically relevant to user's query.
-                    if not is_result_relevant_to_question(user_message, row_dict):
-                        continue
-
-                    url = row_dict.get("SOURCE_URL") or row_dict.get("source_url")
-                    if not url or url in seen_urls:
-                        continue
-
-                    seen_urls.add(url)
-
-                    title = (
-                        row_dict.get("SHORT_DESCRIPTION")
-                        or row_dict.get("short_description")
-                        or row_dict.get("FILE_NAME")
-                        or row_dict.get("file_name")
-                        or "Document"
-                    )
-
-                    source_documents.append({
-                        "title": clean_text(title) if title else "Document",
-                        "url": str(url)
-                    })
-
-            except Exception as exc:
-                search_context = f"Error searching documents: {exc}"
-                st.session_state.last_search_error = str(exc)
-                source_documents = []
-        
-        # Build prompt with context and history
-        recent_history = st.session_state.messages[-HISTORY_LENGTH:] if len(st.session_state.messages) > 0 else []
-        recent_history_str = history_to_text(recent_history) if recent_history else None
-        
-        full_prompt = build_prompt(user_message, search_context, recent_history_str)
-        
-        # Get LLM response
-        with st.spinner("Thinking..."):
-            response = get_response(full_prompt, selected_model)
-
-        # Check if the response indicates no information was found
-        no_info_indicators = [
-            "couldn't find any information",
-            "no relevant information",
-            "don't have information",
-            "no information available",
-            "couldn't locate any information"
-        ]
-
-        clarification_indicators = [
-            "please ask a specific question",
-            "could you please ask",
-            "to assist you better, please ask",
-            "provide a clear question",
-            "ask a specific question"
-        ]
-
-        response_lower = response.lower()
-        has_no_information = any(indicator in response_lower for indicator in no_info_indicators)
-        asks_for_clarification = any(indicator in response_lower for indicator in clarification_indicators)
-
-        # Only append sources for relevant retrieved answers.
-        can_show_sources = should_search and not has_no_information and not asks_for_clarification and len(source_documents) > 0
-        if can_show_sources:
-            response += "\n\n---\n\n"
-            if len(source_documents) == 1:
-                response += "### 📚 Source\n\n"
-            else:
-                response += f"### 📚 Sources ({len(source_documents)} documents)\n\n"
+        # Entity-table shortcut, search, prompt and answer; the sidebar settings are read here.
+        settings = turn_settings()
+        turn = answer_turn(user_message, settings)
+        # e.g. the slower side of a hedged completion
+        st.session_state.turn_jobs.cancel_all("finished")
+
+        # Store debug info for the Debug Info panel
+        for key, value in turn.trace.items():
+            st.session_state[key] = value
+        st.session_state.last_entity_lookup = turn.entity_answer
+        st.session_state.last_search_results = turn.results
+        st.session_state.last_search_error = turn.search_error
+        st.session_state.last_search_context = turn.search_context
+        st.session_state.last_route = turn.route
+        st.session_state.last_degraded = degraded = turn.degraded
+        st.session_state.last_compare = turn.compared
+        response, results = turn.response, turn.results
+        compared = turn.compared if degraded is None else None
+        if degraded is None and (results or turn.entity_answer is not None):
+            # Once enough sessions ask it, the question joins everyone's type-ahead.
+            note_question(backend, user_message, st.session_state.requester.user)
 
-            for idx, doc in enumerate(source_documents, 1):
-                response += f"{idx}. **{doc['title']}**  \n"
-                response += f"   🔗 [{doc['url']}]({doc['url']})\n\n"
-        
         # Display the response and save to history
         with st.container():
-            st.markdown(response)
+            assistant_message = {"role": "assistant", "content": response}
+            if degraded is None and results:
+                asked = [m["content"] for m in st.session_state.messages if m["role"] == "user"]
+                assistant_message["followups"] = suggest_followups(user_message, response, results, asked)
+                for followup in assistant_message["followups"]:
+                    if will_search(followup, st.session_state.entity_answers):
+                        shared_prefetcher().prefetch(engine, followup, settings)
+            if compared:
+                # The columns are already on screen; only the sources are left.
+                assistant_message["compare"] = compared
+                assistant_message["sources"] = with_sources("", turn.sources)
+                st.markdown(assistant_message["sources"])
+            else:
+                st.markdown(response)
             
             # Add to chat history
             st.session_state.messages.append({"role": "user", "content": user_message})
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.messages.append(assistant_message)
             
             # Show feedback
             show_feedback_controls(len(st.session_state.messages) - 1)
 
+def take_followup():
+    """Ask the clicked follow-up once."""
+    st.session_state.followup_question = st.session_state.followup_chip
+    st.session_state.followup_chip = None
+
+# Chips for the latest answer; outside the transcript fragment, so a click reruns the page.
+if st.session_state.messages and st.session_state.messages[-1].get("followups"):
+    st.pills(
+        "Follow-up questions",
+        st.session_state.messages[-1]["followups"],
+        key="followup_chip",
+        label_visibility="collapsed",
+        on_change=take_followup,
+    )
+
 
 # Debug Info Section - Placed at bottom so it shows current search results
-# st.markdown("---")
-with st.sidebar.expander("🔍 Debug Info", expanded=False):
-    last_question = st.session_state.get("last_search_question")
-    if last_question:
-        st.write(f"**Last question:** {last_question}")
-
-    results = st.session_state.get("last_search_results") or []
-    if results:
-        st.write(f"**Total Results:** {len(results)} chunks retrieved")
-
-        distinct_titles: list[str] = []
-        distinct_sources: list[str] = []
-        for row in results:
-            row_dict = normalize_row(row)
-
-            # Use SHORT_DESCRIPTION or FILE_NAME for title
-            t_val = (
-                row_dict.get("SHORT_DESCRIPTION") or row_dict.get("short_description")
-                or row_dict.get("FILE_NAME") or row_dict.get("file_name")
+@st.fragment
+def debug_panel():
+    with rerun_timer(st.session_state, "debug"), st.expander("🔍 Debug Info", expanded=False):
+        stats = rerun_summary(st.session_state)
+        if stats:
+            st.write("**Reruns this session:** " + ", ".join(
+                f"{row['scope']} {row['runs']}× (last {row['last_ms']:.0f} ms)" for row in stats
+            ))
+        route = st.session_state.get("last_route")
+        if route:
+            decision = route["decision"]
+            answer = route.get("answer")
+            st.write(f"**Model route:** {decision.primary} → {decision.fallback or 'no fallback'}; {decision.reason}")
+            if answer:
+                st.write(
+                    f"**Answered by:** {answer.model} in {answer.seconds:.2f}s"
+                    + (" (hedged)" if answer.hedged else "")
+                    + "".join(f"; {a['model']} failed" for a in answer.attempts if "error" in a)
+                )
+            else:
+                st.write(f"**Model error:** {route['error']}")
+            if st.session_state.last_degraded:
+                st.write(f"**Degraded answer:** {st.session_state.last_degraded}")
+            st.json(latency_stats.snapshot(), expanded=False)
+        compared = st.session_state.last_compare
+        if compared:
+            st.write("**Compared models:** " + "; ".join(
+                f"{run['model']} " + ("failed" if run["error"] else f"{run['seconds']:.2f}s, ~{run['output_tokens']} tokens")
+                for run in compared
+            ))
+        prefetched = st.session_state.last_prefetch
+        if prefetched:
+            st.write(
+                f"**Search prefetched:** waited {prefetched['waited_s']:.2f}s instead of searching "
+                f"({prefetched['search_s']:.2f}s of search calls)"
             )
-            s_val = (
-                row_dict.get("SOURCE_URL") or row_dict.get("source_url")
+        prefetches = shared_prefetcher().snapshot()
+        if prefetches["started"]:
+            st.write(
+                f"**Follow-up prefetch:** {prefetches['hits']} used, {prefetches['wasted']} wasted "
+                f"(~{prefetches['wasted_search_s']:.1f}s warehouse, ~{prefetches['wasted_credits_estimate']:.4f} credits), "
+                f"{prefetches['busy']} skipped while busy"
             )
-
-            if t_val:
-                t_str = str(t_val)
-                if t_str not in distinct_titles:
-                    distinct_titles.append(t_str)
-            if s_val:
-                s_str = str(s_val)
-                if s_str not in distinct_sources:
-                    distinct_sources.append(s_str)
-
-        if distinct_titles:
-            st.write("**Distinct Titles (top 10):**")
-            for t in distinct_titles[:10]:
-                st.write(f"- {t}")
-        if distinct_sources:
-            st.write("**Distinct SOURCE_URLs (top 10):**")
-            for s in distinct_sources[:10]:
-                st.write(f"- {s}")
-
-        st.markdown("---")
-
-        for idx, row in enumerate(results, start=1):
-            row_dict = normalize_row(row)
-            st.write(f"**Chunk {idx}:**")
-
-            # Use SHORT_DESCRIPTION or FILE_NAME for title
-            title = (
-                row_dict.get("SHORT_DESCRIPTION") or row_dict.get("short_description")
-                or row_dict.get("FILE_NAME") or row_dict.get("file_name")
-                or "N/A"
+            st.json(prefetches, expanded=False)
+        entity_answer = st.session_state.get("last_entity_lookup")
+        if entity_answer is not None:
+            st.write(
+                f"**Answered from entity tables:** {entity_answer.query.describe()}, "
+                f"{len(entity_answer.rows)} rows in {entity_answer.seconds * 1000:.1f} ms"
             )
-            source_url = (
-                row_dict.get("SOURCE_URL")
-                or row_dict.get("source_url")
-                or "N/A"
+        cancels = cancel_metrics.snapshot()
+        if cancels["counts"]:
+            turn_jobs = st.session_state.turn_jobs
+            st.write(
+                f"**Cancelled statements:** {int(turn_jobs.savings['cancelled'])} this session "
+                f"(~{turn_jobs.savings['saved_s']:.1f}s warehouse time saved); process-wide "
+                f"~{cancels['saved_estimate_s']:.1f}s saved, {cancels['spent_before_cancel_s']:.1f}s spent before cancelling"
+            )
+            st.json(cancels, expanded=False)
+        admission = shared_controller().snapshot()
+        if any(gate["admitted"] for gate in admission.values()):
+            st.write("**Admission:** " + "; ".join(
+                f"{kind} {gate['in_flight']}/{gate['limit']} running, {gate['queue_depth']} queued, "
+                f"wait p95 {gate['wait_p95_s']}s, {gate['timeouts']} timed out"
+                for kind, gate in admission.items() if gate["admitted"] or gate["timeouts"]
+            ))
+            st.json(admission, expanded=False)
+        writer = shared_writer().status()
+        if writer.get("queued"):
+            st.write(
+                f"**Feedback writer:** {writer.get('written', 0)} written, {writer['in_queue']} queued, "
+                f"{writer['spool_files']} spool file(s)"
+                + (f", last error: {writer['last_error']}" if writer["last_error"] else "")
             )
-            st.write(f"- Title: {title}")
-            st.write(f"- Source: {source_url}")
-
-            chunk_value = row_dict.get("CHUNK") or row_dict.get("chunk") or row_dict.get("content")
-            chunk_text = extract_result_text(chunk_value)
-            if chunk_text:
-                st.text((chunk_text[:250] + "...") if len(chunk_text) > 250 else chunk_text)
-
-            uploaded_by = row_dict.get("UPLOADED_BY") or row_dict.get("uploaded_by")
-            if uploaded_by:
-                st.write(f"- Uploaded by: {uploaded_by}")
 
-            chunk_index = row_dict.get("CHUNK_INDEX") or row_dict.get("chunk_index")
-            if chunk_index is not None:
-                st.write(f"- Chunk Index: {chunk_index}")
+        last_question = st.session_state.get("last_search_question")
+        if last_question:
+            st.write(f"**Last question:** {last_question}")
+
+        search_filters = st.session_state.get("last_search_filters")
+        if search_filters and search_filters[1]:
+            st.write(f"**Filters:** {search_filters[0].describe()}")
+            st.json(search_filters[1], expanded=False)
+        dropped = st.session_state.get("last_search_filters_dropped")
+        if dropped:
+            st.write(f"**Question filters dropped:** {dropped.describe()} (no results with them)")
+
+        shard_trace = st.session_state.get("last_search_shards")
+        if shard_trace and st.session_state.search_routes.sharded:
+            calls = shard_trace["calls"]
+            st.write(
+                f"**Shards:** {', '.join(shard_trace['shards'])} of "
+                f"{len(st.session_state.search_routes.routes)} ({shard_trace['reason']})"
+            )
+            for call in calls:
+                st.write(
+                    f"- {call['shard']}: {call['hits']} hits"
+                    + (f", {call['seconds']:.2f}s" if call["seconds"] is not None else f", failed: {call['error']}")
+                )
+
+        plan = st.session_state.get("last_search_plan") or []
+        if len(plan) > 1:
+            st.write(f"**Sub-queries ({len(plan)}, searched concurrently):**")
+            for step in plan:
+                st.write(f"- {step['query']} ({step['hits']} hits, {step['seconds']:.2f}s)")
+
+        results = st.session_state.get("last_search_results") or []
+        if results:
+            st.write(f"**Total Results:** {len(results)} chunks retrieved")
+            candidates = st.session_state.get("last_search_candidates")
+            if candidates:
+                st.write(f"**Reranked:** top {len(results)} of {candidates} over-fetched candidates")
+            depth = st.session_state.get("last_search_depth")
+            if depth:
+                st.write(
+                    f"**Adaptive depth:** {depth.depth} of {depth.fetched} ({depth.reason}), "
+                    f"~{depth.tokens_saved} prompt tokens saved"
+                )
+
+            distinct_titles: list[str] = []
+            distinct_sources: list[str] = []
+            for row in results:
+                row_dict = normalize_row(row)
+
+                # Use SHORT_DESCRIPTION or FILE_NAME for title
+                t_val = (
+                    row_dict.get("SHORT_DESCRIPTION") or row_dict.get("short_description")
+                    or row_dict.get("FILE_NAME") or row_dict.get("file_name")
+                )
+                s_val = (
+                    row_dict.get("SOURCE_URL") or row_dict.get("source_url")
+                )
+
+                if t_val:
+                    t_str = str(t_val)
+                    if t_str not in distinct_titles:
+                        distinct_titles.append(t_str)
+                if s_val:
+                    s_str = str(s_val)
+                    if s_str not in distinct_sources:
+                        distinct_sources.append(s_str)
+
+            if distinct_titles:
+                st.write("**Distinct Titles (top 10):**")
+                for t in distinct_titles[:10]:
+                    st.write(f"- {t}")
+            if distinct_sources:
+                st.write("**Distinct SOURCE_URLs (top 10):**")
+                for s in distinct_sources[:10]:
+                    st.write(f"- {s}")
 
             st.markdown("---")
-    else:
-        st.write("No search performed yet.")
-
-    context = st.session_state.get("last_search_context")
-    if context:
-        st.write("**Search Context Used:**")
-        st.text((context[:800] + "...") if len(context) > 800 else context)
 
-with st.container():
-    st.markdown('<div class="restart-btn">', unsafe_allow_html=True)
-    
-    # Show both Save PDF and Restart buttons if there's chat history
-    if len(st.session_state.messages) > 0:
-        _, _, save_col, restart_col = st.columns([6, 1, 1, 1])
-        with save_col:
-            pdf_buffer = generate_chat_pdf()
-            st.download_button(
-                label="Save PDF",
-                data=pdf_buffer,
-                file_name=f"iitj_chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                mime="application/pdf",
-                icon=":material/download:",
+            for idx, row in enumerate(results, start=1):
+                row_dict = normalize_row(row)
+                st.write(f"**Chunk {idx}:**")
+
+                # Use SHORT_DESCRIPTION or FILE_NAME for title
+                title = (
+                    row_dict.get("SHORT_DESCRIPTION") or row_dict.get("short_description")
+                    or row_dict.get("FILE_NAME") or row_dict.get("file_name")
+                    or "N/A"
+                )
+                source_url = (
+                    row_dict.get("SOURCE_URL")
+                    or row_dict.get("source_url")
+                    or "N/A"
+                )
+                st.write(f"- Title: {title}")
+                st.write(f"- Source: {source_url}")
+
+                chunk_value = row_dict.get("CHUNK") or row_dict.get("chunk") or row_dict.get("content")
+                chunk_text = extract_result_text(chunk_value)
+                if chunk_text:
+                    st.text((chunk_text[:250] + "...") if len(chunk_text) > 250 else chunk_text)
+
+                uploaded_by = row_dict.get("UPLOADED_BY") or row_dict.get("uploaded_by")
+                if uploaded_by:
+                    st.write(f"- Uploaded by: {uploaded_by}")
+
+                chunk_index = row_dict.get("CHUNK_INDEX") or row_dict.get("chunk_index")
+                if chunk_index is not None:
+                    st.write(f"- Chunk Index: {chunk_index}")
+
+                st.markdown("---")
+        else:
+            st.write("No search performed yet.")
+
+        context = st.session_state.get("last_search_context")
+        if context:
+            st.write("**Search Context Used:**")
+            st.text((context[:800] + "...") if len(context) > 800 else context)
+
+def breaker_status():
+    """Cortex circuit breakers; anything but closed means answers are degraded."""
+    labels = {"search": "Document search", "complete": "AI answers"}
+    states = breaker_states()
+    if all(state["state"] == "closed" for state in states.values()):
+        st.caption("Cortex: " + " · ".join(f"🟢 {labels[kind]}" for kind in states))
+        return
+    for kind, state in states.items():
+        if state["state"] == "open":
+            st.warning(
+                f"🔴 {labels[kind]} unavailable after repeated failures; retrying in {state['retry_in']:.0f}s. "
+                "Answers are degraded and labeled."
             )
+        elif state["state"] == "half-open":
+            st.info(f"🟡 {labels[kind]}: checking whether the service has recovered")
+        else:
+            st.caption(f"🟢 {labels[kind]}")
+
+with st.sidebar:
+    breaker_status()
+    debug_panel()
+
+@st.fragment
+def export_bar():
+    """Save PDF and Restart; the PDF is served from the cache unless the chat grew."""
+    with rerun_timer(st.session_state, "export"), st.container():
+        st.markdown('<div class="restart-btn">', unsafe_allow_html=True)
+        
+        # Show both Save PDF and Restart buttons if there's chat history
+        if len(st.session_state.messages) > 0:
+            _, _, save_col, restart_col = st.columns([6, 1, 1, 1])
+            with save_col:
+                st.download_button(
+                    label="Save PDF",
+                    data=chat_pdf(),
+                    file_name=f"iitj_chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                    mime="application/pdf",
+                    icon=":material/download:",
+                    on_click="ignore",
+                )
+        else:
+            # Only show Restart button if no chat history
+            _, _, _, restart_col = st.columns([6, 1, 1, 1])
         with restart_col:
-            st.button(
-                "Restart",
-                icon=":material/refresh:",
-                on_click=clear_conversation,
-            )
-    else:
-        # Only show Restart button if no chat history
-        _, _, _, right_col = st.columns([6, 1, 1, 1])
-        with right_col:
-            st.button(
-                "Restart",
-                icon=":material/refresh:",
-                on_click=clear_conversation,
-            )
-    
-    st.markdown('</div>', unsafe_allow_html=True)
+            # Restart resets the whole page, not just this fragment.
+            if st.button("Restart", icon=":material/refresh:"):
+                clear_conversation()
+                st.rerun()
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+
+typeahead("typeahead_followup", "Type a name or a topic and press Enter for suggested questions...")
+export_bar()
+record_rerun(st.session_state, "app", time.perf_counter() - app_run_started)
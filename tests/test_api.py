@@ -0,0 +1,29 @@
+"""API settings: each value must have the type of its engine default."""
+
+import pytest
+
+from iitj_search.api import BadRequest, parse_settings
+
+
+def test_valid_settings():
+    settings = parse_settings({
+        "search_limit": 5, "entity_answers": False, "depth_mode": "Rerank",
+        "compare_models": ["llama3.1-70b", "claude-4-sonnet"],
+    })
+    assert settings["search_limit"] == 5 and settings["entity_answers"] is False
+    assert settings["compare_models"] == ("llama3.1-70b", "claude-4-sonnet")
+
+
+@pytest.mark.parametrize("settings", [
+    {"search_limit": "abc"},
+    {"search_limit": True},
+    {"search_limit": 0},
+    {"entity_answers": 1},
+    {"depth_mode": "Deep"},
+    {"model": "gpt-4"},
+    {"compare_models": "llama3.1-70b"},
+    {"compare_models": [1, 2]},
+])
+def test_bad_settings(settings):
+    with pytest.raises(BadRequest):
+        parse_settings(settings)
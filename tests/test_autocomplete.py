@@ -0,0 +1,17 @@
+"""Type-ahead: a session's questions reach other sessions only once several sessions ask them."""
+
+from iitj_search.autocomplete import MIN_SESSIONS, note_question, shared_index
+from iitj_search.backend import LocalBackend
+
+QUESTION = "What is the hostel fee for first year students?"
+
+
+def test_question_needs_distinct_sessions():
+    backend = LocalBackend()
+    index = shared_index(backend)
+    for _ in range(MIN_SESSIONS):
+        note_question(backend, QUESTION, "session-a")
+    assert QUESTION not in index.complete("hostel fee")
+    for n in range(1, MIN_SESSIONS):
+        note_question(backend, QUESTION, f"session-{n}")
+    assert QUESTION in index.complete("hostel fee")
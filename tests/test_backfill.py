@@ -0,0 +1,44 @@
+"""Re-embedding keeps a file's old chunks until the new ones are in."""
+
+import pytest
+
+from iitj_search import config
+from iitj_search.backend import LocalBackend
+from iitj_search.backfill import reembed
+from iitj_search.local_corpus import build_corpus
+
+
+def chunk_generations(backend, file_name):
+    rows = backend.sql(
+        f"SELECT CREATED_AT, COUNT(*) AS N FROM {config.CHUNK_TABLE} WHERE FILE_NAME = ? GROUP BY CREATED_AT",
+        params=[file_name],
+    )
+    return {row["CREATED_AT"]: row["N"] for row in rows}
+
+
+@pytest.fixture
+def backend():
+    backend = LocalBackend()
+    backend.load_corpus(build_corpus(0)[:3])
+    return backend
+
+
+def test_reembed_replaces_the_old_generation(backend):
+    name = backend.sql(f"SELECT FILE_NAME FROM {config.CHUNK_TABLE} LIMIT 1")[0]["FILE_NAME"]
+    (old,) = chunk_generations(backend, name)
+    chunks = reembed(backend, name)
+    generations = chunk_generations(backend, name)
+    assert old not in generations and list(generations.values()) == [chunks]
+
+
+def test_failed_reembed_keeps_the_old_chunks(backend, monkeypatch):
+    name = backend.sql(f"SELECT FILE_NAME FROM {config.CHUNK_TABLE} LIMIT 1")[0]["FILE_NAME"]
+    before = chunk_generations(backend, name)
+
+    def fail(file_name):
+        raise RuntimeError("warehouse suspended")
+
+    monkeypatch.setattr(backend, "generate_embeddings", fail)
+    with pytest.raises(RuntimeError):
+        reembed(backend, name)
+    assert chunk_generations(backend, name) == before
@@ -0,0 +1,22 @@
+"""Cold-start regression check: every page's cold first render stays under the threshold.
+
+Runs ``iitj_search.startup_profile`` against the local backend. The
+threshold defaults to the profiler's and can be raised on slow CI runners
+with IITJ_MAX_FIRST_RENDER (seconds).
+"""
+
+import json
+import os
+
+from iitj_search.startup_profile import DEFAULT_MAX_FIRST_RENDER, main
+
+MAX_FIRST_RENDER = float(os.environ.get("IITJ_MAX_FIRST_RENDER") or DEFAULT_MAX_FIRST_RENDER)
+
+
+def test_cold_first_render_under_threshold(capsys):
+    status = main(["--max-first-render", str(MAX_FIRST_RENDER), "--json"])
+    report = json.loads(capsys.readouterr().out)
+    assert status == 0, (
+        f"cold first render over {MAX_FIRST_RENDER}s or raised: "
+        + ", ".join(f"{page['page']} {page['first_render_s']}s {page['exceptions']}" for page in report["pages"])
+    )
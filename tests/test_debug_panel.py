@@ -0,0 +1,30 @@
+"""The Debug Info panel shows the last search's readouts after a searched question.
+
+Nothing besides the question is needed: no rerun statistics beforehand and
+no feedback sent.
+"""
+
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+from iitj_search.backend import LocalBackend
+from iitj_search.local_corpus import build_corpus
+
+SEARCH_PAGE = Path(__file__).resolve().parent.parent / "pages" / "02_AI_Search.py"
+
+
+def test_debug_panel_shows_search_readouts():
+    backend = LocalBackend()
+    backend.load_corpus(build_corpus(50))
+    at = AppTest.from_file(str(SEARCH_PAGE), default_timeout=60)
+    at.session_state["backend"] = backend
+    at.session_state["depth_mode"] = "Adaptive"
+    at.run()
+    at.chat_input[0].set_value("Compare the CSE and EE departments").run()
+    assert not at.exception
+
+    panel = " ".join(element.value for element in at.sidebar.markdown)
+    for readout in ("**Last question:**", "**Sub-queries", "**Total Results:**", "**Adaptive depth:**",
+                    "**Chunk 1:**", "**Search Context Used:**"):
+        assert readout in panel
@@ -0,0 +1,28 @@
+"""Which questions the entity tables answer, and which go to search."""
+
+import pytest
+
+from iitj_search.entities import match_enumeration
+
+
+@pytest.mark.parametrize("question, kind, topic", [
+    ("List all faculty in Mathematics", "faculty", "Mathematics"),
+    ("List faculty in the Mathematics department", "faculty", "Mathematics"),
+    ("List all professors in AI/DATA SCIENCE. Also give their email", "faculty", "AI/DATA SCIENCE"),
+    ("Which professors work in AI? Give their emails", "faculty", "AI"),
+    ("What are the departments at IIT Jodhpur?", "departments", None),
+])
+def test_enumerations(question, kind, topic):
+    query = match_enumeration(question)
+    assert (query.kind, query.topic) == (kind, topic)
+
+
+@pytest.mark.parametrize("question", [
+    "Who is the head of the CSE department?",
+    "Which departments offer a PhD in physics?",
+    "Give details of the admission process for all departments",
+    "Which professors teach the machine learning course?",
+    "List all faculty in CSE who are on leave",
+])
+def test_other_questions_go_to_search(question):
+    assert match_enumeration(question) is None
@@ -0,0 +1,20 @@
+"""Filters read from the question: only explicit upload phrasing limits the upload date."""
+
+from datetime import date
+
+from iitj_search.filters import SearchFilters, parse_filters
+
+TODAY = date(2026, 1, 31)
+
+
+def test_upload_phrasing_becomes_a_filter():
+    filters, text = parse_filters("notices uploaded after 2025-01-01", TODAY)
+    assert (filters.uploaded_after, text) == (date(2025, 1, 1), "notices")
+    filters, text = parse_filters("recently uploaded tender notices", TODAY)
+    assert (filters.uploaded_after, text) == (date(2025, 11, 2), "tender notices")
+
+
+def test_content_dates_stay_in_the_query():
+    for question in ("Which research papers were published in 2023?", "What are the latest notices?",
+                     "admissions in 2025"):
+        assert parse_filters(question, TODAY) == (SearchFilters(), question)
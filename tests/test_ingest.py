@@ -0,0 +1,23 @@
+"""A dry run only reads the stage and tables."""
+
+from iitj_search import ingest
+from iitj_search.backend import LocalBackend
+
+
+def test_dry_run_creates_nothing(tmp_path, monkeypatch):
+    (tmp_path / "notice.txt").write_text("Hostel allotment notice")
+    backend = LocalBackend()
+    statements = []
+    run = backend.sql
+
+    def sql(query, params=None):
+        statements.append(" ".join(query.split()))
+        return run(query, params)
+
+    monkeypatch.setattr(backend, "sql", sql)
+    monkeypatch.setattr(ingest, "command_line_backend", lambda name: backend)
+    assert ingest.main([
+        "--dir", str(tmp_path), "--base-url", "https://iitj.ac.in/docs", "--uploaded-by", "office@iitj.ac.in",
+        "--dry-run",
+    ]) == 0
+    assert statements and all(s.startswith(("LIST", "SELECT")) for s in statements)
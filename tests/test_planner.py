@@ -0,0 +1,16 @@
+"""Sub-query planning: what the local rules split and what they leave whole."""
+
+from iitj_search.planner import plan_queries
+
+
+def test_slash_between_words_splits():
+    assert plan_queries("List all professors in AI/DATA SCIENCE") == [
+        "List all professors in AI/DATA SCIENCE",
+        "List all professors in AI",
+        "List all professors in DATA SCIENCE",
+    ]
+
+
+def test_slash_in_academic_year_stays_whole():
+    assert plan_queries("fee structure for 2024/25") == ["fee structure for 2024/25"]
+    assert plan_queries("hostel fee for the 2024/2025 session") == ["hostel fee for the 2024/2025 session"]
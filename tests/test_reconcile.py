@@ -0,0 +1,26 @@
+"""The prune guard: a bad stage listing must not empty the index."""
+
+import pytest
+
+from iitj_search.reconcile import PRUNABLE, REPORT_ONLY, check_prune
+
+BEFORE = {"chunks": 100, "metadata_rows": 100}
+
+
+def found(orphaned_files: int) -> dict:
+    result = {key: [] for key in PRUNABLE + REPORT_ONLY}
+    result["orphaned_chunks"] = [{"file": f"f{i}.pdf", "chunks": 1} for i in range(orphaned_files)]
+    return result
+
+
+def test_empty_stage_refuses():
+    with pytest.raises(RuntimeError, match="stage lists no files"):
+        check_prune(found(1), {}, BEFORE)
+
+
+def test_share_of_index_refuses():
+    staged = {"a.pdf": {}}
+    check_prune(found(40), staged, BEFORE)
+    with pytest.raises(RuntimeError, match="exceeds --max-deletes 40"):
+        check_prune(found(41), staged, BEFORE)
+    check_prune(found(41), staged, BEFORE, max_deletes=50)
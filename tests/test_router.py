@@ -0,0 +1,32 @@
+"""Routed completions: hedging and fallback timing."""
+
+import time
+
+from iitj_search import router
+from iitj_search.router import RouteDecision, choose, complete_routed
+
+
+def slow_complete(model, prompt):
+    time.sleep(0.3)
+    return f"{model} answered"
+
+
+def test_hedge_without_fallback_waits_instead_of_spinning(monkeypatch):
+    calls = []
+    real_wait = router.wait
+
+    def counting_wait(*args, **kwargs):
+        calls.append(1)
+        return real_wait(*args, **kwargs)
+
+    monkeypatch.setattr(router, "wait", counting_wait)
+    decision = RouteDecision("llama3.1-70b", None, "simple", "test", hedge_after=0.05, deadline=5)
+    answer = complete_routed(slow_complete, "prompt", decision)
+    assert answer.model == "llama3.1-70b" and not answer.hedged
+    assert len(calls) < 10
+
+
+def test_no_hedge_when_every_other_model_is_failing(monkeypatch):
+    monkeypatch.setattr(router.latency_stats, "failing", lambda model: model != "llama3.1-70b")
+    decision = choose("What are the hostel fees?", "prompt")
+    assert (decision.primary, decision.fallback, decision.hedge_after) == ("llama3.1-70b", None, None)